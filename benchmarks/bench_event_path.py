@@ -0,0 +1,305 @@
+"""
+Load and latency benchmark for the full event path: publisher adapter -> event center -> subscriber adapters.
+
+Launches an event center (in its own process, from a temp directory), then, for each scenario, starts subscriber
+adapters (each with its own callback server, registered for the benchmark event) and publisher adapters posting
+events at a given rate and payload size for a fixed time.  Latency is measured per delivery, from the event's
+'original_event_time' metadata (set the way routers set it) to when the subscriber's event handler gets it.
+
+Publishers pace themselves on a schedule, and stamp each event with the time it was due (not the time it was sent),
+so latency includes time spent waiting on a slow event center, instead of hiding it (coordinated omission).
+
+Reports per scenario:
+- published/s, and delivered/s until the last delivery landed (deliveries = published x subscribers)
+- lost: deliveries that didn't land within the drain time
+- latency p50, p99, p999 and max (ms), over events published after warmup
+
+Run from repo root:
+    python -m benchmarks.bench_event_path [--server sync|async|gunicorn] [--duration 10] [--warmup 1]
+        [--publishers 2] [--rates 0 500] [--payload-bytes 100 10000] [--subscribers 1 4]
+        [--json results.json] [--baseline previous.json]
+
+Scenarios are all combinations of rates (events/s over all publishers, 0 for as fast as they can), payload sizes and
+subscriber counts.  Clients share this process, so at high rates they may be the bottleneck.  Compare against a saved
+run with --baseline (prints changes per scenario).
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+import requests
+from eventdispatch import Event, Properties
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN_CONF = os.path.join(REPO_DIR, 'eventcenter', 'gunicorn_conf.py')
+EVENT_CENTER_PORT = 6400
+CLIENT_BASE_PORT = 6500
+BENCH_EVENT = 'bench_event'
+
+SERVER_SYNC = 'sync'
+SERVER_ASYNC = 'async'
+SERVER_GUNICORN = 'gunicorn'
+
+
+class LatencyRecorder:
+    # Collects delivery latencies (from subscribers' callback threads).
+
+    def __init__(self, measure_from: float):
+        self.__measure_from = measure_from
+        self.__latencies = []
+        self.__delivered_count = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def delivered_count(self) -> int:
+        return self.__delivered_count
+
+    @property
+    def latencies(self) -> List[float]:
+        return list(self.__latencies)
+
+    def on_event(self, remote_event):
+        received_at = time.time()
+        sent_at = remote_event.event.payload['metadata']['original_event_time']
+        with self.__lock:
+            self.__delivered_count += 1
+            if sent_at >= self.__measure_from:
+                self.__latencies.append(received_at - sent_at)
+
+
+def start_event_center(server: str, work_dir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([REPO_DIR] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    env['EC_PORT'] = str(EVENT_CENTER_PORT)
+    env['EC_LOG_DEBUG'] = '0'
+    os.makedirs(os.path.join(work_dir, 'server'), exist_ok=True)
+
+    if server == SERVER_ASYNC:
+        command = [sys.executable, '-m', 'eventcenter.app_async_event_center']
+    elif server == SERVER_GUNICORN:
+        command = [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONF, 'eventcenter.app_event_center:app']
+    else:
+        env['RUN_AS_A_SERVER'] = '1'
+        command = [sys.executable, '-m', 'eventcenter.app_event_center']
+
+    process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_until(lambda: requests.get(f'http://localhost:{EVENT_CENTER_PORT}/ping', timeout=1.0).ok, 30.0,
+               'Event center did not come up')
+    return process
+
+
+def create_adapter(port: int, event_handler):
+    from eventcenter.client.event_center_adapter import EventCenterAdapter
+
+    # Adapter takes its callback port from properties when created.
+    Properties().set('EVENT_CENTER_CALLBACK_PORT', port)
+    return EventCenterAdapter(event_handler)
+
+
+def publish(adapter, rate_per_publisher: float, payload: str, deadline: float, counts: List[int]):
+    interval = 1.0 / rate_per_publisher if rate_per_publisher else 0.0
+    due = time.time()
+    count = 0
+    while due < deadline:
+        if interval:
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+        event = Event(BENCH_EVENT, {'index': count, 'data': payload})
+        event.payload['metadata'] = {
+            'original_event_id': event.id,
+            'original_event_time': due if interval else event.time,
+            'router': 'bench'
+        }
+        adapter.post_event(event, is_suppress_connection_error=False)
+        count += 1
+        due = due + interval if interval else time.time()
+    counts.append(count)
+
+
+def run_scenario(index: int, publisher_count: int, rate: float, payload_bytes: int, subscriber_count: int,
+                 duration_sec: float, warmup_sec: float, drain_sec: float) -> Dict[str, Any]:
+    base_port = CLIENT_BASE_PORT + index * 100
+    start = time.time() + 0.5
+    recorder = LatencyRecorder(measure_from=start + warmup_sec)
+    adapters = []
+    try:
+        subscribers = [create_adapter(base_port + i, recorder.on_event) for i in range(subscriber_count)]
+        adapters.extend(subscribers)
+        for subscriber in subscribers:
+            subscriber.register([BENCH_EVENT])
+        publishers = [create_adapter(base_port + subscriber_count + i, lambda remote_event: None)
+                      for i in range(publisher_count)]
+        adapters.extend(publishers)
+
+        counts = []
+        deadline = start + warmup_sec + duration_sec
+        threads = [threading.Thread(target=publish, args=[publisher, rate / publisher_count, 'x' * payload_bytes,
+                                                          deadline, counts]) for publisher in publishers]
+        time.sleep(max(0.0, start - time.time()))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+
+        # Let deliveries in flight land.
+        published = sum(counts)
+        expected = published * subscriber_count
+        wait_until(lambda: recorder.delivered_count >= expected, drain_sec)
+        delivery_elapsed = time.time() - start
+
+        latencies = sorted(recorder.latencies)
+        return {
+            'publishers': publisher_count,
+            'rate': rate,
+            'payload_bytes': payload_bytes,
+            'subscribers': subscriber_count,
+            'published_per_sec': round(published / elapsed, 1),
+            'delivered_per_sec': round(recorder.delivered_count / delivery_elapsed, 1),
+            'lost': max(0, expected - recorder.delivered_count),
+            'latency_ms': {
+                'p50': to_ms(percentile(latencies, 50)),
+                'p99': to_ms(percentile(latencies, 99)),
+                'p999': to_ms(percentile(latencies, 99.9)),
+                'max': to_ms(latencies[-1] if latencies else None),
+                'samples': len(latencies)
+            }
+        }
+    finally:
+        for adapter in adapters:
+            adapter.unregister_all()
+            adapter.shutdown()
+
+
+def percentile(sorted_values: List[float], p: float) -> Any:
+    # Nearest rank.
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(p / 100.0 * len(sorted_values) + 0.5 - 1e-9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def to_ms(value: Any) -> Any:
+    return round(value * 1000.0, 2) if value is not None else None
+
+
+def wait_until(condition, timeout_sec: float, error: str = None):
+    deadline = time.monotonic() + timeout_sec
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return True
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.05)
+    if error:
+        raise RuntimeError(error)
+    return False
+
+
+def run(server: str, publisher_count: int, rates: List[float], payload_sizes: List[int], subscriber_counts: List[int],
+        duration_sec: float, warmup_sec: float, drain_sec: float) -> Dict[str, Any]:
+    Properties().set('EVENT_CENTER_URL', f'http://localhost:{EVENT_CENTER_PORT}')
+    Properties().set('EVENT_CENTER_CALLBACK_HOST', 'http://localhost')
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+    logging.disable(logging.CRITICAL)
+
+    scenarios = list(itertools.product(rates, payload_sizes, subscriber_counts))
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        process = start_event_center(server, work_dir)
+        try:
+            for index, (rate, payload_bytes, subscriber_count) in enumerate(scenarios):
+                results.append(run_scenario(index, publisher_count, rate, payload_bytes, subscriber_count,
+                                            duration_sec, warmup_sec, drain_sec))
+        finally:
+            process.terminate()
+            process.wait(10)
+            logging.disable(logging.NOTSET)
+
+    return {
+        'server': server,
+        'duration_sec': duration_sec,
+        'warmup_sec': warmup_sec,
+        'scenarios': results
+    }
+
+
+def get_scenario_key(result: Dict[str, Any]) -> tuple:
+    return result['publishers'], result['rate'], result['payload_bytes'], result['subscribers']
+
+
+def print_results(results: Dict[str, Any], baseline: Dict[str, Any] = None):
+    previous = {get_scenario_key(result): result for result in (baseline or {}).get('scenarios', [])}
+
+    print(f"server: {results['server']}")
+    print(f"{'rate':>8}{'bytes':>8}{'subs':>6}{'published/s':>13}{'delivered/s':>13}{'lost':>7}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'p999 ms':>9}{'max ms':>9}")
+    for result in results['scenarios']:
+        latency = result['latency_ms']
+        rate = f"{result['rate']:g}" if result['rate'] else 'max'
+        print(f"{rate:>8}{result['payload_bytes']:>8}{result['subscribers']:>6}{result['published_per_sec']:>13}"
+              f"{result['delivered_per_sec']:>13}{result['lost']:>7}{str(latency['p50']):>9}{str(latency['p99']):>9}"
+              f"{str(latency['p999']):>9}{str(latency['max']):>9}")
+
+        before = previous.get(get_scenario_key(result))
+        if before:
+            print(f"{'vs baseline':>22}{format_change(before['published_per_sec'], result['published_per_sec']):>19}"
+                  f"{format_change(before['delivered_per_sec'], result['delivered_per_sec']):>13}{'':>7}"
+                  + ''.join(f"{format_change(before['latency_ms'][key], latency[key]):>9}"
+                            for key in ['p50', 'p99', 'p999', 'max']))
+
+
+def format_change(before: Any, after: Any) -> str:
+    if not before or after is None:
+        return '-'
+    return f'{(after - before) / before:+.0%}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Event center throughput and end-to-end latency')
+    parser.add_argument('-s', '--server', choices=[SERVER_SYNC, SERVER_ASYNC, SERVER_GUNICORN], default=SERVER_SYNC,
+                        help='Event center to launch (Default: sync)')
+    parser.add_argument('-d', '--duration', type=float, default=10.0,
+                        help='Seconds to publish per scenario, after warmup (Default: 10)')
+    parser.add_argument('-w', '--warmup', type=float, default=1.0,
+                        help='Seconds to publish before measuring latency (Default: 1)')
+    parser.add_argument('--drain', type=float, default=10.0,
+                        help='Seconds to wait for deliveries in flight, after publishing (Default: 10)')
+    parser.add_argument('-p', '--publishers', type=int, default=2, help='Publishing clients (Default: 2)')
+    parser.add_argument('-r', '--rates', type=float, nargs='+', default=[0],
+                        help='Events per second over all publishers, 0 for as fast as they can (Default: 0)')
+    parser.add_argument('-b', '--payload-bytes', type=int, nargs='+', default=[100],
+                        help='Payload sizes to try (Default: 100)')
+    parser.add_argument('-n', '--subscribers', type=int, nargs='+', default=[1, 4],
+                        help='Subscriber counts (fan-out) to try (Default: 1 4)')
+    parser.add_argument('-j', '--json', metavar='', help='File to write results to (as json)')
+    parser.add_argument('--baseline', metavar='', help='Results of an earlier run (json) to compare against')
+    args = parser.parse_args()
+
+    results = run(args.server, args.publishers, args.rates, args.payload_bytes, args.subscribers, args.duration,
+                  args.warmup, args.drain)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Measures registration and routing throughput at different log levels, to check that debug log messages (and the
+registration/event dumps in them) are only built when DEBUG is enabled.
+
+Run from repo root:
+    python -m benchmarks.bench_logging [--count 2000] [--json results.json]
+
+Modes:
+- disabled: all logging disabled (baseline, nothing logged or built)
+- info:     root logger at INFO (production setting, should be on par with baseline)
+- debug:    root logger at DEBUG, messages built but dropped by a null handler (cost of building messages)
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, Dict
+from unittest import mock
+
+from eventdispatch import Event, Properties
+
+MODE_DISABLED = 'disabled'
+MODE_INFO = 'info'
+MODE_DEBUG = 'debug'
+
+CALLBACK_PORT = 9500
+
+
+def set_log_mode(mode: str):
+    root = logging.getLogger()
+    root.handlers = [logging.NullHandler()]
+    logging.disable(logging.NOTSET)
+
+    if mode == MODE_DISABLED:
+        logging.disable(logging.CRITICAL)
+    elif mode == MODE_INFO:
+        root.setLevel(logging.INFO)
+    else:
+        root.setLevel(logging.DEBUG)
+
+
+def bench_registration(count: int) -> float:
+    from eventcenter.server.event_center import EventRegistrationManager, RegistrationData, \
+        get_subscription_index
+
+    get_subscription_index().clear()
+    manager = EventRegistrationManager()
+    urls = [f'http://localhost:{8000 + i}/on_event' for i in range(10)]
+
+    start = time.perf_counter()
+    for i in range(count):
+        data = RegistrationData(urls[i % len(urls)], [f'event_{i}'], '')
+        manager.register(data, is_persist=False)
+        manager.pack_registrants()
+    for i in range(count):
+        data = RegistrationData(urls[i % len(urls)], [f'event_{i}'], '')
+        manager.unregister(data, is_persist=False)
+        manager.pack_registrants()
+    elapsed = time.perf_counter() - start
+
+    get_subscription_index().clear()
+    return (2 * count) / elapsed
+
+
+def bench_routing(count: int, router) -> float:
+    events = [Event('bench_event', {'index': i, 'data': {'name': 'Alice', 'values': list(range(10))}})
+              for i in range(count)]
+
+    start = time.perf_counter()
+    for event in events:
+        router.on_internal_event(event)
+    router.wait_until_sent()
+    elapsed = time.perf_counter() - start
+
+    return count / elapsed
+
+
+def run(count: int) -> Dict[str, Dict[str, float]]:
+    from eventcenter.client.event_center_adapter import EventCenterAdapter
+    from eventcenter.client.router import EventRouter
+    from eventcenter.client.router_diagnostics import ROUTER_DIAGNOSTICS, DIAGNOSTICS_OFF
+
+    temp_dir = tempfile.mkdtemp()
+    Properties().set('REGISTRANTS_FILE_PATH', os.path.join(temp_dir, 'registrants.json'), is_skip_if_exists=True)
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+    Properties().set('EVENT_CENTER_URL', 'http://localhost:6000', is_skip_if_exists=True)
+    Properties().set('EVENT_CENTER_CALLBACK_HOST', 'http://localhost', is_skip_if_exists=True)
+    Properties().set('EVENT_CENTER_CALLBACK_PORT', CALLBACK_PORT, is_skip_if_exists=True)
+
+    # Keep router diagnostic events out of it, only measure logging.
+    Properties().set(ROUTER_DIAGNOSTICS, DIAGNOSTICS_OFF)
+
+    results = {}
+    # Don't reach out to event center (only measure work done in process).
+    with mock.patch.object(EventCenterAdapter, 'unregister_all'), \
+            mock.patch.object(EventCenterAdapter, 'post_event'), \
+            mock.patch.object(EventCenterAdapter, 'post_events'):
+        router = EventRouter()
+        try:
+            for mode in [MODE_DISABLED, MODE_INFO, MODE_DEBUG]:
+                set_log_mode(mode)
+                results[mode] = {
+                    'registration_ops_per_sec': measure(lambda: bench_registration(count)),
+                    'routing_events_per_sec': measure(lambda: bench_routing(count, router)),
+                }
+        finally:
+            logging.disable(logging.NOTSET)
+            router.disconnect()
+    return results
+
+
+def measure(bench: Callable[[], float], rounds: int = 3) -> float:
+    # Best of a few rounds (least disturbed by other activity).
+    return round(max(bench() for _ in range(rounds)), 1)
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    baseline = results[MODE_DISABLED]
+    print(f"{'mode':<10}{'registration ops/s':>22}{'routing events/s':>20}")
+    for mode, result in results.items():
+        registration = result['registration_ops_per_sec']
+        routing = result['routing_events_per_sec']
+        print(f"{mode:<10}{registration:>14} ({registration / baseline['registration_ops_per_sec']:4.0%})"
+              f"{routing:>12} ({routing / baseline['routing_events_per_sec']:4.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Registration and routing throughput per log level')
+    parser.add_argument('-c', '--count', type=int, default=2000, help='Operations per round (Default: 2000)')
+    parser.add_argument('-j', '--json', metavar='', help='File to write results to (as json)')
+    args = parser.parse_args()
+
+    results = run(args.count)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
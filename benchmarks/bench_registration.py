@@ -0,0 +1,124 @@
+"""
+Measures registration throughput with concurrent clients, to check that clients changing their own registrations
+don't wait on each other (registrants are locked per callback url, and persisted outside those locks).
+
+Each client (thread) registers and unregisters events for its own callback url, as routers do when they come and go.
+Same number of events is registered per round whatever the number of clients (split between them), so registrants
+file is the same size.  Reports registration changes per second (all clients together) per number of clients, for each
+persistence mode.
+
+Run from repo root:
+    python -m benchmarks.bench_registration [--count 2000] [--clients 1 2 4 8 16] [--stripes 64] [--json results.json]
+
+Modes:
+- memory:  changes aren't persisted (cost of registering, and locking, only)
+- journal: changes are appended to the registrants journal (default for app scripts)
+- file:    registrants file is rewritten on changes (concurrent changes are written together)
+
+Run with --stripes 1 to compare against a single lock for all registrants.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from eventdispatch import Properties
+
+MODE_MEMORY = 'memory'
+MODE_JOURNAL = 'journal'
+MODE_FILE = 'file'
+
+
+def bench_clients(mode: str, client_count: int, count: int) -> float:
+    from eventcenter.server.event_center import EventRegistrationManager, RegistrationData, \
+        get_subscription_index
+    from eventcenter.server.journal import FSYNC_INTERVAL
+
+    temp_dir = tempfile.mkdtemp()
+    Properties().set('REGISTRANTS_FILE_PATH', os.path.join(temp_dir, 'registrants.json'))
+    Properties().set('REGISTRANTS_JOURNAL', mode == MODE_JOURNAL)
+    Properties().set('REGISTRANTS_JOURNAL_FSYNC', FSYNC_INTERVAL)
+
+    get_subscription_index().clear()
+    manager = EventRegistrationManager()
+    is_persist = mode != MODE_MEMORY
+    is_started = threading.Event()
+    count_per_client = count // client_count
+
+    def churn(url: str):
+        is_started.wait()
+        for i in range(count_per_client):
+            manager.register(RegistrationData(url, [f'event_{i}'], 'bench_channel'), is_persist=is_persist)
+        for i in range(count_per_client):
+            manager.unregister(RegistrationData(url, [f'event_{i}'], 'bench_channel'), is_persist=is_persist)
+
+    threads = [threading.Thread(target=churn, args=[f'http://localhost:{8000 + i}/on_event'])
+               for i in range(client_count)]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    is_started.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    manager.clear_registrants()
+    manager.close()
+    get_subscription_index().clear()
+    shutil.rmtree(temp_dir)
+    return (2 * count_per_client * client_count) / elapsed
+
+
+def run(count: int, client_counts: List[int], stripes: int) -> Dict[str, Dict[str, float]]:
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+    Properties().set('REGISTRANTS_LOCK_STRIPES', stripes)
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    try:
+        for mode in [MODE_MEMORY, MODE_JOURNAL, MODE_FILE]:
+            results[mode] = {str(client_count): measure(lambda: bench_clients(mode, client_count, count))
+                             for client_count in client_counts}
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def measure(bench, rounds: int = 3) -> float:
+    # Best of a few rounds (least disturbed by other activity).
+    return round(max(bench() for _ in range(rounds)), 1)
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    client_counts = list(next(iter(results.values())).keys())
+    print(f"{'mode':<10}" + ''.join(f"{f'{count} client(s)':>16}" for count in client_counts) + '  (changes/s)')
+    for mode, result in results.items():
+        print(f"{mode:<10}" + ''.join(f'{result[count]:>16}' for count in client_counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Registration throughput with concurrent clients')
+    parser.add_argument('-c', '--count', type=int, default=2000,
+                        help='Events registered (then unregistered) per round, by all clients (Default: 2000)')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help='Numbers of concurrent clients to measure (Default: 1 2 4 8 16)')
+    parser.add_argument('--stripes', type=int, default=64, help='Registrant lock stripes (Default: 64)')
+    parser.add_argument('-j', '--json', metavar='', help='File to write results to (as json)')
+    args = parser.parse_args()
+
+    results = run(args.count, args.clients, args.stripes)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
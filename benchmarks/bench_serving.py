@@ -0,0 +1,164 @@
+"""
+Compares event center throughput when served by the development server (werkzeug) versus gunicorn (production mode,
+with one or more workers).
+
+Each mode launches an event center in a temp directory, registers local receivers for all events, then posts events
+from concurrent clients for a fixed time.  Reports events accepted (posted) and delivered per second.
+
+Run from repo root (gunicorn must be installed):
+    python -m benchmarks.bench_serving [--duration 10] [--clients 16] [--workers 1 2 4] [--json results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN_CONF = os.path.join(REPO_DIR, 'eventcenter', 'gunicorn_conf.py')
+EVENT_CENTER_PORT = 6100
+RECEIVER_BASE_PORT = 6200
+
+
+class Receiver(BaseHTTPRequestHandler):
+    delivered_count = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        count = len(json.loads(body).get('remote_events', [None]))
+        with Receiver.lock:
+            Receiver.delivered_count += count
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+def start_event_center(mode: str, workers: int, work_dir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([REPO_DIR] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    env['EC_PORT'] = str(EVENT_CENTER_PORT)
+    env['EC_LOG_DEBUG'] = '0'
+    env['EC_WORKERS'] = str(workers)
+    os.makedirs(os.path.join(work_dir, 'server'), exist_ok=True)
+
+    if mode == 'dev':
+        env['RUN_AS_A_SERVER'] = '1'
+        command = [sys.executable, '-m', 'eventcenter.app_event_center']
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONF, 'eventcenter.app_event_center:app']
+
+    process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_until_up(f'http://localhost:{EVENT_CENTER_PORT}/ping')
+    return process
+
+
+def wait_until_up(url: str, timeout_sec: float = 30.0):
+    deadline = time.monotonic() + timeout_sec
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1.0)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Event center did not come up at '{url}'")
+
+
+def post_events(url: str, deadline: float, counts: List[int]):
+    session = requests.Session()
+    count = 0
+    while time.monotonic() < deadline:
+        data = {'channel': '', 'event': {'id': count, 'name': 'bench_event', 'time': time.time(),
+                                         'payload': {'index': count}}}
+        response = session.post(url, json=data, timeout=10.0)
+        if response.status_code == 200:
+            count += 1
+    counts.append(count)
+
+
+def run_mode(mode: str, workers: int, duration_sec: float, clients: int, receivers: int) -> Dict[str, Any]:
+    event_center_url = f'http://localhost:{EVENT_CENTER_PORT}'
+    Receiver.delivered_count = 0
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        process = start_event_center(mode, workers, work_dir)
+        servers = []
+        try:
+            for i in range(receivers):
+                server = ThreadingHTTPServer(('localhost', RECEIVER_BASE_PORT + i), Receiver)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                servers.append(server)
+                requests.post(f'{event_center_url}/register', timeout=10.0, json={
+                    'callback_url': f'http://localhost:{RECEIVER_BASE_PORT + i}/on_event',
+                    'events': [],
+                    'channel': ''
+                })
+
+            # Let registrations reach all workers (synced through shared journal).
+            time.sleep(1.0)
+
+            counts = []
+            deadline = time.monotonic() + duration_sec
+            threads = [threading.Thread(target=post_events, args=[f'{event_center_url}/post_event', deadline, counts])
+                       for _ in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            # Give deliveries in flight a moment to land.
+            time.sleep(1.0)
+            posted = sum(counts)
+            return {
+                'mode': mode,
+                'workers': workers,
+                'posted_per_sec': round(posted / duration_sec, 1),
+                'delivered_per_sec': round(Receiver.delivered_count / duration_sec, 1),
+            }
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+            process.terminate()
+            process.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Event center throughput, dev server vs gunicorn')
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help='Seconds to post per mode (Default: 10)')
+    parser.add_argument('-c', '--clients', type=int, default=16, help='Concurrent posting clients (Default: 16)')
+    parser.add_argument('-r', '--receivers', type=int, default=2, help='Receivers registered for all events '
+                                                                       '(Default: 2)')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='Gunicorn worker counts to try (Default: 1 2 4)')
+    parser.add_argument('-j', '--json', metavar='', help='File to write results to (as json)')
+    args = parser.parse_args()
+
+    results = [run_mode('dev', 1, args.duration, args.clients, args.receivers)]
+    for workers in args.workers:
+        results.append(run_mode('gunicorn', workers, args.duration, args.clients, args.receivers))
+
+    print(f"{'mode':<10}{'workers':>8}{'posted/s':>12}{'delivered/s':>14}")
+    for result in results:
+        print(f"{result['mode']:<10}{result['workers']:>8}{result['posted_per_sec']:>12}"
+              f"{result['delivered_per_sec']:>14}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
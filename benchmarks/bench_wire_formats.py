@@ -0,0 +1,121 @@
+"""
+Measures encode/decode time and size of event bodies per wire format, to see what a binary format (MessagePack,
+CBOR) saves over json on payloads heavy in numbers (e.g. sensor readings, price series).
+
+Run from repo root:
+    python -m benchmarks.bench_wire_formats [--count 2000] [--values 1000] [--json results.json]
+
+Formats (only those installed are measured):
+- json (<backend>): json with each installed backend (orjson, ujson, stdlib)
+- msgpack:          MessagePack (msgpack)
+- cbor:             CBOR (cbor2)
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, Tuple
+
+from eventcenter.client import serialization
+from eventcenter.client.serialization import CONTENT_TYPE_JSON, CONTENT_TYPE_MSGPACK, CONTENT_TYPE_CBOR, \
+    ORJSON, UJSON, STDLIB_JSON
+
+
+def make_body(value_count: int) -> Dict[str, Any]:
+    # Callback body of an event with a large numeric payload (floats and ints).
+    rand = random.Random(1)
+    return {
+        'channel': 'telemetry',
+        'event': {
+            'id': 12345,
+            'name': 'readings_updated',
+            'time': time.time(),
+            'payload': {
+                'sensor': 'sensor_1',
+                'timestamps': [1700000000 + i for i in range(value_count)],
+                'values': [rand.uniform(-1000.0, 1000.0) for _ in range(value_count)],
+                'counts': [rand.randint(0, 100000) for _ in range(value_count)],
+                'metadata': {'sender_url': 'http://localhost:8000'}
+            }
+        }
+    }
+
+
+def get_formats() -> Dict[str, Tuple[str, str]]:
+    # Format name -> (content type, json backend), for installed ones.
+    formats = {}
+    for backend, module in [(ORJSON, serialization.orjson), (UJSON, serialization.ujson), (STDLIB_JSON, json)]:
+        if module:
+            formats[f'json ({backend})'] = (CONTENT_TYPE_JSON, backend)
+
+    for name, content_type in [('msgpack', CONTENT_TYPE_MSGPACK), ('cbor', CONTENT_TYPE_CBOR)]:
+        if content_type in serialization.get_content_types():
+            formats[name] = (content_type, None)
+    return formats
+
+
+def bench_format(content_type: str, body: Dict[str, Any], count: int) -> Dict[str, float]:
+    encoded = serialization.encode(body, content_type)
+    assert serialization.decode(encoded, content_type) == body
+
+    start = time.perf_counter()
+    for _ in range(count):
+        serialization.encode(body, content_type)
+    encode_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(count):
+        serialization.decode(encoded, content_type)
+    decode_sec = time.perf_counter() - start
+
+    return {
+        'bytes': len(encoded),
+        'encode_us': encode_sec / count * 1e6,
+        'decode_us': decode_sec / count * 1e6,
+    }
+
+
+def run(count: int, value_count: int) -> Dict[str, Dict[str, float]]:
+    body = make_body(value_count)
+
+    results = {}
+    for name, (content_type, backend) in get_formats().items():
+        serialization.set_json_backend(backend)
+        # Best of a few rounds (least disturbed by other activity).
+        rounds = [bench_format(content_type, body, count) for _ in range(3)]
+        results[name] = {
+            'bytes': rounds[0]['bytes'],
+            'encode_us': round(min(result['encode_us'] for result in rounds), 1),
+            'decode_us': round(min(result['decode_us'] for result in rounds), 1),
+        }
+    serialization.set_json_backend()
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    baseline = results.get(f'json ({STDLIB_JSON})', next(iter(results.values())))
+    print(f"{'format':<16}{'bytes':>14}{'encode us':>18}{'decode us':>18}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['bytes']:>8} ({result['bytes'] / baseline['bytes']:4.0%})"
+              f"{result['encode_us']:>10} ({result['encode_us'] / baseline['encode_us']:4.0%})"
+              f"{result['decode_us']:>10} ({result['decode_us'] / baseline['decode_us']:4.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encode/decode time and size of event bodies per wire format')
+    parser.add_argument('-c', '--count', type=int, default=2000, help='Encodes/decodes per round (Default: 2000)')
+    parser.add_argument('-v', '--values', type=int, default=1000,
+                        help='Numbers per series in event payload (Default: 1000)')
+    parser.add_argument('-j', '--json', metavar='', help='File to write results to (as json)')
+    args = parser.parse_args()
+
+    results = run(args.count, args.values)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
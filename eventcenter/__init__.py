@@ -3,10 +3,12 @@ from eventcenter.client.app.service import SERVICE_PORT, RUN_AS_A_SERVER, RESPON
 from eventcenter.client.app.service import Service, ServiceEvent
 from eventcenter.client.event_center_adapter import EVENT_CENTER_CALLBACK_HOST, EVENT_CENTER_CALLBACK_PORT
 from eventcenter.client.event_center_adapter import EVENT_CENTER_URL
+from eventcenter.client.event_center_adapter import EVENT_CENTER_TRANSPORT, TRANSPORT_HTTP, TRANSPORT_STREAM
 from eventcenter.client.network import APICaller as APICaller
 from eventcenter.client.network import ApiConnectionError as ApiConnectionError
 from eventcenter.client.network import FlaskAppRunner as FlaskAppRunner
 from eventcenter.client.router import EventRouter as EventRouter
 from eventcenter.client.router import ROUTER_NAME, ROUTER_CHANNEL
 from eventcenter.client.router import start_event_router, stop_event_router
+from eventcenter.client.router_diagnostics import ROUTER_DIAGNOSTICS, ROUTER_DIAGNOSTICS_SAMPLE_EVERY
 from eventcenter.server.service import EventCenterService as EventCenterService
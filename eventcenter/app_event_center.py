@@ -17,21 +17,86 @@ log_level = os.environ.get('EC_LOG_DEBUG', '1')
 # Check flask run level from environment ('1' == DEBUG, otherwise INFO).
 run_as_a_server = os.environ.get('RUN_AS_A_SERVER', '0')
 
+# Check number of threads used to deliver events to clients (concurrently) from environment.
+delivery_worker_count = int(os.environ.get('EC_DELIVERY_WORKERS', 32))
+
+# Check connection pool settings (for calls to clients) from environment.
+http_pool_size = int(os.environ.get('EC_HTTP_POOL_SIZE', 10))
+http_max_retries = int(os.environ.get('EC_HTTP_MAX_RETRIES', 0))
+
+# Check registrant persistence settings from environment ('1' == journal registration changes).
+registrants_journal = os.environ.get('EC_REGISTRANTS_JOURNAL', '1')
+registrants_journal_fsync = os.environ.get('EC_REGISTRANTS_JOURNAL_FSYNC', 'interval')
+
+# Check retry settings (for unreachable clients) from environment (failed retries in a row before a client is dropped,
+# and directory to spill events held for unreachable clients to, beyond what's held in memory).
+retry_max_failures = int(os.environ.get('EC_RETRY_MAX_FAILURES', 8))
+retry_spill_dir = os.environ.get('EC_RETRY_SPILL_DIR', '')
+
+# Check circuit breaker settings (for sick clients) from environment (failed or slow calls in a row before deliveries
+# to a client are held, and how long a call can take before it counts as slow).
+circuit_failure_threshold = int(os.environ.get('EC_CIRCUIT_FAILURE_THRESHOLD', 5))
+circuit_slow_call_sec = float(os.environ.get('EC_CIRCUIT_SLOW_CALL_SEC', 5.0))
+
+# Check replay log settings from environment (directory to log posted events in, so clients can resume from an offset,
+# and how long to keep them).
+replay_log_dir = os.environ.get('EC_REPLAY_LOG_DIR', '')
+replay_retention_sec = float(os.environ.get('EC_REPLAY_RETENTION_SEC', 24 * 60 * 60))
+
+# Check cluster settings from environment (url other nodes reach this node at, cluster is off without it, and nodes to
+# join through), and registrants file path (each node on a host needs its own).
+cluster_node_url = os.environ.get('EC_CLUSTER_NODE_URL', '')
+cluster_seed_nodes = os.environ.get('EC_CLUSTER_SEED_NODES', '')
+registrants_file_path = os.environ.get('EC_REGISTRANTS_FILE_PATH', 'server/registrants.json')
+
+# Check if metrics are recorded (and served at /metrics) from environment ('1' == record them).
+metrics_enabled = os.environ.get('EC_METRICS', '1')
+
+# Check number of server worker processes from environment (more than one shares registrations via the journal).
+workers = int(os.environ.get('EC_WORKERS', 1))
+registrants_sync_interval_sec = float(os.environ.get('EC_REGISTRANTS_SYNC_INTERVAL_SEC', 0.5))
+
 logging.getLogger().setLevel(level=logging.DEBUG if log_level == '1' else logging.INFO)
 
 
 def main():
     global app
 
-    Properties().set('REGISTRANTS_FILE_PATH', 'server/registrants.json')
+    Properties().set('REGISTRANTS_FILE_PATH', registrants_file_path)
     Properties().set('EVENT_CENTER_PORT', port)
     Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 20)
+    Properties().set('DELIVERY_WORKER_COUNT', delivery_worker_count)
+    Properties().set('HTTP_POOL_SIZE', http_pool_size)
+    Properties().set('HTTP_MAX_RETRIES', http_max_retries)
+    Properties().set('REGISTRANTS_JOURNAL', True if registrants_journal == '1' or workers > 1 else False)
+    Properties().set('REGISTRANTS_JOURNAL_FSYNC', registrants_journal_fsync)
+    Properties().set('REGISTRANTS_SHARED', workers > 1)
+    Properties().set('REGISTRANTS_SYNC_INTERVAL_SEC', registrants_sync_interval_sec)
     Properties().set('RUN_AS_A_SERVER', True if run_as_a_server == '1' else False)
+    Properties().set('RETRY_MAX_FAILURES', retry_max_failures)
+    Properties().set('CIRCUIT_FAILURE_THRESHOLD', circuit_failure_threshold)
+    Properties().set('CIRCUIT_SLOW_CALL_SEC', circuit_slow_call_sec)
+    Properties().set('METRICS_ENABLED', True if metrics_enabled == '1' else False)
+    if replay_log_dir and workers == 1:
+        # Logs are written by one process (workers would write over each other's).
+        Properties().set('REPLAY_LOG_DIR', replay_log_dir)
+        Properties().set('REPLAY_RETENTION_SEC', replay_retention_sec)
+    if cluster_node_url:
+        Properties().set('CLUSTER_NODE_URL', cluster_node_url)
+        Properties().set('CLUSTER_SEED_NODES', cluster_seed_nodes)
+    if retry_spill_dir and workers == 1:
+        # Spill files are per process (workers would write over each other's).
+        Properties().set('RETRY_SPILL_DIR', retry_spill_dir)
     Properties().set('PRETTY_PRINT', True)
 
     ecs = EventCenterService()
     app = ecs.app
     print(f"Event Center started on port: {Properties().get('EVENT_CENTER_PORT')}")
+    return ecs
+
 
+event_center_service = main()
 
-main()
+if __name__ == '__main__' and run_as_a_server == '1':
+    # Serving with built-in (development) server, stay up while it runs.
+    event_center_service.join()
@@ -8,9 +8,14 @@ from typing import Dict, Any
 from eventdispatch import Properties, Event, unregister_from_events, register_for_events
 
 from eventcenter.client.app.service import ServiceEvent, RUN_AS_A_SERVER
+from eventcenter.client.callback_executor import CALLBACK_WORKER_COUNT, CALLBACK_QUEUE_SIZE, CALLBACK_BACKPRESSURE, \
+    BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_REJECT
+from eventcenter.client.event_batcher import EVENT_BATCH_LINGER_SEC
 from eventcenter.client.event_center_adapter import EVENT_CENTER_URL, EVENT_CENTER_CALLBACK_HOST, \
-    EVENT_CENTER_CALLBACK_PORT
+    EVENT_CENTER_CALLBACK_PORT, EVENT_CENTER_TRANSPORT, TRANSPORT_HTTP, TRANSPORT_STREAM
 from eventcenter.client.router import start_event_router, stop_event_router, ROUTER_NAME
+from eventcenter.client.router_diagnostics import ROUTER_DIAGNOSTICS, DIAGNOSTICS_OFF, DIAGNOSTICS_SAMPLED, \
+    DIAGNOSTICS_FULL, DEFAULT_DIAGNOSTICS
 
 # Event-Driven App properties
 PRETTY_PRINT = 'PRETTY_PRINT'
@@ -19,6 +24,9 @@ MONITOR_EVENTS = 'MONITOR_EVENTS'
 DEFAULT_EVENT_CENTER_URL = 'http://localhost:6000'
 DEFAULT_CALLBACK_HOST = 'http://localhost'
 DEFAULT_CALLBACK_PORT = 7000
+DEFAULT_CALLBACK_WORKER_COUNT = 8
+DEFAULT_CALLBACK_QUEUE_SIZE = 1000
+DEFAULT_CALLBACK_BACKPRESSURE = BACKPRESSURE_BLOCK
 
 logging.basicConfig(level=logging.INFO)
 
@@ -84,10 +92,51 @@ class EventDrivenApp(AppInterface):
                             default=DEFAULT_CALLBACK_PORT,
                             help=f'Your port, reachable by the remote Event Center to send you events (Default: {DEFAULT_CALLBACK_PORT})')
 
+        parser.add_argument('-tr', '--transport',
+                            metavar='',
+                            choices=[TRANSPORT_HTTP, TRANSPORT_STREAM],
+                            default=TRANSPORT_HTTP,
+                            help=f'How to talk to the remote Event Center: {TRANSPORT_HTTP} (api calls, events are '
+                                 f'sent to your callback host/port), or {TRANSPORT_STREAM} (one connection for all, '
+                                 f'needs async Event Center) (Default: {TRANSPORT_HTTP})')
+
         parser.add_argument('-raas', '--router_as_a_server',
                             action='store_true', default=False,
                             help=f'Launch router as a server.  Use when launching as python or flask app. Do not use if launching as a daemon or via gunicorn')
 
+        parser.add_argument('-bl', '--batch_linger_sec',
+                            metavar='',
+                            type=float, default=0.0,
+                            help=f'Time to wait for more events, to post them to the remote Event Center in a batch '
+                                 f'(Default: 0, post each event as it comes)')
+
+        parser.add_argument('-cw', '--callback_workers',
+                            metavar='',
+                            type=int, default=DEFAULT_CALLBACK_WORKER_COUNT,
+                            help=f'Number of threads handling events received from the remote Event Center '
+                                 f'(Default: {DEFAULT_CALLBACK_WORKER_COUNT})')
+
+        parser.add_argument('-cq', '--callback_queue_size',
+                            metavar='',
+                            type=int, default=DEFAULT_CALLBACK_QUEUE_SIZE,
+                            help=f'Max number of received events waiting to be handled '
+                                 f'(Default: {DEFAULT_CALLBACK_QUEUE_SIZE})')
+
+        parser.add_argument('-cb', '--callback_backpressure',
+                            metavar='',
+                            choices=[BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_REJECT],
+                            default=DEFAULT_CALLBACK_BACKPRESSURE,
+                            help=f'What to do when received events queue is full: {BACKPRESSURE_BLOCK}, '
+                                 f'{BACKPRESSURE_DROP_OLDEST}, or {BACKPRESSURE_REJECT} '
+                                 f'(Default: {DEFAULT_CALLBACK_BACKPRESSURE})')
+
+        parser.add_argument('-rd', '--router_diagnostics',
+                            metavar='',
+                            choices=[DIAGNOSTICS_OFF, DIAGNOSTICS_SAMPLED, DIAGNOSTICS_FULL],
+                            default=DEFAULT_DIAGNOSTICS,
+                            help=f'Which router diagnostic events to post per event routed: {DIAGNOSTICS_OFF}, '
+                                 f'{DIAGNOSTICS_SAMPLED}, or {DIAGNOSTICS_FULL} (Default: {DEFAULT_DIAGNOSTICS})')
+
         parser.add_argument('-me', '--monitor_events',
                             action='store_true', default=False,
                             help=f'Enable monitoring all events during app')
@@ -102,9 +151,15 @@ class EventDrivenApp(AppInterface):
         Properties().set(EVENT_CENTER_URL, args.get('event_center_url'))
         Properties().set(EVENT_CENTER_CALLBACK_HOST, args.get('callback_host'))
         Properties().set(EVENT_CENTER_CALLBACK_PORT, args.get('callback_port'))
+        Properties().set(EVENT_CENTER_TRANSPORT, args.get('transport'))
+        Properties().set(EVENT_BATCH_LINGER_SEC, args.get('batch_linger_sec'))
+        Properties().set(CALLBACK_WORKER_COUNT, args.get('callback_workers'))
+        Properties().set(CALLBACK_QUEUE_SIZE, args.get('callback_queue_size'))
+        Properties().set(CALLBACK_BACKPRESSURE, args.get('callback_backpressure'))
 
         # Set app properties.
         Properties().set(ROUTER_NAME, name)
+        Properties().set(ROUTER_DIAGNOSTICS, args.get('router_diagnostics'))
         Properties().set(PRETTY_PRINT, args.get('pretty_print'))
         Properties().set(MONITOR_EVENTS, args.get('monitor_events'))
         Properties().set(RUN_AS_A_SERVER, args.get('router_as_a_server'))
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from eventdispatch import Properties
+
+from eventcenter.client.callback_executor import CALLBACK_WORKER_COUNT, CALLBACK_QUEUE_SIZE, CALLBACK_BACKPRESSURE, \
+    BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_REJECT, DEFAULT_WORKER_COUNT, DEFAULT_QUEUE_SIZE, \
+    DEFAULT_BACKPRESSURE
+
+
+class AsyncCallbackExecutor:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Same as CallbackExecutor, for a coroutine event handler: hands received events to the handler from the event
+      loop (a task per busy channel, instead of a worker thread).
+    - Preserves ordering per channel, bounds how many handlers run at once (worker count), and bounds how many
+      events can be waiting (with the same backpressure policies).
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], worker_count: int = None,
+                 max_queue_size: int = None, backpressure: str = None):
+        self.__handler = handler
+
+        worker_count = AsyncCallbackExecutor.__get_property(CALLBACK_WORKER_COUNT, worker_count,
+                                                            DEFAULT_WORKER_COUNT)
+        self.__max_queue_size = max(1, int(
+            AsyncCallbackExecutor.__get_property(CALLBACK_QUEUE_SIZE, max_queue_size, DEFAULT_QUEUE_SIZE)))
+        self.__backpressure = AsyncCallbackExecutor.__get_property(CALLBACK_BACKPRESSURE, backpressure,
+                                                                   DEFAULT_BACKPRESSURE)
+        if self.__backpressure not in [BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_REJECT]:
+            raise ValueError(f"Unknown backpressure policy '{self.__backpressure}'")
+
+        self.__worker_count = max(1, int(worker_count))
+
+        # Waiting items per channel, each item tagged with a sequence number (to find the oldest across channels).
+        self.__queues: Dict[str, deque] = {}
+        self.__sequence = 0
+        self.__pending_count = 0
+        self.__in_flight_count = 0
+        self.__handled_count = 0
+        self.__dropped_count = 0
+        self.__rejected_count = 0
+
+        # Created on first use (bound to the running loop).
+        self.__workers: asyncio.Semaphore = None
+        self.__changed: asyncio.Condition = None
+        self.__tasks = set()
+
+    @property
+    def backpressure(self) -> str:
+        return self.__backpressure
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pending': self.__pending_count,
+            'in_flight': self.__in_flight_count,
+            'handled': self.__handled_count,
+            'dropped': self.__dropped_count,
+            'rejected': self.__rejected_count,
+            'max_queue_size': self.__max_queue_size,
+            'backpressure': self.__backpressure,
+            'queue_depths': {channel: len(queue) for channel, queue in self.__queues.items()}
+        }
+
+    async def submit(self, channel: str, item: Any) -> bool:
+        return await self.submit_all([(channel, item)])
+
+    async def submit_all(self, items: List[Tuple[str, Any]]) -> bool:
+        # Items are accepted (or rejected) all together, so a rejected batch can be resent as a whole.
+        if not items:
+            return True
+
+        self.__bind_to_loop()
+        if self.__pending_count + len(items) > self.__max_queue_size:
+            if self.__backpressure == BACKPRESSURE_REJECT:
+                self.__rejected_count += len(items)
+                self.__log_message_rejected(len(items))
+                return False
+
+            if self.__backpressure == BACKPRESSURE_BLOCK:
+                # Wait for room (or for queue to empty, when more items than the queue can ever hold).
+                async with self.__changed:
+                    await self.__changed.wait_for(lambda: self.__pending_count == 0 or
+                                                  self.__pending_count + len(items) <= self.__max_queue_size)
+
+        for channel, item in items:
+            self.__sequence += 1
+            queue = self.__queues.get(channel)
+            if queue is None:
+                queue = self.__queues[channel] = deque()
+                task = asyncio.get_running_loop().create_task(self.__drain(channel))
+                self.__tasks.add(task)
+                task.add_done_callback(self.__tasks.discard)
+            queue.append((self.__sequence, item))
+            self.__pending_count += 1
+
+        if self.__backpressure == BACKPRESSURE_DROP_OLDEST:
+            while self.__pending_count > self.__max_queue_size:
+                self.__drop_oldest()
+        return True
+
+    async def wait_until_idle(self, timeout_sec: float = None) -> bool:
+        self.__bind_to_loop()
+        try:
+            async with self.__changed:
+                await asyncio.wait_for(self.__changed.wait_for(lambda: not self.__queues), timeout_sec)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def shutdown(self):
+        for task in list(self.__tasks):
+            task.cancel()
+
+    async def __drain(self, channel: str):
+        queue = self.__queues[channel]
+        while queue:
+            _, item = queue.popleft()
+            self.__pending_count -= 1
+            self.__in_flight_count += 1
+            await self.__notify_changed()
+
+            try:
+                async with self.__workers:
+                    await self.__handler(item)
+            except Exception as e:
+                self.__logger.exception(f"Handling event on channel '{channel}' failed: {e}")
+
+            self.__in_flight_count -= 1
+            self.__handled_count += 1
+
+        # Nothing left for channel, release it (next submit will start a new drain).
+        del self.__queues[channel]
+        await self.__notify_changed()
+
+    async def __notify_changed(self):
+        async with self.__changed:
+            self.__changed.notify_all()
+
+    def __bind_to_loop(self):
+        if not self.__changed:
+            self.__workers = asyncio.Semaphore(self.__worker_count)
+            self.__changed = asyncio.Condition()
+
+    def __drop_oldest(self):
+        oldest_queue = min((queue for queue in self.__queues.values() if queue), key=lambda queue: queue[0][0])
+        oldest_queue.popleft()
+        self.__pending_count -= 1
+        self.__dropped_count += 1
+        self.__log_message_dropped()
+
+    def __log_message_rejected(self, count: int):
+        self.__logger.warning(f'Callback queue full ({self.__max_queue_size}), rejected {count} event(s)')
+
+    def __log_message_dropped(self):
+        self.__logger.warning(f'Callback queue full ({self.__max_queue_size}), dropped oldest event')
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
@@ -0,0 +1,203 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiohttp import web
+from eventdispatch import Event, Properties
+
+from eventcenter.client import serialization
+from eventcenter.client.async_callback_executor import AsyncCallbackExecutor
+from eventcenter.client.async_network import AsyncAPICaller, AsyncResponse, get_async_session_pool
+from eventcenter.client.compression import get_compressor, decompress
+from eventcenter.client.event_center_adapter import PING_ENDPOINT, CALLBACK_ENDPOINT, EVENT_CENTER_BATCH_DELIVERY, \
+    EventMappingError, EventCenterConnectionError
+from eventcenter.client.network import HTTP_STATUS_TOO_MANY_REQUESTS
+from eventcenter.server.event_center import RegistrationData, RemoteEventData, EventMappingData, \
+    RemoteEventBatchData, ReplayRequestData
+from eventcenter.server.service import RESPONSE_OK
+
+
+class AsyncEventCenterAdapter:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Same as EventCenterAdapter, for asyncio apps: calls to event center are awaitable (through a shared async
+      connection pool), so posting from an event loop never blocks it or needs a thread hop.
+    - Receives events on an async callback server (on the same loop), and hands each one (as RemoteEventData) to a
+      coroutine handler, in order per channel, with the same backpressure policies as the sync adapter.
+    - Must be started (and stopped) from the event loop it's used on.
+    """
+
+    def __init__(self, event_handler: Callable[[RemoteEventData], Awaitable[None]]):
+        self.event_handler = event_handler
+        self.event_center_url = Properties().get('EVENT_CENTER_URL')
+        host = Properties().get('EVENT_CENTER_CALLBACK_HOST')
+        self.port = int(Properties().get('EVENT_CENTER_CALLBACK_PORT'))
+
+        self.url = f'{host}:{self.port}'
+        self.callback_url = f'{self.url}{CALLBACK_ENDPOINT}'
+
+        # Ask event center to deliver events in batches (when it has several queued for this adapter).
+        self.is_batch_delivery = Properties().has(EVENT_CENTER_BATCH_DELIVERY) and \
+            Properties().get(EVENT_CENTER_BATCH_DELIVERY) == True
+
+        # Hand received events to event handler from the loop (in order, per channel).
+        self.__callback_executor = AsyncCallbackExecutor(self.event_handler)
+
+        self.app = web.Application()
+        self.app.add_routes([
+            web.get(PING_ENDPOINT, self.__ping),
+            web.post(CALLBACK_ENDPOINT, self.__on_event),
+        ])
+        self.__runner: web.AppRunner = None
+
+    @property
+    def callback_stats(self) -> dict:
+        return self.__callback_executor.stats
+
+    async def start(self):
+        # Bodies are decompressed here (aiohttp only decodes some encodings, depending on its version).
+        self.__runner = web.AppRunner(self.app, access_log=None, auto_decompress=False)
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, '0.0.0.0', self.port).start()
+
+    async def shutdown(self):
+        if self.__runner:
+            await self.__runner.cleanup()
+            self.__runner = None
+        await self.__callback_executor.shutdown()
+        await get_async_session_pool().close()
+
+    async def wait_until_handled(self, timeout_sec: float = None) -> bool:
+        return await self.__callback_executor.wait_until_idle(timeout_sec)
+
+    async def register(self, events: [str], channel: str = ''):
+        await self.__register(events, channel, is_register=True)
+
+    async def unregister(self, events: [str], channel: str = ''):
+        await self.__register(events, channel, is_register=False)
+
+    async def unregister_all(self, is_suppress_connection_error: bool = True):
+        url = self.event_center_url + '/unregister_all'
+        data = {
+            'callback_url': self.callback_url
+        }
+        await AsyncAPICaller.make_post_call(url, json=data, is_suppress_connection_error=is_suppress_connection_error)
+
+    async def post_event(self, event: Event, channel: str = '', is_suppress_connection_error: bool = True):
+        url = self.event_center_url + '/post_event'
+
+        self.__set_sender(event)
+        data = RemoteEventData(channel, event)
+        await AsyncAPICaller.make_post_call(url, json=data.dict,
+                                            is_suppress_connection_error=is_suppress_connection_error)
+
+    async def post_events(self, events: [Event], channel: str = '', is_suppress_connection_error: bool = True):
+        url = self.event_center_url + '/post_events'
+
+        remote_events = []
+        for event in events:
+            self.__set_sender(event)
+            remote_events.append(RemoteEventData(channel, event))
+
+        data = RemoteEventBatchData(remote_events)
+        await AsyncAPICaller.make_post_call(url, json=data.dict,
+                                            is_suppress_connection_error=is_suppress_connection_error)
+
+    async def replay(self, channel: str = '', offset: int = 0, events: [str] = None) -> int:
+        # Same as EventCenterAdapter.replay.
+        url = self.event_center_url + '/replay'
+        while True:
+            data = ReplayRequestData(channel, offset, events=events)
+            response: AsyncResponse = await AsyncAPICaller.make_post_call(url, json=data.dict,
+                                                                          is_suppress_connection_error=True)
+
+            if not response:
+                AsyncEventCenterAdapter.__log_message_no_response()
+                raise EventCenterConnectionError()
+
+            response = response.json()
+            remote_events = RemoteEventBatchData.from_dict(response).remote_events
+            items = [(remote_event.channel, remote_event) for remote_event in remote_events]
+            if items and not await self.__callback_executor.submit_all(items):
+                # Too busy to take events, resume from here later.
+                return offset
+
+            next_offset = response.get('next_offset', offset)
+            if next_offset <= offset or next_offset >= response.get('end_offset', next_offset):
+                return next_offset
+            offset = next_offset
+
+    async def map_events(self, events_to_map: [Event], event_to_post: Event, ignore_if_exists: bool = False,
+                         channel: str = '') -> str:
+        url = self.event_center_url + '/map_events'
+
+        data = EventMappingData(channel, events_to_map, event_to_post, ignore_if_exists)
+        response: AsyncResponse = await AsyncAPICaller.make_post_call(url, json=data.dict,
+                                                                      is_suppress_connection_error=True)
+
+        if not response:
+            AsyncEventCenterAdapter.__log_message_no_response()
+            raise EventCenterConnectionError()
+
+        response = response.json()
+
+        if response.get('success', 'false') == 'true':
+            AsyncEventCenterAdapter.__log_message_map_events_succeeded(data)
+            return response['event_map_key']
+        else:
+            error = response.get('error', '(no error message provided')
+            raise EventMappingError(error)
+
+    async def __ping(self, request: web.Request) -> web.Response:
+        return AsyncEventCenterAdapter.__make_response(request, RESPONSE_OK)
+
+    async def __on_event(self, request: web.Request) -> web.Response:
+        try:
+            body = serialization.decode(decompress(await request.read(), request.headers.get('Content-Encoding')),
+                                        request.content_type)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=f'Malformed request body: {e}')
+
+        # Check if got a batch of events (if registered for batch delivery).
+        if 'remote_events' in body:
+            remote_events = RemoteEventBatchData.from_dict(body).remote_events
+        else:
+            remote_events = [RemoteEventData.from_dict(body)]
+
+        # Respond in agreed format (event center learns from it which format to deliver events in).
+        items = [(remote_event.channel, remote_event) for remote_event in remote_events]
+        if not await self.__callback_executor.submit_all(items):
+            return AsyncEventCenterAdapter.__make_response(request, {'error': 'too_many_requests'},
+                                                           HTTP_STATUS_TOO_MANY_REQUESTS)
+        return AsyncEventCenterAdapter.__make_response(request, {})
+
+    def __set_sender(self, event: Event):
+        sender = f'{self.url}'
+        try:
+            metadata = event.payload['metadata']
+            metadata['sender_url'] = sender
+        except KeyError:
+            event.payload['metadata'] = {'sender_url': sender}
+
+    async def __register(self, events: [str], channel: str, is_register: bool = True):
+        endpoint = '/register' if is_register else '/unregister'
+        url = self.event_center_url + endpoint
+        data = RegistrationData(self.callback_url, events, channel, self.is_batch_delivery)
+        await AsyncAPICaller.make_post_call(url, json=data.dict, is_suppress_connection_error=True)
+
+    @staticmethod
+    def __make_response(request: web.Request, response: Dict[str, Any], status: int = 200) -> web.Response:
+        content_type = serialization.get_content_negotiator().choose_content_type(request.headers.get('Accept'))
+        body, headers = get_compressor().compress_response(serialization.encode(response, content_type),
+                                                           request.headers.get('Accept-Encoding'))
+        return web.Response(body=body, status=status, content_type=content_type, headers=headers)
+
+    @staticmethod
+    def __log_message_map_events_succeeded(event_mapping_data: EventMappingData):
+        logging.getLogger().debug(f"Mapped events\n{event_mapping_data.dict}")
+
+    @staticmethod
+    def __log_message_no_response():
+        logging.getLogger().error(f'No response after API call to Event Center. Make sure Event Center is running '
+                                  f'and connectivity information provided is correct.')
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from typing import Any, Dict
+
+import aiohttp
+from eventdispatch import Properties
+
+from eventcenter.client import serialization
+from eventcenter.client.compression import get_compressor
+from eventcenter.client.network import ApiConnectionError, HEADERS, HTTP_POOL_SIZE, HTTP_KEEP_ALIVE
+
+DEFAULT_ASYNC_POOL_SIZE = 100
+
+
+class AsyncResponse:
+    """
+    PURPOSE:
+    - Response of an async API call, read in full (so it can be used after the connection is handed back).
+    - Same basics as a requests response (status code, json), so callers read it the same way.
+    """
+
+    def __init__(self, status_code: int, content: bytes, content_type: str = serialization.CONTENT_TYPE_JSON):
+        self.__status_code = status_code
+        self.__content = content
+        self.__content_type = content_type
+
+    @property
+    def status_code(self) -> int:
+        return self.__status_code
+
+    @property
+    def content(self) -> bytes:
+        return self.__content
+
+    @property
+    def content_type(self) -> str:
+        return self.__content_type
+
+    def json(self) -> Any:
+        # Decoded per content type (json, or a binary format agreed on).
+        return serialization.decode(self.__content, self.__content_type) if self.__content else None
+
+
+class AsyncSessionPool:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Keeps one async HTTP session per event loop (sessions can't be shared across loops), so connections are kept
+      alive and reused across calls made from that loop.
+    - Pool size (connections per host) and keep-alive are configurable (via properties, if not given).
+    """
+
+    def __init__(self, pool_size: int = None, is_keep_alive: bool = None):
+        self.__pool_size = int(AsyncSessionPool.__get_property(HTTP_POOL_SIZE, pool_size, DEFAULT_ASYNC_POOL_SIZE))
+        self.__is_keep_alive = bool(AsyncSessionPool.__get_property(HTTP_KEEP_ALIVE, is_keep_alive, True))
+        self.__sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+    def get_session(self) -> aiohttp.ClientSession:
+        # Only called from a running loop, and only touched from that loop's thread (no lock needed per loop).
+        loop = asyncio.get_running_loop()
+        session = self.__sessions.get(loop)
+        if not session or session.closed:
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.__pool_size,
+                                             force_close=not self.__is_keep_alive)
+            session = aiohttp.ClientSession(connector=connector)
+            self.__sessions[loop] = session
+        return session
+
+    async def close(self):
+        # Closes session of running loop.
+        session = self.__sessions.pop(asyncio.get_running_loop(), None)
+        if session:
+            await session.close()
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
+
+
+_default_async_session_pool: AsyncSessionPool = None
+
+
+def get_async_session_pool() -> AsyncSessionPool:
+    global _default_async_session_pool
+
+    if not _default_async_session_pool:
+        _default_async_session_pool = AsyncSessionPool()
+    return _default_async_session_pool
+
+
+class AsyncAPICaller:
+    # Same as APICaller, awaitable (calls go through the shared async session pool).
+
+    @staticmethod
+    async def make_post_call(url: str, data: Any = None, json: Any = None,
+                             headers: Dict[str, Any] = None,
+                             timeout_sec: float = None,
+                             is_suppress_connection_error: bool = False) -> AsyncResponse:
+        return await AsyncAPICaller.__make_call('POST', url, data, json, headers, timeout_sec,
+                                                is_suppress_connection_error)
+
+    @staticmethod
+    async def make_get_call(url: str, json: Any = None,
+                            headers: Dict[str, Any] = None,
+                            timeout_sec: float = None,
+                            is_suppress_connection_error: bool = False) -> AsyncResponse:
+        return await AsyncAPICaller.__make_call('GET', url, None, json, headers, timeout_sec,
+                                                is_suppress_connection_error)
+
+    @staticmethod
+    async def __make_call(method: str, url: str, data: Any, json: Any, headers: Dict[str, Any],
+                          timeout_sec: float, is_suppress_connection_error: bool) -> AsyncResponse:
+        # Encode (and compress) json bodies in format agreed on with destination (same as APICaller).
+        negotiator = serialization.get_content_negotiator()
+        compressor = get_compressor()
+        if json is not None:
+            content_type = negotiator.get_content_type(url)
+            body, headers = compressor.compress_request(url, serialization.encode(json, content_type),
+                                                        headers if headers else negotiator.get_headers(content_type))
+        else:
+            body, headers = data, headers if headers else HEADERS
+        session = get_async_session_pool().get_session()
+
+        try:
+            async with session.request(method, url, data=body, headers=headers,
+                                       timeout=aiohttp.ClientTimeout(total=timeout_sec)) as response:
+                content_type = response.headers.get('Content-Type')
+                negotiator.learn(url, content_type)
+                compressor.learn(url, response.headers.get('Accept-Encoding'))
+                return AsyncResponse(response.status, await response.read(), content_type)
+
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if not is_suppress_connection_error:
+                raise ApiConnectionError(url, data, json)
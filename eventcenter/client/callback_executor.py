@@ -0,0 +1,183 @@
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Tuple
+
+from eventdispatch import Properties
+
+from eventcenter.client.worker_pool import WorkerPool
+
+# Callback handling properties.
+CALLBACK_WORKER_COUNT = 'CALLBACK_WORKER_COUNT'
+CALLBACK_QUEUE_SIZE = 'CALLBACK_QUEUE_SIZE'
+CALLBACK_BACKPRESSURE = 'CALLBACK_BACKPRESSURE'
+
+# Backpressure policies (what to do when queue is full).
+BACKPRESSURE_BLOCK = 'block'
+BACKPRESSURE_DROP_OLDEST = 'drop_oldest'
+BACKPRESSURE_REJECT = 'reject'
+
+DEFAULT_WORKER_COUNT = 8
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_BACKPRESSURE = BACKPRESSURE_BLOCK
+
+MAX_DRAIN = 100
+
+
+class CallbackExecutor:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Hands received events to the event handler, using a bounded pool of worker threads.
+    - Preserves ordering per channel (only one worker handles a channel's events at a time).
+    - Bounds how many events can be waiting, and applies a backpressure policy once full: block the caller,
+      drop the oldest waiting event, or reject the new event(s).
+    - Keeps counts (queue depths, dropped and rejected events) to see how far behind handling is.
+    """
+
+    def __init__(self, handler: Callable[[Any], None], worker_count: int = None, max_queue_size: int = None,
+                 backpressure: str = None):
+        self.__handler = handler
+
+        worker_count = CallbackExecutor.__get_property(CALLBACK_WORKER_COUNT, worker_count, DEFAULT_WORKER_COUNT)
+        self.__max_queue_size = max(1, int(
+            CallbackExecutor.__get_property(CALLBACK_QUEUE_SIZE, max_queue_size, DEFAULT_QUEUE_SIZE)))
+        self.__backpressure = CallbackExecutor.__get_property(CALLBACK_BACKPRESSURE, backpressure,
+                                                              DEFAULT_BACKPRESSURE)
+        if self.__backpressure not in [BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_REJECT]:
+            raise ValueError(f"Unknown backpressure policy '{self.__backpressure}'")
+
+        self.__executor = WorkerPool(int(worker_count), name='callback')
+
+        # Waiting items per channel, each item tagged with a sequence number (to find the oldest across channels).
+        self.__queues: Dict[str, deque] = {}
+        self.__sequence = 0
+        self.__pending_count = 0
+        self.__in_flight_count = 0
+        self.__handled_count = 0
+        self.__dropped_count = 0
+        self.__rejected_count = 0
+
+        self.__lock = threading.Lock()
+        self.__space = threading.Condition(self.__lock)
+        self.__idle = threading.Condition(self.__lock)
+
+    @property
+    def backpressure(self) -> str:
+        return self.__backpressure
+
+    @property
+    def max_queue_size(self) -> int:
+        return self.__max_queue_size
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self.__lock:
+            return {
+                'pending': self.__pending_count,
+                'in_flight': self.__in_flight_count,
+                'handled': self.__handled_count,
+                'dropped': self.__dropped_count,
+                'rejected': self.__rejected_count,
+                'max_queue_size': self.__max_queue_size,
+                'backpressure': self.__backpressure,
+                'queue_depths': {channel: len(queue) for channel, queue in self.__queues.items()}
+            }
+
+    def queue_depth(self, channel: str) -> int:
+        with self.__lock:
+            queue = self.__queues.get(channel)
+            return len(queue) if queue else 0
+
+    def submit(self, channel: str, item: Any) -> bool:
+        return self.submit_all([(channel, item)])
+
+    def submit_all(self, items: List[Tuple[str, Any]]) -> bool:
+        # Items are accepted (or rejected) all together, so a rejected batch can be resent as a whole.
+        if not items:
+            return True
+
+        with self.__lock:
+            if self.__pending_count + len(items) > self.__max_queue_size:
+                if self.__backpressure == BACKPRESSURE_REJECT:
+                    self.__rejected_count += len(items)
+                    self.__log_message_rejected(len(items))
+                    return False
+
+                if self.__backpressure == BACKPRESSURE_BLOCK:
+                    # Wait for room (or for queue to empty, when more items than the queue can ever hold).
+                    self.__space.wait_for(lambda: self.__pending_count == 0 or
+                                          self.__pending_count + len(items) <= self.__max_queue_size)
+
+            channels_to_drain = []
+            for channel, item in items:
+                self.__sequence += 1
+                queue = self.__queues.get(channel)
+                if queue is None:
+                    queue = self.__queues[channel] = deque()
+                    channels_to_drain.append(channel)
+                queue.append((self.__sequence, item))
+                self.__pending_count += 1
+
+            if self.__backpressure == BACKPRESSURE_DROP_OLDEST:
+                while self.__pending_count > self.__max_queue_size:
+                    self.__drop_oldest()
+
+        for channel in channels_to_drain:
+            self.__executor.submit(self.__drain, channel)
+        return True
+
+    def wait_until_idle(self, timeout_sec: float = None) -> bool:
+        with self.__idle:
+            return self.__idle.wait_for(lambda: not self.__queues, timeout=timeout_sec)
+
+    def shutdown(self, wait: bool = True):
+        self.__executor.shutdown(wait=wait)
+
+    def __drain(self, channel: str):
+        for _ in range(MAX_DRAIN):
+            with self.__lock:
+                queue = self.__queues[channel]
+                if not queue:
+                    # Nothing left for channel, release it (next submit will schedule a new drain).
+                    del self.__queues[channel]
+                    self.__idle.notify_all()
+                    return
+                _, item = queue.popleft()
+                self.__pending_count -= 1
+                self.__in_flight_count += 1
+                self.__space.notify_all()
+
+            try:
+                self.__handler(item)
+            except Exception as e:
+                self.__logger.exception(f"Handling event on channel '{channel}' failed: {e}")
+
+            with self.__lock:
+                self.__in_flight_count -= 1
+                self.__handled_count += 1
+
+        # Yield worker to other channels, continue draining later.
+        self.__executor.submit(self.__drain, channel)
+
+    def __drop_oldest(self):
+        # Oldest waiting item is at the head of one of the channel queues (channel being drained keeps its queue,
+        # even when empty).
+        oldest_queue = min((queue for queue in self.__queues.values() if queue), key=lambda queue: queue[0][0])
+        oldest_queue.popleft()
+        self.__pending_count -= 1
+        self.__dropped_count += 1
+        self.__log_message_dropped()
+
+    def __log_message_rejected(self, count: int):
+        self.__logger.warning(f'Callback queue full ({self.__max_queue_size}), rejected {count} event(s)')
+
+    def __log_message_dropped(self):
+        self.__logger.warning(f'Callback queue full ({self.__max_queue_size}), dropped oldest event')
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
@@ -0,0 +1,189 @@
+import gzip
+import logging
+import threading
+from typing import Callable, Dict, List, Tuple, Union
+from urllib.parse import urlsplit
+
+from eventdispatch import Properties
+
+# Optional zstd (stdlib on Python 3.14+, else backports.zstd, same module the http libraries decode zstd with).
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+# Compression properties.
+COMPRESSION = 'COMPRESSION'
+COMPRESSION_MIN_SIZE = 'COMPRESSION_MIN_SIZE'
+
+ENCODING_ZSTD = 'zstd'
+ENCODING_GZIP = 'gzip'
+COMPRESSION_OFF = 'off'
+
+# Bodies smaller than this are sent as is (compressing them saves little, and costs CPU on both ends).
+DEFAULT_MIN_SIZE = 1024
+
+# Same as zlib's default (gzip module defaults to 9, which is much slower for little gain).
+GZIP_LEVEL = 6
+
+
+def _build_encoders() -> Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    # Encoding -> (compress, decompress), best first.
+    encoders = {}
+    if zstd:
+        encoders[ENCODING_ZSTD] = (zstd.compress, zstd.decompress)
+    encoders[ENCODING_GZIP] = (lambda data: gzip.compress(data, GZIP_LEVEL, mtime=0), gzip.decompress)
+    return encoders
+
+
+_encoders = _build_encoders()
+
+
+def get_encodings() -> List[str]:
+    return list(_encoders.keys())
+
+
+def compress(data: bytes, encoding: str = None) -> bytes:
+    return _encoders[encoding][0](data) if encoding else data
+
+
+def decompress(data: bytes, encoding: str = None) -> bytes:
+    # Bodies without an encoding (or 'identity') are returned as is.
+    encoding = encoding.strip().lower() if encoding else None
+    if not encoding or encoding == 'identity':
+        return data
+    if encoding not in _encoders:
+        raise ValueError(f"Unsupported content encoding '{encoding}'")
+    return _encoders[encoding][1](data)
+
+
+class Compressor:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Compresses bodies sent between clients and event center (requests and responses) when they're larger than a
+      threshold, with the best encoding both ends support (zstd, gzip).
+    - Responses are compressed per the Accept-Encoding of the request.  Every response also lists (in its own
+      Accept-Encoding header) the encodings this end reads requests in, and requests to a host are only compressed
+      once it listed one, so ends that don't (e.g. older versions) keep getting uncompressed requests.
+    """
+
+    def __init__(self, encoding: str = None, min_size: int = None):
+        if encoding is None:
+            encoding = Properties().get(COMPRESSION) if Properties().has(COMPRESSION) else None
+        if min_size is None:
+            min_size = Properties().get(COMPRESSION_MIN_SIZE) if Properties().has(COMPRESSION_MIN_SIZE) \
+                else DEFAULT_MIN_SIZE
+
+        if encoding and encoding != COMPRESSION_OFF and encoding not in _encoders:
+            self.__logger.warning(f"Compression '{encoding}' is not available, picking best available")
+            encoding = None
+
+        # Encodings this end uses, preferred first (none, if compression is off).
+        if encoding == COMPRESSION_OFF:
+            self.__encodings = []
+        else:
+            self.__encodings = list(dict.fromkeys(([encoding] if encoding else []) + get_encodings()))
+
+        self.__min_size = int(min_size)
+        self.__accept_encoding = ', '.join(self.__encodings)
+        self.__encodings_by_host: Dict[str, str] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def is_enabled(self) -> bool:
+        return len(self.__encodings) > 0
+
+    @property
+    def min_size(self) -> int:
+        return self.__min_size
+
+    @property
+    def accept_encoding(self) -> str:
+        return self.__accept_encoding
+
+    def get_encoding(self, url: str, size: int) -> Union[str, None]:
+        # Encoding to send a request body of given size to url in (None to send it as is).
+        if size < self.__min_size:
+            return None
+        return self.__encodings_by_host.get(Compressor.__get_key(url))
+
+    def learn(self, url: str, accept_encoding: str):
+        # Note encoding a host reads requests in (from Accept-Encoding of its response, if it listed any).
+        encoding = self.choose_encoding(accept_encoding)
+        key = Compressor.__get_key(url)
+        if self.__encodings_by_host.get(key) != encoding:
+            with self.__lock:
+                self.__encodings_by_host[key] = encoding
+
+    def choose_encoding(self, accept_encoding: str, size: int = None) -> Union[str, None]:
+        # Picks first of this end's encodings (in order of preference) that other end accepts.
+        if not accept_encoding or (size is not None and size < self.__min_size):
+            return None
+
+        accepted = set()
+        for item in accept_encoding.split(','):
+            encoding, _, params = item.partition(';')
+            if not Compressor.__is_refused(params):
+                accepted.add(encoding.strip().lower())
+        return next((encoding for encoding in self.__encodings if encoding in accepted), None)
+
+    def compress_request(self, url: str, body: bytes, headers: Dict[str, str]) -> Tuple[bytes, Dict[str, str]]:
+        # Request body (compressed, if large and host reads the encoding), and headers to send it with.
+        encoding = self.get_encoding(url, len(body))
+        if not encoding:
+            return body, headers
+        return compress(body, encoding), Compressor.add_content_encoding(headers, encoding)
+
+    def compress_response(self, body: bytes, accept_encoding: str) -> Tuple[bytes, Dict[str, str]]:
+        # Response body (compressed, if large and caller accepts the encoding), and headers to add to response.
+        headers = {'Accept-Encoding': self.__accept_encoding} if self.__accept_encoding else {}
+        encoding = self.choose_encoding(accept_encoding, len(body))
+        if encoding:
+            body = compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+            headers['Vary'] = 'Accept-Encoding'
+        return body, headers
+
+    @staticmethod
+    def add_content_encoding(headers: Dict[str, str], encoding: str = None) -> Dict[str, str]:
+        return dict(headers, **{'Content-Encoding': encoding}) if encoding else headers
+
+    @staticmethod
+    def __is_refused(params: str) -> bool:
+        # E.g. 'gzip;q=0' means gzip is not accepted.
+        params = params.replace(' ', '').lower()
+        try:
+            return params.startswith('q=') and float(params[2:]) == 0
+        except ValueError:
+            return False
+
+    @staticmethod
+    def __get_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+
+_default_compressor: Compressor = None
+_default_compressor_lock = threading.Lock()
+
+
+def get_compressor() -> Compressor:
+    global _default_compressor
+
+    with _default_compressor_lock:
+        if not _default_compressor:
+            _default_compressor = Compressor()
+        return _default_compressor
+
+
+def set_compressor(compressor: Compressor = None):
+    # Replace default compressor (None to rebuild it from properties on next use).
+    global _default_compressor
+
+    with _default_compressor_lock:
+        _default_compressor = compressor
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, List
+
+# Event batching properties.
+EVENT_BATCH_LINGER_SEC = 'EVENT_BATCH_LINGER_SEC'
+EVENT_BATCH_MAX_SIZE = 'EVENT_BATCH_MAX_SIZE'
+
+DEFAULT_BATCH_MAX_SIZE = 100
+
+
+class EventBatcher:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Coalesces items (events) added within a linger time into a single batch, sent in one call.
+    - Sends a batch early, once it reaches the max batch size.
+    - Sends batches from a single thread, so items are sent in the order they were added.
+    """
+
+    def __init__(self, send_batch: Callable[[List[Any]], None], linger_sec: float,
+                 max_batch_size: int = DEFAULT_BATCH_MAX_SIZE, name: str = 'EventBatcher'):
+        self.__send_batch = send_batch
+        self.__linger_sec = linger_sec
+        self.__max_batch_size = max(1, max_batch_size)
+
+        self.__pending: List[Any] = []
+        self.__first_added_time = 0.0
+        self.__is_running = True
+        self.__condition = threading.Condition()
+
+        # Serializes sending, so a flush (from another thread) cannot overtake a batch being sent.
+        self.__send_lock = threading.Lock()
+
+        self.__thread = threading.Thread(target=self.__run, name=name, daemon=True)
+        self.__thread.start()
+
+    @property
+    def pending_count(self) -> int:
+        with self.__condition:
+            return len(self.__pending)
+
+    def add(self, item: Any):
+        with self.__condition:
+            if not self.__pending:
+                self.__first_added_time = time.monotonic()
+            self.__pending.append(item)
+
+            # Wake sender when first item arrives (to start linger timer) or when batch is full.
+            if len(self.__pending) == 1 or len(self.__pending) >= self.__max_batch_size:
+                self.__condition.notify()
+
+    def flush(self):
+        with self.__send_lock:
+            with self.__condition:
+                batch = self.__take_batch()
+            self.__send(batch)
+
+    def stop(self):
+        with self.__condition:
+            self.__is_running = False
+            self.__condition.notify()
+        self.__thread.join()
+
+        # Send anything still pending.
+        while self.pending_count:
+            self.flush()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while self.__is_running and not self.__is_batch_ready():
+                    self.__condition.wait(self.__get_wait_time())
+
+                if not self.__is_running:
+                    return
+
+            # Take batch under send lock (same as flush), so batches are sent in the order they were taken.
+            self.flush()
+
+    def __is_batch_ready(self) -> bool:
+        if not self.__pending:
+            return False
+        if len(self.__pending) >= self.__max_batch_size:
+            return True
+        return time.monotonic() - self.__first_added_time >= self.__linger_sec
+
+    def __get_wait_time(self):
+        if not self.__pending:
+            return None
+        return max(0.0, self.__linger_sec - (time.monotonic() - self.__first_added_time))
+
+    def __take_batch(self) -> List[Any]:
+        batch = self.__pending[:self.__max_batch_size]
+        self.__pending = self.__pending[self.__max_batch_size:]
+        self.__first_added_time = time.monotonic()
+        return batch
+
+    def __send(self, batch: List[Any]):
+        if not batch:
+            return
+
+        try:
+            self.__send_batch(batch)
+        except Exception as e:
+            self.__logger.error(f'Failed to send batch of {len(batch)} item(s): {e}')
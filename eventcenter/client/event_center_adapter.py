@@ -1,13 +1,16 @@
 import logging
-import threading
 from typing import Callable
 
 from eventdispatch import Event, Properties
 from eventdispatch.core import NotifiableError
-from flask import Flask, request
-
-from eventcenter.client.network import FlaskAppRunner, APICaller
-from eventcenter.server.event_center import RegistrationData, RemoteEventData, EventMappingData
+from flask import Flask
+
+from eventcenter.client.callback_executor import CallbackExecutor
+from eventcenter.client.event_batcher import EventBatcher, EVENT_BATCH_LINGER_SEC, EVENT_BATCH_MAX_SIZE, \
+    DEFAULT_BATCH_MAX_SIZE
+from eventcenter.client.network import FlaskAppRunner, APICaller, HTTP_STATUS_TOO_MANY_REQUESTS
+from eventcenter.server.event_center import RegistrationData, RemoteEventData, EventMappingData, \
+    RemoteEventBatchData, ReplayRequestData
 from eventcenter.server.service import RESPONSE_OK
 
 PING_ENDPOINT = '/ping'
@@ -17,6 +20,12 @@ CALLBACK_ENDPOINT = '/on_event'
 EVENT_CENTER_URL = 'EVENT_CENTER_URL'
 EVENT_CENTER_CALLBACK_HOST = 'EVENT_CENTER_CALLBACK_HOST'
 EVENT_CENTER_CALLBACK_PORT = 'EVENT_CENTER_CALLBACK_PORT'
+EVENT_CENTER_BATCH_DELIVERY = 'EVENT_CENTER_BATCH_DELIVERY'
+EVENT_CENTER_TRANSPORT = 'EVENT_CENTER_TRANSPORT'
+
+# Transports (how a router talks to event center).
+TRANSPORT_HTTP = 'http'
+TRANSPORT_STREAM = 'stream'
 
 
 class EventCenterAdapter(FlaskAppRunner):
@@ -29,8 +38,23 @@ class EventCenterAdapter(FlaskAppRunner):
         self.url = f'{host}:{port}'
         self.callback_url = f'{self.url}{CALLBACK_ENDPOINT}'
 
+        # Ask event center to deliver events in batches (when it has several queued for this adapter).
+        self.is_batch_delivery = Properties().has(EVENT_CENTER_BATCH_DELIVERY) and \
+            Properties().get(EVENT_CENTER_BATCH_DELIVERY) == True
+
         self.app = Flask('EventCenterAdapter')
 
+        # Batch outgoing events, if linger time is set (otherwise post each event as it comes).
+        self.__event_batcher = None
+        linger_sec = Properties().get(EVENT_BATCH_LINGER_SEC) if Properties().has(EVENT_BATCH_LINGER_SEC) else 0
+        if linger_sec:
+            max_batch_size = Properties().get(EVENT_BATCH_MAX_SIZE) if Properties().has(EVENT_BATCH_MAX_SIZE) \
+                else DEFAULT_BATCH_MAX_SIZE
+            self.__event_batcher = EventBatcher(self.__post_events, float(linger_sec), int(max_batch_size))
+
+        # Hand received events to event handler with a bounded pool of workers (in order, per channel).
+        self.__callback_executor = CallbackExecutor(self.event_handler)
+
         super().__init__('0.0.0.0', port, self.app, run_as_a_server=True)
         self.start()
 
@@ -40,9 +64,23 @@ class EventCenterAdapter(FlaskAppRunner):
 
         @self.app.route(CALLBACK_ENDPOINT, methods=['POST'])
         def on_event():
-            remote_event = RemoteEventData.from_dict(request.json)
-            threading.Thread(target=self.event_handler, args=[remote_event]).start()
-            return {}
+            body = self.read_body()
+
+            # Check if got a batch of events (if registered for batch delivery).
+            if 'remote_events' in body:
+                remote_events = RemoteEventBatchData.from_dict(body).remote_events
+            else:
+                remote_events = [RemoteEventData.from_dict(body)]
+
+            # Respond in agreed format (event center learns from it which format to deliver events in).
+            items = [(remote_event.channel, remote_event) for remote_event in remote_events]
+            if not self.__callback_executor.submit_all(items):
+                return self.make_response({'error': 'too_many_requests'}, HTTP_STATUS_TOO_MANY_REQUESTS)
+            return self.make_response({})
+
+    @property
+    def callback_stats(self) -> dict:
+        return self.__callback_executor.stats
 
     def register(self, events: [str], channel: str = ''):
         self.__register(events, channel, is_register=True)
@@ -60,16 +98,60 @@ class EventCenterAdapter(FlaskAppRunner):
     def post_event(self, event: Event, channel: str = '', is_suppress_connection_error: bool = True):
         url = self.event_center_url + '/post_event'
 
-        sender = f'{self.url}'
-        try:
-            metadata = event.payload['metadata']
-            metadata['sender_url'] = sender
-        except KeyError:
-            event.payload['metadata'] = {'sender_url': sender}
-
+        self.__set_sender(event)
         data = RemoteEventData(channel, event)
+
+        if self.__event_batcher:
+            self.__event_batcher.add(data)
+            return
+
         APICaller.make_post_call(url, json=data.dict, is_suppress_connection_error=is_suppress_connection_error)
 
+    def post_events(self, events: [Event], channel: str = '', is_suppress_connection_error: bool = True):
+        remote_events = []
+        for event in events:
+            self.__set_sender(event)
+            remote_events.append(RemoteEventData(channel, event))
+
+        if self.__event_batcher:
+            for remote_event in remote_events:
+                self.__event_batcher.add(remote_event)
+            return
+
+        self.__post_events(remote_events, is_suppress_connection_error)
+
+    def shutdown(self):
+        # Send any events still waiting to be batched.
+        if self.__event_batcher:
+            self.__event_batcher.stop()
+        self.__callback_executor.shutdown(wait=False)
+        super().shutdown()
+
+    def replay(self, channel: str = '', offset: int = 0, events: [str] = None) -> int:
+        # Get events logged for channel from offset on (e.g. ones posted while disconnected), and hand them to event
+        # handler, same as delivered ones (each carries its offset, as 'replay_offset' in its payload's metadata).
+        # Returns offset to resume from next time.
+        url = self.event_center_url + '/replay'
+        while True:
+            data = ReplayRequestData(channel, offset, events=events)
+            response = APICaller.make_post_call(url, json=data.dict, is_suppress_connection_error=True)
+
+            if not response:
+                EventCenterAdapter.__log_message_no_response()
+                raise EventCenterConnectionError()
+
+            response = APICaller.read_body(response)
+            remote_events = RemoteEventBatchData.from_dict(response).remote_events
+            items = [(remote_event.channel, remote_event) for remote_event in remote_events]
+            if items and not self.__callback_executor.submit_all(items):
+                # Too busy to take events, resume from here later.
+                return offset
+
+            next_offset = response.get('next_offset', offset)
+            if next_offset <= offset or next_offset >= response.get('end_offset', next_offset):
+                return next_offset
+            offset = next_offset
+
     def map_events(self, events_to_map: [Event], event_to_post: Event, ignore_if_exists: bool = False,
                    channel: str = '') -> str:
         url = self.event_center_url + '/map_events'
@@ -81,7 +163,7 @@ class EventCenterAdapter(FlaskAppRunner):
             EventCenterAdapter.__log_message_no_response()
             raise EventCenterConnectionError()
 
-        response = response.json()
+        response = APICaller.read_body(response)
 
         if response.get('success', 'false') == 'true':
             EventCenterAdapter.__log_message_map_events_succeeded(data)
@@ -99,10 +181,23 @@ class EventCenterAdapter(FlaskAppRunner):
         logging.getLogger().error(f'No response after API call to Event Center. Make sure Event Center is running '
                                   f'and connectivity information provided is correct.')
 
+    def __post_events(self, remote_events: [RemoteEventData], is_suppress_connection_error: bool = True):
+        url = self.event_center_url + '/post_events'
+        data = RemoteEventBatchData(remote_events)
+        APICaller.make_post_call(url, json=data.dict, is_suppress_connection_error=is_suppress_connection_error)
+
+    def __set_sender(self, event: Event):
+        sender = f'{self.url}'
+        try:
+            metadata = event.payload['metadata']
+            metadata['sender_url'] = sender
+        except KeyError:
+            event.payload['metadata'] = {'sender_url': sender}
+
     def __register(self, events: [str], channel: str, is_register: bool = True):
         endpoint = '/register' if is_register else '/unregister'
         url = self.event_center_url + endpoint
-        data = RegistrationData(self.callback_url, events, channel)
+        data = RegistrationData(self.callback_url, events, channel, self.is_batch_delivery)
         APICaller.make_post_call(url, json=data.dict, is_suppress_connection_error=True)
 
 
@@ -0,0 +1,74 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, List
+
+
+class EventSender:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Takes items (events) from any thread without locking (callers never wait on sending).
+    - Sends items from a single, dedicated thread, in the order they were added.
+    - Hands over everything queued up (up to a max batch size) in one go, so it can be sent together.
+    """
+
+    def __init__(self, send_batch: Callable[[List[Any]], None], max_batch_size: int = 100,
+                 name: str = 'EventSender'):
+        self.__send_batch = send_batch
+        self.__max_batch_size = max(1, max_batch_size)
+
+        self.__queue = queue.SimpleQueue()
+        self.__stop_marker = object()
+
+        self.__thread = threading.Thread(target=self.__run, name=name, daemon=True)
+        self.__thread.start()
+
+    def add(self, item: Any):
+        self.__queue.put(item)
+
+    def wait_until_sent(self, timeout_sec: float = None) -> bool:
+        # Queue a marker behind items added so far, and wait for sender to reach it.
+        if not self.__thread.is_alive():
+            return True
+        sent = threading.Event()
+        self.__queue.put(sent)
+        return sent.wait(timeout_sec)
+
+    def stop(self, timeout_sec: float = None):
+        # Items added before stopping are still sent.
+        self.__queue.put(self.__stop_marker)
+        self.__thread.join(timeout_sec)
+
+    def __run(self):
+        while True:
+            batch = [self.__queue.get()]
+            while len(batch) < self.__max_batch_size:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Send items up to each marker, then act on marker.
+            items = []
+            for item in batch:
+                if item is self.__stop_marker:
+                    self.__send(items)
+                    return
+                if isinstance(item, threading.Event):
+                    self.__send(items)
+                    items = []
+                    item.set()
+                    continue
+                items.append(item)
+            self.__send(items)
+
+    def __send(self, items: List[Any]):
+        if not items:
+            return
+
+        try:
+            self.__send_batch(items)
+        except Exception as e:
+            self.__logger.exception(f'Failed to send {len(items)} item(s): {e}')
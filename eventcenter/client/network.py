@@ -1,14 +1,33 @@
 import logging
 import threading
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit
 
 import requests
 from eventdispatch import NotifiableError, PropertyNotSetError, Properties
-from flask import Flask, make_response
+from flask import Flask, make_response, request
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from werkzeug.exceptions import BadRequest
 from werkzeug.serving import make_server
 
+from eventcenter.client import serialization
+from eventcenter.client.compression import get_compressor, decompress
+
 HEADERS = {'Content-Type': 'application/json'}
 
+HTTP_STATUS_TOO_MANY_REQUESTS = 429
+
+# Connection pool properties.
+HTTP_POOL_SIZE = 'HTTP_POOL_SIZE'
+HTTP_MAX_RETRIES = 'HTTP_MAX_RETRIES'
+HTTP_RETRY_BACKOFF_SEC = 'HTTP_RETRY_BACKOFF_SEC'
+HTTP_KEEP_ALIVE = 'HTTP_KEEP_ALIVE'
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 0
+DEFAULT_RETRY_BACKOFF_SEC = 0.0
+
 
 class FlaskAppRunner(threading.Thread):
     def __init__(self, host: str, port: int, app: Flask, run_as_a_server: bool = False):
@@ -29,6 +48,12 @@ class FlaskAppRunner(threading.Thread):
         self.logger = logging.getLogger(app.name)
         self.app = app
 
+        # Parse requests and build responses with the (fast) json backend.
+        self.app.json = serialization.JsonProvider(app)
+
+        # Compress large responses (and tell callers which encodings requests can be compressed with).
+        self.app.after_request(FlaskAppRunner.__compress_response)
+
         if run_as_a_server:
             self.server = make_server(host, port, app)
 
@@ -41,12 +66,42 @@ class FlaskAppRunner(threading.Thread):
             return Properties().get('RUN_AS_A_SERVER')
         return False
 
-    def make_response(self, response: Any):
+    def make_response(self, response: Any, status: int = 200):
+        # Respond in format agreed on with caller (per its Accept header), json unless both support a binary one.
+        content_type = serialization.get_content_negotiator().choose_content_type(request.headers.get('Accept'))
+        if content_type != serialization.CONTENT_TYPE_JSON:
+            response = make_response(serialization.encode(response, content_type), status)
+            response.content_type = content_type
+        elif self.is_allow_cors or status != 200:
+            response = make_response(response, status)
+
         if self.is_allow_cors:
-            response = make_response(response)
             response.headers.add('Access-Control-Allow-Origin', '*')
         return response
 
+    @staticmethod
+    def read_body() -> Any:
+        # Request body, decompressed (if it was) and decoded per its content type (json, or a binary format agreed on).
+        # Missing or malformed body is the caller's error (400), not the server's.
+        try:
+            data = decompress(request.get_data(), request.headers.get('Content-Encoding'))
+            if data:
+                return serialization.decode(data, request.content_type)
+        except ValueError as e:
+            raise BadRequest(f'Malformed request body: {e}')
+        raise BadRequest('Missing request body')
+
+    @staticmethod
+    def __compress_response(response):
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+
+        body, headers = get_compressor().compress_response(response.get_data(), request.headers.get('Accept-Encoding'))
+        if 'Content-Encoding' in headers:
+            response.set_data(body)
+        response.headers.update(headers)
+        return response
+
     def run(self):
         if self.server:
             self.logger.debug(f"Starting flask app '{self.app.name}'")
@@ -58,26 +113,122 @@ class FlaskAppRunner(threading.Thread):
             self.logger.debug(f"Stopped flask app '{self.app.name}'")
 
 
+class SessionPool:
+    """
+    PURPOSE:
+    - Keeps one HTTP session per destination host (scheme + host + port), so connections are kept alive and
+      reused across calls, instead of paying a new TCP (and TLS) handshake per call.
+    - Pool size, keep-alive and retry policy are configurable (via properties, if not given).
+    - Counts session hits/misses and connections opened, to monitor connection reuse.
+    """
+
+    def __init__(self, pool_size: int = None, max_retries: int = None, retry_backoff_sec: float = None,
+                 is_keep_alive: bool = None):
+        self.__pool_size = int(SessionPool.__get_property(HTTP_POOL_SIZE, pool_size, DEFAULT_POOL_SIZE))
+        self.__max_retries = int(SessionPool.__get_property(HTTP_MAX_RETRIES, max_retries, DEFAULT_MAX_RETRIES))
+        self.__retry_backoff_sec = float(
+            SessionPool.__get_property(HTTP_RETRY_BACKOFF_SEC, retry_backoff_sec, DEFAULT_RETRY_BACKOFF_SEC))
+        self.__is_keep_alive = bool(SessionPool.__get_property(HTTP_KEEP_ALIVE, is_keep_alive, True))
+
+        self.__sessions: Dict[str, requests.Session] = {}
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self.__lock:
+            sessions = list(self.__sessions.values())
+            stats = {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'sessions': len(sessions),
+                'connections_opened': 0,
+                'requests': 0
+            }
+
+        # Connections opened vs requests made (by underlying connection pools) shows how much keep-alive helps.
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool:
+                        stats['connections_opened'] += pool.num_connections
+                        stats['requests'] += pool.num_requests
+        return stats
+
+    def get_session(self, url: str) -> requests.Session:
+        key = SessionPool.__get_key(url)
+
+        with self.__lock:
+            try:
+                session = self.__sessions[key]
+                self.__hits += 1
+                return session
+            except KeyError:
+                self.__misses += 1
+                session = self.__create_session()
+                self.__sessions[key] = session
+                return session
+
+    def close(self):
+        with self.__lock:
+            for session in self.__sessions.values():
+                session.close()
+            self.__sessions = {}
+
+    def __create_session(self) -> requests.Session:
+        # Only retry failures to connect (request never reached destination), since posts are not idempotent.
+        retry = Retry(total=self.__max_retries, read=False, status=False, backoff_factor=self.__retry_backoff_sec)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.__pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.__is_keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    @staticmethod
+    def __get_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
+
+
+_default_session_pool: SessionPool = None
+_default_session_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> SessionPool:
+    global _default_session_pool
+
+    with _default_session_pool_lock:
+        if not _default_session_pool:
+            _default_session_pool = SessionPool()
+        return _default_session_pool
+
+
 class APICaller:
+    # Calls made without a session go through the shared session pool (to reuse connections per host).
+
     @staticmethod
     def make_post_call(url: str, data: Dict[str, Any] = None, json: Any = None,
                        headers: Dict[str, Any] = None,
                        session: requests.Session = None,
                        timeout_sec: float = None,
                        is_suppress_connection_error: bool = False) -> requests.Response:
-        headers = headers if headers else HEADERS
+        body, headers = APICaller.__encode_body(url, data, json, headers)
+        session = session if session else get_session_pool().get_session(url)
 
         try:
-            if session:
-                if timeout_sec:
-                    return session.post(url, data=data, json=json, headers=headers, timeout=timeout_sec)
-                else:
-                    return session.post(url, data=data, json=json, headers=headers)
-            else:
-                if timeout_sec:
-                    return requests.post(url, data=data, json=json, headers=headers, timeout=timeout_sec)
-                else:
-                    return requests.post(url, data=data, json=json, headers=headers)
+            return APICaller.__learn(url, session.post(url, data=body, headers=headers, timeout=timeout_sec))
 
         except requests.exceptions.ConnectionError:
             if not is_suppress_connection_error:
@@ -89,19 +240,11 @@ class APICaller:
                         session: requests.Session = None,
                         timeout_sec: float = None,
                         is_suppress_connection_error: bool = False) -> requests.Response:
-        headers = headers if headers else HEADERS
+        body, headers = APICaller.__encode_body(url, data, json, headers)
+        session = session if session else get_session_pool().get_session(url)
 
         try:
-            if session:
-                if timeout_sec:
-                    return session.patch(url, data=data, json=json, headers=headers, timeout=timeout_sec)
-                else:
-                    return session.patch(url, data=data, json=json, headers=headers)
-            else:
-                if timeout_sec:
-                    return requests.patch(url, data=data, json=json, headers=headers, timeout=timeout_sec)
-                else:
-                    return requests.patch(url, data=data, json=json, headers=headers)
+            return APICaller.__learn(url, session.patch(url, data=body, headers=headers, timeout=timeout_sec))
 
         except requests.exceptions.ConnectionError:
             if not is_suppress_connection_error:
@@ -113,11 +256,10 @@ class APICaller:
                       is_suppress_connection_error: bool = False) -> requests.Response:
         headers = headers if headers else HEADERS
         params = APICaller.__remove_empty_params(params)
+        session = session if session else get_session_pool().get_session(url)
+
         try:
-            if session:
-                return session.get(url, params=params, headers=headers)
-            else:
-                return requests.get(url, params=params, headers=headers)
+            return session.get(url, params=params, headers=headers)
 
         except requests.exceptions.ConnectionError:
             if not is_suppress_connection_error:
@@ -129,24 +271,41 @@ class APICaller:
                          session: requests.Session = None,
                          timeout_sec: float = None,
                          is_suppress_connection_error: bool = False) -> requests.Response:
-        headers = headers if headers else HEADERS
+        body, headers = APICaller.__encode_body(url, data, json, headers)
+        session = session if session else get_session_pool().get_session(url)
 
         try:
-            if session:
-                if timeout_sec:
-                    return session.delete(url, data=data, json=json, headers=headers, timeout=timeout_sec)
-                else:
-                    return session.delete(url, data=data, json=json, headers=headers)
-            else:
-                if timeout_sec:
-                    return requests.delete(url, data=data, json=json, headers=headers, timeout=timeout_sec)
-                else:
-                    return requests.delete(url, data=data, json=json, headers=headers)
+            return APICaller.__learn(url, session.delete(url, data=body, headers=headers, timeout=timeout_sec))
 
         except requests.exceptions.ConnectionError:
             if not is_suppress_connection_error:
                 raise ApiConnectionError(url, data, json)
 
+    @staticmethod
+    def read_body(response: requests.Response) -> Any:
+        # Response body, decoded per its content type (json, or a binary format agreed on).
+        return serialization.decode(response.content, response.headers.get('Content-Type')) \
+            if response.content else None
+
+    @staticmethod
+    def __encode_body(url: str, data: Any, json: Any, headers: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+        # Encode json bodies in format agreed on with destination (json by default, with the fast json backend),
+        # instead of letting requests do it.
+        if json is None:
+            return data, headers if headers else HEADERS
+
+        negotiator = serialization.get_content_negotiator()
+        content_type = negotiator.get_content_type(url)
+        return get_compressor().compress_request(url, serialization.encode(json, content_type),
+                                                 headers if headers else negotiator.get_headers(content_type))
+
+    @staticmethod
+    def __learn(url: str, response: requests.Response) -> requests.Response:
+        # Note format destination answered in, and encodings it reads (to use them for calls to it from now on).
+        serialization.get_content_negotiator().learn(url, response.headers.get('Content-Type'))
+        get_compressor().learn(url, response.headers.get('Accept-Encoding'))
+        return response
+
     @staticmethod
     def __remove_empty_params(params):
         return {key: value for (key, value) in params.items() if value}
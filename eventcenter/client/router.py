@@ -1,16 +1,21 @@
 import logging
+import threading
 from enum import Enum
-from typing import Any, Union
+from typing import Any, Callable, Union
 
 from eventdispatch import Event, EventDispatchEvent, register_for_events, Properties, post_event, \
     EventDispatchManager
 from eventdispatch.core import EventMapper, NamespacedEnum
 from flask import Flask
-from wrapt import synchronized
 
-from eventcenter.client.event_center_adapter import EventCenterAdapter
+from eventcenter.client.event_batcher import EVENT_BATCH_MAX_SIZE, DEFAULT_BATCH_MAX_SIZE
+from eventcenter.client.event_center_adapter import EventCenterAdapter, EVENT_CENTER_TRANSPORT, TRANSPORT_HTTP, \
+    TRANSPORT_STREAM
+from eventcenter.client.event_sender import EventSender
+from eventcenter.client.router_diagnostics import RouterDiagnostics
 from eventcenter.client.router_events import RouterEvent
 from eventcenter.server.event_center import RemoteEventData
+from eventcenter.server.topics import TopicTrie, is_pattern
 
 
 def start_event_router():
@@ -35,18 +40,31 @@ PRETTY_PRINT = 'PRETTY_PRINT'
 class EventRouter(EventMapper):
     __EXTERNAL_EVENT_ID = 'external_event_id'
     __EXTERNAL_EVENT_TIME = 'external_event_time'
+    __EXTERNAL_EVENT_NAME = 'external_event_name'
     __pretty_print = False
 
     __logger = logging.getLogger(__name__)
 
     def __init__(self):
+        # Decides which diagnostic (router) events get posted, and counts them all.
+        self.__diagnostics = RouterDiagnostics()
         self.__post_diagnostic_event(RouterEvent.STARTED)
 
-        self.__event_service_adapter = EventCenterAdapter(self.on_external_event)
+        self.__event_service_adapter = EventRouter.__create_adapter(self.on_external_event)
         self.__channel = '' if not Properties().has(ROUTER_CHANNEL) else Properties().get(ROUTER_CHANNEL)
         self.__name = '' if not Properties().has(ROUTER_NAME) else Properties().get(ROUTER_NAME)
         EventRouter.__pretty_print = Properties().has(PRETTY_PRINT) and Properties().get(PRETTY_PRINT)
 
+        # Event name patterns local handlers registered for (by handler), to dispatch external events matching them
+        # (Event Dispatch only dispatches by exact name).
+        self.__patterns = TopicTrie()
+        self.__patterns_lock = threading.Lock()
+
+        # Propagate internal events out from a dedicated thread, so threads posting events never wait on the network.
+        max_batch_size = Properties().get(EVENT_BATCH_MAX_SIZE) if Properties().has(EVENT_BATCH_MAX_SIZE) \
+            else DEFAULT_BATCH_MAX_SIZE
+        self.__event_sender = EventSender(self.__propagate_events, int(max_batch_size), name='EventRouterSender')
+
         # Register for all internal events, to propagate out.
         register_for_events(self.on_internal_event, [])
 
@@ -62,43 +80,77 @@ class EventRouter(EventMapper):
         self.__post_diagnostic_event(RouterEvent.READY)
 
     @property
-    def server(self) -> Flask:
+    def server(self) -> Union[Flask, None]:
+        # Streaming adapter has no callback server.
         return self.__event_service_adapter.app
 
+    @property
+    def diagnostic_counts(self) -> dict[str, int]:
+        return self.__diagnostics.counts
+
     def map_events(self, events_to_map: [Event], event_to_post: Event, ignore_if_exists: bool = False) -> str:
         return self.__event_service_adapter.map_events(events_to_map, event_to_post, ignore_if_exists, self.__channel)
 
-    @synchronized
     def on_internal_event(self, event: Event):
+        # Only queue event here (it's propagated out by event sender's thread).
+        self.__event_sender.add(event)
+
+    def wait_until_sent(self, timeout_sec: float = None) -> bool:
+        return self.__event_sender.wait_until_sent(timeout_sec)
+
+    def __propagate_events(self, events: [Event]):
+        # Handle in order received, posting consecutive (non-registration) events together.
+        events_to_post = []
+        for event in events:
+            event_to_post = self.__propagate_event(event)
+            if event_to_post:
+                events_to_post.append(event_to_post)
+            else:
+                self.__post_events(events_to_post)
+                events_to_post = []
+        self.__post_events(events_to_post)
+
+    def __post_events(self, events: [Event]):
+        try:
+            if len(events) == 1:
+                self.__event_service_adapter.post_event(events[0], self.__channel, is_suppress_connection_error=False)
+            elif events:
+                self.__event_service_adapter.post_events(events, self.__channel, is_suppress_connection_error=False)
+        except Exception:
+            pass
+
+    def __propagate_event(self, event: Event) -> Union[Event, None]:
+        # Handles registration events, and returns any other event that should be posted out.
         self.__log_message_got_internal_event(event)
 
         if event.name == 'api_connection_error':
             self.__post_diagnostic_event(RouterEvent.FAILED_TO_REACH_EVENT_CENTER, {})
-            return
+            return None
 
         # Check if event originated from outside (if so, no need to propagate it out again).
         if EventRouter.__EXTERNAL_EVENT_ID in event.payload and EventRouter.__EXTERNAL_EVENT_TIME in event.payload:
             self.__log_message_not_propagating_event__originated_outside(event)
-            return
+            return None
 
         # Check if registration event.
         if event.name == EventDispatchEvent.HANDLER_REGISTERED.namespaced_value:
             # Check if it's from Event Router (if so, ignore it).
-            if 'EventRouter.on_internal_event' in event.payload['handler'] or 'BoundFunctionWrapper' in event.payload[
-                'handler']:
+            if 'EventRouter.on_internal_event' in event.payload['handler']:
                 self.__log_message_not_propagating_event__originated_from_router(event)
-                return
+                return None
 
             events = event.get('events', event.payload)
+            self.__update_patterns(events, event.payload['handler'], is_register=True)
             self.__log_message_propagating_event(event)
             self.__event_service_adapter.register(events, self.__channel)
         elif event.name == EventDispatchEvent.HANDLER_UNREGISTERED.namespaced_value:
             # Check if it's from Event Router (if so, ignore it).
             if 'EventRouter.on_internal_event' in event.payload['handler']:
                 self.__log_message_not_propagating_event__originated_from_router(event)
-                return
+                return None
 
             events = event.get('events', event.payload)
+            self.__update_patterns(events, event.payload['handler'], is_register=False)
             self.__log_message_propagating_event(event)
             self.__event_service_adapter.unregister(events, self.__channel)
         else:
@@ -110,17 +162,16 @@ class EventRouter(EventMapper):
             }
 
             self.__log_message_propagating_event(event)
+            return event
 
-            try:
-                self.__event_service_adapter.post_event(event, self.__channel, is_suppress_connection_error=False)
-            except Exception:
-                pass
+        return None
 
     def on_external_event(self, remote_event: RemoteEventData):
         # Add external (original) event info to payload.
         metadata = {
             EventRouter.__EXTERNAL_EVENT_ID: remote_event.event.id,
             EventRouter.__EXTERNAL_EVENT_TIME: remote_event.event.time,
+            EventRouter.__EXTERNAL_EVENT_NAME: remote_event.event.name,
             'channel': remote_event.channel
         }
 
@@ -134,48 +185,84 @@ class EventRouter(EventMapper):
         # Propagate external event to local_clients event center
         post_event(remote_event.event.name, remote_event.event.payload, self.on_internal_event)
 
+        # Handlers registered for patterns the event matches get it posted under their pattern (once per pattern,
+        # event's own name is in its metadata).
+        with self.__patterns_lock:
+            patterns = set(self.__patterns.match(remote_event.event.name).values())
+        for pattern in sorted(patterns):
+            post_event(pattern, remote_event.event.payload, self.on_internal_event)
+
+    def __update_patterns(self, events: [str], handler: str, is_register: bool):
+        with self.__patterns_lock:
+            for pattern in events:
+                if not isinstance(pattern, str) or not is_pattern(pattern):
+                    continue
+                if is_register:
+                    self.__patterns.add(pattern, handler, pattern)
+                else:
+                    self.__patterns.remove(pattern, handler)
+
+    @staticmethod
+    def __create_adapter(event_handler: Callable):
+        transport = Properties().get(EVENT_CENTER_TRANSPORT) if Properties().has(EVENT_CENTER_TRANSPORT) \
+            else TRANSPORT_HTTP
+        if transport == TRANSPORT_STREAM:
+            # Streaming needs the async http client (optional dependency), only import it if used.
+            from eventcenter.client.stream_adapter import StreamingEventCenterAdapter
+            return StreamingEventCenterAdapter(event_handler)
+        if transport != TRANSPORT_HTTP:
+            raise ValueError(f"Unknown event center transport '{transport}'")
+        return EventCenterAdapter(event_handler)
+
     def disconnect(self):
+        # Send out events queued so far, before shutting down.
+        self.__event_sender.stop()
         self.__event_service_adapter.shutdown()
 
     # @staticmethod
     def __log_message_got_internal_event(self, event: Event):
-        payload = EventRouter.__build_payload(event)
-        message = f"Got internal event '{event.name}'\n{payload}"
         log_level = logging.ERROR if event.name.endswith('_error') else logging.DEBUG
-        EventRouter.__logger.log(log_level, message)
+        if EventRouter.__logger.isEnabledFor(log_level):
+            payload = EventRouter.__build_payload(event)
+            message = f"Got internal event '{event.name}'\n{payload}"
+            EventRouter.__logger.log(log_level, message)
 
-        self.__post_diagnostic_event(RouterEvent.GOT_INTERNAL_EVENT, payload)
+        self.__post_event_diagnostic(RouterEvent.GOT_INTERNAL_EVENT, event)
 
     def __log_message_got_external_event(self, event: Event):
-        payload = EventRouter.__build_payload(event)
-        message = f"Got external event '{event.name}'"
-        try:
-            name = event.payload.get('metadata').get('router')
-            message += f" from router '{name}'"
-        except KeyError:
-            pass
-        message += f"\n{payload}"
-        EventRouter.__logger.debug(message)
+        if EventRouter.__logger.isEnabledFor(logging.DEBUG):
+            payload = EventRouter.__build_payload(event)
+            message = f"Got external event '{event.name}'"
+            try:
+                name = event.payload.get('metadata').get('router')
+                message += f" from router '{name}'"
+            except KeyError:
+                pass
+            message += f"\n{payload}"
+            EventRouter.__logger.debug(message)
 
-        self.__post_diagnostic_event(RouterEvent.GOT_EXTERNAL_EVENT, payload)
+        self.__post_event_diagnostic(RouterEvent.GOT_EXTERNAL_EVENT, event)
 
     def __log_message_not_propagating_event__originated_outside(self, event: Event):
-        message = f"Not propagating event '{event.name}'...originated from outside"
-        EventRouter.__logger.debug(message)
+        if EventRouter.__logger.isEnabledFor(logging.DEBUG):
+            message = f"Not propagating event '{event.name}'...originated from outside"
+            EventRouter.__logger.debug(message)
 
-        self.__post_diagnostic_event(RouterEvent.NOT_PROPAGATING_EXTERNAL_EVENT, EventRouter.__build_payload(event))
+        self.__post_event_diagnostic(RouterEvent.NOT_PROPAGATING_EXTERNAL_EVENT, event)
 
     def __log_message_not_propagating_event__originated_from_router(self, event: Event):
-        message = f"Not propagating event '{event.name}'...originated from router"
-        EventRouter.__logger.debug(message)
+        if EventRouter.__logger.isEnabledFor(logging.DEBUG):
+            message = f"Not propagating event '{event.name}'...originated from router"
+            EventRouter.__logger.debug(message)
 
-        self.__post_diagnostic_event(RouterEvent.NOT_PROPAGATING_INTERNAL_EVENT, EventRouter.__build_payload(event))
+        self.__post_event_diagnostic(RouterEvent.NOT_PROPAGATING_INTERNAL_EVENT, event)
 
     def __log_message_propagating_event(self, event: Event):
-        message = f"Propagating event '{event.name}' to event center"
-        EventRouter.__logger.debug(message)
+        if EventRouter.__logger.isEnabledFor(logging.DEBUG):
+            message = f"Propagating event '{event.name}' to event center"
+            EventRouter.__logger.debug(message)
 
-        self.__post_diagnostic_event(RouterEvent.PROPAGATING_INTERNAL_EVENT, EventRouter.__build_payload(event))
+        self.__post_event_diagnostic(RouterEvent.PROPAGATING_INTERNAL_EVENT, event)
 
     @staticmethod
     def __build_payload(event: Event) -> Union[dict[str, Any], str]:
@@ -189,9 +276,19 @@ class EventRouter(EventMapper):
         # return json.dumps(payload, indent=2) if EventRouter.__pretty_print else payload
 
     def __post_diagnostic_event(self, name: [Union[str, Enum, NamespacedEnum]], payload: dict[str, Any] = None):
+        if not self.__diagnostics.should_post(name):
+            return
+
         # Post message with flag to NOT post event back to event router (since it's the event source).
         post_event(name, payload, self.on_internal_event)
 
+    def __post_event_diagnostic(self, name: [Union[str, Enum, NamespacedEnum]], event: Event):
+        # Only build payload if diagnostic event will be posted.
+        if not self.__diagnostics.should_post(name):
+            return
+
+        post_event(name, EventRouter.__build_payload(event), self.on_internal_event)
+
 
 def post_diagnostic_event(self, name: [Union[str, Enum, NamespacedEnum]], payload: dict[str, Any] = None):
     # Post message with flag to NOT post event back to event router (since it's the event source).
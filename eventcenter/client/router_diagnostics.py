@@ -0,0 +1,82 @@
+import threading
+from collections import Counter
+from enum import Enum
+from typing import Dict, Union
+
+from eventdispatch import Properties
+from eventdispatch.core import NamespacedEnum
+
+from eventcenter.client.router_events import RouterEvent
+
+# Router diagnostics properties.
+ROUTER_DIAGNOSTICS = 'ROUTER_DIAGNOSTICS'
+ROUTER_DIAGNOSTICS_SAMPLE_EVERY = 'ROUTER_DIAGNOSTICS_SAMPLE_EVERY'
+
+# Diagnostics levels.
+DIAGNOSTICS_OFF = 'off'
+DIAGNOSTICS_SAMPLED = 'sampled'
+DIAGNOSTICS_FULL = 'full'
+
+DEFAULT_DIAGNOSTICS = DIAGNOSTICS_FULL
+DEFAULT_SAMPLE_EVERY = 100
+
+# Diagnostic events posted per event handled by router (others, like started/ready, are always posted).
+PER_EVENT_DIAGNOSTICS = {
+    RouterEvent.GOT_INTERNAL_EVENT,
+    RouterEvent.GOT_EXTERNAL_EVENT,
+    RouterEvent.PROPAGATING_INTERNAL_EVENT,
+    RouterEvent.NOT_PROPAGATING_INTERNAL_EVENT,
+    RouterEvent.NOT_PROPAGATING_EXTERNAL_EVENT,
+}
+
+
+class RouterDiagnostics:
+    """
+    PURPOSE:
+    - Counts diagnostic events as they occur (cheap, always on), so visibility is kept even when they're not posted.
+    - Decides which per-event diagnostic events get posted, per level:
+        - full: all of them
+        - sampled: first one, then every Nth one (per diagnostic event)
+        - off: none
+    """
+
+    def __init__(self, level: str = None, sample_every: int = None):
+        if level is None:
+            level = Properties().get(ROUTER_DIAGNOSTICS) if Properties().has(ROUTER_DIAGNOSTICS) \
+                else DEFAULT_DIAGNOSTICS
+        if sample_every is None:
+            sample_every = Properties().get(ROUTER_DIAGNOSTICS_SAMPLE_EVERY) \
+                if Properties().has(ROUTER_DIAGNOSTICS_SAMPLE_EVERY) else DEFAULT_SAMPLE_EVERY
+
+        if level not in [DIAGNOSTICS_OFF, DIAGNOSTICS_SAMPLED, DIAGNOSTICS_FULL]:
+            raise ValueError(f"Unknown router diagnostics level '{level}'")
+
+        self.__level = level
+        self.__sample_every = max(1, int(sample_every))
+        self.__counts = Counter()
+        self.__lock = threading.Lock()
+
+    @property
+    def level(self) -> str:
+        return self.__level
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        with self.__lock:
+            return {RouterDiagnostics.__get_key(name): count for name, count in self.__counts.items()}
+
+    def should_post(self, name: Union[str, Enum, NamespacedEnum]) -> bool:
+        # Count occurrence, and check if it should be posted (as an event).
+        with self.__lock:
+            self.__counts[name] += 1
+            count = self.__counts[name]
+
+        if name not in PER_EVENT_DIAGNOSTICS or self.__level == DIAGNOSTICS_FULL:
+            return True
+        if self.__level == DIAGNOSTICS_OFF:
+            return False
+        return (count - 1) % self.__sample_every == 0
+
+    @staticmethod
+    def __get_key(name: Union[str, Enum, NamespacedEnum]) -> str:
+        return name.value if isinstance(name, Enum) else name
@@ -0,0 +1,263 @@
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Union
+from urllib.parse import urlsplit
+
+from eventdispatch import Properties
+from flask.json.provider import DefaultJSONProvider
+
+# Optional fast json libraries (first one found is used, unless a backend is set via property).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Optional binary formats (offered to the other end, if installed).
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+# Serialization properties.
+JSON_BACKEND = 'JSON_BACKEND'
+WIRE_FORMAT = 'WIRE_FORMAT'
+
+ORJSON = 'orjson'
+UJSON = 'ujson'
+STDLIB_JSON = 'json'
+
+# Wire formats (content types of bodies sent between clients and event center).
+FORMAT_JSON = 'json'
+FORMAT_MSGPACK = 'msgpack'
+FORMAT_CBOR = 'cbor'
+
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_MSGPACK = 'application/msgpack'
+CONTENT_TYPE_CBOR = 'application/cbor'
+
+CONTENT_TYPES = {
+    FORMAT_JSON: CONTENT_TYPE_JSON,
+    FORMAT_MSGPACK: CONTENT_TYPE_MSGPACK,
+    FORMAT_CBOR: CONTENT_TYPE_CBOR
+}
+
+
+class JsonBackend:
+    """
+    PURPOSE:
+    - Wraps a json library behind the same dumps (to bytes) and loads (from bytes or str) functions.
+    """
+
+    def __init__(self, name: str, dumps: Callable[[Any], bytes], loads: Callable[[Union[bytes, str]], Any]):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+
+def _build_backends() -> dict:
+    backends = {
+        STDLIB_JSON: JsonBackend(STDLIB_JSON,
+                                 lambda obj: json.dumps(obj, separators=(',', ':')).encode(),
+                                 json.loads)
+    }
+    if ujson:
+        backends[UJSON] = JsonBackend(UJSON, lambda obj: ujson.dumps(obj).encode(), ujson.loads)
+    if orjson:
+        backends[ORJSON] = JsonBackend(ORJSON, lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+                                       orjson.loads)
+    return backends
+
+
+_backends = _build_backends()
+_backend: JsonBackend = None
+
+
+def get_json_backend() -> JsonBackend:
+    if not _backend:
+        name = Properties().get(JSON_BACKEND) if Properties().has(JSON_BACKEND) else None
+        set_json_backend(name)
+    return _backend
+
+
+def set_json_backend(name: str = None):
+    global _backend
+
+    if name and name not in _backends:
+        logging.getLogger(__name__).warning(f"JSON backend '{name}' is not available, picking fastest available")
+        name = None
+
+    if not name:
+        # Pick fastest available.
+        name = next(backend for backend in [ORJSON, UJSON, STDLIB_JSON] if backend in _backends)
+
+    _backend = _backends[name]
+
+
+def dumps(obj: Any) -> bytes:
+    return get_json_backend().dumps(obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    return get_json_backend().loads(data)
+
+
+class Codec:
+    """
+    PURPOSE:
+    - Wraps a wire format behind the same dumps (to bytes) and loads (from bytes) functions, with its content type.
+    """
+
+    def __init__(self, content_type: str, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+        self.content_type = content_type
+        self.dumps = dumps
+        self.loads = loads
+
+
+def _build_codecs() -> Dict[str, Codec]:
+    # Json goes through the json backend (looked up per call, since backend can be changed).
+    codecs = {
+        CONTENT_TYPE_JSON: Codec(CONTENT_TYPE_JSON, lambda obj: dumps(obj), lambda data: loads(data))
+    }
+    if msgpack:
+        codecs[CONTENT_TYPE_MSGPACK] = Codec(CONTENT_TYPE_MSGPACK, msgpack.packb,
+                                             lambda data: msgpack.unpackb(data, strict_map_key=False))
+    if cbor2:
+        codecs[CONTENT_TYPE_CBOR] = Codec(CONTENT_TYPE_CBOR, cbor2.dumps, cbor2.loads)
+    return codecs
+
+
+_codecs = _build_codecs()
+
+
+def get_codec(content_type: str = None) -> Codec:
+    # Falls back to json for content types not known (or not installed).
+    return _codecs.get(_strip_params(content_type), _codecs[CONTENT_TYPE_JSON])
+
+
+def get_content_types() -> List[str]:
+    return list(_codecs.keys())
+
+
+def encode(obj: Any, content_type: str = CONTENT_TYPE_JSON) -> bytes:
+    return get_codec(content_type).dumps(obj)
+
+
+def decode(data: Union[bytes, str], content_type: str = CONTENT_TYPE_JSON) -> Any:
+    return get_codec(content_type).loads(data)
+
+
+def _strip_params(content_type: str) -> str:
+    # E.g. 'application/json; charset=utf-8' -> 'application/json'
+    return content_type.split(';', 1)[0].strip().lower() if content_type else CONTENT_TYPE_JSON
+
+
+class ContentNegotiator:
+    """
+    PURPOSE:
+    - Agrees on a wire format with each host talked to, so a binary format (MessagePack, CBOR) is used when both
+      ends support it, and json otherwise.
+    - Requests offer formats this end can read (Accept header, preferred one first).  Responses are sent in this
+      end's preferred format (if it has one, and the other end accepts it), or else the first one the other end
+      accepts.
+    - Remembers the format of each host's responses, and sends it requests in that format from then on.  Ends that
+      don't negotiate (e.g. older versions) only ever answer in json, so they keep getting json.
+    """
+
+    def __init__(self, wire_format: str = None):
+        if wire_format is None:
+            wire_format = Properties().get(WIRE_FORMAT) if Properties().has(WIRE_FORMAT) else None
+
+        self.__preferred = CONTENT_TYPES.get(wire_format) if wire_format else None
+        if self.__preferred and self.__preferred not in _codecs:
+            logging.getLogger(__name__).warning(f"Wire format '{wire_format}' is not installed, using json")
+            self.__preferred = None
+
+        offered = [self.__preferred or CONTENT_TYPE_JSON] + get_content_types()
+        self.__accept = ', '.join(dict.fromkeys(offered))
+        self.__content_types: Dict[str, str] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def preferred_content_type(self) -> str:
+        return self.__preferred or CONTENT_TYPE_JSON
+
+    @property
+    def accept(self) -> str:
+        return self.__accept
+
+    def get_content_type(self, url: str) -> str:
+        return self.__content_types.get(ContentNegotiator.__get_key(url), CONTENT_TYPE_JSON)
+
+    def get_headers(self, content_type: str = CONTENT_TYPE_JSON) -> Dict[str, str]:
+        return {'Content-Type': content_type, 'Accept': self.__accept}
+
+    def learn(self, url: str, content_type: str):
+        # Only formats this end can read count (e.g. not an html error page).
+        content_type = _strip_params(content_type)
+        if content_type not in _codecs:
+            return
+
+        key = ContentNegotiator.__get_key(url)
+        if self.__content_types.get(key, CONTENT_TYPE_JSON) != content_type:
+            with self.__lock:
+                self.__content_types[key] = content_type
+
+    def choose_content_type(self, accept: str = None) -> str:
+        # Picks format for a response, per what request accepts.
+        accepted = [_strip_params(content_type) for content_type in accept.split(',')] if accept else []
+        if self.__preferred and self.__preferred in accepted:
+            return self.__preferred
+        return next((content_type for content_type in accepted if content_type in _codecs), CONTENT_TYPE_JSON)
+
+    @staticmethod
+    def __get_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+
+_default_content_negotiator: ContentNegotiator = None
+_default_content_negotiator_lock = threading.Lock()
+
+
+def get_content_negotiator() -> ContentNegotiator:
+    global _default_content_negotiator
+
+    with _default_content_negotiator_lock:
+        if not _default_content_negotiator:
+            _default_content_negotiator = ContentNegotiator()
+        return _default_content_negotiator
+
+
+def set_content_negotiator(negotiator: ContentNegotiator = None):
+    # Replace default negotiator (None to rebuild it from properties on next use).
+    global _default_content_negotiator
+
+    with _default_content_negotiator_lock:
+        _default_content_negotiator = negotiator
+
+
+class JsonProvider(DefaultJSONProvider):
+    """
+    PURPOSE:
+    - Makes flask apps parse requests (request.json) and build json responses with the json backend.
+    - Falls back to flask's default when output is asked to be formatted (e.g. indented).
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs.get('indent') or kwargs.get('sort_keys'):
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return loads(s)
@@ -0,0 +1,321 @@
+import asyncio
+import itertools
+import logging
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from eventdispatch import Event, Properties
+
+from eventcenter.client import serialization
+from eventcenter.client.callback_executor import CallbackExecutor
+from eventcenter.client.event_center_adapter import EVENT_CENTER_BATCH_DELIVERY, EventMappingError, \
+    EventCenterConnectionError
+from eventcenter.client.network import ApiConnectionError
+from eventcenter.server.event_center import RegistrationData, RemoteEventData, EventMappingData, \
+    RemoteEventBatchData
+from eventcenter.server.stream import STREAM_ENDPOINT, STREAM_URL_SCHEME, OP_REGISTER, OP_UNREGISTER, \
+    OP_UNREGISTER_ALL, OP_POST_EVENT, OP_POST_EVENTS, OP_MAP_EVENTS, OP_RESPONSE, OP_DELIVER, DEFAULT_HEARTBEAT_SEC
+
+# Streaming properties.
+EVENT_CENTER_STREAM_ID = 'EVENT_CENTER_STREAM_ID'
+EVENT_CENTER_STREAM_CONNECT_TIMEOUT_SEC = 'EVENT_CENTER_STREAM_CONNECT_TIMEOUT_SEC'
+EVENT_CENTER_STREAM_REQUEST_TIMEOUT_SEC = 'EVENT_CENTER_STREAM_REQUEST_TIMEOUT_SEC'
+EVENT_CENTER_STREAM_RECONNECT_SEC = 'EVENT_CENTER_STREAM_RECONNECT_SEC'
+
+DEFAULT_CONNECT_TIMEOUT_SEC = 2.0
+DEFAULT_REQUEST_TIMEOUT_SEC = 10.0
+DEFAULT_RECONNECT_SEC = 1.0
+
+
+class StreamingEventCenterAdapter:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Same as EventCenterAdapter, but talks to the (async) event center over one long-lived stream (websocket):
+      registrations, posted events and deliveries are all frames on it.
+    - Client doesn't run a callback server (nor needs to be reachable), and each event costs a frame write instead
+      of an http request.
+    - Keeps the connection up: reconnects when it drops, and re-registers (event center drops a stream's
+      registrations when it disconnects).
+    - Runs the connection on its own event loop thread, so it can be called from any thread.
+    """
+
+    def __init__(self, event_handler: Callable[[RemoteEventData], None]):
+        self.event_handler = event_handler
+        self.event_center_url = Properties().get('EVENT_CENTER_URL')
+
+        stream_id = Properties().get(EVENT_CENTER_STREAM_ID) if Properties().has(EVENT_CENTER_STREAM_ID) \
+            else uuid.uuid4().hex
+        self.url = f'{STREAM_URL_SCHEME}{stream_id}'
+        self.callback_url = self.url
+        self.stream_url = self.event_center_url.replace('http', 'ws', 1) + f'{STREAM_ENDPOINT}?id={stream_id}'
+
+        # No callback server (events come in over the stream).
+        self.app = None
+
+        # Ask event center to deliver events in batches (when it has several queued for this adapter).
+        self.is_batch_delivery = Properties().has(EVENT_CENTER_BATCH_DELIVERY) and \
+            Properties().get(EVENT_CENTER_BATCH_DELIVERY) == True
+
+        self.__connect_timeout_sec = float(StreamingEventCenterAdapter.__get_property(
+            EVENT_CENTER_STREAM_CONNECT_TIMEOUT_SEC, DEFAULT_CONNECT_TIMEOUT_SEC))
+        self.__request_timeout_sec = float(StreamingEventCenterAdapter.__get_property(
+            EVENT_CENTER_STREAM_REQUEST_TIMEOUT_SEC, DEFAULT_REQUEST_TIMEOUT_SEC))
+        self.__reconnect_sec = float(StreamingEventCenterAdapter.__get_property(
+            EVENT_CENTER_STREAM_RECONNECT_SEC, DEFAULT_RECONNECT_SEC))
+
+        # Hand received events to event handler with a bounded pool of workers (in order, per channel).
+        self.__callback_executor = CallbackExecutor(self.event_handler)
+
+        # Registrations made (in order), to replay when reconnecting.
+        self.__registrations: List[Tuple[str, List[str], str]] = []
+        self.__registrations_lock = threading.Lock()
+
+        self.__request_ids = itertools.count(1)
+        self.__responses: Dict[int, asyncio.Future] = {}
+        self.__ws: aiohttp.ClientWebSocketResponse = None
+        self.__is_stopped = False
+
+        self.__loop = asyncio.new_event_loop()
+        self.__connected = asyncio.Event()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, name='EventCenterStream', daemon=True)
+        self.__thread.start()
+        self.__connection: asyncio.Task = None
+        self.__loop.call_soon_threadsafe(self.__start)
+
+        # Give connection a chance to come up (keeps trying in the background if it doesn't).
+        self.wait_until_connected(self.__connect_timeout_sec)
+
+    @property
+    def is_connected(self) -> bool:
+        return self.__connected.is_set()
+
+    @property
+    def callback_stats(self) -> dict:
+        return self.__callback_executor.stats
+
+    def wait_until_connected(self, timeout_sec: float = None) -> bool:
+        future = asyncio.run_coroutine_threadsafe(self.__wait_until_connected(timeout_sec), self.__loop)
+        return future.result()
+
+    def register(self, events: [str], channel: str = ''):
+        self.__register(events, channel, is_register=True)
+
+    def unregister(self, events: [str], channel: str = ''):
+        self.__register(events, channel, is_register=False)
+
+    def unregister_all(self, is_suppress_connection_error: bool = True):
+        with self.__registrations_lock:
+            self.__registrations = []
+        self.__request(OP_UNREGISTER_ALL, {}, is_suppress_connection_error)
+
+    def post_event(self, event: Event, channel: str = '', is_suppress_connection_error: bool = True):
+        self.__set_sender(event)
+        data = RemoteEventData(channel, event)
+        self.__send(OP_POST_EVENT, data.dict, is_suppress_connection_error)
+
+    def post_events(self, events: [Event], channel: str = '', is_suppress_connection_error: bool = True):
+        remote_events = []
+        for event in events:
+            self.__set_sender(event)
+            remote_events.append(RemoteEventData(channel, event))
+
+        data = RemoteEventBatchData(remote_events)
+        self.__send(OP_POST_EVENTS, data.dict, is_suppress_connection_error)
+
+    def map_events(self, events_to_map: [Event], event_to_post: Event, ignore_if_exists: bool = False,
+                   channel: str = '') -> str:
+        data = EventMappingData(channel, events_to_map, event_to_post, ignore_if_exists)
+        response = self.__request(OP_MAP_EVENTS, data.dict, is_suppress_connection_error=True)
+
+        if not response:
+            StreamingEventCenterAdapter.__log_message_no_response()
+            raise EventCenterConnectionError()
+
+        if response.get('success', 'false') == 'true':
+            StreamingEventCenterAdapter.__log_message_map_events_succeeded(data)
+            return response['event_map_key']
+        else:
+            error = response.get('error', '(no error message provided')
+            raise EventMappingError(error)
+
+    def shutdown(self):
+        if self.__is_stopped:
+            return
+
+        self.__is_stopped = True
+        try:
+            asyncio.run_coroutine_threadsafe(self.__close(), self.__loop).result(self.__request_timeout_sec)
+        except Exception as e:
+            self.__logger.warning(f'Closing stream failed: {e}')
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join(self.__request_timeout_sec)
+        self.__callback_executor.shutdown(wait=False)
+
+    def __register(self, events: [str], channel: str, is_register: bool = True):
+        with self.__registrations_lock:
+            if is_register:
+                self.__registrations.append((OP_REGISTER, events, channel))
+            elif (OP_REGISTER, events, channel) in self.__registrations:
+                # Cancels out earlier registration (nothing to replay).
+                self.__registrations.remove((OP_REGISTER, events, channel))
+            else:
+                self.__registrations.append((OP_UNREGISTER, events, channel))
+
+        op = OP_REGISTER if is_register else OP_UNREGISTER
+        data = RegistrationData(self.callback_url, events, channel, self.is_batch_delivery)
+        self.__request(op, data.dict, is_suppress_connection_error=True)
+
+    def __send(self, op: str, data: Dict[str, Any], is_suppress_connection_error: bool):
+        # Waits for frame to be written (so caller knows it's sent, and sends from one thread stay in order).
+        future = asyncio.run_coroutine_threadsafe(self.__send_frame({'op': op, 'data': data}), self.__loop)
+        try:
+            future.result(self.__request_timeout_sec)
+        except Exception:
+            if not is_suppress_connection_error:
+                raise ApiConnectionError(self.stream_url, None, data)
+
+    def __request(self, op: str, data: Dict[str, Any], is_suppress_connection_error: bool) -> Optional[Any]:
+        # Sends frame and waits for event center's response to it.
+        future = asyncio.run_coroutine_threadsafe(self.__call(op, data), self.__loop)
+        try:
+            return future.result(self.__request_timeout_sec)
+        except Exception:
+            if not is_suppress_connection_error:
+                raise ApiConnectionError(self.stream_url, None, data)
+            return None
+
+    async def __call(self, op: str, data: Dict[str, Any]) -> Any:
+        request_id = next(self.__request_ids)
+        response = self.__loop.create_future()
+        self.__responses[request_id] = response
+        try:
+            await self.__send_frame({'op': op, 'id': request_id, 'data': data})
+            return await asyncio.wait_for(response, self.__request_timeout_sec)
+        finally:
+            self.__responses.pop(request_id, None)
+
+    async def __send_frame(self, frame: Dict[str, Any]):
+        if not await self.__wait_until_connected(self.__connect_timeout_sec):
+            raise ConnectionError(f"Not connected to '{self.stream_url}'")
+        await self.__ws.send_bytes(serialization.dumps(frame))
+
+    async def __wait_until_connected(self, timeout_sec: float = None) -> bool:
+        try:
+            await asyncio.wait_for(self.__connected.wait(), timeout_sec)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def __start(self):
+        self.__connection = self.__loop.create_task(self.__run())
+
+    async def __run(self):
+        heartbeat_sec = DEFAULT_HEARTBEAT_SEC
+        async with aiohttp.ClientSession() as session:
+            while not self.__is_stopped:
+                try:
+                    async with session.ws_connect(self.stream_url, heartbeat=heartbeat_sec) as ws:
+                        self.__ws = ws
+                        await self.__replay_registrations()
+                        self.__connected.set()
+                        self.__log_message_connected()
+
+                        async for message in ws:
+                            if message.type in [aiohttp.WSMsgType.BINARY, aiohttp.WSMsgType.TEXT]:
+                                self.__on_frame(serialization.loads(message.data))
+                except (aiohttp.ClientError, OSError) as e:
+                    self.__log_message_connect_failed(e)
+                finally:
+                    self.__on_disconnected()
+
+                if not self.__is_stopped:
+                    await asyncio.sleep(self.__reconnect_sec)
+
+    async def __replay_registrations(self):
+        # Sent without waiting for responses (event center handles frames in order, before any sent after them).
+        with self.__registrations_lock:
+            registrations = list(self.__registrations)
+        for op, events, channel in registrations:
+            data = RegistrationData(self.callback_url, events, channel, self.is_batch_delivery)
+            await self.__ws.send_bytes(serialization.dumps({'op': op, 'data': data.dict}))
+
+    def __on_frame(self, frame: Dict[str, Any]):
+        op = frame.get('op')
+        if op == OP_DELIVER:
+            body = frame['body']
+
+            # Check if got a batch of events (if registered for batch delivery).
+            if 'remote_events' in body:
+                remote_events = RemoteEventBatchData.from_dict(body).remote_events
+            else:
+                remote_events = [RemoteEventData.from_dict(body)]
+
+            # Blocking here (if handling is behind, with block policy) stops reading from the stream, which pushes
+            # back on the event center.
+            items = [(remote_event.channel, remote_event) for remote_event in remote_events]
+            if not self.__callback_executor.submit_all(items):
+                self.__log_message_dropped(len(items))
+
+        elif op == OP_RESPONSE:
+            response = self.__responses.get(frame.get('id'))
+            if response and not response.done():
+                response.set_result(frame.get('data'))
+
+    def __on_disconnected(self):
+        self.__ws = None
+        if self.__connected.is_set():
+            self.__connected.clear()
+            self.__log_message_disconnected()
+
+        # Responses to requests made will never come.
+        for response in self.__responses.values():
+            if not response.done():
+                response.set_exception(ConnectionError(f"Disconnected from '{self.stream_url}'"))
+
+    async def __close(self):
+        # Closing stream ends connection (not reconnected, since stopped), otherwise stop it trying to connect.
+        if self.__ws:
+            await self.__ws.close()
+        else:
+            self.__connection.cancel()
+        try:
+            await self.__connection
+        except asyncio.CancelledError:
+            pass
+
+    def __set_sender(self, event: Event):
+        sender = f'{self.url}'
+        try:
+            metadata = event.payload['metadata']
+            metadata['sender_url'] = sender
+        except KeyError:
+            event.payload['metadata'] = {'sender_url': sender}
+
+    def __log_message_connected(self):
+        self.__logger.info(f"Connected stream to event center '{self.stream_url}'")
+
+    def __log_message_disconnected(self):
+        self.__logger.warning(f"Stream to event center disconnected '{self.stream_url}'")
+
+    def __log_message_connect_failed(self, e: Exception):
+        self.__logger.debug(f"Could not connect stream to event center '{self.stream_url}': {e}")
+
+    def __log_message_dropped(self, count: int):
+        self.__logger.warning(f'Callback queue full, dropped {count} event(s) received over stream')
+
+    @staticmethod
+    def __log_message_map_events_succeeded(event_mapping_data: EventMappingData):
+        logging.getLogger().debug(f"Mapped events\n{event_mapping_data.dict}")
+
+    @staticmethod
+    def __log_message_no_response():
+        logging.getLogger().error(f'No response after API call to Event Center. Make sure Event Center is running '
+                                  f'and connectivity information provided is correct.')
+
+    @staticmethod
+    def __get_property(name: str, default: Any) -> Any:
+        return Properties().get(name) if Properties().has(name) else default
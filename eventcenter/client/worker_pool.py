@@ -0,0 +1,65 @@
+import logging
+import queue
+import threading
+from typing import Callable, List
+
+
+class WorkerPool:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Runs submitted work on a bounded number of threads (started as needed, then reused).
+    - Keeps taking work after the main thread is done (unlike concurrent.futures pools, which stop at interpreter
+      shutdown), since apps often start their servers and let the main thread finish.
+    """
+
+    def __init__(self, max_workers: int, name: str = 'worker'):
+        self.__max_workers = max(1, max_workers)
+        self.__name = name
+
+        self.__queue = queue.SimpleQueue()
+        self.__threads: List[threading.Thread] = []
+        self.__idle = threading.Semaphore(0)
+        self.__lock = threading.Lock()
+        self.__is_shutdown = False
+
+    def submit(self, work: Callable, *args):
+        if self.__is_shutdown:
+            raise RuntimeError('Cannot submit work after worker pool is shut down')
+
+        self.__queue.put((work, args))
+
+        # Use an idle worker if there is one, otherwise start a new one (up to max).
+        if self.__idle.acquire(blocking=False):
+            return
+        with self.__lock:
+            if len(self.__threads) < self.__max_workers:
+                thread = threading.Thread(target=self.__run, name=f'{self.__name}_{len(self.__threads)}', daemon=True)
+                self.__threads.append(thread)
+                thread.start()
+
+    def shutdown(self, wait: bool = True):
+        # Work already submitted is still done.
+        with self.__lock:
+            self.__is_shutdown = True
+            threads = list(self.__threads)
+        for _ in threads:
+            self.__queue.put(None)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def __run(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+
+            work, args = item
+            try:
+                work(*args)
+            except Exception as e:
+                self.__logger.exception(f'Work failed: {e}')
+            self.__idle.release()
@@ -0,0 +1,18 @@
+import os
+
+# Gunicorn settings for running event center in production (multi-worker, multi-threaded) mode:
+#   PYTHONPATH=../ gunicorn -c gunicorn_conf.py eventcenter.app_event_center:app
+#
+# Each worker is a separate process with its own registrations, kept in sync through the shared registrants
+# journal (see app_event_center.py).  App is loaded per worker (not preloaded), since it starts threads.
+
+port = int(os.environ.get('EC_PORT', 6000))
+
+bind = f'0.0.0.0:{port}'
+workers = int(os.environ.get('EC_WORKERS', 1))
+threads = int(os.environ.get('EC_THREADS', 8))
+worker_class = 'gthread'
+preload_app = False
+
+# Clients hold connections open (keep-alive), give them time to send their next event.
+keepalive = int(os.environ.get('EC_KEEPALIVE_SEC', 5))
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List
+
+import aiohttp
+from eventdispatch import Properties
+
+from eventcenter.client import serialization
+from eventcenter.client.compression import get_compressor
+from eventcenter.client.network import ApiConnectionError, HEADERS
+from eventcenter.server.delivery import DELIVERY_MAX_BATCH_SIZE, DEFAULT_MAX_BATCH_SIZE
+from eventcenter.server.stream import STREAM_URL_SCHEME, DELIVER_FRAME_PREFIX, DELIVER_FRAME_SUFFIX
+
+# Async delivery properties (batch size is shared with DeliveryEngine).
+ASYNC_DELIVERY_MAX_CONCURRENCY = 'ASYNC_DELIVERY_MAX_CONCURRENCY'
+
+DEFAULT_MAX_CONCURRENCY = 10000
+
+
+class AsyncDeliveryEngine:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Same as DeliveryEngine (queues per destination, in order, optional batching), but delivers from an event loop
+      with an async http client, instead of from worker threads.
+    - Holds many concurrent deliveries (one task per busy destination, bounded by a max concurrency), without a
+      thread per delivery.
+    - Accepts deliveries from any thread (handed to event loop), since event dispatch can call from other threads.
+    - Writes deliveries for streaming clients (callback url is a stream url) to their stream, instead of posting.
+    """
+
+    # Deliveries are coroutine functions (run on event loop).
+    is_async = True
+
+    def __init__(self, max_concurrency: int = None, max_batch_size: int = None):
+        if max_concurrency is None:
+            max_concurrency = Properties().get(ASYNC_DELIVERY_MAX_CONCURRENCY) \
+                if Properties().has(ASYNC_DELIVERY_MAX_CONCURRENCY) else DEFAULT_MAX_CONCURRENCY
+        if max_batch_size is None:
+            max_batch_size = Properties().get(DELIVERY_MAX_BATCH_SIZE) if Properties().has(DELIVERY_MAX_BATCH_SIZE) \
+                else DEFAULT_MAX_BATCH_SIZE
+
+        self.__max_concurrency = int(max_concurrency)
+        self.__max_batch_size = max(1, int(max_batch_size))
+
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__session: aiohttp.ClientSession = None
+        self.__semaphore: asyncio.Semaphore = None
+        self.__queues: Dict[str, deque] = {}
+        self.__open_batches: Dict[str, List[Any]] = {}
+        self.__idle: asyncio.Event = None
+
+        # Send functions of connected streaming clients (by their callback url).
+        self.__streams: Dict[str, Callable[[bytes], Awaitable[None]]] = {}
+
+    @property
+    def in_flight_count(self) -> int:
+        return len(self.__queues)
+
+    async def start(self):
+        # Bind to running loop (deliveries run on it).
+        self.__loop = asyncio.get_running_loop()
+        self.__semaphore = asyncio.Semaphore(self.__max_concurrency)
+        self.__idle = asyncio.Event()
+        self.__idle.set()
+
+        connector = aiohttp.TCPConnector(limit=self.__max_concurrency, limit_per_host=0)
+        self.__session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self.__session:
+            await self.__session.close()
+            self.__session = None
+
+    def submit(self, destination: str, delivery: Callable[[], Awaitable[None]]):
+        self.__call_in_loop(self.__submit, destination, delivery)
+
+    def submit_batched(self, destination: str, item: Any, send_batch: Callable[[List[Any]], Awaitable[None]]):
+        self.__call_in_loop(self.__submit_batched, destination, item, send_batch)
+
+    def submit_later(self, destination: str, delay_sec: float, delivery: Callable[[], Awaitable[None]]):
+        # Queue delivery once delay is up (e.g. a retry after a backoff).
+        self.__call_in_loop(self.__loop.call_later, delay_sec, self.__submit, destination, delivery)
+
+    def add_stream(self, url: str, send: Callable[[bytes], Awaitable[None]]):
+        # Replaces any earlier stream of client (e.g. it reconnected).
+        self.__streams[url] = send
+
+    def remove_stream(self, url: str, send: Callable[[bytes], Awaitable[None]]) -> bool:
+        # Only removes given stream (not one that replaced it).
+        if self.__streams.get(url) is not send:
+            return False
+        del self.__streams[url]
+        return True
+
+    async def post(self, url: str, data: Any = None, json: Any = None, headers: Dict[str, str] = None,
+                   timeout_sec: float = None) -> int:
+        # Streams carry json frames, so only negotiate format for posts.
+        if url.startswith(STREAM_URL_SCHEME):
+            body = serialization.dumps(json) if json is not None else data
+            return await self.__write_to_stream(url, body, data, json)
+
+        negotiator = serialization.get_content_negotiator()
+        compressor = get_compressor()
+        if json is not None:
+            content_type = negotiator.get_content_type(url)
+            body, headers = compressor.compress_request(url, serialization.encode(json, content_type),
+                                                        negotiator.get_headers(content_type))
+        else:
+            body, headers = data, headers if headers else HEADERS
+
+        try:
+            async with self.__semaphore:
+                async with self.__session.post(url, data=body, headers=headers,
+                                               timeout=aiohttp.ClientTimeout(total=timeout_sec)) as response:
+                    await response.read()
+                    negotiator.learn(url, response.headers.get('Content-Type'))
+                    compressor.learn(url, response.headers.get('Accept-Encoding'))
+                    return response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            raise ApiConnectionError(url, data, json)
+
+    def run_blocking(self, work: Callable[[], None]):
+        # Run work that blocks (e.g. on disk) off the event loop.
+        self.__loop.run_in_executor(None, work)
+
+    def queue_depth(self, destination: str) -> int:
+        queue = self.__queues.get(destination)
+        return len(queue) if queue else 0
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {destination: len(queue) for destination, queue in self.__queues.items()}
+
+    async def wait_until_idle(self, timeout_sec: float = None) -> bool:
+        try:
+            await asyncio.wait_for(self.__idle.wait(), timeout_sec)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def __write_to_stream(self, url: str, body: bytes, data: Any, json: Any) -> int:
+        send = self.__streams.get(url)
+        if not send:
+            # Client isn't connected (same as an unreachable callback url).
+            raise ApiConnectionError(url, data, json)
+
+        try:
+            # Wrap body in a deliver frame (as bytes, no need to decode body).
+            await send(DELIVER_FRAME_PREFIX + body + DELIVER_FRAME_SUFFIX)
+            return 200
+        except (ConnectionError, RuntimeError):
+            raise ApiConnectionError(url, data, json)
+
+    def __call_in_loop(self, function: Callable, *args):
+        try:
+            is_in_loop = asyncio.get_running_loop() is self.__loop
+        except RuntimeError:
+            is_in_loop = False
+
+        if is_in_loop:
+            function(*args)
+        else:
+            self.__loop.call_soon_threadsafe(function, *args)
+
+    def __submit(self, destination: str, delivery: Callable[[], Awaitable[None]]):
+        queue = self.__queues.get(destination)
+        if queue is not None:
+            # Destination is already being drained, which will pick up this delivery.
+            queue.append(delivery)
+            return
+
+        self.__queues[destination] = deque([delivery])
+        self.__idle.clear()
+        self.__loop.create_task(self.__drain(destination))
+
+    def __submit_batched(self, destination: str, item: Any, send_batch: Callable[[List[Any]], Awaitable[None]]):
+        # Add to destination's open batch (one that is queued, but not yet being sent), if there's room.
+        batch = self.__open_batches.get(destination)
+        if batch is not None and len(batch) < self.__max_batch_size:
+            batch.append(item)
+            return
+
+        batch = [item]
+        self.__open_batches[destination] = batch
+        self.__submit(destination, lambda: self.__send_batch(destination, batch, send_batch))
+
+    async def __drain(self, destination: str):
+        queue = self.__queues[destination]
+        while queue:
+            delivery = queue[0]
+            try:
+                await delivery()
+            except Exception as e:
+                self.__logger.exception(f"Delivery to '{destination}' failed: {e}")
+            queue.popleft()
+
+        # Nothing left for destination, release it (next submit will start a new drain).
+        del self.__queues[destination]
+        if not self.__queues:
+            self.__idle.set()
+
+    async def __send_batch(self, destination: str, batch: List[Any],
+                           send_batch: Callable[[List[Any]], Awaitable[None]]):
+        # Close batch, so items submitted from now on go into a new batch.
+        if self.__open_batches.get(destination) is batch:
+            del self.__open_batches[destination]
+
+        await send_batch(batch)
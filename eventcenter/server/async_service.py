@@ -0,0 +1,372 @@
+import asyncio
+import logging
+import threading
+import uuid
+from typing import Any, Callable, Dict
+
+from aiohttp import web, WSMsgType
+from eventdispatch import Properties, post_event
+from eventdispatch.core import DuplicateMappingError, InvalidMappingEventsError
+
+from eventcenter.client import serialization
+from eventcenter.client.compression import get_compressor, decompress
+from eventcenter.server.async_delivery import AsyncDeliveryEngine
+from eventcenter.server.cluster import Cluster, MEMBERS_ENDPOINT, get_cluster
+from eventcenter.server.delivery import set_delivery_engine
+from eventcenter.server.event_center import EventRegistrationManager, RegistrationData, RemoteEventData, \
+    EventMappingData, RemoteEventBatchData, ReplayRequestData
+from eventcenter.server.metrics import METRICS_ENDPOINT, CONTENT_TYPE_PROMETHEUS
+from eventcenter.server.service import ECEvent, RESPONSE_OK, RESPONSE_ERROR
+from eventcenter.server.stream import STREAM_ENDPOINT, STREAM_URL_SCHEME, OP_REGISTER, OP_UNREGISTER, \
+    OP_UNREGISTER_ALL, OP_POST_EVENT, OP_POST_EVENTS, OP_MAP_EVENTS, OP_RESPONSE, DEFAULT_HEARTBEAT_SEC
+
+# Streaming properties.
+STREAM_HEARTBEAT_SEC = 'STREAM_HEARTBEAT_SEC'
+
+
+class AsyncEventCenterService:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Same REST API as EventCenterService (so existing clients work unchanged), served from an asyncio event loop.
+    - Delivers events to registrants with an async delivery engine, so many deliveries can be in flight at once
+      on a single thread.
+    - Keeps blocking work (registration changes, which persist registrants to disk) off the event loop.
+    - Also serves clients over a stream (websocket), with registrations, posted events and deliveries all going
+      over the one connection (so clients don't need to be reachable, or run a callback server).
+    - In a cluster, forwards requests for a channel to node owning it (stream clients are served by node they're
+      connected to).
+    """
+
+    def __init__(self, host: str = '0.0.0.0', port: int = None):
+        self.__host = host
+        self.__port = port if port is not None else Properties().get('EVENT_CENTER_PORT')
+        self.__is_allow_cors = Properties().has('ALLOW_CORS') and Properties().get('ALLOW_CORS') == True
+
+        self.__delivery_engine = AsyncDeliveryEngine()
+        self.__event_registration_manager: EventRegistrationManager = None
+        self.__cluster: Cluster = None
+        self.__runner: web.AppRunner = None
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__stopped: asyncio.Event = None
+
+        self.app = web.Application()
+        self.app.on_startup.append(self.__on_startup)
+        self.app.on_cleanup.append(self.__on_cleanup)
+        self.app.add_routes([
+            web.get('/ping', self.__ping),
+            web.post('/register', self.__register),
+            web.post('/unregister', self.__unregister),
+            web.post('/unregister_all', self.__unregister_all),
+            web.post('/post_event', self.__post),
+            web.post('/post_events', self.__post_batch),
+            web.post('/replay', self.__replay),
+            web.post('/map_events', self.__map_events),
+            web.get('/event_maps', self.__event_maps),
+            web.get('/registrants', self.__get_registrants),
+            web.get(METRICS_ENDPOINT, self.__get_metrics),
+            web.get(MEMBERS_ENDPOINT, self.__get_cluster_members),
+            web.post(MEMBERS_ENDPOINT, self.__on_cluster_members),
+            web.get('/shutdown', self.__shutdown),
+            web.get(STREAM_ENDPOINT, self.__stream),
+        ])
+
+    @property
+    def port(self) -> int:
+        return self.__port
+
+    @property
+    def delivery_engine(self) -> AsyncDeliveryEngine:
+        return self.__delivery_engine
+
+    @property
+    def event_registration_manager(self) -> EventRegistrationManager:
+        return self.__event_registration_manager
+
+    def run(self):
+        # Serve until shut down (blocks).
+        asyncio.run(self.serve())
+
+    async def serve(self, is_started: threading.Event = None):
+        await self.start()
+        if is_started:
+            is_started.set()
+        await self.__stopped.wait()
+        await self.stop()
+
+    async def start(self):
+        self.__loop = asyncio.get_running_loop()
+        self.__stopped = asyncio.Event()
+        # Bodies are decompressed here (aiohttp only decodes some encodings, depending on its version).
+        self.__runner = web.AppRunner(self.app, access_log=None, auto_decompress=False)
+        await self.__runner.setup()
+        await web.TCPSite(self.__runner, self.__host, self.__port).start()
+        post_event(ECEvent.STARTED, {})
+
+    async def stop(self):
+        if self.__runner:
+            await self.__runner.cleanup()
+            self.__runner = None
+            post_event(ECEvent.STOPPED)
+
+    def shutdown(self):
+        # Can be called from any thread.
+        if self.__loop:
+            self.__loop.call_soon_threadsafe(self.__stopped.set)
+
+    async def __on_startup(self, _app: web.Application):
+        await self.__delivery_engine.start()
+
+        # Registrations (made from here on) deliver through the async engine.
+        set_delivery_engine(self.__delivery_engine)
+
+        # Loading registrants reads from disk, keep that off the event loop.
+        self.__event_registration_manager = await self.__run_blocking(EventRegistrationManager)
+
+        # Join cluster (if in one).  Registrations for channels that move to another node are handed over to it.
+        self.__cluster = get_cluster()
+        self.__cluster.start(on_change=lambda: self.__event_registration_manager.hand_over(self.__cluster))
+
+    async def __on_cleanup(self, _app: web.Application):
+        await self.__delivery_engine.wait_until_idle(timeout_sec=5.0)
+        await self.__delivery_engine.close()
+        if self.__cluster:
+            await self.__run_blocking(self.__cluster.stop)
+        if self.__event_registration_manager:
+            await self.__run_blocking(self.__event_registration_manager.close)
+        set_delivery_engine(None)
+
+    async def __ping(self, request: web.Request) -> web.Response:
+        return self.__make_response(request, RESPONSE_OK)
+
+    async def __register(self, request: web.Request) -> web.Response:
+        registration_data = RegistrationData.from_dict(await self.__read_body(request))
+        forwarded = await self.__forward(request, registration_data.channel, registration_data.dict)
+        if forwarded is not None:
+            return self.__make_response(request, forwarded)
+
+        await self.__run_blocking(self.__event_registration_manager.register, registration_data)
+        return self.__make_response(request, RESPONSE_OK)
+
+    async def __unregister(self, request: web.Request) -> web.Response:
+        registration_data = RegistrationData.from_dict(await self.__read_body(request))
+        forwarded = await self.__forward(request, registration_data.channel, registration_data.dict)
+        if forwarded is not None:
+            return self.__make_response(request, forwarded)
+
+        await self.__run_blocking(self.__event_registration_manager.unregister, registration_data)
+        return self.__make_response(request, RESPONSE_OK)
+
+    async def __unregister_all(self, request: web.Request) -> web.Response:
+        callback_url = (await self.__read_body(request)).get('callback_url', '')
+        if not callback_url:
+            return self.__make_response(request, dict(RESPONSE_ERROR, error='Missing callback url'))
+
+        await self.__run_blocking(self.__event_registration_manager.unregister_all, callback_url)
+
+        # Client may have registrations on any node.
+        if self.__cluster.is_enabled and not Cluster.is_forwarded(request.headers):
+            await self.__run_blocking(self.__cluster.broadcast, '/unregister_all', {'callback_url': callback_url})
+        return self.__make_response(request, RESPONSE_OK)
+
+    async def __post(self, request: web.Request) -> web.Response:
+        # Dispatch on loop (deliveries are only queued to the async engine, and logging to replay log is a write to
+        # memory, nothing here blocks).
+        remote_event_data = RemoteEventData.from_dict(await self.__read_body(request))
+        forwarded = await self.__forward(request, remote_event_data.channel, remote_event_data.dict)
+        if forwarded is not None:
+            return self.__make_response(request, forwarded)
+
+        self.__event_registration_manager.post(remote_event_data)
+        return self.__make_response(request, RESPONSE_OK)
+
+    async def __post_batch(self, request: web.Request) -> web.Response:
+        remote_event_batch_data = RemoteEventBatchData.from_dict(await self.__read_body(request))
+
+        # Batch may hold events for channels owned by different nodes, each node gets its share (all at once).
+        calls = []
+        for node, remote_events in self.__cluster.route_all(remote_event_batch_data.remote_events,
+                                                            lambda remote_event: remote_event.channel,
+                                                            Cluster.is_forwarded(request.headers)):
+            if node is None:
+                self.__event_registration_manager.post_batch(RemoteEventBatchData(remote_events))
+                continue
+            calls.append(self.__run_blocking(self.__cluster.forward, node, request.path,
+                                             RemoteEventBatchData(remote_events).dict))
+
+        failed = [forwarded for forwarded in await asyncio.gather(*calls) if forwarded.get('success') != 'true']
+        return self.__make_response(request, failed[0] if failed else RESPONSE_OK)
+
+    async def __replay(self, request: web.Request) -> web.Response:
+        # Reads from disk, keep that off the event loop.
+        try:
+            replay_request_data = ReplayRequestData.from_dict(await self.__read_body(request))
+        except ValueError as e:
+            return self.__make_response(request, dict(RESPONSE_ERROR, error=str(e)), 400)
+        forwarded = await self.__forward(request, replay_request_data.channel, replay_request_data.dict)
+        if forwarded is not None:
+            return self.__make_response(request, forwarded)
+
+        response = await self.__run_blocking(self.__event_registration_manager.replay, replay_request_data)
+        response.update(RESPONSE_OK)
+        return self.__make_response(request, response)
+
+    async def __map_events(self, request: web.Request) -> web.Response:
+        event_mapping_data = EventMappingData.from_dict(await self.__read_body(request))
+        forwarded = await self.__forward(request, event_mapping_data.channel, event_mapping_data.dict)
+        if forwarded is not None:
+            return self.__make_response(request, forwarded)
+
+        try:
+            response = {
+                'event_map_key': self.__event_registration_manager.map_events(event_mapping_data)
+            }
+            response.update(RESPONSE_OK)
+            return self.__make_response(request, response)
+        except (InvalidMappingEventsError, DuplicateMappingError) as e:
+            return self.__make_response(request, dict(RESPONSE_ERROR, error=e.message))
+
+    async def __event_maps(self, request: web.Request) -> web.Response:
+        channel = (await self.__read_body(request))['channel']
+        forwarded = await self.__forward(request, channel, {'channel': channel})
+        if forwarded is not None:
+            return self.__make_response(request, forwarded)
+
+        maps = self.__event_registration_manager.get_event_maps(channel)
+        response = {
+            'channel': channel,
+            'event_maps': self.__event_registration_manager.pack_event_maps(maps)
+        }
+        response.update(RESPONSE_OK)
+        return self.__make_response(request, response)
+
+    async def __get_registrants(self, request: web.Request) -> web.Response:
+        response = await self.__run_blocking(self.__event_registration_manager.pack_registrants)
+        response['circuit_breakers'] = self.__event_registration_manager.pack_circuit_breakers()
+        response.update(RESPONSE_OK)
+        return self.__make_response(request, response)
+
+    async def __get_metrics(self, request: web.Request) -> web.Response:
+        # Read on event loop (async delivery engine's queues are only touched from it).
+        body, headers = get_compressor().compress_response(
+            self.__event_registration_manager.export_metrics().encode(), request.headers.get('Accept-Encoding'))
+        headers['Content-Type'] = CONTENT_TYPE_PROMETHEUS
+        return web.Response(body=body, headers=headers)
+
+    async def __get_cluster_members(self, request: web.Request) -> web.Response:
+        return self.__make_response(request, dict(self.__cluster.stats, **RESPONSE_OK))
+
+    async def __on_cluster_members(self, request: web.Request) -> web.Response:
+        # Other nodes join, and send heartbeats, here.
+        response = self.__cluster.on_members_message(await self.__read_body(request))
+        return self.__make_response(request, dict(response, **RESPONSE_OK))
+
+    async def __shutdown(self, request: web.Request) -> web.Response:
+        self.__stopped.set()
+        return self.__make_response(request, RESPONSE_OK)
+
+    async def __stream(self, request: web.Request) -> web.WebSocketResponse:
+        heartbeat_sec = Properties().get(STREAM_HEARTBEAT_SEC) if Properties().has(STREAM_HEARTBEAT_SEC) \
+            else DEFAULT_HEARTBEAT_SEC
+        ws = web.WebSocketResponse(heartbeat=float(heartbeat_sec))
+        await ws.prepare(request)
+
+        # Client is registered (and delivered to) by its stream url.
+        callback_url = STREAM_URL_SCHEME + request.query.get('id', uuid.uuid4().hex)
+        send = ws.send_bytes
+        self.__delivery_engine.add_stream(callback_url, send)
+        self.__log_message_stream_connected(callback_url)
+
+        try:
+            # Handle frames one at a time (in order sent), same as if client made api calls one after another.
+            async for message in ws:
+                if message.type in [WSMsgType.BINARY, WSMsgType.TEXT]:
+                    await self.__on_stream_frame(ws, callback_url, serialization.loads(message.data))
+        finally:
+            # Registrations of a stream only last as long as it's connected (client re-registers on reconnect).
+            if self.__delivery_engine.remove_stream(callback_url, send):
+                await self.__run_blocking(self.__event_registration_manager.unregister_all, callback_url)
+            self.__log_message_stream_disconnected(callback_url)
+        return ws
+
+    async def __on_stream_frame(self, ws: web.WebSocketResponse, callback_url: str, frame: Dict[str, Any]):
+        op = frame.get('op')
+        data = frame.get('data', {})
+
+        response = RESPONSE_OK
+        if op in [OP_REGISTER, OP_UNREGISTER]:
+            data['callback_url'] = callback_url
+            registration_data = RegistrationData.from_dict(data)
+            function = self.__event_registration_manager.register if op == OP_REGISTER \
+                else self.__event_registration_manager.unregister
+            await self.__run_blocking(function, registration_data)
+        elif op == OP_UNREGISTER_ALL:
+            await self.__run_blocking(self.__event_registration_manager.unregister_all, callback_url)
+        elif op == OP_POST_EVENT:
+            self.__event_registration_manager.post(RemoteEventData.from_dict(data))
+        elif op == OP_POST_EVENTS:
+            self.__event_registration_manager.post_batch(RemoteEventBatchData.from_dict(data))
+        elif op == OP_MAP_EVENTS:
+            try:
+                response = {
+                    'event_map_key': self.__event_registration_manager.map_events(EventMappingData.from_dict(data))
+                }
+                response.update(RESPONSE_OK)
+            except (InvalidMappingEventsError, DuplicateMappingError) as e:
+                response = dict(RESPONSE_ERROR, error=e.message)
+        else:
+            response = dict(RESPONSE_ERROR, error=f"Unknown op '{op}'")
+
+        if 'id' in frame:
+            await ws.send_bytes(serialization.dumps({'op': OP_RESPONSE, 'id': frame['id'], 'data': response}))
+
+    def __log_message_stream_connected(self, callback_url: str):
+        self.__logger.info(f"Stream connected '{callback_url}'")
+
+    def __log_message_stream_disconnected(self, callback_url: str):
+        self.__logger.info(f"Stream disconnected '{callback_url}'")
+
+    async def __forward(self, request: web.Request, channel: str, body: Dict[str, Any]) -> Any:
+        # Response of node owning channel, or None if it's this node (request is handled here).  Forwarded with
+        # blocking calls (off the event loop), same as sync service.
+        node = self.__cluster.route(channel, Cluster.is_forwarded(request.headers))
+        if not node:
+            return None
+        return await self.__run_blocking(self.__cluster.forward, node, request.path, body, request.method)
+
+    def __make_response(self, request: web.Request, response: Dict[str, Any], status: int = 200) -> web.Response:
+        # Respond in format agreed on with caller (per its Accept header), json unless both support a binary one, and
+        # compressed if large (and caller accepts the encoding).
+        content_type = serialization.get_content_negotiator().choose_content_type(request.headers.get('Accept'))
+        body, headers = get_compressor().compress_response(serialization.encode(response, content_type),
+                                                           request.headers.get('Accept-Encoding'))
+        if self.__is_allow_cors:
+            headers['Access-Control-Allow-Origin'] = '*'
+        return web.Response(body=body, status=status, content_type=content_type, headers=headers)
+
+    @staticmethod
+    async def __read_body(request: web.Request) -> Dict[str, Any]:
+        # Decompressed (if it was) and decoded per content type (json, or a binary format agreed on).  Missing or
+        # malformed body is the caller's error (400), not the server's.
+        try:
+            body = decompress(await request.read(), request.headers.get('Content-Encoding'))
+            if body:
+                return serialization.decode(body, request.content_type)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=f'Malformed request body: {e}')
+        raise web.HTTPBadRequest(text='Missing request body')
+
+    @staticmethod
+    async def __run_blocking(function: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+def start_async_event_center(port: int = None) -> AsyncEventCenterService:
+    # Serve from a background thread (event loop runs there), returns once service is up.
+    service = AsyncEventCenterService(port=port)
+    is_started = threading.Event()
+    threading.Thread(target=asyncio.run, args=[service.serve(is_started)], name='AsyncEventCenter',
+                     daemon=True).start()
+    is_started.wait()
+    return service
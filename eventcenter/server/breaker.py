@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Union
+
+from eventdispatch import Properties
+
+# Circuit breaker properties.
+CIRCUIT_FAILURE_THRESHOLD = 'CIRCUIT_FAILURE_THRESHOLD'
+CIRCUIT_SLOW_CALL_SEC = 'CIRCUIT_SLOW_CALL_SEC'
+CIRCUIT_OPEN_SEC = 'CIRCUIT_OPEN_SEC'
+
+# Failed (or slow) calls in a row before circuit opens (0 turns circuit breakers off).
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_SLOW_CALL_SEC = 5.0
+DEFAULT_OPEN_SEC = 10.0
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Tracks health of a destination (callback url), so calls to a sick one (failing, or too slow) fail fast, instead
+      of each tying up a worker until it times out.
+    - Closed: calls go through.  Opens after a number of failed (or slow) calls in a row.
+    - Open: calls are refused, until open time is up.
+    - Half open: a single call (probe) goes through.  Circuit closes if it succeeds in time, or opens again if not.
+    """
+
+    def __init__(self, destination: str, failure_threshold: int, slow_call_sec: float, open_sec: float):
+        self.__destination = destination
+        self.__failure_threshold = max(1, failure_threshold)
+        self.__slow_call_sec = slow_call_sec
+        self.__open_sec = open_sec
+
+        self.__state = STATE_CLOSED
+        self.__failure_count = 0
+        self.__opened_at = 0.0
+        self.__is_probing = False
+        self.__trip_count = 0
+        self.__skipped_count = 0
+        self.__latency_sec = None
+        self.__lock = threading.Lock()
+
+    @property
+    def destination(self) -> str:
+        return self.__destination
+
+    @property
+    def state(self) -> str:
+        return self.__state
+
+    @property
+    def retry_after_sec(self) -> float:
+        # Time until circuit lets a probe through.
+        with self.__lock:
+            if self.__state == STATE_OPEN:
+                return max(0.0, self.__opened_at + self.__open_sec - time.monotonic())
+            return self.__open_sec if self.__is_probing else 0.0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self.__lock:
+            return {
+                'state': self.__state,
+                'failures': self.__failure_count,
+                'trips': self.__trip_count,
+                'skipped': self.__skipped_count,
+                'latency_sec': round(self.__latency_sec, 3) if self.__latency_sec is not None else None
+            }
+
+    def allow_request(self) -> bool:
+        with self.__lock:
+            if self.__state == STATE_CLOSED:
+                return True
+
+            if self.__state == STATE_OPEN and time.monotonic() >= self.__opened_at + self.__open_sec:
+                self.__state = STATE_HALF_OPEN
+                self.__is_probing = False
+
+            # Only one probe at a time (while half open).
+            if self.__state == STATE_HALF_OPEN and not self.__is_probing:
+                self.__is_probing = True
+                return True
+
+            self.__skipped_count += 1
+            return False
+
+    def release_probe(self):
+        # Probe let through was never sent (e.g. event couldn't be encoded), let next call probe instead.
+        with self.__lock:
+            self.__is_probing = False
+
+    def on_success(self, latency_sec: float):
+        # A call that succeeded, but took too long, counts as a failure (destination is sick, not down).
+        if latency_sec >= self.__slow_call_sec:
+            self.on_failure(latency_sec)
+            return
+
+        with self.__lock:
+            self.__latency_sec = latency_sec
+            self.__failure_count = 0
+            self.__is_probing = False
+            if self.__state != STATE_CLOSED:
+                self.__state = STATE_CLOSED
+                self.__log_message_closed()
+
+    def on_failure(self, latency_sec: float = None):
+        with self.__lock:
+            if latency_sec is not None:
+                self.__latency_sec = latency_sec
+            self.__failure_count += 1
+            self.__is_probing = False
+
+            # Probe failed, or too many failures in a row.
+            if self.__state == STATE_HALF_OPEN or \
+                    (self.__state == STATE_CLOSED and self.__failure_count >= self.__failure_threshold):
+                self.__state = STATE_OPEN
+                self.__opened_at = time.monotonic()
+                self.__trip_count += 1
+                self.__log_message_opened(latency_sec)
+
+    def __log_message_opened(self, latency_sec: Union[float, None]):
+        reason = f'took {latency_sec:.1f} sec' if latency_sec is not None else 'failed'
+        self.__logger.warning(f"Circuit to '{self.__destination}' opened, last call {reason} "
+                              f"({self.__failure_count} bad call(s) in a row), probing again in {self.__open_sec} sec")
+
+    def __log_message_closed(self):
+        self.__logger.warning(f"Circuit to '{self.__destination}' closed, destination is healthy again")
+
+
+class CircuitBreakers:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Keeps a circuit breaker per destination, and the thresholds they share (failed or slow calls in a row before
+      circuit opens, how slow is too slow, and how long circuit stays open before a probe).
+    """
+
+    def __init__(self, failure_threshold: int = None, slow_call_sec: float = None, open_sec: float = None):
+        self.__failure_threshold = int(CircuitBreakers.__get_property(CIRCUIT_FAILURE_THRESHOLD, failure_threshold,
+                                                                      DEFAULT_FAILURE_THRESHOLD))
+        self.__slow_call_sec = float(CircuitBreakers.__get_property(CIRCUIT_SLOW_CALL_SEC, slow_call_sec,
+                                                                    DEFAULT_SLOW_CALL_SEC))
+        self.__open_sec = float(CircuitBreakers.__get_property(CIRCUIT_OPEN_SEC, open_sec, DEFAULT_OPEN_SEC))
+
+        self.__breakers: Dict[str, CircuitBreaker] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.__failure_threshold > 0
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self.__lock:
+            breakers = list(self.__breakers.values())
+        return {breaker.destination: breaker.stats for breaker in breakers}
+
+    def find(self, destination: str) -> Union[CircuitBreaker, None]:
+        return self.__breakers.get(destination)
+
+    def get(self, destination: str) -> Union[CircuitBreaker, None]:
+        # None if circuit breakers are off.
+        if not self.is_enabled:
+            return None
+
+        breaker = self.__breakers.get(destination)
+        if breaker:
+            return breaker
+
+        with self.__lock:
+            breaker = self.__breakers.get(destination)
+            if not breaker:
+                breaker = self.__breakers[destination] = CircuitBreaker(destination, self.__failure_threshold,
+                                                                        self.__slow_call_sec, self.__open_sec)
+            return breaker
+
+    def discard(self, destination: str):
+        with self.__lock:
+            self.__breakers.pop(destination, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__breakers = {}
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
+
+
+_default_circuit_breakers: CircuitBreakers = None
+_default_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breakers() -> CircuitBreakers:
+    global _default_circuit_breakers
+
+    with _default_circuit_breakers_lock:
+        if not _default_circuit_breakers:
+            _default_circuit_breakers = CircuitBreakers()
+        return _default_circuit_breakers
+
+
+def set_circuit_breakers(circuit_breakers: CircuitBreakers = None):
+    # Replace default circuit breakers (None to rebuild them from properties on next use).
+    global _default_circuit_breakers
+
+    with _default_circuit_breakers_lock:
+        _default_circuit_breakers = circuit_breakers
@@ -0,0 +1,320 @@
+import bisect
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from eventdispatch import Properties
+from requests.exceptions import RequestException
+
+from eventcenter.client import serialization
+from eventcenter.client.network import APICaller, get_session_pool
+
+# Cluster properties.
+CLUSTER_NODE_URL = 'CLUSTER_NODE_URL'
+CLUSTER_SEED_NODES = 'CLUSTER_SEED_NODES'
+CLUSTER_VIRTUAL_NODES = 'CLUSTER_VIRTUAL_NODES'
+CLUSTER_HEARTBEAT_SEC = 'CLUSTER_HEARTBEAT_SEC'
+CLUSTER_MAX_MISSED_HEARTBEATS = 'CLUSTER_MAX_MISSED_HEARTBEATS'
+CLUSTER_FORWARD_TIMEOUT_SEC = 'CLUSTER_FORWARD_TIMEOUT_SEC'
+
+DEFAULT_VIRTUAL_NODES = 100
+DEFAULT_HEARTBEAT_SEC = 1.0
+DEFAULT_MAX_MISSED_HEARTBEATS = 3
+
+# Forwarded requests wait on owner node as long as deliveries wait on clients (unless set), so a hung owner doesn't tie
+# up request threads for good.
+CLIENT_CALLBACK_TIMEOUT_SEC = 'CLIENT_CALLBACK_TIMEOUT_SEC'
+DEFAULT_FORWARD_TIMEOUT_SEC = 10.0
+
+MEMBERS_ENDPOINT = '/cluster/members'
+
+# Requests forwarded by another node are handled where they land (so nodes that briefly disagree on membership don't
+# forward a request back and forth).
+FORWARDED_HEADER = 'X-Event-Center-Forwarded'
+FORWARD_HEADERS = {'Content-Type': serialization.CONTENT_TYPE_JSON, FORWARDED_HEADER: '1'}
+
+
+class HashRing:
+    """
+    PURPOSE:
+    - Maps keys (channels) to nodes by consistent hashing, so adding or removing a node only moves the keys it gains
+      or loses (about 1/n of them), instead of reshuffling all of them.
+    - Places each node at many points on the ring (virtual nodes), so keys spread evenly across nodes.
+    - Immutable (a membership change builds a new ring), so lookups need no lock.
+    """
+
+    def __init__(self, nodes: List[str] = None, virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        self.__nodes = sorted(set(nodes or []))
+        points = sorted((HashRing.__hash(f'{node}#{i}'), node) for node in self.__nodes for i in range(virtual_nodes))
+        self.__hashes = [point for point, _ in points]
+        self.__owners = [node for _, node in points]
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self.__nodes)
+
+    def get_node(self, key: str) -> Union[str, None]:
+        # Node at first point on ring at (or after) key's hash (wrapping around).
+        if not self.__hashes:
+            return None
+        index = bisect.bisect_left(self.__hashes, HashRing.__hash(key)) % len(self.__hashes)
+        return self.__owners[index]
+
+    @staticmethod
+    def __hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class Cluster:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Keeps membership of a cluster of event center nodes, and shards channels across members by consistent hashing
+      (each channel is owned by one node, which holds its registrations and dispatches its events).
+    - Joins through seed nodes (any members), and exchanges membership with every known node on each heartbeat, so
+      all members learn of new ones within a couple of heartbeats.
+    - Drops members that miss a number of heartbeats in a row (keeps checking on them, and adds them back once they
+      respond).
+    - Tells owner (e.g. registration manager) when membership changes, so it can hand over registrations for
+      channels that moved to another node.
+    - Off unless given this node's url (as other nodes reach it).
+    """
+
+    def __init__(self, node_url: str = None, seed_nodes: Union[List[str], str] = None, virtual_nodes: int = None,
+                 heartbeat_sec: float = None, max_missed_heartbeats: int = None, forward_timeout_sec: float = None):
+        self.__node_url = Cluster.__get_property(CLUSTER_NODE_URL, node_url, None)
+        seed_nodes = Cluster.__get_property(CLUSTER_SEED_NODES, seed_nodes, [])
+        if isinstance(seed_nodes, str):
+            seed_nodes = [node.strip() for node in seed_nodes.split(',') if node.strip()]
+        self.__virtual_nodes = int(Cluster.__get_property(CLUSTER_VIRTUAL_NODES, virtual_nodes,
+                                                          DEFAULT_VIRTUAL_NODES))
+        self.__heartbeat_sec = float(Cluster.__get_property(CLUSTER_HEARTBEAT_SEC, heartbeat_sec,
+                                                            DEFAULT_HEARTBEAT_SEC))
+        self.__max_missed_heartbeats = int(Cluster.__get_property(CLUSTER_MAX_MISSED_HEARTBEATS,
+                                                                  max_missed_heartbeats,
+                                                                  DEFAULT_MAX_MISSED_HEARTBEATS))
+        forward_timeout_sec = Cluster.__get_property(CLUSTER_FORWARD_TIMEOUT_SEC, forward_timeout_sec, None)
+        self.__forward_timeout_sec = float(Cluster.__get_property(CLIENT_CALLBACK_TIMEOUT_SEC, forward_timeout_sec,
+                                                                  DEFAULT_FORWARD_TIMEOUT_SEC))
+
+        # Known nodes (members, and nodes that were members or seeds), and heartbeats each missed in a row.
+        self.__known = {Cluster.__normalize(node) for node in seed_nodes} - {self.__node_url}
+        self.__missed: Dict[str, int] = {}
+        self.__ring = HashRing([self.__node_url] if self.__node_url else [], self.__virtual_nodes)
+        self.__lock = threading.Lock()
+
+        self.__on_change: Callable[[], None] = None
+        self.__is_changed = False
+        self.__wake = threading.Event()
+        self.__stopped = threading.Event()
+        self.__thread: threading.Thread = None
+
+    @property
+    def is_enabled(self) -> bool:
+        return bool(self.__node_url)
+
+    @property
+    def node_url(self) -> str:
+        return self.__node_url
+
+    @property
+    def members(self) -> List[str]:
+        return self.__ring.nodes
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'node_url': self.__node_url,
+            'members': self.members
+        }
+
+    def get_owner(self, channel: str) -> str:
+        return self.__ring.get_node(channel or '')
+
+    def is_local(self, channel: str) -> bool:
+        return not self.is_enabled or self.get_owner(channel) == self.__node_url
+
+    def route(self, channel: str, is_forwarded: bool = False) -> Union[str, None]:
+        # Node to forward request for channel to, or None if it's handled here.
+        if is_forwarded or self.is_local(channel):
+            return None
+        return self.get_owner(channel)
+
+    def route_all(self, items: List[Any], get_channel: Callable[[Any], str],
+                  is_forwarded: bool = False) -> List[Tuple[Union[str, None], List[Any]]]:
+        # Items grouped by node to forward them to (None for ones handled here), in order within each group.
+        groups: Dict[Union[str, None], List[Any]] = {}
+        for item in items:
+            groups.setdefault(self.route(get_channel(item), is_forwarded), []).append(item)
+        return list(groups.items())
+
+    def forward(self, node_url: str, path: str, body: Dict[str, Any], method: str = 'POST',
+                timeout_sec: float = None) -> Dict[str, Any]:
+        # Response of node the request was forwarded to (or an error, if it couldn't be reached, or didn't answer in
+        # time).
+        timeout_sec = timeout_sec if timeout_sec is not None else self.__forward_timeout_sec
+        try:
+            return APICaller.read_body(Cluster.__call(method, node_url + path, body, timeout_sec)) or {}
+        except (RequestException, ValueError):
+            return Cluster.get_unreachable_response(node_url)
+
+    def broadcast(self, path: str, body: Dict[str, Any]) -> List[str]:
+        # Forward request to every other member, returns ones it failed on.
+        failed = []
+        for node in self.members:
+            if node != self.__node_url and self.forward(node, path, body).get('success') != 'true':
+                failed.append(node)
+        return failed
+
+    def start(self, on_change: Callable[[], None] = None):
+        # Join cluster, and keep checking on members (from a background thread).
+        self.__on_change = on_change
+        if not self.is_enabled or self.__thread:
+            return
+
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name='ClusterHeartbeat', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stopped.set()
+        self.__wake.set()
+        if self.__thread:
+            self.__thread.join(timeout=self.__heartbeat_sec * 2)
+            self.__thread = None
+
+    def on_members_message(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        # Another node joined, or sent a heartbeat (with the nodes it knows of).  Sender is up, add it (if new).
+        sender = body.get('node_url')
+        if sender:
+            sender = Cluster.__normalize(sender)
+            with self.__lock:
+                self.__missed.pop(sender, None)
+            self.__learn(body.get('members', []))
+            self.__add_members([sender])
+        return {'members': self.members}
+
+    def __run(self):
+        while not self.__stopped.is_set():
+            self.__heartbeat()
+            if self.__is_changed:
+                self.__is_changed = False
+                self.__notify_change()
+
+            self.__wake.wait(self.__heartbeat_sec)
+            self.__wake.clear()
+
+    def __heartbeat(self):
+        with self.__lock:
+            nodes = list(self.__known)
+
+        body = {'node_url': self.__node_url, 'members': self.members}
+        reachable, unreachable = [], []
+        for node in nodes:
+            try:
+                response = Cluster.__call('POST', node + MEMBERS_ENDPOINT, body, self.__heartbeat_sec)
+                if response.status_code != 200:
+                    unreachable.append(node)
+                    continue
+                reachable.append(node)
+                self.__learn((APICaller.read_body(response) or {}).get('members', []))
+            except (RequestException, ValueError):
+                unreachable.append(node)
+
+        self.__add_members(reachable)
+        self.__remove_members(unreachable)
+
+    def __learn(self, nodes: List[str]):
+        # Nodes other members know of (checked on next heartbeat, added once they respond).
+        with self.__lock:
+            for node in nodes:
+                node = Cluster.__normalize(node)
+                if node != self.__node_url and node not in self.__known:
+                    self.__known.add(node)
+                    self.__wake.set()
+
+    def __add_members(self, nodes: List[str]):
+        with self.__lock:
+            members = set(self.__ring.nodes)
+            for node in nodes:
+                self.__known.add(node)
+                self.__missed.pop(node, None)
+            added = set(nodes) - members
+            if added:
+                self.__set_members(members | added)
+                self.__log_message_members_changed('joined', added)
+
+    def __remove_members(self, nodes: List[str]):
+        with self.__lock:
+            removed = set()
+            for node in nodes:
+                self.__missed[node] = self.__missed.get(node, 0) + 1
+                if self.__missed[node] >= self.__max_missed_heartbeats and node in self.__ring.nodes:
+                    removed.add(node)
+            if removed:
+                self.__set_members(set(self.__ring.nodes) - removed)
+                self.__log_message_members_changed('left', removed)
+
+    def __set_members(self, members: set):
+        # New ring (lookups in flight keep using the old one).  Owner is told from heartbeat thread.
+        self.__ring = HashRing(list(members | {self.__node_url}), self.__virtual_nodes)
+        self.__is_changed = True
+        self.__wake.set()
+
+    def __notify_change(self):
+        if not self.__on_change:
+            return
+        try:
+            self.__on_change()
+        except Exception as e:
+            self.__logger.exception(f'Handling cluster membership change failed: {e}')
+
+    def __log_message_members_changed(self, change: str, nodes: set):
+        self.__logger.info(f"Node(s) {sorted(nodes)} {change} cluster, members: {self.__ring.nodes}")
+
+    @staticmethod
+    def is_forwarded(headers: Any) -> bool:
+        return headers.get(FORWARDED_HEADER) is not None
+
+    @staticmethod
+    def get_unreachable_response(node_url: str) -> Dict[str, Any]:
+        return {'success': 'false', 'error': f"Node '{node_url}' is unreachable"}
+
+    @staticmethod
+    def __call(method: str, url: str, body: Dict[str, Any], timeout_sec: Union[float, None]):
+        # Sent as json, whatever format caller used (GET too, as event maps are asked for with a body).
+        return get_session_pool().get_session(url).request(method, url, data=serialization.dumps(body),
+                                                           headers=FORWARD_HEADERS, timeout=timeout_sec)
+
+    @staticmethod
+    def __normalize(node_url: str) -> str:
+        return node_url.rstrip('/')
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
+
+
+_default_cluster: Cluster = None
+_default_cluster_lock = threading.Lock()
+
+
+def get_cluster() -> Cluster:
+    global _default_cluster
+
+    with _default_cluster_lock:
+        if not _default_cluster:
+            _default_cluster = Cluster()
+        return _default_cluster
+
+
+def set_cluster(cluster: Cluster = None):
+    # Replace default cluster (None to rebuild it from properties on next use).
+    global _default_cluster
+
+    with _default_cluster_lock:
+        _default_cluster = cluster
@@ -0,0 +1,154 @@
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+from eventdispatch import Properties
+
+from eventcenter.client.worker_pool import WorkerPool
+
+# Delivery properties.
+DELIVERY_WORKER_COUNT = 'DELIVERY_WORKER_COUNT'
+DELIVERY_MAX_DRAIN = 'DELIVERY_MAX_DRAIN'
+DELIVERY_MAX_BATCH_SIZE = 'DELIVERY_MAX_BATCH_SIZE'
+
+DEFAULT_WORKER_COUNT = 32
+DEFAULT_MAX_DRAIN = 100
+DEFAULT_MAX_BATCH_SIZE = 100
+
+
+class DeliveryEngine:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Queues outbound callbacks per destination (callback url).
+    - Sends to different destinations concurrently, using a bounded pool of worker threads.
+    - Preserves ordering per destination (only one worker drains a destination's queue at a time).
+    - Keeps a backlogged destination from hogging a worker, by yielding after a max number of deliveries.
+    - Optionally accumulates items for a destination into batches, while the destination is busy (so the
+      slower the destination, the bigger the batches).
+    """
+
+    # Deliveries are plain callables (run on worker threads), not coroutines.
+    is_async = False
+
+    def __init__(self, worker_count: int = None, max_drain: int = None, max_batch_size: int = None):
+        if worker_count is None:
+            worker_count = Properties().get(DELIVERY_WORKER_COUNT) if Properties().has(DELIVERY_WORKER_COUNT) \
+                else DEFAULT_WORKER_COUNT
+        if max_drain is None:
+            max_drain = Properties().get(DELIVERY_MAX_DRAIN) if Properties().has(DELIVERY_MAX_DRAIN) \
+                else DEFAULT_MAX_DRAIN
+
+        if max_batch_size is None:
+            max_batch_size = Properties().get(DELIVERY_MAX_BATCH_SIZE) if Properties().has(DELIVERY_MAX_BATCH_SIZE) \
+                else DEFAULT_MAX_BATCH_SIZE
+
+        self.__max_drain = int(max_drain)
+        self.__max_batch_size = max(1, int(max_batch_size))
+        self.__executor = WorkerPool(int(worker_count), name='delivery')
+        self.__queues: Dict[str, deque] = {}
+        self.__open_batches: Dict[str, List[Any]] = {}
+        self.__lock = threading.Lock()
+        self.__idle = threading.Condition(self.__lock)
+
+    def submit(self, destination: str, delivery: Callable[[], None]):
+        with self.__lock:
+            try:
+                queue = self.__queues[destination]
+                queue.append(delivery)
+
+                # Destination is already being drained by a worker, which will pick up this delivery.
+                return
+            except KeyError:
+                self.__queues[destination] = deque([delivery])
+
+        self.__executor.submit(self.__drain, destination)
+
+    def submit_batched(self, destination: str, item: Any, send_batch: Callable[[List[Any]], None]):
+        with self.__lock:
+            # Add to destination's open batch (one that is queued, but not yet being sent), if there's room.
+            batch = self.__open_batches.get(destination)
+            if batch is not None and len(batch) < self.__max_batch_size:
+                batch.append(item)
+                return
+
+            batch = [item]
+            self.__open_batches[destination] = batch
+
+        self.submit(destination, lambda: self.__send_batch(destination, batch, send_batch))
+
+    def submit_later(self, destination: str, delay_sec: float, delivery: Callable[[], None]):
+        # Queue delivery once delay is up (e.g. a retry after a backoff).
+        timer = threading.Timer(delay_sec, self.submit, args=[destination, delivery])
+        timer.daemon = True
+        timer.start()
+
+    def queue_depth(self, destination: str) -> int:
+        with self.__lock:
+            queue = self.__queues.get(destination)
+            return len(queue) if queue else 0
+
+    def queue_depths(self) -> Dict[str, int]:
+        with self.__lock:
+            return {destination: len(queue) for destination, queue in self.__queues.items()}
+
+    def wait_until_idle(self, timeout_sec: float = None) -> bool:
+        with self.__idle:
+            return self.__idle.wait_for(lambda: not self.__queues, timeout=timeout_sec)
+
+    def shutdown(self, wait: bool = True):
+        self.__executor.shutdown(wait=wait)
+
+    def __drain(self, destination: str):
+        for _ in range(self.__max_drain):
+            with self.__lock:
+                queue = self.__queues[destination]
+                if not queue:
+                    # Nothing left for destination, release it (next submit will schedule a new drain).
+                    del self.__queues[destination]
+                    self.__idle.notify_all()
+                    return
+                delivery = queue[0]
+
+            try:
+                delivery()
+            except Exception as e:
+                self.__logger.exception(f"Delivery to '{destination}' failed: {e}")
+
+            # Only remove delivery once done, so queue stays registered (and ordered) while delivery is in flight.
+            with self.__lock:
+                self.__queues[destination].popleft()
+
+        # Yield worker to other destinations, continue draining later.
+        self.__executor.submit(self.__drain, destination)
+
+    def __send_batch(self, destination: str, batch: List[Any], send_batch: Callable[[List[Any]], None]):
+        # Close batch, so items submitted from now on go into a new batch.
+        with self.__lock:
+            if self.__open_batches.get(destination) is batch:
+                del self.__open_batches[destination]
+
+        send_batch(batch)
+
+
+_default_engine: DeliveryEngine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_delivery_engine() -> DeliveryEngine:
+    global _default_engine
+
+    with _default_engine_lock:
+        if not _default_engine:
+            _default_engine = DeliveryEngine()
+        return _default_engine
+
+
+def set_delivery_engine(engine):
+    # Replace default engine (e.g. with an async one, when served by an event loop).
+    global _default_engine
+
+    with _default_engine_lock:
+        _default_engine = engine
@@ -1,27 +1,46 @@
 import json
 import logging
 import threading
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Tuple, Union
 
 from eventdispatch import Data, Event, Properties, NamespacedEnum, register_for_events, \
     EventDispatchManager, PropertyNotSetError
 from eventdispatch import EventMapUtil
-from requests.exceptions import InvalidSchema
-
-from eventcenter.client.network import APICaller, ApiConnectionError
+from requests.exceptions import InvalidSchema, Timeout
+
+from eventcenter.client import serialization
+from eventcenter.client.compression import get_compressor, compress, Compressor
+from eventcenter.client.network import APICaller, ApiConnectionError, HTTP_STATUS_TOO_MANY_REQUESTS
+from eventcenter.server.breaker import CircuitBreakers, get_circuit_breakers
+from eventcenter.server.cluster import Cluster
+from eventcenter.server.delivery import DeliveryEngine, get_delivery_engine, DELIVERY_MAX_BATCH_SIZE, \
+    DEFAULT_MAX_BATCH_SIZE
+from eventcenter.server.journal import RegistrantsJournal, REGISTRANTS_JOURNAL, REGISTRANTS_SYNC_INTERVAL_SEC, \
+    DEFAULT_SYNC_INTERVAL_SEC
+from eventcenter.server.locks import LockStripes
+from eventcenter.server.metrics import Metrics, get_metrics, EVENTS_RECEIVED, DELIVERIES, DELIVERY_LATENCY, \
+    DELIVERY_SUCCESS, DELIVERY_REJECTED, DELIVERY_FAILED, REGISTRANTS, REGISTRATIONS, DELIVERY_QUEUE_DEPTH, \
+    RETRY_QUEUE_DEPTH
+from eventcenter.server.replay import ReplayLog, get_replay_log
+from eventcenter.server.retry import RetryQueue, RetryQueues, get_retry_queues
+from eventcenter.server.stream import STREAM_URL_SCHEME
+from eventcenter.server.topics import TopicTrie, is_pattern
 
 
 class RegistrationData(Data):
-    def __init__(self, callback_url: str, events: [str], channel: str = ''):
+    def __init__(self, callback_url: str, events: [str], channel: str = '', is_batch_delivery: bool = False):
         super().__init__({
             'callback_url': callback_url,
             'events': events,
             'channel': channel,
+            'batch_delivery': is_batch_delivery,
         })
 
         self.__callback_url = callback_url
         self.__events = events
         self.__channel = channel
+        self.__is_batch_delivery = is_batch_delivery
 
     @property
     def callback_url(self) -> str:
@@ -35,12 +54,17 @@ class RegistrationData(Data):
     def channel(self) -> str:
         return self.__channel
 
+    @property
+    def is_batch_delivery(self) -> bool:
+        return self.__is_batch_delivery
+
     @staticmethod
     def from_dict(data: Dict[str, Any]):
         callback_url = data.get('callback_url')
         events = data.get('events')
         channel = data.get('channel', '')
-        return RegistrationData(callback_url, events, channel)
+        is_batch_delivery = data.get('batch_delivery', False)
+        return RegistrationData(callback_url, events, channel, is_batch_delivery)
 
 
 # -------------------------------------------------------------------------------------------------
@@ -54,6 +78,7 @@ class RemoteEventData(Data):
 
         self.__channel = channel
         self.__event = event
+        self.__encoded: Dict[Tuple[str, str], bytes] = {}
 
     @property
     def channel(self) -> str:
@@ -63,6 +88,21 @@ class RemoteEventData(Data):
     def event(self) -> Event:
         return self.__event
 
+    @property
+    def encoded(self) -> bytes:
+        return self.encode(serialization.CONTENT_TYPE_JSON)
+
+    def encode(self, content_type: str, encoding: str = None) -> bytes:
+        # Encode (and compress) once per format (on first use), and reuse for every client it's sent to in that format.
+        key = (content_type, encoding)
+        try:
+            return self.__encoded[key]
+        except KeyError:
+            encoded = compress(self.encode(content_type), encoding) if encoding else \
+                serialization.encode(self.dict, content_type)
+            self.__encoded[key] = encoded
+            return encoded
+
     @staticmethod
     def from_dict(data: Dict[str, Any]):
         channel = data.get('channel')
@@ -70,6 +110,26 @@ class RemoteEventData(Data):
         return RemoteEventData(channel, event)
 
 
+# -------------------------------------------------------------------------------------------------
+
+class RemoteEventBatchData(Data):
+    def __init__(self, remote_events: [RemoteEventData]):
+        super().__init__({
+            'remote_events': [remote_event.dict for remote_event in remote_events]
+        })
+
+        self.__remote_events = remote_events
+
+    @property
+    def remote_events(self) -> [RemoteEventData]:
+        return self.__remote_events
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]):
+        remote_events = [RemoteEventData.from_dict(remote_event) for remote_event in data.get('remote_events', [])]
+        return RemoteEventBatchData(remote_events)
+
+
 # -------------------------------------------------------------------------------------------------
 
 class EventMappingData(Data):
@@ -115,16 +175,89 @@ class EventMappingData(Data):
         return EventMappingData(channel, events_to_map, event_to_post, ignore_if_exists)
 
 
+# -------------------------------------------------------------------------------------------------
+
+class ReplayRequestData(Data):
+    def __init__(self, channel: str, offset: int, max_count: int = None, events: [str] = None):
+        super().__init__({
+            'channel': channel if channel else '',
+            'offset': offset,
+            'max_count': max_count,
+            'events': events
+        })
+
+        self.__channel = channel if channel else ''
+        self.__offset = offset
+        self.__max_count = max_count
+        self.__events = events
+
+    @property
+    def channel(self) -> str:
+        return self.__channel
+
+    @property
+    def offset(self) -> int:
+        return self.__offset
+
+    @property
+    def max_count(self) -> int:
+        return self.__max_count
+
+    @property
+    def events(self) -> [str]:
+        return self.__events
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]):
+        # Raises ValueError if offset or max count isn't a non-negative integer (caller's error).
+        channel = data.get('channel')
+        offset = ReplayRequestData.__to_count(data, 'offset', 0)
+        max_count = ReplayRequestData.__to_count(data, 'max_count', None)
+        events = data.get('events')
+        return ReplayRequestData(channel, offset, max_count if max_count else None, events)
+
+    @staticmethod
+    def __to_count(data: Dict[str, Any], name: str, default: Union[int, None]) -> Union[int, None]:
+        value = data.get(name)
+        if value is None:
+            return default
+        try:
+            count = int(value)
+        except (TypeError, ValueError):
+            count = -1
+        if isinstance(value, (bool, float)) or count < 0:
+            raise ValueError(f"Invalid {name} '{value}', must be a non-negative integer")
+        return count
+
+
 # -------------------------------------------------------------------------------------------------
 
 class EventRegistrationManager:
     __REGISTRANTS_KEY = 'registrants'
+    __BATCH_DELIVERY_KEY = 'batch_delivery'
 
     def __init__(self):
-        self.__registrants = {}
-        self.__lock = threading.Lock()
+        # Registrants are locked per callback url (striped), so changes to unrelated registrants don't wait on each
+        # other.  Registry itself is copy-on-write (replaced, never changed in place), so it's read without a lock.
+        self.__registrants: Dict[str, Registrant] = {}
+        self.__locks = LockStripes()
+        self.__registry_lock = threading.Lock()
+        self.__subscription_index = get_subscription_index()
+
+        # Packed registrants are cached, and only re-packed after registrations change (version goes up).
+        self.__registrants_version = 0
+        self.__packed_registrants = (-1, {})
+
+        # Registrants file is rewritten by one thread at a time (a write covers changes made while others waited on it).
+        self.__persist_lock = threading.Lock()
+        self.__persisted_version = -1
         self.__registrants_file_path = Properties().get('REGISTRANTS_FILE_PATH')
 
+        # Journal registration changes, if enabled (otherwise rewrite registrants file on every change).
+        self.__journal = None
+        if Properties().has(REGISTRANTS_JOURNAL) and Properties().get(REGISTRANTS_JOURNAL):
+            self.__journal = RegistrantsJournal(self.__registrants_file_path)
+
         if Properties().has('PRETTY_PRINT') and Properties().get('PRETTY_PRINT'):
             EventDispatchManager(pretty_print=True)
 
@@ -133,20 +266,40 @@ class EventRegistrationManager:
 
         self.__load_registrants()
 
+        # Pick up events held for unreachable clients before a restart (spilled to disk).
+        for registrant in self.__registrants.values():
+            registrant.resume_retry()
+
+        # Pick up registration changes made by other processes sharing the journal (e.g. other server workers).
+        self.__sync_stopped = threading.Event()
+        if self.__journal and self.__journal.is_shared:
+            sync_interval_sec = Properties().get(REGISTRANTS_SYNC_INTERVAL_SEC) \
+                if Properties().has(REGISTRANTS_SYNC_INTERVAL_SEC) else DEFAULT_SYNC_INTERVAL_SEC
+            self.__sync_thread = threading.Thread(target=self.__run_sync, args=[float(sync_interval_sec)],
+                                                  name='RegistrantsSync', daemon=True)
+            self.__sync_thread.start()
+
     @property
     def registrants(self) -> dict:
         return self.__registrants
 
     def register(self, registration_data: RegistrationData, is_persist: bool = True):
-        with self.__lock:
+        version = None
+        with self.__locks.get(registration_data.callback_url):
+            is_got_registered = False
             try:
                 registrant = self.__registrants[registration_data.callback_url]
+
+                # Delivery mode applies to all of registrant's registrations (latest registration decides).
+                if registrant.is_batch_delivery != registration_data.is_batch_delivery:
+                    registrant.is_batch_delivery = registration_data.is_batch_delivery
+                    is_got_registered = True
             except KeyError:
                 # New registrant, create and store.
-                registrant = Registrant(registration_data.callback_url)
-                self.__registrants[registration_data.callback_url] = registrant
+                registrant = Registrant(registration_data.callback_url, registration_data.is_batch_delivery,
+                                        self.__subscription_index)
+                self.__add_registrant(registrant)
 
-            is_got_registered = False
             if registration_data.events:
                 for event in registration_data.events:
                     if registrant.register(event, channel=registration_data.channel):
@@ -156,13 +309,18 @@ class EventRegistrationManager:
                     is_got_registered = True
 
             if is_got_registered:
+                version = self.__increment_version()
                 registrant.log_message_registrations(registrant.callback_url)
 
                 if is_persist:
-                    self.__persist_registrants()
+                    self.__journal_change('register', registration_data.dict)
 
-    def unregister(self, registration_data: RegistrationData):
-        with self.__lock:
+        if version and is_persist:
+            self.__persist_change(version)
+
+    def unregister(self, registration_data: RegistrationData, is_persist: bool = True):
+        version = None
+        with self.__locks.get(registration_data.callback_url):
             try:
                 registrant = self.__registrants[registration_data.callback_url]
 
@@ -175,33 +333,96 @@ class EventRegistrationManager:
                     if registrant.unregister(channel=registration_data.channel):
                         is_got_unregistered = True
                 if len(registrant.registrations) == 0:
-                    del self.__registrants[registration_data.callback_url]
+                    self.__remove_registrant(registration_data.callback_url)
+                    get_retry_queues().discard(registration_data.callback_url)
+                    get_circuit_breakers().discard(registration_data.callback_url)
+                    get_metrics().discard(registration_data.callback_url)
 
                 if is_got_unregistered:
+                    version = self.__increment_version()
                     registrant.log_message_registrations(registrant.callback_url)
-                    self.__persist_registrants()
+
+                    if is_persist:
+                        self.__journal_change('unregister', registration_data.dict)
 
             except KeyError:
                 # No registrant, so nothing to do.
                 return
 
-    def unregister_all(self, callback_url: str):
-        with self.__lock:
+        if version and is_persist:
+            self.__persist_change(version)
+
+    def unregister_all(self, callback_url: str, is_persist: bool = True):
+        version = None
+        with self.__locks.get(callback_url):
             try:
                 registrant = self.__registrants[callback_url]
                 if registrant.unregister_all():
-                    del self.__registrants[callback_url]
-                    self.__persist_registrants()
+                    self.__remove_registrant(callback_url)
+                    version = self.__increment_version()
+
+                    if is_persist:
+                        self.__journal_change('unregister_all', {'callback_url': callback_url})
             except KeyError:
                 # No registrant, so nothing to do.
                 return
 
+        if version and is_persist:
+            self.__persist_change(version)
+
     @staticmethod
     def post(remote_event_data: RemoteEventData):
         if remote_event_data.channel not in EventDispatchManager().event_dispatchers:
             EventDispatchManager().add_event_dispatch(remote_event_data.channel)
         event_dispatch = EventDispatchManager().event_dispatchers.get(remote_event_data.channel)
-        event_dispatch.post_event(remote_event_data.event.name, remote_event_data.event.payload)
+        get_metrics().inc(EVENTS_RECEIVED, (remote_event_data.channel or '',))
+
+        # Log event (if replay log is on), and tell clients its offset (so they can resume from it).
+        payload = remote_event_data.event.payload
+        replay_log = get_replay_log()
+        if replay_log.is_enabled:
+            offset = replay_log.append(remote_event_data.channel or '', remote_event_data.dict)
+            payload = payload if payload is not None else {}
+            ReplayLog.set_offset(payload, offset)
+
+        event_dispatch.post_event(remote_event_data.event.name, payload)
+
+    @staticmethod
+    def post_batch(remote_event_batch_data: RemoteEventBatchData):
+        # Post in order received (events were batched in the order they were posted by the client).
+        for remote_event_data in remote_event_batch_data.remote_events:
+            EventRegistrationManager.post(remote_event_data)
+
+    @staticmethod
+    def replay(replay_request_data: ReplayRequestData) -> Dict[str, Any]:
+        # Events logged for channel from offset on (only ones asked for, if given event names).  Events no longer kept
+        # (past retention) are skipped, client can tell from first offset.
+        channel = replay_request_data.channel
+        records, first_offset, end_offset = get_replay_log().read(channel, replay_request_data.offset,
+                                                                  replay_request_data.max_count)
+
+        # Event names asked for can be patterns (e.g. 'worker.*').
+        events = TopicTrie()
+        for event in replay_request_data.events or []:
+            events.add(event, event, True)
+
+        remote_events = []
+        for offset, data in records:
+            event_data = data.get('event', {})
+            if replay_request_data.events and not events.match(event_data.get('name') or ''):
+                continue
+            event_data['payload'] = event_data.get('payload') or {}
+            ReplayLog.set_offset(event_data['payload'], offset)
+            remote_events.append(RemoteEventData.from_dict(data))
+
+        response = RemoteEventBatchData(remote_events).dict
+        response.update({
+            'channel': channel,
+            'first_offset': first_offset,
+            'next_offset': records[-1][0] + 1 if records else max(replay_request_data.offset, first_offset),
+            'end_offset': end_offset
+        })
+        return response
 
     @staticmethod
     def map_events(event_mapping_data: EventMappingData):
@@ -223,6 +444,52 @@ class EventRegistrationManager:
             maps[key] = EventMapUtil.build_event_mapping_payload(event_map.events_to_map, event_map.event_to_post)
         return maps
 
+    def pack_circuit_breakers(self) -> Dict[str, Any]:
+        # Health of registrants' callback urls (only ones delivered to so far, while circuit breakers are on).
+        stats = get_circuit_breakers().stats
+        return {callback_url: stats[callback_url] for callback_url in list(self.__registrants) if callback_url in stats}
+
+    def export_metrics(self) -> str:
+        # Metrics recorded so far, and current registrant counts and queue depths, in Prometheus text format.
+        channels = dict(self.__subscription_index.channels)
+        return get_metrics().render({
+            REGISTRANTS: {(): len(self.__registrants)},
+            REGISTRATIONS: {(channel,): subscriptions.registration_count
+                            for channel, subscriptions in channels.items()},
+            DELIVERY_QUEUE_DEPTH: {(callback_url,): depth
+                                   for callback_url, depth in get_delivery_engine().queue_depths().items()},
+            RETRY_QUEUE_DEPTH: {(callback_url,): stats['pending'] + stats['spilled']
+                                for callback_url, stats in get_retry_queues().stats.items()}
+        })
+
+    def hand_over(self, cluster: Cluster):
+        # After cluster membership changed, move registrations for channels now owned by another node there (events
+        # for those channels are forwarded to their owner from now on).  Ones that can't be moved yet are kept.
+        moves = []
+        for callback_url, registrant in self.__registrants.items():
+            # Stream clients are connected to this node, their registrations can't move.
+            if callback_url.startswith(STREAM_URL_SCHEME):
+                continue
+            for channel, registrations in list(registrant.registrations.items()):
+                owner = cluster.route(channel)
+                if not owner:
+                    continue
+                events = [event for event in list(registrations) if event]
+                if events:
+                    moves.append((owner, RegistrationData(callback_url, events, channel,
+                                                          registrant.is_batch_delivery)))
+                if len(events) < len(registrations):
+                    moves.append((owner, RegistrationData(callback_url, [], channel,
+                                                          registrant.is_batch_delivery)))
+
+        for owner, registration_data in moves:
+            response = cluster.forward(owner, '/register', registration_data.dict)
+            if response.get('success') != 'true':
+                self.__log_message_hand_over_failed(owner, registration_data)
+                continue
+            self.unregister(registration_data)
+            self.__log_message_handed_over(owner, registration_data)
+
     def get_registrant(self, callback_url: str):
         try:
             return self.__registrants[callback_url]
@@ -230,41 +497,239 @@ class EventRegistrationManager:
             return None
 
     def clear_registrants(self):
-        with self.__lock:
-            self.__registrants: Dict[str, Registrant] = {}
+        with self.__locks.all():
+            for callback_url, registrant in self.__registrants.items():
+                registrant.unregister_all()
+
+                # Let processes sharing the journal know (they only learn of changes from journal entries).
+                if self.__journal and self.__journal.is_shared:
+                    self.__journal.append('unregister_all', {'callback_url': callback_url})
+
+            with self.__registry_lock:
+                self.__registrants = {}
+            self.__increment_version()
             self.__persist_registrants()
 
+    def close(self):
+        self.__sync_stopped.set()
+        with self.__locks.all():
+            if self.__journal:
+                self.__journal.close()
+        get_replay_log().close()
+
     def on_event(self, event: Event):
         if event.name == RegistrationEvent.CALLBACK_FAILED_EVENT.namespaced_value:
             self.__handle_unreachable_client(event)
 
     def __load_registrants(self):
+        if self.__journal:
+            self.__load_registrants_from_journal()
+            return
+
         try:
             with open(self.__registrants_file_path, 'r') as file:
                 data = json.load(file)
                 if data:
-                    self.__reprocess_registrations(data.get(self.__REGISTRANTS_KEY))
+                    self.__reprocess_registrations(data.get(self.__REGISTRANTS_KEY),
+                                                   data.get(self.__BATCH_DELIVERY_KEY, []))
         except (FileNotFoundError, json.JSONDecodeError, KeyError):
             # If file doesn't exist, or json data in file is invalid, assume clean start.
             self.clear_registrants()
 
-    def __reprocess_registrations(self, registrants_data: Dict[str, Any]) -> [registrants]:
+    def __reprocess_registrations(self, registrants_data: Dict[str, Any], batch_delivery_urls: [str]):
         for callback_url, channels in registrants_data.items():
+            is_batch_delivery = callback_url in batch_delivery_urls
             for channel, events in channels.items():
-                self.register(RegistrationData(callback_url, events, channel), is_persist=False)
+                self.register(RegistrationData(callback_url, events, channel, is_batch_delivery), is_persist=False)
+
+    def __load_registrants_from_journal(self):
+        with self.__locks.all(), self.__journal.exclusive():
+            # Restore snapshot, then re-apply changes journaled since snapshot was taken (in order).
+            snapshot, entries = self.__journal.load()
+            self.__reprocess_registrations(snapshot.get(self.__REGISTRANTS_KEY, {}),
+                                           snapshot.get(self.__BATCH_DELIVERY_KEY, []))
+            self.__apply_journal_entries(entries)
+
+            if self.__journal.is_shared:
+                # Journal is in use by other processes, just follow it from here on.
+                self.__journal.reset_reader()
+                return
+
+            # Fold restored state into a new snapshot (so journal starts over).
+            self.__persist_registrants()
 
-    def __persist_registrants(self):
-        with open(self.__registrants_file_path, 'w') as file:
-            json.dump(self.pack_registrants(), file)
+    def __apply_journal_entries(self, entries: List[Dict[str, Any]]):
+        for entry in entries:
+            operation = entry.get('op')
+            data = entry.get('data', {})
+            if operation == 'register':
+                self.register(RegistrationData.from_dict(data), is_persist=False)
+            elif operation == 'unregister':
+                self.unregister(RegistrationData.from_dict(data), is_persist=False)
+            elif operation == 'unregister_all':
+                self.unregister_all(data.get('callback_url'), is_persist=False)
+
+    def __run_sync(self, sync_interval_sec: float):
+        while not self.__sync_stopped.wait(sync_interval_sec):
+            try:
+                self.__sync_registrants()
+            except Exception as e:
+                logging.getLogger().exception(f'Failed to sync registrants from shared journal: {e}')
+
+    def __sync_registrants(self):
+        with self.__locks.all():
+            entries = self.__journal.read_new_entries()
+            if entries is None:
+                # Missed changes (journal got compacted more than once since last read), rebuild from scratch.
+                self.__reload_registrants()
+                return
+            self.__apply_journal_entries(entries)
+
+    def __reload_registrants(self):
+        with self.__locks.all(), self.__journal.exclusive():
+            snapshot, entries = self.__journal.load()
+            target, batch_delivery_urls = EventRegistrationManager.__build_registrants(snapshot, entries)
+
+            # Only change registrations that differ (untouched ones keep delivering, without a gap).
+            for callback_url in [url for url in self.__registrants if url not in target]:
+                self.unregister_all(callback_url, is_persist=False)
+
+            for callback_url, channels in target.items():
+                registrant = self.__registrants.get(callback_url)
+                current = registrant.registrations if registrant else {}
+                for channel in [channel for channel in current if channel not in channels]:
+                    for event in list(current[channel]):
+                        self.unregister(RegistrationData(callback_url, [event], channel), is_persist=False)
+
+                is_batch_delivery = callback_url in batch_delivery_urls
+                for channel, events in channels.items():
+                    for event in [event for event in current.get(channel, {}) if event not in events]:
+                        self.unregister(RegistrationData(callback_url, [event], channel), is_persist=False)
+                    self.register(RegistrationData(callback_url, list(events), channel, is_batch_delivery),
+                                  is_persist=False)
+
+            self.__journal.reset_reader()
+
+    @staticmethod
+    def __build_registrants(snapshot: Dict[str, Any], entries: List[Dict[str, Any]]) -> Tuple[dict, set]:
+        # Replays journal entries over snapshot (same as registering them), without creating registrations.
+        registrants = {}
+        for callback_url, channels in snapshot.get(EventRegistrationManager.__REGISTRANTS_KEY, {}).items():
+            registrants[callback_url] = {channel: set(events) if events else {''}
+                                         for channel, events in channels.items()}
+        batch_delivery_urls = set(snapshot.get(EventRegistrationManager.__BATCH_DELIVERY_KEY, []))
+
+        for entry in entries:
+            operation = entry.get('op')
+            data = entry.get('data', {})
+            callback_url = data.get('callback_url')
+            events = data.get('events') or ['']
+            channel = data.get('channel', '')
+
+            if operation == 'register':
+                registrants.setdefault(callback_url, {}).setdefault(channel, set()).update(events)
+                if data.get('batch_delivery'):
+                    batch_delivery_urls.add(callback_url)
+                else:
+                    batch_delivery_urls.discard(callback_url)
+            elif operation == 'unregister':
+                channels = registrants.get(callback_url, {})
+                channels.get(channel, set()).difference_update(events)
+                if channel in channels and not channels[channel]:
+                    del channels[channel]
+                if callback_url in registrants and not channels:
+                    del registrants[callback_url]
+            elif operation == 'unregister_all':
+                registrants.pop(callback_url, None)
+
+        return registrants, batch_delivery_urls
+
+    def __add_registrant(self, registrant: 'Registrant'):
+        with self.__registry_lock:
+            registrants = dict(self.__registrants)
+            registrants[registrant.callback_url] = registrant
+            self.__registrants = registrants
+
+    def __remove_registrant(self, callback_url: str):
+        with self.__registry_lock:
+            registrants = dict(self.__registrants)
+            registrants.pop(callback_url, None)
+            self.__registrants = registrants
+
+    def __increment_version(self) -> int:
+        with self.__registry_lock:
+            self.__registrants_version += 1
+            return self.__registrants_version
+
+    def __journal_change(self, operation: str, data: Dict[str, Any]):
+        # Called with registrant locked, so changes to a registrant are journaled in the order they were made.
+        if self.__journal:
+            self.__journal.append(operation, data)
+
+    def __persist_change(self, version: int):
+        # Called with no registrant locked (compacting locks all of them, and it must not wait on a thread that
+        # holds one lock, while that thread waits on this one's).
+        if not self.__journal:
+            self.__persist_registrants(version)
+            return
+
+        if self.__journal.is_compaction_due:
+            with self.__locks.all():
+                if self.__journal.is_compaction_due:
+                    self.__persist_registrants()
+
+    def __persist_registrants(self, version: int = None):
+        if self.__journal:
+            # No changes while snapshot is taken (they'd be journaled after it, then dropped with the journal).
+            with self.__locks.all(), self.__journal.exclusive():
+                # Catch up with changes from processes sharing the journal, so snapshot includes them.
+                if self.__journal.is_shared:
+                    self.__sync_registrants()
+                self.__journal.compact(self.pack_registrants())
+            return
+
+        # Concurrent changes are written together: skip if a write made while waiting already included this change.
+        with self.__persist_lock:
+            if version is not None and self.__persisted_version >= version:
+                return
+            version = self.__registrants_version
+            with open(self.__registrants_file_path, 'w') as file:
+                json.dump(self.pack_registrants(), file)
+            self.__persisted_version = version
 
     def pack_registrants(self) -> Dict[str, Any]:
+        # Return copy, so callers adding to response don't change cached version.
+        version, packed = self.__packed_registrants
+        if version == self.__registrants_version:
+            return dict(packed)
+
+        version = self.__registrants_version
         registrants = {}
         for callback_url, registrant in self.__registrants.items():
             registrants[callback_url] = {}
-            for channel, registrations in registrant.registrations.items():
-                events = [] if len(registrations) == 0 else [event for event in registrations]
+            # Copies, registrant may be changing (it's only locked by threads changing it).
+            for channel, registrations in list(registrant.registrations.items()):
+                events = [] if len(registrations) == 0 else list(registrations)
                 registrants[callback_url][channel] = events
 
+        EventRegistrationManager.__log_message_registrants(registrants)
+
+        packed = {self.__REGISTRANTS_KEY: registrants}
+
+        # Only include registrants getting batch delivery, if there are any.
+        batch_delivery_urls = [url for url, registrant in self.__registrants.items() if registrant.is_batch_delivery]
+        if batch_delivery_urls:
+            packed[self.__BATCH_DELIVERY_KEY] = batch_delivery_urls
+
+        self.__packed_registrants = (version, packed)
+        return dict(packed)
+
+    @staticmethod
+    def __log_message_registrants(registrants: Dict[str, Any]):
+        # Only build dump of registrants if it will be logged.
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+
         message = '\nCurrent Registrations:\n'
         if Properties().has('PRETTY_PRINT') and Properties().get('PRETTY_PRINT'):
             message += json.dumps(registrants, indent=2) + '\n'
@@ -272,7 +737,13 @@ class EventRegistrationManager:
             message += f"{registrants}'\n'"
         logging.getLogger().debug(message)
 
-        return {self.__REGISTRANTS_KEY: registrants}
+    def __log_message_handed_over(self, owner: str, registration_data: RegistrationData):
+        logging.getLogger().info(f"Handed over registration of '{registration_data.callback_url}' "
+                                 f"(channel '{registration_data.channel}') to '{owner}'")
+
+    def __log_message_hand_over_failed(self, owner: str, registration_data: RegistrationData):
+        logging.getLogger().warning(f"Couldn't hand over registration of '{registration_data.callback_url}' "
+                                    f"(channel '{registration_data.channel}') to '{owner}', keeping it")
 
     def __handle_unreachable_client(self, event: Event):
         callback_url = event.payload.get('callback_url')
@@ -293,32 +764,57 @@ class RegistrationEvent(NamespacedEnum):
 
 
 class Registration:
-    def __init__(self, callback_url: str, event: str = None, channel: str = ''):
+    def __init__(self, callback_url: str, event: str = None, channel: str = '',
+                 delivery_engine: DeliveryEngine = None, is_batch_delivery: bool = False,
+                 subscription_index: 'SubscriptionIndex' = None, retry_queues: RetryQueues = None,
+                 circuit_breakers: CircuitBreakers = None, metrics: Metrics = None):
         self.__channel = channel if channel else ''
         self.__callback_url = callback_url
         self.__event = event or ''
+        self.__is_batch_delivery = is_batch_delivery
         self.__client_callback_timeout_sec = Properties().get('CLIENT_CALLBACK_TIMEOUT_SEC')
+        self.__delivery_engine = delivery_engine if delivery_engine else get_delivery_engine()
+        self.__subscription_index = subscription_index if subscription_index else get_subscription_index()
+        self.__retry_queues = retry_queues if retry_queues else get_retry_queues()
+        self.__circuit_breakers = circuit_breakers if circuit_breakers else get_circuit_breakers()
+        self.__metrics = metrics if metrics else get_metrics()
         self.__is_cancelled = False
 
-        # if first registration for channel, add event dispatch for channel.
-        if self.__channel not in EventDispatchManager().event_dispatchers:
-            EventDispatchManager().add_event_dispatch(self.__channel)
+        # Index registration (index gets events from channel's event dispatch, and hands them to registrations).
+        self.__subscription_index.add(self)
 
-        self.__event_dispatch = EventDispatchManager().event_dispatchers.get(self.__channel)
-        self.__event_dispatch.register(self.on_event, self.__get_event_as_list())
+    @property
+    def channel(self) -> str:
+        return self.__channel
+
+    @property
+    def callback_url(self) -> str:
+        return self.__callback_url
 
     @property
     def event(self) -> str:
         return self.__event
 
+    @property
+    def is_batch_delivery(self) -> bool:
+        return self.__is_batch_delivery
+
+    @is_batch_delivery.setter
+    def is_batch_delivery(self, is_batch_delivery: bool):
+        self.__is_batch_delivery = is_batch_delivery
+
     def cancel(self):
         if self.__is_cancelled:
             return
 
         self.__is_cancelled = True
-        self.__event_dispatch.unregister(self.on_event, self.__get_event_as_list())
+        self.__subscription_index.remove(self)
 
     def on_event(self, event: Event):
+        self.deliver(RemoteEventData(self.__channel, event))
+
+    def deliver(self, remote_event: RemoteEventData):
+        event = remote_event.event
         if self.__is_cancelled:
             self.__log_message_skipping_post(event, 'registration_cancelled')
             return
@@ -332,29 +828,337 @@ class Registration:
                     self.__log_message_skipping_post(event, 'destination is originator')
                     return
 
-        remote_event = RemoteEventData(self.__channel, event)
+        # Hand off to delivery engine (so a slow client doesn't hold up delivery to other clients).
+        engine = self.__delivery_engine
+        if self.__is_batch_delivery:
+            send_batch = self.__deliver_batch_async if engine.is_async else self.__deliver_batch
+            engine.submit_batched(self.__callback_url, (self, remote_event), send_batch)
+        elif engine.is_async:
+            engine.submit(self.__callback_url, lambda: self.__deliver_async(remote_event))
+        else:
+            engine.submit(self.__callback_url, lambda: self.__deliver(remote_event))
+
+    def __deliver(self, remote_event: RemoteEventData):
+        # Registration may have been cancelled while event was queued.
+        if self.__is_cancelled:
+            self.__log_message_skipping_post(remote_event.event, 'registration_cancelled')
+            return
+
+        if self.__hold_if_retrying([remote_event]) or self.__hold_if_circuit_open([remote_event]):
+            return
+
+        try:
+            data, headers = self.__encode(remote_event)
+            response = self.__post(data=data, headers=headers)
+            if Registration.__is_rejected(response):
+                self.__log_message_rejected(1)
+                return
+            self.__log_message_posted_event(remote_event.event)
+        except (ApiConnectionError, InvalidSchema, Timeout):
+            if not self.__retry([remote_event]):
+                self.__handle_unreachable_client()
+
+    def __deliver_batch(self, batch: [tuple]):
+        # Batch can hold events from any of registrant's registrations (all share the same callback url).
+        batch = [(registration, remote_event) for registration, remote_event in batch
+                 if not registration.__is_cancelled]
+        if not batch:
+            return
+
+        remote_events = [remote_event for _, remote_event in batch]
+        if self.__hold_if_retrying(remote_events) or self.__hold_if_circuit_open(remote_events):
+            return
+
+        try:
+            response = self.__post(json=RemoteEventBatchData(remote_events).dict)
+            if Registration.__is_rejected(response):
+                self.__log_message_rejected(len(remote_events))
+                return
+            self.__log_message_posted_batch(remote_events)
+        except (ApiConnectionError, InvalidSchema, Timeout):
+            if self.__retry(remote_events):
+                return
+            for registration in {registration for registration, _ in batch}:
+                registration.__handle_unreachable_client()
+
+    async def __deliver_async(self, remote_event: RemoteEventData):
+        # Same as __deliver, for async delivery engine (posts from event loop).
+        if self.__is_cancelled:
+            self.__log_message_skipping_post(remote_event.event, 'registration_cancelled')
+            return
+
+        if self.__hold_if_retrying([remote_event]) or self.__hold_if_circuit_open([remote_event]):
+            return
+
+        try:
+            data, headers = self.__encode(remote_event)
+            status = await self.__post_async(data=data, headers=headers)
+            if status == HTTP_STATUS_TOO_MANY_REQUESTS:
+                self.__log_message_rejected(1)
+                return
+            self.__log_message_posted_event(remote_event.event)
+        except ApiConnectionError:
+            if not self.__retry([remote_event]):
+                # Unregistering persists registrations, keep that off the event loop.
+                self.__delivery_engine.run_blocking(self.__handle_unreachable_client)
+
+    async def __deliver_batch_async(self, batch: [tuple]):
+        # Same as __deliver_batch, for async delivery engine (posts from event loop).
+        batch = [(registration, remote_event) for registration, remote_event in batch
+                 if not registration.__is_cancelled]
+        if not batch:
+            return
+
+        remote_events = [remote_event for _, remote_event in batch]
+        if self.__hold_if_retrying(remote_events) or self.__hold_if_circuit_open(remote_events):
+            return
 
         try:
-            APICaller.make_post_call(self.__callback_url, json=remote_event.dict,
-                                     timeout_sec=self.__client_callback_timeout_sec)
-            self.__log_message_posted_event(event)
-        except (ApiConnectionError, InvalidSchema):
-            self.__handle_unreachable_client()
+            status = await self.__post_async(json=RemoteEventBatchData(remote_events).dict)
+            if status == HTTP_STATUS_TOO_MANY_REQUESTS:
+                self.__log_message_rejected(len(remote_events))
+                return
+            self.__log_message_posted_batch(remote_events)
+        except ApiConnectionError:
+            if self.__retry(remote_events):
+                return
+            for registration in {registration for registration, _ in batch}:
+                self.__delivery_engine.run_blocking(registration.__handle_unreachable_client)
+
+    def resume_retry(self):
+        # Retry events held for client before a restart (spilled to disk), if there are any.
+        queue = self.__retry_queues.resume(self.__callback_url, RemoteEventData.from_dict)
+        if queue and queue.schedule_retry():
+            self.__delivery_engine.submit(self.__callback_url, self.__get_retry_delivery())
+
+    def __hold_if_retrying(self, remote_events: [RemoteEventData]) -> bool:
+        # Client is unreachable, hold events behind ones not delivered yet (so they're delivered in order).
+        queue = self.__retry_queues.find(self.__callback_url)
+        if not queue or not queue.is_active:
+            return False
+
+        queue.add_all(remote_events)
+        return True
+
+    def __hold_if_circuit_open(self, remote_events: [RemoteEventData]) -> bool:
+        # Client is sick (failing, or too slow), don't tie up a worker on it.  Hold events until circuit lets a probe
+        # through (or skip them, if retries are off).
+        breaker = self.__circuit_breakers.get(self.__callback_url)
+        if not breaker or breaker.allow_request():
+            return False
+
+        if not self.__retry_queues.is_enabled:
+            for remote_event in remote_events:
+                self.__log_message_skipping_post(remote_event.event, 'circuit open')
+            return True
+
+        queue = self.__retry_queues.get(self.__callback_url, RemoteEventData.from_dict)
+        queue.add_all(remote_events)
+        if queue.schedule_retry():
+            self.__delivery_engine.submit_later(self.__callback_url, breaker.retry_after_sec,
+                                                self.__get_retry_delivery())
+        return True
+
+    def __wait_for_circuit(self) -> bool:
+        # Held events wait (without counting as a failed retry) while circuit is open.
+        breaker = self.__circuit_breakers.get(self.__callback_url)
+        if not breaker or breaker.allow_request():
+            return False
+
+        self.__delivery_engine.submit_later(self.__callback_url, breaker.retry_after_sec, self.__get_retry_delivery())
+        return True
+
+    def __retry(self, remote_events: [RemoteEventData]) -> bool:
+        # Hold events that failed to send, and retry after a backoff (instead of dropping client on first failure).
+        # False if client should be dropped (retries are off).
+        if not self.__retry_queues.is_enabled:
+            return False
+
+        queue = self.__retry_queues.get(self.__callback_url, RemoteEventData.from_dict)
+        queue.add_all(remote_events)
+        return self.__schedule_retry(queue) if queue.schedule_retry() else True
+
+    def __schedule_retry(self, queue: RetryQueue) -> bool:
+        # False if client failed too many times in a row (and should be dropped).
+        delay_sec = self.__retry_queues.on_failure(queue)
+        if delay_sec is None:
+            self.__retry_queues.discard(self.__callback_url)
+            return False
+
+        self.__delivery_engine.submit_later(self.__callback_url, delay_sec, self.__get_retry_delivery())
+        return True
+
+    def __get_retry_delivery(self):
+        return self.__deliver_held_async if self.__delivery_engine.is_async else self.__deliver_held
+
+    def __deliver_held(self):
+        # Retry held events (oldest first), until all are delivered, or client fails again.
+        queue = self.__retry_queues.find(self.__callback_url)
+        remote_events = self.__get_held_events(queue)
+        if not remote_events:
+            return
+
+        try:
+            if len(remote_events) == 1 and not self.__is_batch_delivery:
+                data, headers = self.__encode(remote_events[0])
+                response = self.__post(data=data, headers=headers)
+            else:
+                response = self.__post(json=RemoteEventBatchData(remote_events).dict)
+        except (ApiConnectionError, InvalidSchema, Timeout):
+            if not self.__schedule_retry(queue):
+                self.__handle_unreachable_client()
+            return
+
+        self.__on_held_events_sent(queue, remote_events, Registration.__is_rejected(response))
+
+    async def __deliver_held_async(self):
+        # Same as __deliver_held, for async delivery engine (posts from event loop).
+        queue = self.__retry_queues.find(self.__callback_url)
+        remote_events = self.__get_held_events(queue)
+        if not remote_events:
+            return
+
+        try:
+            if len(remote_events) == 1 and not self.__is_batch_delivery:
+                data, headers = self.__encode(remote_events[0])
+                status = await self.__post_async(data=data, headers=headers)
+            else:
+                status = await self.__post_async(json=RemoteEventBatchData(remote_events).dict)
+        except ApiConnectionError:
+            if not self.__schedule_retry(queue):
+                self.__delivery_engine.run_blocking(self.__handle_unreachable_client)
+            return
+
+        self.__on_held_events_sent(queue, remote_events, status == HTTP_STATUS_TOO_MANY_REQUESTS)
+
+    def __get_held_events(self, queue: RetryQueue) -> [RemoteEventData]:
+        # Queue is gone if client was unregistered meanwhile.
+        if not queue:
+            return []
+
+        # Batch delivery clients get held events in batches (others one at a time).
+        count = 1
+        if self.__is_batch_delivery:
+            count = int(Properties().get(DELIVERY_MAX_BATCH_SIZE)) if Properties().has(DELIVERY_MAX_BATCH_SIZE) \
+                else DEFAULT_MAX_BATCH_SIZE
+        remote_events = queue.peek(count)
+        if not remote_events and not queue.on_retry_done():
+            self.__retry_queues.discard(self.__callback_url)
+        if remote_events and self.__wait_for_circuit():
+            return []
+        return remote_events
+
+    def __on_held_events_sent(self, queue: RetryQueue, remote_events: [RemoteEventData], is_rejected: bool):
+        # Client is reachable again (events it rejected, per its backpressure policy, are dropped as usual).
+        queue.remove(len(remote_events))
+        if is_rejected:
+            self.__log_message_rejected(len(remote_events))
+        else:
+            self.__log_message_posted_batch(remote_events)
+
+        # Keep going (through delivery engine, so it stays in order with other deliveries to client) until all sent.
+        if queue.on_retry_done():
+            self.__delivery_engine.submit(self.__callback_url, self.__get_retry_delivery())
+        else:
+            self.__retry_queues.discard(self.__callback_url)
+
+    def __post(self, **kwargs):
+        # Post to client, noting how it went (and how long it took) in its circuit breaker, and in metrics.
+        start = time.monotonic()
+        try:
+            response = APICaller.make_post_call(self.__callback_url, timeout_sec=self.__client_callback_timeout_sec,
+                                                **kwargs)
+        except Exception:
+            self.__on_post_failed(time.monotonic() - start)
+            raise
+
+        self.__on_posted(getattr(response, 'status_code', None), time.monotonic() - start)
+        return response
+
+    async def __post_async(self, **kwargs) -> int:
+        # Same as __post, for async delivery engine.
+        start = time.monotonic()
+        try:
+            status = await self.__delivery_engine.post(self.__callback_url,
+                                                       timeout_sec=self.__client_callback_timeout_sec, **kwargs)
+        except Exception:
+            self.__on_post_failed(time.monotonic() - start)
+            raise
+
+        self.__on_posted(status, time.monotonic() - start)
+        return status
+
+    def __on_post_failed(self, latency_sec: float):
+        breaker = self.__circuit_breakers.get(self.__callback_url)
+        if breaker:
+            breaker.on_failure()
+        self.__record_post(DELIVERY_FAILED, latency_sec)
+
+    def __on_posted(self, status: int, latency_sec: float):
+        # Server errors count as failures (client is up, but sick).
+        is_failed = bool(status and status >= 500)
+        breaker = self.__circuit_breakers.get(self.__callback_url)
+        if breaker and is_failed:
+            breaker.on_failure(latency_sec)
+        elif breaker:
+            breaker.on_success(latency_sec)
+
+        if is_failed:
+            self.__record_post(DELIVERY_FAILED, latency_sec)
+        elif status == HTTP_STATUS_TOO_MANY_REQUESTS:
+            self.__record_post(DELIVERY_REJECTED, latency_sec)
+        else:
+            self.__record_post(DELIVERY_SUCCESS, latency_sec)
+
+    def __record_post(self, result: str, latency_sec: float):
+        self.__metrics.inc(DELIVERIES, (self.__callback_url, result))
+        self.__metrics.observe(DELIVERY_LATENCY, (self.__callback_url,), latency_sec)
+
+    def __encode(self, remote_event: RemoteEventData) -> Tuple[bytes, Dict[str, str]]:
+        # Send in format agreed on with client (json, unless both support a binary one), compressed if large (and
+        # client reads the encoding).  Encoded once per event, however many clients it's sent to.
+        try:
+            negotiator = serialization.get_content_negotiator()
+            content_type = negotiator.get_content_type(self.__callback_url)
+            encoding = get_compressor().get_encoding(self.__callback_url, len(remote_event.encode(content_type)))
+            return remote_event.encode(content_type, encoding), \
+                Compressor.add_content_encoding(negotiator.get_headers(content_type), encoding)
+        except Exception:
+            # Nothing gets posted, release probe circuit may have let through (or it stays half open for good).
+            breaker = self.__circuit_breakers.find(self.__callback_url)
+            if breaker:
+                breaker.release_probe()
+            raise
+
+    @staticmethod
+    def __is_rejected(response) -> bool:
+        # Client is too busy to take event(s), and rejected them (per its backpressure policy).
+        return getattr(response, 'status_code', None) == HTTP_STATUS_TOO_MANY_REQUESTS
+
+    def __log_message_rejected(self, count: int):
+        logging.getLogger().warning(f"'{self.__callback_url}' is too busy, rejected {count} event(s)")
+
+    def __log_message_posted_batch(self, remote_events: [RemoteEventData]):
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+        logging.getLogger().debug(f"Posted batch of {len(remote_events)} event(s) to '{self.__callback_url}'")
 
     def __log_message_posted_event(self, event: Event):
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
         logging.getLogger().debug(f"Posted '{event.name}' to '{self.__callback_url}'")
 
     def __log_message_skipping_post(self, event: Event, reason: str):
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
         logging.getLogger().debug(
             f"Skipping posting '{event.name}' to '{self.__callback_url}'...{reason}")
 
-    def __get_event_as_list(self) -> [str]:
-        return [self.__event] if self.__event else []
-
     def __handle_unreachable_client(self):
         self.cancel()
 
-        self.__event_dispatch.post_event(RegistrationEvent.CALLBACK_FAILED_EVENT.namespaced_value, {
+        event_dispatch = EventDispatchManager().event_dispatchers.get(self.__channel)
+        event_dispatch.post_event(RegistrationEvent.CALLBACK_FAILED_EVENT.namespaced_value, {
             'channel': self.__channel,
             'callback_url': self.__callback_url,
             'event': self.__event
@@ -378,8 +1182,11 @@ class Registration:
 class Registrant:
     __ALL_EVENT = ''
 
-    def __init__(self, callback_url: str):
+    def __init__(self, callback_url: str, is_batch_delivery: bool = False,
+                 subscription_index: 'SubscriptionIndex' = None):
         self.__callback_url = callback_url
+        self.__is_batch_delivery = is_batch_delivery
+        self.__subscription_index = subscription_index
         self.__registrations: Dict[str, Dict[str, Registration]] = {}
 
         try:
@@ -395,6 +1202,17 @@ class Registrant:
     def callback_url(self) -> str:
         return self.__callback_url
 
+    @property
+    def is_batch_delivery(self) -> bool:
+        return self.__is_batch_delivery
+
+    @is_batch_delivery.setter
+    def is_batch_delivery(self, is_batch_delivery: bool):
+        self.__is_batch_delivery = is_batch_delivery
+        for channel, registrations in self.__registrations.items():
+            for event, registration in registrations.items():
+                registration.is_batch_delivery = is_batch_delivery
+
     def register(self, event: str = None, channel: str = '') -> bool:
         if channel not in self.__registrations:
             self.__registrations[channel] = {}
@@ -407,7 +1225,9 @@ class Registrant:
         if key in registrations:
             return False
 
-        registrations[key] = Registration(self.__callback_url, event, channel)
+        registrations[key] = Registration(self.__callback_url, event, channel,
+                                          is_batch_delivery=self.__is_batch_delivery,
+                                          subscription_index=self.__subscription_index)
 
         # self.__log_message_registrations()
         return True
@@ -445,10 +1265,26 @@ class Registrant:
 
         self.__registrations = {}
 
+        # Drop events held for client (if it was unreachable), its health, and its metrics.
+        get_retry_queues().discard(self.__callback_url)
+        get_circuit_breakers().discard(self.__callback_url)
+        get_metrics().discard(self.__callback_url)
+
         self.log_message_registrations(self.__callback_url)
         return is_unregistered
 
+    def resume_retry(self):
+        # Held events are per client (not per registration), any registration can retry them.
+        for registrations in self.__registrations.values():
+            for registration in registrations.values():
+                registration.resume_retry()
+                return
+
     def log_message_registrations(self, registrant_name: str):
+        # Only build dump of registrations if it will be logged.
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+
         message = f'Registrations for: {registrant_name}\n'
         regs = []
         for channel, registrations in self.__registrations.items():
@@ -466,5 +1302,162 @@ class Registrant:
     def dict(self) -> Dict[str, Any]:
         return {
             'callback_url': self.__callback_url,
+            'batch_delivery': self.__is_batch_delivery,
             'registrations': Registration.to_dict_list(self.__registrations)
         }
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class ChannelSubscriptions:
+    """
+    PURPOSE:
+    - Indexes registrations on a channel, by event name, then by callback url.
+    - Indexes registrations for event name patterns (e.g. 'worker.*', 'router.#') in a topic trie, so matching an
+      event against them costs the same however many there are.
+    - Is the only handler registered with the channel's event dispatch (for all events).
+    - Per event, does one lookup for registrations, and builds the remote event once, for all of its registrations
+      (which is serialized once per format, on first delivery in it).
+    """
+
+    __ALL_EVENT = ''
+
+    def __init__(self, channel: str):
+        self.__channel = channel
+        self.__registrations: Dict[str, Dict[str, Registration]] = {}
+        self.__patterns = TopicTrie()
+        self.__lock = threading.RLock()
+
+    @property
+    def channel(self) -> str:
+        return self.__channel
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.__registrations and self.__patterns.is_empty
+
+    @property
+    def registration_count(self) -> int:
+        with self.__lock:
+            return sum(len(registrations) for registrations in self.__registrations.values()) + self.__patterns.size
+
+    def add(self, registration: Registration):
+        with self.__lock:
+            if is_pattern(registration.event):
+                self.__patterns.add(registration.event, registration.callback_url, registration)
+                return
+
+            if registration.event not in self.__registrations:
+                self.__registrations[registration.event] = {}
+            self.__registrations[registration.event][registration.callback_url] = registration
+
+    def remove(self, registration: Registration):
+        with self.__lock:
+            if is_pattern(registration.event):
+                self.__patterns.remove(registration.event, registration.callback_url, registration)
+                return
+
+            registrations = self.__registrations.get(registration.event, {})
+            if registrations.get(registration.callback_url) is registration:
+                del registrations[registration.callback_url]
+                if not registrations:
+                    del self.__registrations[registration.event]
+
+    def get_registrations(self, event_name: str) -> [Registration]:
+        with self.__lock:
+            registrations = dict(self.__registrations.get(self.__ALL_EVENT, {}))
+
+            # More specific registration takes precedence (each callback url gets event only once): a pattern over
+            # all events, a specific event over a pattern.
+            registrations.update(self.__patterns.match(event_name))
+            registrations.update(self.__registrations.get(event_name, {}))
+            return list(registrations.values())
+
+    def on_event(self, event: Event):
+        registrations = self.get_registrations(event.name)
+        if not registrations:
+            return
+
+        # All deliveries share the same remote event (and the bodies it encodes to, per format).
+        remote_event = RemoteEventData(self.__channel, event)
+        for registration in registrations:
+            registration.deliver(remote_event)
+
+
+# -------------------------------------------------------------------------------------------------
+
+
+class SubscriptionIndex:
+    """
+    PURPOSE:
+    - Keeps registrations per channel (see ChannelSubscriptions).
+    - Registers a channel's subscriptions with the channel's event dispatch when channel gets its first
+      registration, and unregisters them when channel has no more registrations.
+    """
+
+    def __init__(self):
+        self.__channels: Dict[str, ChannelSubscriptions] = {}
+        self.__lock = threading.RLock()
+
+    @property
+    def channels(self) -> Dict[str, ChannelSubscriptions]:
+        return self.__channels
+
+    def add(self, registration: Registration):
+        with self.__lock:
+            try:
+                channel_subscriptions = self.__channels[registration.channel]
+            except KeyError:
+                channel_subscriptions = ChannelSubscriptions(registration.channel)
+                self.__channels[registration.channel] = channel_subscriptions
+
+            is_first_registration = channel_subscriptions.is_empty
+            channel_subscriptions.add(registration)
+
+            if is_first_registration:
+                SubscriptionIndex.__get_event_dispatch(registration.channel).register(
+                    channel_subscriptions.on_event, [])
+
+    def remove(self, registration: Registration):
+        with self.__lock:
+            channel_subscriptions = self.__channels.get(registration.channel)
+            if not channel_subscriptions:
+                return
+
+            channel_subscriptions.remove(registration)
+
+            if channel_subscriptions.is_empty:
+                del self.__channels[registration.channel]
+                SubscriptionIndex.__get_event_dispatch(registration.channel).unregister(
+                    channel_subscriptions.on_event, [])
+
+    def clear(self):
+        with self.__lock:
+            for channel, channel_subscriptions in self.__channels.items():
+                SubscriptionIndex.__get_event_dispatch(channel).unregister(channel_subscriptions.on_event, [])
+            self.__channels = {}
+
+    def get_registrations(self, channel: str, event_name: str) -> [Registration]:
+        channel_subscriptions = self.__channels.get(channel)
+        return channel_subscriptions.get_registrations(event_name) if channel_subscriptions else []
+
+    @staticmethod
+    def __get_event_dispatch(channel: str):
+        # If first registration for channel, add event dispatch for channel.
+        if channel not in EventDispatchManager().event_dispatchers:
+            EventDispatchManager().add_event_dispatch(channel)
+        return EventDispatchManager().event_dispatchers.get(channel)
+
+
+_default_subscription_index: SubscriptionIndex = None
+_default_subscription_index_lock = threading.Lock()
+
+
+def get_subscription_index() -> SubscriptionIndex:
+    global _default_subscription_index
+
+    with _default_subscription_index_lock:
+        if not _default_subscription_index:
+            _default_subscription_index = SubscriptionIndex()
+        return _default_subscription_index
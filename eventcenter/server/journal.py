@@ -0,0 +1,296 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from eventdispatch import Properties
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Journal properties.
+REGISTRANTS_JOURNAL = 'REGISTRANTS_JOURNAL'
+REGISTRANTS_JOURNAL_FSYNC = 'REGISTRANTS_JOURNAL_FSYNC'
+REGISTRANTS_JOURNAL_FSYNC_INTERVAL_SEC = 'REGISTRANTS_JOURNAL_FSYNC_INTERVAL_SEC'
+REGISTRANTS_JOURNAL_COMPACT_EVERY = 'REGISTRANTS_JOURNAL_COMPACT_EVERY'
+REGISTRANTS_SHARED = 'REGISTRANTS_SHARED'
+REGISTRANTS_SYNC_INTERVAL_SEC = 'REGISTRANTS_SYNC_INTERVAL_SEC'
+
+# Fsync policies.
+FSYNC_ALWAYS = 'always'
+FSYNC_INTERVAL = 'interval'
+FSYNC_NEVER = 'never'
+
+DEFAULT_FSYNC = FSYNC_INTERVAL
+DEFAULT_FSYNC_INTERVAL_SEC = 1.0
+DEFAULT_COMPACT_EVERY = 1000
+DEFAULT_SYNC_INTERVAL_SEC = 0.5
+
+JOURNAL_FILE_SUFFIX = '.journal'
+LOCK_FILE_SUFFIX = '.lock'
+GENERATION_KEY = 'generation'
+
+
+class RegistrantsJournal:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Persists registration changes (deltas) by appending them to a journal file, instead of rewriting all
+      registrants on every change.
+    - Compacts journal into a snapshot (the registrants file) once enough changes are journaled.
+    - Syncs journal to disk per configured policy (always, at an interval, or never...leaving it to the OS).
+    - When shared (by several processes, e.g. server workers), serializes writes across processes with a file lock,
+      tags entries with their writer, and lets each writer read entries written by the others.
+    """
+
+    def __init__(self, snapshot_file_path: str, fsync_policy: str = None, fsync_interval_sec: float = None,
+                 compact_every: int = None, is_shared: bool = None):
+        self.__snapshot_file_path = snapshot_file_path
+        self.__journal_file_path = snapshot_file_path + JOURNAL_FILE_SUFFIX
+
+        self.__fsync_policy = RegistrantsJournal.__get_property(REGISTRANTS_JOURNAL_FSYNC, fsync_policy,
+                                                                DEFAULT_FSYNC)
+        self.__fsync_interval_sec = float(RegistrantsJournal.__get_property(
+            REGISTRANTS_JOURNAL_FSYNC_INTERVAL_SEC, fsync_interval_sec, DEFAULT_FSYNC_INTERVAL_SEC))
+        self.__compact_every = int(RegistrantsJournal.__get_property(
+            REGISTRANTS_JOURNAL_COMPACT_EVERY, compact_every, DEFAULT_COMPACT_EVERY))
+        self.__is_shared = RegistrantsJournal.__get_property(REGISTRANTS_SHARED, is_shared, False) == True
+        if self.__is_shared and not fcntl:
+            raise RuntimeError('Shared registrants journal needs file locking (fcntl), not available on platform')
+
+        self.__lock = threading.RLock()
+        self.__file = None
+        self.__entry_count = 0
+        self.__last_fsync_time = time.monotonic()
+
+        # Shared journal state (cross-process lock, who's writing, and how far this writer has read).
+        self.__writer_id = uuid.uuid4().hex
+        self.__lock_file = None
+        self.__lock_depth = 0
+        self.__reader = None
+        self.__read_generation = 0
+        self.__partial_line = b''
+
+    @property
+    def journal_file_path(self) -> str:
+        return self.__journal_file_path
+
+    @property
+    def entry_count(self) -> int:
+        return self.__entry_count
+
+    @property
+    def is_compaction_due(self) -> bool:
+        return self.__entry_count >= self.__compact_every
+
+    @property
+    def is_shared(self) -> bool:
+        return self.__is_shared
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        # Holds journal for this thread (and, if shared, for this process across processes).  Can be nested.
+        with self.__lock:
+            if self.__is_shared and self.__lock_depth == 0:
+                if not self.__lock_file:
+                    self.__lock_file = open(self.__journal_file_path + LOCK_FILE_SUFFIX, 'a')
+                fcntl.flock(self.__lock_file.fileno(), fcntl.LOCK_EX)
+            self.__lock_depth += 1
+            try:
+                yield
+            finally:
+                self.__lock_depth -= 1
+                if self.__is_shared and self.__lock_depth == 0:
+                    fcntl.flock(self.__lock_file.fileno(), fcntl.LOCK_UN)
+
+    def load(self) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        snapshot = {}
+        try:
+            with open(self.__snapshot_file_path, 'r') as file:
+                snapshot = json.load(file) or {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+        entries = []
+        try:
+            with open(self.__journal_file_path, 'r') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partially written entry (e.g. crashed mid-write), nothing valid can follow it.
+                        self.__logger.warning(f"Ignoring incomplete entry in '{self.__journal_file_path}'")
+                        break
+
+                    # Skip header (of shared journal).
+                    if 'op' in entry:
+                        entries.append(entry)
+        except FileNotFoundError:
+            pass
+
+        return snapshot, entries
+
+    def append(self, operation: str, data: Dict[str, Any] = None):
+        entry = {'op': operation}
+        if data:
+            entry['data'] = data
+        if self.__is_shared:
+            entry['writer'] = self.__writer_id
+
+        with self.exclusive():
+            if self.__is_shared:
+                self.__reopen_if_replaced()
+            if not self.__file:
+                self.__file = open(self.__journal_file_path, 'a')
+
+            self.__file.write(json.dumps(entry) + '\n')
+            self.__file.flush()
+            self.__entry_count += 1
+
+            if self.__fsync_policy == FSYNC_ALWAYS:
+                self.__fsync()
+            elif self.__fsync_policy == FSYNC_INTERVAL:
+                if time.monotonic() - self.__last_fsync_time >= self.__fsync_interval_sec:
+                    self.__fsync()
+
+    def compact(self, snapshot: Dict[str, Any]):
+        with self.exclusive():
+            # Write snapshot to temp file first, then swap, so a crash never leaves a partial snapshot.
+            temp_file_path = self.__snapshot_file_path + '.tmp'
+            with open(temp_file_path, 'w') as file:
+                json.dump(snapshot, file)
+                file.flush()
+                if self.__fsync_policy != FSYNC_NEVER:
+                    os.fsync(file.fileno())
+            os.replace(temp_file_path, self.__snapshot_file_path)
+
+            # Snapshot now holds all journaled changes, start journal over.
+            if self.__file:
+                self.__file.close()
+                self.__file = None
+
+            if self.__is_shared:
+                # Swap in a new journal (instead of truncating), so other processes can finish reading the old one.
+                # Caller is expected to have read all entries (under the same exclusive hold) before compacting.
+                self.__create_journal(self.__read_generation + 1)
+                self.reset_reader()
+            else:
+                self.__file = open(self.__journal_file_path, 'w')
+
+            self.__entry_count = 0
+            self.__last_fsync_time = time.monotonic()
+
+    def reset_reader(self):
+        # Start reading from the end of the current journal (entries so far are assumed to be applied).
+        with self.exclusive():
+            if not os.path.isfile(self.__journal_file_path):
+                self.__create_journal(0)
+            self.__open_reader()
+            self.__entry_count = len(self.__read_available(is_count_own=True))
+
+    def read_new_entries(self) -> Optional[List[Dict[str, Any]]]:
+        # Returns entries written by others since last read, or None if some were missed (journal was
+        # compacted more than once since last read), in which case the caller needs to reload snapshot and journal.
+        with self.__lock:
+            if not self.__reader:
+                self.reset_reader()
+
+            entries = self.__read_available()
+            if os.fstat(self.__reader.fileno()).st_ino != RegistrantsJournal.__get_inode(self.__journal_file_path):
+                # Journal was compacted. Old one is complete (no more writes to it), finish it, then go to new one.
+                entries += self.__read_available()
+                generation = self.__read_generation
+                self.__open_reader()
+                if self.__read_generation != generation + 1:
+                    return None
+                entries += self.__read_available()
+
+            return [entry for entry in entries if entry.get('writer') != self.__writer_id]
+
+    def close(self):
+        with self.__lock:
+            if self.__file:
+                self.__fsync()
+                self.__file.close()
+                self.__file = None
+            if self.__reader:
+                self.__reader.close()
+                self.__reader = None
+            if self.__lock_file:
+                self.__lock_file.close()
+                self.__lock_file = None
+
+    def __create_journal(self, generation: int):
+        temp_file_path = self.__journal_file_path + '.tmp'
+        with open(temp_file_path, 'w') as file:
+            file.write(json.dumps({GENERATION_KEY: generation}) + '\n')
+        os.replace(temp_file_path, self.__journal_file_path)
+
+    def __open_reader(self):
+        if self.__reader:
+            self.__reader.close()
+        self.__reader = open(self.__journal_file_path, 'rb')
+        self.__partial_line = b''
+
+        # Journal starts with its generation (journals written before sharing have none, count as first one).
+        try:
+            header = json.loads(self.__reader.readline())
+        except json.JSONDecodeError:
+            header = {}
+        if GENERATION_KEY in header:
+            self.__read_generation = header[GENERATION_KEY]
+        else:
+            self.__read_generation = 0
+            self.__reader.seek(0)
+
+    def __read_available(self, is_count_own: bool = False) -> List[Dict[str, Any]]:
+        # Counts entries read toward compaction (own entries are counted when appended, unless asked to here).
+        entries = []
+        data = self.__partial_line + self.__reader.read()
+        lines = data.split(b'\n')
+
+        # Last piece is either empty or a line still being written, keep it for next read.
+        self.__partial_line = lines.pop()
+        for line in lines:
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                self.__logger.warning(f"Ignoring invalid entry in '{self.__journal_file_path}'")
+                continue
+            if 'op' in entry:
+                entries.append(entry)
+                if is_count_own or entry.get('writer') != self.__writer_id:
+                    self.__entry_count += 1
+        return entries
+
+    def __reopen_if_replaced(self):
+        if self.__file and os.fstat(self.__file.fileno()).st_ino != \
+                RegistrantsJournal.__get_inode(self.__journal_file_path):
+            self.__file.close()
+            self.__file = None
+
+    def __fsync(self):
+        os.fsync(self.__file.fileno())
+        self.__last_fsync_time = time.monotonic()
+
+    @staticmethod
+    def __get_inode(path: str) -> int:
+        try:
+            return os.stat(path).st_ino
+        except FileNotFoundError:
+            return -1
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
@@ -0,0 +1,44 @@
+import contextlib
+import threading
+from typing import Any
+
+from eventdispatch import Properties
+
+# Locking properties.
+REGISTRANTS_LOCK_STRIPES = 'REGISTRANTS_LOCK_STRIPES'
+
+DEFAULT_LOCK_STRIPES = 64
+
+
+class LockStripes:
+    """
+    PURPOSE:
+    - Spreads locking of keys (e.g. callback urls) over a fixed set of locks, so threads working on unrelated keys
+      rarely wait on each other, without keeping a lock per key.
+    - Same key always maps to same lock (work on a key is still serialized, and done in order).
+    - Locks all stripes at once for work spanning all keys (in stripe order, so two threads doing it can't deadlock).
+    """
+
+    def __init__(self, count: int = None):
+        count = int(LockStripes.__get_property(REGISTRANTS_LOCK_STRIPES, count, DEFAULT_LOCK_STRIPES))
+        self.__locks = [threading.RLock() for _ in range(max(1, count))]
+
+    @property
+    def count(self) -> int:
+        return len(self.__locks)
+
+    def get(self, key: str) -> threading.RLock:
+        return self.__locks[hash(key) % len(self.__locks)]
+
+    @contextlib.contextmanager
+    def all(self):
+        with contextlib.ExitStack() as stack:
+            for lock in self.__locks:
+                stack.enter_context(lock)
+            yield
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
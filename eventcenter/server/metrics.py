@@ -0,0 +1,253 @@
+import bisect
+import threading
+import weakref
+from typing import Any, Dict, List, Tuple
+
+from eventdispatch import Properties
+
+# Metrics properties.
+METRICS_ENABLED = 'METRICS_ENABLED'
+METRICS_LATENCY_BUCKETS = 'METRICS_LATENCY_BUCKETS'
+
+DEFAULT_LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+METRICS_ENDPOINT = '/metrics'
+CONTENT_TYPE_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+
+TYPE_COUNTER = 'counter'
+TYPE_GAUGE = 'gauge'
+TYPE_HISTOGRAM = 'histogram'
+
+# Metrics (recorded as events come and go).
+EVENTS_RECEIVED = 'eventcenter_events_received_total'
+DELIVERIES = 'eventcenter_deliveries_total'
+DELIVERY_LATENCY = 'eventcenter_delivery_latency_seconds'
+
+# Metrics read when scraped.
+REGISTRANTS = 'eventcenter_registrants'
+REGISTRATIONS = 'eventcenter_registrations'
+DELIVERY_QUEUE_DEPTH = 'eventcenter_delivery_queue_depth'
+RETRY_QUEUE_DEPTH = 'eventcenter_retry_queue_depth'
+
+CALLBACK_URL_LABEL = 'callback_url'
+
+DELIVERY_SUCCESS = 'success'
+DELIVERY_REJECTED = 'rejected'
+DELIVERY_FAILED = 'failed'
+
+# Type, label names and help of each metric.
+DESCRIPTIONS = {
+    EVENTS_RECEIVED: (TYPE_COUNTER, ['channel'], 'Events posted to channel'),
+    DELIVERIES: (TYPE_COUNTER, [CALLBACK_URL_LABEL, 'result'],
+                 'Posts (of an event, or a batch of events) to callback url, by result (success, rejected, failed)'),
+    DELIVERY_LATENCY: (TYPE_HISTOGRAM, [CALLBACK_URL_LABEL], 'Time taken by posts to callback url'),
+    REGISTRANTS: (TYPE_GAUGE, [], 'Registrants (callback urls)'),
+    REGISTRATIONS: (TYPE_GAUGE, ['channel'], 'Registrations on channel'),
+    DELIVERY_QUEUE_DEPTH: (TYPE_GAUGE, [CALLBACK_URL_LABEL], 'Deliveries queued for callback url'),
+    RETRY_QUEUE_DEPTH: (TYPE_GAUGE, [CALLBACK_URL_LABEL], 'Events held for callback url until it is reachable again'),
+}
+
+
+class Metrics:
+    """
+    PURPOSE:
+    - Counts (and times) things on hot paths, e.g. events received per channel, posts per callback url, without
+      locking: each thread records into its own shard, and shards are only added up when metrics are read.
+    - Keeps what threads that ended recorded (folded into a shared shard), so counters never go down.
+    - Times with histograms (fixed buckets, so recording is a lookup and an increment).
+    - Renders metrics, plus gauges read when scraped (e.g. queue depths), in Prometheus text format.
+    """
+
+    def __init__(self, is_enabled: bool = None, latency_buckets: List[float] = None):
+        self.__is_enabled = bool(Metrics.__get_property(METRICS_ENABLED, is_enabled, True))
+        latency_buckets = Metrics.__get_property(METRICS_LATENCY_BUCKETS, latency_buckets, DEFAULT_LATENCY_BUCKETS)
+        if isinstance(latency_buckets, str):
+            latency_buckets = [bucket for bucket in latency_buckets.split(',') if bucket.strip()]
+        self.__buckets = sorted(float(bucket) for bucket in latency_buckets)
+
+        # Shards of live threads, and of threads that ended (lock only guards these, not recording).  Reentrant, as a
+        # shard can be retired from whichever thread drops its owner.
+        self.__local = threading.local()
+        self.__shards: List[Dict[tuple, Any]] = []
+        self.__retired: Dict[tuple, Any] = {}
+        self.__lock = threading.RLock()
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.__is_enabled
+
+    @property
+    def buckets(self) -> List[float]:
+        return list(self.__buckets)
+
+    def inc(self, name: str, labels: Tuple[str, ...] = (), amount: int = 1):
+        if not self.__is_enabled:
+            return
+
+        shard = self.__get_shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name: str, labels: Tuple[str, ...], value: float):
+        # Histogram is kept as a count per bucket (last one is +Inf), then sum of values.
+        if not self.__is_enabled:
+            return
+
+        shard = self.__get_shard()
+        key = (name, labels)
+        histogram = shard.get(key)
+        if histogram is None:
+            histogram = shard[key] = [0] * (len(self.__buckets) + 2)
+        histogram[bisect.bisect_left(self.__buckets, value)] += 1
+        histogram[-1] += value
+
+    def get(self, name: str, labels: Tuple[str, ...] = ()) -> Any:
+        # Value across all threads (a counter's count, or a histogram's counts per bucket and sum), None if not
+        # recorded.
+        return self.collect().get((name, labels))
+
+    def collect(self) -> Dict[tuple, Any]:
+        with self.__lock:
+            shards = [self.__retired] + self.__shards
+            samples = {}
+            for shard in shards:
+                Metrics.__merge(samples, shard)
+            return samples
+
+    def discard(self, callback_url: str):
+        # Drop series of a callback url once it's gone (so label values don't pile up as clients come and go).
+        with self.__lock:
+            for shard in [self.__retired] + self.__shards:
+                # Shard's owner may be recording meanwhile, keys are copied first (atomically).
+                for key in list(shard):
+                    if Metrics.__is_labeled_with(key, CALLBACK_URL_LABEL, callback_url):
+                        shard.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            for shard in self.__shards:
+                shard.clear()
+            self.__retired = {}
+
+    def render(self, gauges: Dict[str, Dict[Tuple[str, ...], float]] = None) -> str:
+        # Recorded metrics, and given gauges (values per labels, by name), grouped by metric.
+        samples: Dict[str, Dict[tuple, Any]] = {}
+        for (name, labels), value in self.collect().items():
+            samples.setdefault(name, {})[labels] = value
+        for name, values in (gauges or {}).items():
+            samples.setdefault(name, {}).update(values)
+
+        lines = []
+        for name in sorted(samples):
+            metric_type, label_names, description = DESCRIPTIONS.get(name, (TYPE_GAUGE, [], ''))
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in sorted(samples[name].items()):
+                pairs = list(zip(label_names, labels))
+                if metric_type == TYPE_HISTOGRAM:
+                    lines.extend(self.__render_histogram(name, pairs, value))
+                else:
+                    lines.append(f'{name}{Metrics.__render_labels(pairs)} {Metrics.__render_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def __render_histogram(self, name: str, pairs: List[Tuple[str, str]], histogram: List[float]) -> List[str]:
+        # Buckets are cumulative in Prometheus (count of values less than or equal to bucket's bound).
+        lines = []
+        count = 0
+        for bound, bucket_count in zip(self.__buckets + [float('inf')], histogram[:-1]):
+            count += bucket_count
+            labels = Metrics.__render_labels(pairs + [('le', Metrics.__render_value(bound))])
+            lines.append(f'{name}_bucket{labels} {count}')
+        lines.append(f'{name}_sum{Metrics.__render_labels(pairs)} {Metrics.__render_value(histogram[-1])}')
+        lines.append(f'{name}_count{Metrics.__render_labels(pairs)} {count}')
+        return lines
+
+    def __get_shard(self) -> Dict[tuple, Any]:
+        try:
+            return self.__local.shard
+        except AttributeError:
+            pass
+
+        # Thread's first record.  Shard is folded into retired one once thread ends (and its locals are dropped).
+        shard = {}
+        owner = _ShardOwner()
+        weakref.finalize(owner, self.__retire, shard)
+        self.__local.shard = shard
+        self.__local.owner = owner
+        with self.__lock:
+            self.__shards.append(shard)
+        return shard
+
+    def __retire(self, shard: Dict[tuple, Any]):
+        with self.__lock:
+            self.__shards = [live for live in self.__shards if live is not shard]
+            Metrics.__merge(self.__retired, shard)
+
+    @staticmethod
+    def __merge(samples: Dict[tuple, Any], shard: Dict[tuple, Any]):
+        # Shard's owner may be recording meanwhile, items are copied first (atomically).
+        for key, value in list(shard.items()):
+            if isinstance(value, list):
+                total = samples.get(key)
+                samples[key] = [a + b for a, b in zip(total, value)] if total else list(value)
+            else:
+                samples[key] = samples.get(key, 0) + value
+
+    @staticmethod
+    def __is_labeled_with(key: tuple, label_name: str, value: str) -> bool:
+        name, labels = key
+        label_names = DESCRIPTIONS.get(name, (TYPE_GAUGE, [], ''))[1]
+        return label_name in label_names and labels[label_names.index(label_name)] == value
+
+    @staticmethod
+    def __render_labels(pairs: List[Tuple[str, str]]) -> str:
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{Metrics.__escape(str(value))}"' for name, value in pairs) + '}'
+
+    @staticmethod
+    def __render_value(value: float) -> str:
+        if value == float('inf'):
+            return '+Inf'
+        return str(value) if isinstance(value, int) else repr(float(value))
+
+    @staticmethod
+    def __escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
+
+
+class _ShardOwner:
+    # Lives in a thread's locals, so it's dropped (and its shard retired) when thread ends.
+    pass
+
+
+_default_metrics: Metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    global _default_metrics
+
+    # Read on hot paths, only lock to create them.
+    metrics = _default_metrics
+    if metrics:
+        return metrics
+
+    with _default_metrics_lock:
+        if not _default_metrics:
+            _default_metrics = Metrics()
+        return _default_metrics
+
+
+def set_metrics(metrics: Metrics = None):
+    # Replace default metrics (None to rebuild them from properties on next use).
+    global _default_metrics
+
+    with _default_metrics_lock:
+        _default_metrics = metrics
@@ -0,0 +1,421 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Tuple, Union
+from urllib.parse import quote, unquote
+
+from eventdispatch import Properties
+
+from eventcenter.client import serialization
+
+# Replay log properties.
+REPLAY_LOG_DIR = 'REPLAY_LOG_DIR'
+REPLAY_SEGMENT_SIZE = 'REPLAY_SEGMENT_SIZE'
+REPLAY_RETENTION_BYTES = 'REPLAY_RETENTION_BYTES'
+REPLAY_RETENTION_SEC = 'REPLAY_RETENTION_SEC'
+REPLAY_MAX_READ_COUNT = 'REPLAY_MAX_READ_COUNT'
+
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+DEFAULT_RETENTION_BYTES = 1024 * 1024 * 1024
+DEFAULT_RETENTION_SEC = 24 * 60 * 60
+DEFAULT_MAX_READ_COUNT = 1000
+
+# Key (in event payload metadata) of event's offset in its channel's log.
+OFFSET_KEY = 'replay_offset'
+
+CHANNEL_DIR_PREFIX = 'channel-'
+SEGMENT_FILE_SUFFIX = '.log'
+
+# Record: payload length, offset, time posted (then payload).  Segments are preallocated (zero filled), so a zero
+# length marks where records end.
+RECORD_HEADER = struct.Struct('>IQd')
+
+# Position of every nth record is kept (in memory), records in between are found by scanning from there.
+INDEX_INTERVAL = 64
+
+
+class ReplaySegment:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Holds records of a channel's log, from a base offset on, in a file.
+    - Active segment (the one being appended to) is preallocated, and written through a memory map.  Once full, it's
+      sealed (cut to size, and unmapped).  Sealed segments are only mapped while being read.
+    - Keeps a sparse index (position of every nth record), so reading from an offset doesn't scan the whole segment.
+    """
+
+    def __init__(self, file_path: str, base_offset: int, capacity: int = None):
+        self.__file_path = file_path
+        self.__base_offset = base_offset
+        self.__next_offset = base_offset
+        self.__size = 0
+        self.__last_time = 0.0
+        self.__index: List[int] = []
+        self.__file = None
+        self.__mmap = None
+
+        if capacity:
+            # New (active) segment.
+            self.__file = open(file_path, 'w+b')
+            self.__file.truncate(capacity)
+            self.__mmap = mmap.mmap(self.__file.fileno(), capacity)
+        else:
+            self.__load()
+
+    @property
+    def file_path(self) -> str:
+        return self.__file_path
+
+    @property
+    def base_offset(self) -> int:
+        return self.__base_offset
+
+    @property
+    def next_offset(self) -> int:
+        return self.__next_offset
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def last_time(self) -> float:
+        return self.__last_time
+
+    @property
+    def is_sealed(self) -> bool:
+        return self.__mmap is None
+
+    def append(self, data: bytes, posted_time: float) -> Union[int, None]:
+        # Offset of record, or None if it doesn't fit (segment is full).
+        end = self.__size + RECORD_HEADER.size + len(data)
+        if self.is_sealed or end > len(self.__mmap):
+            return None
+
+        offset = self.__next_offset
+        if (offset - self.__base_offset) % INDEX_INTERVAL == 0:
+            self.__index.append(self.__size)
+
+        RECORD_HEADER.pack_into(self.__mmap, self.__size, len(data), offset, posted_time)
+        self.__mmap[self.__size + RECORD_HEADER.size:end] = data
+        self.__size = end
+        self.__next_offset += 1
+        self.__last_time = posted_time
+        return offset
+
+    def read(self, from_offset: int, max_count: int) -> List[Tuple[int, bytes]]:
+        # Records (offset, payload) from offset on (up to a max count).
+        from_offset = max(from_offset, self.__base_offset)
+        if from_offset >= self.__next_offset or max_count <= 0:
+            return []
+
+        if not self.is_sealed:
+            return self.__read(self.__mmap, from_offset, max_count)
+
+        with open(self.__file_path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.__read(data, from_offset, max_count)
+
+    def seal(self):
+        if self.is_sealed:
+            return
+        self.__mmap.flush()
+        self.__mmap.close()
+        self.__mmap = None
+        self.__file.truncate(self.__size)
+        self.__file.close()
+        self.__file = None
+
+    def delete(self):
+        self.seal()
+        try:
+            os.remove(self.__file_path)
+        except FileNotFoundError:
+            pass
+
+    def __read(self, data: Any, from_offset: int, max_count: int) -> List[Tuple[int, bytes]]:
+        records = []
+        position = self.__index[(from_offset - self.__base_offset) // INDEX_INTERVAL]
+        while position < self.__size and len(records) < max_count:
+            length, offset, _ = RECORD_HEADER.unpack_from(data, position)
+            start = position + RECORD_HEADER.size
+            if offset >= from_offset:
+                records.append((offset, bytes(data[start:start + length])))
+            position = start + length
+        return records
+
+    def __load(self):
+        # Rebuild index (and find where records end) of a segment written before a restart.
+        with open(self.__file_path, 'r+b') as file:
+            file_size = os.fstat(file.fileno()).st_size
+            if file_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self.__scan(data, file_size)
+
+            # Drop unused (preallocated) space, and any partially written record (e.g. crashed mid-write).
+            if self.__size < file_size:
+                file.truncate(self.__size)
+
+    def __scan(self, data: Any, file_size: int):
+        position = 0
+        while position + RECORD_HEADER.size <= file_size:
+            length, offset, posted_time = RECORD_HEADER.unpack_from(data, position)
+            end = position + RECORD_HEADER.size + length
+            if length == 0 or end > file_size or offset != self.__next_offset:
+                if length and offset != self.__next_offset:
+                    self.__logger.warning(f"Ignoring invalid records in '{self.__file_path}' from {position}")
+                break
+
+            if (offset - self.__base_offset) % INDEX_INTERVAL == 0:
+                self.__index.append(position)
+            position = end
+            self.__size = end
+            self.__next_offset = offset + 1
+            self.__last_time = posted_time
+
+
+class ChannelLog:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Append only log of events posted to a channel, split in segments (files named after their base offset).
+    - Gives each event an offset (starting at 0, one up per event, never reused), so a client can resume from the
+      last offset it got (e.g. after reconnecting).
+    - Retention: oldest segments are deleted once log is larger than max size, or their events are older than max
+      age (active segment is always kept).
+    """
+
+    def __init__(self, directory: str, channel: str, segment_size: int, retention_bytes: int, retention_sec: float):
+        self.__directory = directory
+        self.__channel = channel
+        self.__segment_size = segment_size
+        self.__retention_bytes = retention_bytes
+        self.__retention_sec = retention_sec
+        self.__lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.__segments: List[ReplaySegment] = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(SEGMENT_FILE_SUFFIX):
+                self.__segments.append(ReplaySegment(os.path.join(directory, name),
+                                                     int(name[:-len(SEGMENT_FILE_SUFFIX)])))
+
+        # Segments written before a restart are sealed (appends go to a new segment).  Last one is kept even if empty,
+        # so offsets carry on from it.
+        self.__segments = [segment for segment in self.__segments[:-1] if not self.__delete_if_empty(segment)] + \
+            self.__segments[-1:]
+
+    @property
+    def channel(self) -> str:
+        return self.__channel
+
+    @property
+    def first_offset(self) -> int:
+        with self.__lock:
+            return self.__segments[0].base_offset if self.__segments else 0
+
+    @property
+    def next_offset(self) -> int:
+        with self.__lock:
+            return self.__segments[-1].next_offset if self.__segments else 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self.__lock:
+            return {
+                'first_offset': self.__segments[0].base_offset if self.__segments else 0,
+                'next_offset': self.__segments[-1].next_offset if self.__segments else 0,
+                'segments': len(self.__segments),
+                'bytes': sum(segment.size for segment in self.__segments)
+            }
+
+    def append(self, data: bytes) -> int:
+        posted_time = time.time()
+        with self.__lock:
+            offset = self.__segments[-1].append(data, posted_time) if self.__segments else None
+            if offset is None:
+                self.__roll(len(data))
+                offset = self.__segments[-1].append(data, posted_time)
+            return offset
+
+    def read(self, from_offset: int, max_count: int) -> List[Tuple[int, bytes]]:
+        # Records (offset, payload) from offset on, or from first one kept (if offset is no longer retained).
+        with self.__lock:
+            self.__apply_retention()
+
+            records = []
+            for segment in self.__segments:
+                if segment.next_offset <= from_offset:
+                    continue
+                records += segment.read(from_offset, max_count - len(records))
+                if len(records) >= max_count:
+                    break
+            return records
+
+    def close(self):
+        with self.__lock:
+            for segment in self.__segments:
+                segment.seal()
+
+    def __roll(self, record_size: int):
+        # Seal active segment, and start a new one (large enough for record, if it's larger than segment size).
+        next_offset = 0
+        if self.__segments:
+            self.__segments[-1].seal()
+            next_offset = self.__segments[-1].next_offset
+            if self.__delete_if_empty(self.__segments[-1]):
+                self.__segments.pop()
+
+        capacity = max(self.__segment_size, RECORD_HEADER.size + record_size)
+        file_path = os.path.join(self.__directory, f'{next_offset:020d}{SEGMENT_FILE_SUFFIX}')
+        self.__segments.append(ReplaySegment(file_path, next_offset, capacity))
+        self.__apply_retention()
+
+    def __apply_retention(self):
+        total_size = sum(segment.size for segment in self.__segments)
+        oldest_time = time.time() - self.__retention_sec if self.__retention_sec else 0
+
+        while len(self.__segments) > 1:
+            segment = self.__segments[0]
+            if total_size <= self.__retention_bytes and segment.last_time >= oldest_time:
+                break
+
+            segment.delete()
+            self.__segments.pop(0)
+            total_size -= segment.size
+            self.__log_message_deleted(segment)
+
+    @staticmethod
+    def __delete_if_empty(segment: ReplaySegment) -> bool:
+        if segment.next_offset > segment.base_offset:
+            return False
+        segment.delete()
+        return True
+
+    def __log_message_deleted(self, segment: ReplaySegment):
+        self.__logger.info(f"Deleted events {segment.base_offset} to {segment.next_offset - 1} from log of channel "
+                           f"'{self.__channel}' (past retention)")
+
+
+class ReplayLog:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Keeps a log per channel of events posted to it (on disk, memory mapped), so clients can get events again from
+      an offset on (e.g. the ones posted while they were disconnected), for at least once delivery.
+    - Off unless given a directory to keep logs in.
+    """
+
+    def __init__(self, directory: str = None, segment_size: int = None, retention_bytes: int = None,
+                 retention_sec: float = None, max_read_count: int = None):
+        self.__directory = ReplayLog.__get_property(REPLAY_LOG_DIR, directory, None)
+        self.__segment_size = int(ReplayLog.__get_property(REPLAY_SEGMENT_SIZE, segment_size, DEFAULT_SEGMENT_SIZE))
+        self.__retention_bytes = int(ReplayLog.__get_property(REPLAY_RETENTION_BYTES, retention_bytes,
+                                                              DEFAULT_RETENTION_BYTES))
+        self.__retention_sec = float(ReplayLog.__get_property(REPLAY_RETENTION_SEC, retention_sec,
+                                                              DEFAULT_RETENTION_SEC))
+        self.__max_read_count = int(ReplayLog.__get_property(REPLAY_MAX_READ_COUNT, max_read_count,
+                                                             DEFAULT_MAX_READ_COUNT))
+
+        self.__logs: Dict[str, ChannelLog] = {}
+        self.__lock = threading.Lock()
+
+        # Pick up logs written before a restart (so offsets carry on from where they were).
+        if self.__directory and os.path.isdir(self.__directory):
+            for name in os.listdir(self.__directory):
+                if name.startswith(CHANNEL_DIR_PREFIX):
+                    self.__get_log(unquote(name[len(CHANNEL_DIR_PREFIX):]))
+
+    @property
+    def is_enabled(self) -> bool:
+        return bool(self.__directory)
+
+    @property
+    def max_read_count(self) -> int:
+        return self.__max_read_count
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self.__lock:
+            logs = list(self.__logs.values())
+        return {log.channel: log.stats for log in logs}
+
+    def append(self, channel: str, data: Dict[str, Any]) -> Union[int, None]:
+        # Offset of event in channel's log (None if log is off).
+        if not self.is_enabled:
+            return None
+        return self.__get_log(channel).append(serialization.dumps(data))
+
+    def read(self, channel: str, from_offset: int, max_count: int = None) -> Tuple[List[Tuple[int, Any]], int, int]:
+        # Events (offset, data) from offset on, first offset still kept, and next offset to be written.
+        log = self.__get_log(channel, is_create=False) if self.is_enabled else None
+        if not log:
+            return [], 0, 0
+
+        max_count = min(max_count, self.__max_read_count) if max_count else self.__max_read_count
+        records = []
+        for offset, data in log.read(max(0, from_offset), max_count):
+            try:
+                records.append((offset, serialization.loads(data)))
+            except ValueError:
+                self.__logger.warning(f"Skipped unreadable event {offset} in log of channel '{channel}'")
+        return records, log.first_offset, log.next_offset
+
+    def close(self):
+        with self.__lock:
+            for log in self.__logs.values():
+                log.close()
+            self.__logs = {}
+
+    def __get_log(self, channel: str, is_create: bool = True) -> Union[ChannelLog, None]:
+        log = self.__logs.get(channel)
+        if log:
+            return log
+
+        with self.__lock:
+            log = self.__logs.get(channel)
+            if not log:
+                directory = os.path.join(self.__directory, CHANNEL_DIR_PREFIX + quote(channel, safe=''))
+                if not is_create and not os.path.isdir(directory):
+                    return None
+                log = self.__logs[channel] = ChannelLog(directory, channel, self.__segment_size,
+                                                        self.__retention_bytes, self.__retention_sec)
+            return log
+
+    @staticmethod
+    def set_offset(payload: Dict[str, Any], offset: int):
+        # Tell client where event is in channel's log (so it knows where to resume from).
+        payload.setdefault('metadata', {})[OFFSET_KEY] = offset
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
+
+
+_default_replay_log: ReplayLog = None
+_default_replay_log_lock = threading.Lock()
+
+
+def get_replay_log() -> ReplayLog:
+    global _default_replay_log
+
+    with _default_replay_log_lock:
+        if not _default_replay_log:
+            _default_replay_log = ReplayLog()
+        return _default_replay_log
+
+
+def set_replay_log(replay_log: ReplayLog = None):
+    # Replace default replay log (None to rebuild it from properties on next use).
+    global _default_replay_log
+
+    with _default_replay_log_lock:
+        _default_replay_log = replay_log
@@ -0,0 +1,323 @@
+import hashlib
+import logging
+import os
+import random
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Union
+
+from eventdispatch import Properties
+
+from eventcenter.client import serialization
+
+# Retry properties.
+RETRY_MAX_FAILURES = 'RETRY_MAX_FAILURES'
+RETRY_BACKOFF_SEC = 'RETRY_BACKOFF_SEC'
+RETRY_MAX_BACKOFF_SEC = 'RETRY_MAX_BACKOFF_SEC'
+RETRY_QUEUE_SIZE = 'RETRY_QUEUE_SIZE'
+RETRY_SPILL_DIR = 'RETRY_SPILL_DIR'
+RETRY_MAX_SPILL_SIZE = 'RETRY_MAX_SPILL_SIZE'
+
+# Failed retries in a row before client is dropped (0 drops it on first failure, without retrying).
+DEFAULT_MAX_FAILURES = 8
+DEFAULT_BACKOFF_SEC = 0.5
+DEFAULT_MAX_BACKOFF_SEC = 30.0
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_MAX_SPILL_SIZE = 100000
+
+
+class RetryQueue:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Holds events that couldn't be delivered to a destination (callback url), plus any sent to it after that (so
+      they're delivered in order), until destination is reachable again.
+    - Tracks failed retries in a row, and the backoff (exponential, with jitter) before the next one.
+    - Bounded: holds up to a max number of events in memory, and spills the rest to a file (if given a spill file),
+      up to a max.  When full, the oldest event is dropped.
+    - Spilled events outlive a restart (picked up when queue is created again for the destination).
+    """
+
+    def __init__(self, destination: str, from_dict: Callable[[Dict[str, Any]], Any], max_size: int,
+                 spill_file_path: str = None, max_spill_size: int = 0):
+        self.__destination = destination
+        self.__from_dict = from_dict
+        self.__max_size = max(1, max_size)
+        self.__max_spill_size = max_spill_size if spill_file_path else 0
+
+        self.__items = deque()
+        self.__failure_count = 0
+        self.__dropped_count = 0
+        self.__is_retry_scheduled = False
+        self.__lock = threading.RLock()
+
+        # Spilled events are appended to file as json lines, and read back in order (from read offset).
+        self.__spill_file_path = spill_file_path
+        self.__spill_file = None
+        self.__spill_read_offset = 0
+        self.__spilled_count = 0
+        if spill_file_path and os.path.exists(spill_file_path):
+            self.__spill_file = open(spill_file_path, 'a+b')
+            self.__spill_file.seek(0)
+            self.__spilled_count = sum(1 for line in self.__spill_file if line.strip())
+            self.__refill()
+
+    @property
+    def destination(self) -> str:
+        return self.__destination
+
+    @property
+    def is_active(self) -> bool:
+        # Destination is failing (events are held until it's reachable again).
+        with self.__lock:
+            return self.__is_retry_scheduled or self.size > 0
+
+    @property
+    def size(self) -> int:
+        return len(self.__items) + self.__spilled_count
+
+    @property
+    def failure_count(self) -> int:
+        return self.__failure_count
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self.__lock:
+            return {
+                'pending': len(self.__items),
+                'spilled': self.__spilled_count,
+                'failures': self.__failure_count,
+                'dropped': self.__dropped_count
+            }
+
+    def add_all(self, items: List[Any]):
+        with self.__lock:
+            for item in items:
+                if self.size >= self.__max_size + self.__max_spill_size:
+                    self.__drop_oldest()
+
+                if self.__spilled_count == 0 and len(self.__items) < self.__max_size:
+                    self.__items.append(item)
+                else:
+                    self.__spill(item)
+
+    def peek(self, count: int = 1) -> List[Any]:
+        with self.__lock:
+            return [self.__items[i] for i in range(min(count, len(self.__items)))]
+
+    def remove(self, count: int = 1):
+        # Remove events from head of queue (once delivered), destination is reachable again.
+        with self.__lock:
+            for _ in range(min(count, len(self.__items))):
+                self.__items.popleft()
+            self.__failure_count = 0
+            self.__refill()
+
+    def schedule_retry(self) -> bool:
+        # True if caller should schedule a retry (only one is scheduled at a time).
+        with self.__lock:
+            if self.__is_retry_scheduled:
+                return False
+            self.__is_retry_scheduled = True
+            return True
+
+    def on_retry_done(self) -> bool:
+        # True if more events are waiting (caller keeps retrying), otherwise queue is no longer active.
+        with self.__lock:
+            self.__is_retry_scheduled = self.size > 0
+            return self.__is_retry_scheduled
+
+    def on_failure(self, max_failures: int, backoff_sec: float, max_backoff_sec: float) -> Union[float, None]:
+        # Delay before next retry, or None if destination failed too many times in a row (and should be dropped).
+        with self.__lock:
+            self.__failure_count += 1
+            if self.__failure_count > max_failures:
+                return None
+
+            delay_sec = min(max_backoff_sec, backoff_sec * (2 ** (self.__failure_count - 1)))
+            # Jitter, so destinations that failed together don't all retry at once.
+            return delay_sec * random.uniform(0.5, 1.0)
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+            self.__is_retry_scheduled = False
+            self.__close_spill_file(is_delete=True)
+
+    def close(self):
+        # Keep spilled events (picked up again after a restart).
+        with self.__lock:
+            self.__close_spill_file(is_delete=False)
+
+    def __spill(self, item: Any):
+        if not self.__spill_file:
+            os.makedirs(os.path.dirname(self.__spill_file_path) or '.', exist_ok=True)
+            self.__spill_file = open(self.__spill_file_path, 'a+b')
+
+        # Appends always go to end of file (file is opened for append).
+        self.__spill_file.write(serialization.dumps(item.dict) + b'\n')
+        self.__spill_file.flush()
+        self.__spilled_count += 1
+
+    def __refill(self):
+        # Move spilled events back to memory (in order), as room frees up.
+        while self.__spilled_count > 0 and len(self.__items) < self.__max_size:
+            self.__spill_file.seek(self.__spill_read_offset)
+            line = self.__spill_file.readline()
+            self.__spill_read_offset = self.__spill_file.tell()
+            if not line:
+                # End of file (e.g. file was cut short), nothing more to read back.
+                self.__spilled_count = 0
+                break
+            if not line.strip():
+                continue
+
+            self.__spilled_count -= 1
+            try:
+                self.__items.append(self.__from_dict(serialization.loads(line)))
+            except (ValueError, TypeError, AttributeError):
+                self.__logger.warning(f"Skipped unreadable event spilled for '{self.__destination}'")
+
+        # Start file over once all of it has been read back.
+        if self.__spill_file and self.__spilled_count == 0:
+            self.__spill_file.truncate(0)
+            self.__spill_read_offset = 0
+
+    def __drop_oldest(self):
+        if self.__items:
+            self.__items.popleft()
+        self.__refill()
+        self.__dropped_count += 1
+        self.__log_message_dropped()
+
+    def __close_spill_file(self, is_delete: bool):
+        if self.__spill_file:
+            self.__spill_file.close()
+            self.__spill_file = None
+        if is_delete and self.__spill_file_path and os.path.exists(self.__spill_file_path):
+            os.remove(self.__spill_file_path)
+        self.__spilled_count = 0
+        self.__spill_read_offset = 0
+
+    def __log_message_dropped(self):
+        self.__logger.warning(f"Retry queue of '{self.__destination}' is full, dropped oldest event")
+
+
+class RetryQueues:
+    __logger = logging.getLogger(__name__)
+
+    """
+    PURPOSE:
+    - Keeps a retry queue per failing destination, and the retry policy they share (max failures in a row before a
+      destination is dropped, backoff, queue bounds, spill directory).
+    """
+
+    def __init__(self, max_failures: int = None, backoff_sec: float = None, max_backoff_sec: float = None,
+                 max_size: int = None, spill_dir: str = None, max_spill_size: int = None):
+        self.__max_failures = int(RetryQueues.__get_property(RETRY_MAX_FAILURES, max_failures, DEFAULT_MAX_FAILURES))
+        self.__backoff_sec = float(RetryQueues.__get_property(RETRY_BACKOFF_SEC, backoff_sec, DEFAULT_BACKOFF_SEC))
+        self.__max_backoff_sec = float(RetryQueues.__get_property(RETRY_MAX_BACKOFF_SEC, max_backoff_sec,
+                                                                  DEFAULT_MAX_BACKOFF_SEC))
+        self.__max_size = int(RetryQueues.__get_property(RETRY_QUEUE_SIZE, max_size, DEFAULT_QUEUE_SIZE))
+        self.__spill_dir = RetryQueues.__get_property(RETRY_SPILL_DIR, spill_dir, None)
+        self.__max_spill_size = int(RetryQueues.__get_property(RETRY_MAX_SPILL_SIZE, max_spill_size,
+                                                               DEFAULT_MAX_SPILL_SIZE))
+
+        self.__queues: Dict[str, RetryQueue] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def is_enabled(self) -> bool:
+        return self.__max_failures > 0
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self.__lock:
+            queues = list(self.__queues.values())
+        return {queue.destination: queue.stats for queue in queues}
+
+    def find(self, destination: str) -> Union[RetryQueue, None]:
+        return self.__queues.get(destination)
+
+    def get(self, destination: str, from_dict: Callable[[Dict[str, Any]], Any]) -> RetryQueue:
+        with self.__lock:
+            queue = self.__queues.get(destination)
+            if not queue:
+                queue = self.__queues[destination] = RetryQueue(destination, from_dict, self.__max_size,
+                                                                self.__get_spill_file_path(destination),
+                                                                self.__max_spill_size)
+            return queue
+
+    def resume(self, destination: str, from_dict: Callable[[Dict[str, Any]], Any]) -> Union[RetryQueue, None]:
+        # Queue of destination, if it has events spilled before a restart.
+        spill_file_path = self.__get_spill_file_path(destination)
+        if not spill_file_path or not os.path.exists(spill_file_path):
+            return None
+
+        queue = self.get(destination, from_dict)
+        if queue.size == 0:
+            self.discard(destination)
+            return None
+        return queue
+
+    def on_failure(self, queue: RetryQueue) -> Union[float, None]:
+        delay_sec = queue.on_failure(self.__max_failures, self.__backoff_sec, self.__max_backoff_sec)
+        if delay_sec is None:
+            self.__log_message_giving_up(queue)
+        else:
+            self.__log_message_retrying(queue, delay_sec)
+        return delay_sec
+
+    def discard(self, destination: str):
+        with self.__lock:
+            queue = self.__queues.pop(destination, None)
+        if queue:
+            queue.clear()
+
+    def close(self):
+        with self.__lock:
+            for queue in self.__queues.values():
+                queue.close()
+            self.__queues = {}
+
+    def __get_spill_file_path(self, destination: str) -> Union[str, None]:
+        if not self.__spill_dir:
+            return None
+        name = hashlib.sha1(destination.encode()).hexdigest()
+        return os.path.join(self.__spill_dir, f'{name}.jsonl')
+
+    def __log_message_retrying(self, queue: RetryQueue, delay_sec: float):
+        self.__logger.warning(f"'{queue.destination}' is unreachable ({queue.failure_count} failure(s) in a row, "
+                              f"{queue.size} event(s) held), retrying in {delay_sec:.1f} sec")
+
+    def __log_message_giving_up(self, queue: RetryQueue):
+        self.__logger.warning(f"'{queue.destination}' is unreachable ({queue.failure_count} failure(s) in a row), "
+                              f"dropping it (and {queue.size} event(s) held)")
+
+    @staticmethod
+    def __get_property(name: str, value: Any, default: Any) -> Any:
+        if value is not None:
+            return value
+        return Properties().get(name) if Properties().has(name) else default
+
+
+_default_retry_queues: RetryQueues = None
+_default_retry_queues_lock = threading.Lock()
+
+
+def get_retry_queues() -> RetryQueues:
+    global _default_retry_queues
+
+    with _default_retry_queues_lock:
+        if not _default_retry_queues:
+            _default_retry_queues = RetryQueues()
+        return _default_retry_queues
+
+
+def set_retry_queues(retry_queues: RetryQueues = None):
+    # Replace default retry queues (None to rebuild them from properties on next use).
+    global _default_retry_queues
+
+    with _default_retry_queues_lock:
+        _default_retry_queues = retry_queues
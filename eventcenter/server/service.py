@@ -1,12 +1,15 @@
 import threading
+from typing import Any, Dict
 
 from eventdispatch import Properties, NamespacedEnum, post_event
 from eventdispatch.core import DuplicateMappingError, InvalidMappingEventsError
-from flask import Flask, request
+from flask import Flask, Response, request
 
 from eventcenter.client.network import FlaskAppRunner
+from eventcenter.server.cluster import Cluster, MEMBERS_ENDPOINT, get_cluster
 from eventcenter.server.event_center import EventRegistrationManager, RegistrationData, RemoteEventData, \
-    EventMappingData
+    EventMappingData, RemoteEventBatchData, ReplayRequestData
+from eventcenter.server.metrics import METRICS_ENDPOINT, CONTENT_TYPE_PROMETHEUS
 
 RESPONSE_OK = {
     'success': 'true'
@@ -33,14 +36,16 @@ class EventCenterService(FlaskAppRunner):
     def __init__(self):
         self.__event_registration_manager = EventRegistrationManager()
 
+        # In a cluster, requests for a channel are forwarded to node owning it (and registrations for channels that
+        # move to another node as members come and go are handed over to it).
+        self.__cluster = get_cluster()
+        self.__cluster.start(on_change=lambda: self.__event_registration_manager.hand_over(self.__cluster))
+
         self.app = Flask('EventCenter')
         port = Properties().get('EVENT_CENTER_PORT')
-        super().__init__('0.0.0.0', port, self.app)
 
-        if self.is_flask_debug():
-            self.start()
-
-        post_event(ECEvent.STARTED, {})
+        # Serve with built-in (development) server if asked to, otherwise app is served by a production server.
+        super().__init__('0.0.0.0', port, self.app, run_as_a_server=self.is_flask_debug())
 
         @self.app.route('/ping', methods=['GET'])
         def ping():
@@ -48,35 +53,86 @@ class EventCenterService(FlaskAppRunner):
 
         @self.app.route('/register', methods=['POST'])
         def register():
-            registration_data = RegistrationData.from_dict(request.json)
+            registration_data = RegistrationData.from_dict(self.read_body())
+            forwarded = self.__forward(registration_data.channel, '/register', registration_data.dict)
+            if forwarded is not None:
+                return self.make_response(forwarded)
+
             self.__event_registration_manager.register(registration_data)
             return self.make_response(RESPONSE_OK)
 
         @self.app.route('/unregister', methods=['POST'])
         def unregister():
-            registration_data = RegistrationData.from_dict(request.json)
+            registration_data = RegistrationData.from_dict(self.read_body())
+            forwarded = self.__forward(registration_data.channel, '/unregister', registration_data.dict)
+            if forwarded is not None:
+                return self.make_response(forwarded)
+
             self.__event_registration_manager.unregister(registration_data)
             return self.make_response(RESPONSE_OK)
 
         @self.app.route('/unregister_all', methods=['POST'])
         def unregister_all():
-            callback_url = request.json.get('callback_url', '')
+            callback_url = self.read_body().get('callback_url', '')
             if not callback_url:
                 RESPONSE_ERROR['error'] = 'Missing callback url'
                 return RESPONSE_ERROR
 
             self.__event_registration_manager.unregister_all(callback_url)
+
+            # Client may have registrations on any node.
+            if self.__cluster.is_enabled and not Cluster.is_forwarded(request.headers):
+                self.__cluster.broadcast('/unregister_all', {'callback_url': callback_url})
             return self.make_response(RESPONSE_OK)
 
         @self.app.route('/post_event', methods=['POST'])
         def post():
-            remote_event_data = RemoteEventData.from_dict(request.json)
+            remote_event_data = RemoteEventData.from_dict(self.read_body())
+            forwarded = self.__forward(remote_event_data.channel, '/post_event', remote_event_data.dict)
+            if forwarded is not None:
+                return self.make_response(forwarded)
+
             self.__event_registration_manager.post(remote_event_data)
             return self.make_response(RESPONSE_OK)
 
+        @self.app.route('/post_events', methods=['POST'])
+        def post_batch():
+            remote_event_batch_data = RemoteEventBatchData.from_dict(self.read_body())
+
+            # Batch may hold events for channels owned by different nodes, each node gets its share.
+            response = RESPONSE_OK
+            for node, remote_events in self.__cluster.route_all(remote_event_batch_data.remote_events,
+                                                                lambda remote_event: remote_event.channel,
+                                                                Cluster.is_forwarded(request.headers)):
+                if node is None:
+                    self.__event_registration_manager.post_batch(RemoteEventBatchData(remote_events))
+                    continue
+                forwarded = self.__cluster.forward(node, '/post_events', RemoteEventBatchData(remote_events).dict)
+                if forwarded.get('success') != 'true':
+                    response = forwarded
+            return self.make_response(response)
+
+        @self.app.route('/replay', methods=['POST'])
+        def replay():
+            try:
+                replay_request_data = ReplayRequestData.from_dict(self.read_body())
+            except ValueError as e:
+                return self.make_response(dict(RESPONSE_ERROR, error=str(e)), 400)
+            forwarded = self.__forward(replay_request_data.channel, '/replay', replay_request_data.dict)
+            if forwarded is not None:
+                return self.make_response(forwarded)
+
+            response = self.__event_registration_manager.replay(replay_request_data)
+            response.update(RESPONSE_OK)
+            return self.make_response(response)
+
         @self.app.route('/map_events', methods=['POST'])
         def map_events():
-            event_mapping_data = EventMappingData.from_dict(request.json)
+            event_mapping_data = EventMappingData.from_dict(self.read_body())
+            forwarded = self.__forward(event_mapping_data.channel, '/map_events', event_mapping_data.dict)
+            if forwarded is not None:
+                return self.make_response(forwarded)
+
             try:
                 response = {
                     'event_map_key': self.__event_registration_manager.map_events(event_mapping_data)
@@ -89,7 +145,11 @@ class EventCenterService(FlaskAppRunner):
 
         @self.app.route('/event_maps', methods=['GET'])
         def event_maps():
-            channel = request.json['channel']
+            channel = self.read_body()['channel']
+            forwarded = self.__forward(channel, '/event_maps', {'channel': channel}, method='GET')
+            if forwarded is not None:
+                return self.make_response(forwarded)
+
             maps = self.__event_registration_manager.get_event_maps(channel)
             response = {
                 'channel': channel,
@@ -100,12 +160,26 @@ class EventCenterService(FlaskAppRunner):
 
         # @self.app.route('/track_events', methods=['POST'])
         # def watch():
-        #     request.json
+        #     self.read_body()
 
         # Admin APIs
         @self.app.route('/registrants', methods=['GET'])
         def get_registrants():
             response = self.__event_registration_manager.pack_registrants()
+            response['circuit_breakers'] = self.__event_registration_manager.pack_circuit_breakers()
+            response.update(RESPONSE_OK)
+            return self.make_response(response)
+
+        @self.app.route(METRICS_ENDPOINT, methods=['GET'])
+        def get_metrics():
+            # Metrics of this node (or server worker) only, scrape each of them.
+            return Response(self.__event_registration_manager.export_metrics(), content_type=CONTENT_TYPE_PROMETHEUS)
+
+        @self.app.route(MEMBERS_ENDPOINT, methods=['GET', 'POST'])
+        def cluster_members():
+            # Other nodes join, and send heartbeats, here.
+            response = self.__cluster.on_members_message(self.read_body() or {}) if request.method == 'POST' \
+                else self.__cluster.stats
             response.update(RESPONSE_OK)
             return self.make_response(response)
 
@@ -114,6 +188,19 @@ class EventCenterService(FlaskAppRunner):
             threading.Thread(target=self.shutdown, args=[]).start()
             return RESPONSE_OK
 
+        # Only start serving once all routes are added (Flask refuses new routes after first request).
+        if self.is_flask_debug():
+            self.start()
+
+        post_event(ECEvent.STARTED, {})
+
     def shutdown(self):
         super().shutdown()
+        self.__cluster.stop()
+        self.__event_registration_manager.close()
         post_event(ECEvent.STOPPED)
+
+    def __forward(self, channel: str, path: str, body: Dict[str, Any], method: str = 'POST') -> Any:
+        # Response of node owning channel, or None if it's this node (request is handled here).
+        node = self.__cluster.route(channel, Cluster.is_forwarded(request.headers))
+        return self.__cluster.forward(node, path, body, method=method) if node else None
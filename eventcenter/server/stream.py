@@ -0,0 +1,24 @@
+# Streaming transport (one long-lived websocket per client, to the async event center).
+#
+# Client and event center exchange json frames: {'op': <op>, 'data': <same data as the http api>}.  A frame with an
+# 'id' gets a response frame ({'op': 'response', 'id': <id>, 'data': <same response as the http api>}).
+# Events are delivered to the client in 'deliver' frames ({'op': 'deliver', 'body': <same body as a callback post>}).
+
+STREAM_ENDPOINT = '/stream'
+
+# Callback url of a streaming client (deliveries to it are written to its stream, instead of posted).
+STREAM_URL_SCHEME = 'stream://'
+
+OP_REGISTER = 'register'
+OP_UNREGISTER = 'unregister'
+OP_UNREGISTER_ALL = 'unregister_all'
+OP_POST_EVENT = 'post_event'
+OP_POST_EVENTS = 'post_events'
+OP_MAP_EVENTS = 'map_events'
+OP_RESPONSE = 'response'
+OP_DELIVER = 'deliver'
+
+DELIVER_FRAME_PREFIX = b'{"op":"' + OP_DELIVER.encode() + b'","body":'
+DELIVER_FRAME_SUFFIX = b'}'
+
+DEFAULT_HEARTBEAT_SEC = 30.0
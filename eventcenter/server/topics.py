@@ -0,0 +1,106 @@
+from typing import Any, Dict, List
+
+# Event names are namespaced, with segments separated by dots (e.g. 'worker.started', as NamespacedEnum names them).
+# In a pattern, '*' matches exactly one segment, and '#' matches any number of segments (none included).
+SEGMENT_SEPARATOR = '.'
+WILDCARD_ONE = '*'
+WILDCARD_ANY = '#'
+
+
+def is_pattern(event: str) -> bool:
+    # Only whole segments are wildcards ('worker.*' is a pattern, 'worker*' is an event name).
+    return bool(event) and any(segment in (WILDCARD_ONE, WILDCARD_ANY) for segment in event.split(SEGMENT_SEPARATOR))
+
+
+class _TopicNode:
+    __slots__ = ['children', 'values']
+
+    def __init__(self):
+        self.children: Dict[str, '_TopicNode'] = {}
+        self.values: Dict[str, Any] = {}
+
+
+class TopicTrie:
+    """
+    PURPOSE:
+    - Indexes values (e.g. registrations, by callback url) under event name patterns, one trie level per segment.
+    - Finds values of all patterns an event name matches by walking the trie along the name's segments (and any
+      wildcard branches on the way), so matching cost depends on name depth, not on how many patterns there are.
+    - Not thread safe, owner locks around it.
+    """
+
+    def __init__(self):
+        self.__root = _TopicNode()
+        self.__size = 0
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def is_empty(self) -> bool:
+        return self.__size == 0
+
+    def add(self, pattern: str, key: str, value: Any):
+        node = self.__root
+        for segment in pattern.split(SEGMENT_SEPARATOR):
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = _TopicNode()
+            node = child
+
+        if key not in node.values:
+            self.__size += 1
+        node.values[key] = value
+
+    def remove(self, pattern: str, key: str, value: Any = None) -> bool:
+        # Only removes value under key if it's the one given (if given).  Branches left empty are pruned.
+        path = [self.__root]
+        segments = pattern.split(SEGMENT_SEPARATOR)
+        for segment in segments:
+            node = path[-1].children.get(segment)
+            if node is None:
+                return False
+            path.append(node)
+
+        node = path[-1]
+        if key not in node.values or (value is not None and node.values[key] is not value):
+            return False
+
+        del node.values[key]
+        self.__size -= 1
+        for parent, segment, child in zip(reversed(path[:-1]), reversed(segments), reversed(path[1:])):
+            if child.values or child.children:
+                break
+            del parent.children[segment]
+        return True
+
+    def match(self, event: str) -> Dict[str, Any]:
+        # Values (by key) of all patterns event name matches.
+        found = {}
+        if self.__size:
+            TopicTrie.__match(self.__root, event.split(SEGMENT_SEPARATOR), 0, found)
+        return found
+
+    def clear(self):
+        self.__root = _TopicNode()
+        self.__size = 0
+
+    @staticmethod
+    def __match(node: _TopicNode, segments: List[str], index: int, found: Dict[str, Any]):
+        # '#' takes any number of the remaining segments (none included).
+        any_node = node.children.get(WILDCARD_ANY)
+        if any_node is not None:
+            for next_index in range(index, len(segments) + 1):
+                TopicTrie.__match(any_node, segments, next_index, found)
+
+        if index == len(segments):
+            found.update(node.values)
+            return
+
+        child = node.children.get(segments[index])
+        if child is not None:
+            TopicTrie.__match(child, segments, index + 1, found)
+        one_node = node.children.get(WILDCARD_ONE)
+        if one_node is not None:
+            TopicTrie.__match(one_node, segments, index + 1, found)
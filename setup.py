@@ -13,7 +13,15 @@ setup(
         'Flask==3.0.3',
         'Werkzeug==3.0.3',
         'gunicorn==21.2.0',
-        'wrapt==1.16.0',
         'eventdispatch @ git+https://github.com/bsfard/event-dispatch.git'
-    ]
+    ],
+    extras_require={
+        # Asyncio event center (eventcenter.app_async_event_center).
+        'async': ['aiohttp>=3.9'],
+        # Binary wire formats (WIRE_FORMAT property).
+        'msgpack': ['msgpack>=1.0'],
+        'cbor': ['cbor2>=5.4'],
+        # Zstd compression (stdlib from Python 3.14).
+        'zstd': ['backports.zstd; python_version < "3.14"']
+    }
 )
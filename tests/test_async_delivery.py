@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from eventcenter.client.network import ApiConnectionError
+from eventcenter.server.async_delivery import AsyncDeliveryEngine
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    pass
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    pass
+
+
+def test_submit__preserves_order_per_destination():
+    # Objective:
+    # Deliveries to the same destination are made in the order they were submitted.
+
+    # Setup
+    delivered = []
+
+    async def deliver(i: int):
+        # Later deliveries finish sooner (if run concurrently, they'd be out of order).
+        await asyncio.sleep(0.01 * (10 - i))
+        delivered.append(i)
+
+    async def run():
+        engine = AsyncDeliveryEngine(max_concurrency=10)
+        await engine.start()
+
+        # Test
+        for i in range(10):
+            engine.submit('url1', lambda i=i: deliver(i))
+        is_idle = await engine.wait_until_idle(2.0)
+
+        await engine.close()
+        return is_idle
+
+    # Verify
+    assert asyncio.run(run())
+    assert delivered == list(range(10))
+
+
+def test_submit__destinations_delivered_concurrently():
+    # Objective:
+    # A destination that is slow to respond does not hold up delivery to other destinations.
+
+    # Setup
+    delivered = []
+
+    async def run():
+        engine = AsyncDeliveryEngine(max_concurrency=10)
+        await engine.start()
+        release = asyncio.Event()
+
+        async def deliver_slow():
+            await release.wait()
+            delivered.append('slow_url')
+
+        async def deliver(url: str):
+            delivered.append(url)
+
+        # Test
+        engine.submit('slow_url', deliver_slow)
+        engine.submit('url1', lambda: deliver('url1'))
+        engine.submit('url2', lambda: deliver('url2'))
+        await asyncio.sleep(0.05)
+        delivered_before_release = sorted(delivered)
+        release.set()
+        await engine.wait_until_idle(1.0)
+
+        await engine.close()
+        return delivered_before_release
+
+    # Verify
+    assert asyncio.run(run()) == ['url1', 'url2']
+    assert delivered[-1] == 'slow_url'
+
+
+def test_submit__from_another_thread():
+    # Objective:
+    # Deliveries submitted from a thread other than the event loop's are run on the event loop.
+
+    # Setup
+    delivered = []
+
+    async def deliver():
+        delivered.append(asyncio.get_running_loop())
+
+    async def run():
+        engine = AsyncDeliveryEngine(max_concurrency=10)
+        await engine.start()
+
+        # Test
+        await asyncio.get_running_loop().run_in_executor(None, engine.submit, 'url1', deliver)
+        await asyncio.sleep(0.05)
+        await engine.wait_until_idle(1.0)
+
+        await engine.close()
+        return asyncio.get_running_loop()
+
+    # Verify
+    loop = asyncio.run(run())
+    assert delivered == [loop]
+
+
+def test_submit_batched__batches_while_destination_busy():
+    # Objective:
+    # Items submitted while destination is busy are sent together, in order, in batches up to max size.
+
+    # Setup
+    batches = []
+
+    async def run():
+        engine = AsyncDeliveryEngine(max_concurrency=10, max_batch_size=3)
+        await engine.start()
+        release = asyncio.Event()
+
+        async def send_batch(batch: list):
+            await release.wait()
+            batches.append(list(batch))
+
+        # Test
+        for i in range(7):
+            engine.submit_batched('url1', i, send_batch)
+        await asyncio.sleep(0.01)
+        release.set()
+        await engine.wait_until_idle(1.0)
+
+        await engine.close()
+
+    asyncio.run(run())
+
+    # Verify
+    assert [item for batch in batches for item in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in batches)
+
+
+def test_post__unreachable_url():
+    # Objective:
+    # Posting to a url that can't be connected to raises a connection error.
+
+    # Setup
+    async def run():
+        engine = AsyncDeliveryEngine(max_concurrency=10)
+        await engine.start()
+
+        # Test
+        try:
+            await engine.post('http://localhost:1/on_event', json={'a': 1}, timeout_sec=1.0)
+        finally:
+            await engine.close()
+
+    # Verify
+    with pytest.raises(ApiConnectionError):
+        asyncio.run(run())
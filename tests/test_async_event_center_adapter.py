@@ -0,0 +1,210 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+import aiohttp
+from eventdispatch import Event, Properties, EventDispatchManager
+
+from eventcenter.client import compression
+from eventcenter.client.async_callback_executor import AsyncCallbackExecutor
+from eventcenter.client.async_event_center_adapter import AsyncEventCenterAdapter
+from eventcenter.client.callback_executor import BACKPRESSURE_REJECT
+from eventcenter.server.async_service import AsyncEventCenterService, start_async_event_center
+from eventcenter.server.event_center import RemoteEventData, get_subscription_index
+from constants import EVENT_CENTER_PORT
+from helper import set_properties_for_event_center_interfacing
+
+SOME_CHANNEL = 'some_channel'
+
+service: AsyncEventCenterService
+
+
+def setup_module():
+    global service
+
+    set_properties_for_event_center_interfacing()
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+    service = start_async_event_center(EVENT_CENTER_PORT)
+
+
+def setup_function():
+    service.event_registration_manager.clear_registrants()
+    get_subscription_index().clear()
+    EventDispatchManager().default_dispatch.clear_registered_handlers()
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    service.shutdown()
+    time.sleep(0.2)
+
+
+def test_init():
+    # Objective:
+    # Adapter is created, with callback url built from properties.
+
+    # Setup
+    host = Properties().get('EVENT_CENTER_CALLBACK_HOST')
+    port = str(Properties().get('EVENT_CENTER_CALLBACK_PORT'))
+
+    # Test
+    adapter = AsyncEventCenterAdapter(on_event)
+
+    # Verify
+    assert host in adapter.callback_url
+    assert port in adapter.callback_url
+
+
+@pytest.mark.parametrize('channel', ['', SOME_CHANNEL])
+def test_post_event__received_by_registered_adapter(channel: str):
+    # Objective:
+    # Events posted (awaited) by an adapter are received by another adapter registered for them, in order.
+    # (Event center doesn't deliver events back to their sender.)
+
+    # Setup
+    received = []
+
+    async def handle(remote_event: RemoteEventData):
+        received.append(remote_event)
+
+    async def run():
+        adapter = AsyncEventCenterAdapter(handle)
+        sender = create_sender_adapter()
+        await adapter.start()
+        await adapter.register(['test_event'], channel)
+
+        # Test
+        for i in range(10):
+            await sender.post_event(Event('test_event', {'index': i}), channel)
+        await wait_until(lambda: len(received) >= 10)
+
+        await sender.shutdown()
+        await adapter.shutdown()
+
+    asyncio.run(run())
+
+    # Verify
+    assert [remote_event.event.payload['index'] for remote_event in received] == list(range(10))
+    assert all(remote_event.channel == channel for remote_event in received)
+    assert 'sender_url' in received[0].event.payload['metadata']
+
+
+def test_post_events__received_by_registered_adapter():
+    # Objective:
+    # A batch of events posted by an adapter is received, in order.
+
+    # Setup
+    received = []
+
+    async def handle(remote_event: RemoteEventData):
+        received.append(remote_event)
+
+    async def run():
+        adapter = AsyncEventCenterAdapter(handle)
+        sender = create_sender_adapter()
+        await adapter.start()
+        await adapter.register([])
+
+        # Test
+        await sender.post_events([Event('test_event', {'index': i}) for i in range(5)])
+        await wait_until(lambda: len(received) >= 5)
+
+        await sender.shutdown()
+        await adapter.shutdown()
+
+    asyncio.run(run())
+
+    # Verify
+    assert [remote_event.event.payload['index'] for remote_event in received
+            if remote_event.event.name == 'test_event'] == list(range(5))
+
+
+@pytest.mark.parametrize('encoding', compression.get_encodings())
+def test_on_event__when_compressed(encoding: str):
+    # Objective:
+    # Adapter reads events delivered in every encoding it offers (it decompresses them, not aiohttp).
+
+    # Setup
+    received = []
+
+    async def handle(remote_event: RemoteEventData):
+        received.append(remote_event)
+
+    data = RemoteEventData(SOME_CHANNEL, Event('test_event', {'index': 0})).dict
+    body = compression.compress(json.dumps(data).encode(), encoding)
+
+    async def run():
+        adapter = AsyncEventCenterAdapter(handle)
+        await adapter.start()
+
+        # Test
+        async with aiohttp.ClientSession() as session:
+            async with session.post(adapter.callback_url, data=body,
+                                    headers={'Content-Type': 'application/json',
+                                             'Content-Encoding': encoding}) as response:
+                status = response.status
+        await wait_until(lambda: received)
+
+        await adapter.shutdown()
+        return status
+
+    status = asyncio.run(run())
+
+    # Verify
+    assert status == 200
+    assert received[0].channel == SOME_CHANNEL
+    assert received[0].event.payload == {'index': 0}
+
+
+def test_callback_executor__rejects_when_full():
+    # Objective:
+    # Events that don't fit in the callback queue are rejected (with reject backpressure), as a whole.
+
+    # Setup
+    async def handle(_item):
+        await asyncio.sleep(0.1)
+
+    async def run():
+        executor = AsyncCallbackExecutor(handle, worker_count=1, max_queue_size=2, backpressure=BACKPRESSURE_REJECT)
+
+        # Test
+        is_accepted1 = await executor.submit_all([('a', 1), ('a', 2)])
+        is_accepted2 = await executor.submit_all([('a', 3), ('a', 4)])
+        stats = executor.stats
+        await executor.shutdown()
+        return is_accepted1, is_accepted2, stats
+
+    is_accepted1, is_accepted2, stats = asyncio.run(run())
+
+    # Verify
+    assert is_accepted1
+    assert not is_accepted2
+    assert stats['rejected'] == 2
+
+
+def create_sender_adapter() -> AsyncEventCenterAdapter:
+    # Sender needs its own callback url (is not started, only posts).
+    port = Properties().get('EVENT_CENTER_CALLBACK_PORT')
+    Properties().set('EVENT_CENTER_CALLBACK_PORT', int(port) + 1)
+    try:
+        return AsyncEventCenterAdapter(on_event)
+    finally:
+        Properties().set('EVENT_CENTER_CALLBACK_PORT', port)
+
+
+async def on_event(_remote_event: RemoteEventData):
+    pass
+
+
+async def wait_until(condition, timeout_sec: float = 5.0):
+    deadline = time.monotonic() + timeout_sec
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
@@ -0,0 +1,288 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+import requests
+from eventdispatch import Properties, EventDispatchManager
+
+from eventcenter.server.async_service import AsyncEventCenterService, start_async_event_center
+from eventcenter.server.event_center import get_subscription_index
+from eventcenter.server.breaker import CircuitBreakers, set_circuit_breakers
+from eventcenter.server.replay import ReplayLog, set_replay_log
+from eventcenter.server.retry import RetryQueues, set_retry_queues
+
+EVENT_CENTER_PORT = 6310
+RECEIVER_PORT = 6311
+LATE_RECEIVER_PORT = 6312
+
+service: AsyncEventCenterService
+receiver: ThreadingHTTPServer
+event_center_url = f'http://localhost:{EVENT_CENTER_PORT}'
+callback_url = f'http://localhost:{RECEIVER_PORT}/on_event'
+
+
+class Receiver(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        Receiver.received.extend(body.get('remote_events', [body]))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+def setup_module():
+    global service, receiver
+
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+
+    receiver = ThreadingHTTPServer(('localhost', RECEIVER_PORT), Receiver)
+    threading.Thread(target=receiver.serve_forever, daemon=True).start()
+
+    service = start_async_event_center(EVENT_CENTER_PORT)
+
+
+def setup_function():
+    Receiver.received = []
+    service.event_registration_manager.clear_registrants()
+    get_subscription_index().clear()
+    EventDispatchManager().default_dispatch.clear_registered_handlers()
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    service.shutdown()
+    receiver.shutdown()
+    receiver.server_close()
+
+
+def test_ping():
+    # Objective:
+    # Service responds with same response as (sync) event center.
+
+    # Test
+    response = requests.get(f'{event_center_url}/ping')
+
+    # Verify
+    assert response.status_code == 200
+    assert response.json() == {'success': 'true'}
+
+
+def test_post_event__delivered_in_order():
+    # Objective:
+    # Events posted to the service are delivered to a registered client, in the order they were posted.
+
+    # Setup
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                        'channel': ''})
+
+    # Test
+    for i in range(20):
+        response = requests.post(f'{event_center_url}/post_event', json={
+            'channel': '',
+            'event': {'id': i, 'name': 'test_event', 'time': time.time(), 'payload': {'index': i}}
+        })
+        assert response.status_code == 200
+
+    # Verify
+    wait_until(lambda: len(Receiver.received) >= 20)
+    assert [remote_event['event']['payload']['index'] for remote_event in Receiver.received] == list(range(20))
+
+
+def test_post_events__batch_delivery():
+    # Objective:
+    # Events posted as a batch are delivered (in batches) to a client registered for batch delivery.
+
+    # Setup
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                        'channel': '', 'is_batch_delivery': True})
+    remote_events = [{'channel': '', 'event': {'id': i, 'name': 'test_event', 'time': time.time(),
+                                               'payload': {'index': i}}} for i in range(10)]
+
+    # Test
+    response = requests.post(f'{event_center_url}/post_events', json={'remote_events': remote_events})
+
+    # Verify
+    assert response.status_code == 200
+    wait_until(lambda: len(Receiver.received) >= 10)
+    assert [remote_event['event']['payload']['index'] for remote_event in Receiver.received] == list(range(10))
+
+
+def test_post_event__when_client_unreachable_for_a_while():
+    # Objective:
+    # Events posted while client is unreachable are held, and delivered (in order) once it's reachable again.
+
+    # Setup
+    set_retry_queues(RetryQueues(backoff_sec=0.05, max_backoff_sec=0.05))
+    set_circuit_breakers(CircuitBreakers(open_sec=0.05))
+    late_receiver_url = f'http://localhost:{LATE_RECEIVER_PORT}/on_event'
+    requests.post(f'{event_center_url}/register', json={'callback_url': late_receiver_url, 'events': ['test_event'],
+                                                        'channel': ''})
+
+    # Test
+    for i in range(5):
+        requests.post(f'{event_center_url}/post_event', json={
+            'channel': '',
+            'event': {'id': i, 'name': 'test_event', 'time': time.time(), 'payload': {'index': i}}
+        })
+    time.sleep(0.2)
+    late_receiver = ThreadingHTTPServer(('localhost', LATE_RECEIVER_PORT), Receiver)
+    threading.Thread(target=late_receiver.serve_forever, daemon=True).start()
+
+    # Verify
+    try:
+        wait_until(lambda: len(Receiver.received) >= 5)
+        assert [remote_event['event']['payload']['index'] for remote_event in Receiver.received] == list(range(5))
+        assert late_receiver_url in json.dumps(requests.get(f'{event_center_url}/registrants').json())
+    finally:
+        late_receiver.shutdown()
+        late_receiver.server_close()
+        set_retry_queues()
+        set_circuit_breakers()
+
+
+def test_registrants():
+    # Objective:
+    # Registered client is listed in registrants.
+
+    # Setup
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                        'channel': ''})
+
+    # Test
+    response = requests.get(f'{event_center_url}/registrants')
+
+    # Verify
+    assert response.json()['success'] == 'true'
+    assert callback_url in response.json()['registrants']
+
+
+def test_metrics():
+    # Objective:
+    # Events received per channel, deliveries (and their latency) per client, and registrant counts are exposed in
+    # Prometheus text format.
+
+    # Setup
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                        'channel': 'metrics_channel'})
+    for i in range(3):
+        requests.post(f'{event_center_url}/post_event', json={
+            'channel': 'metrics_channel',
+            'event': {'id': i, 'name': 'test_event', 'time': time.time(), 'payload': {'index': i}}
+        })
+    wait_until(lambda: len(Receiver.received) >= 3)
+
+    # Test
+    response = requests.get(f'{event_center_url}/metrics')
+
+    # Verify
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert 'eventcenter_events_received_total{channel="metrics_channel"} 3' in response.text
+    assert f'eventcenter_deliveries_total{{callback_url="{callback_url}",result="success"}}' in response.text
+    assert f'eventcenter_delivery_latency_seconds_count{{callback_url="{callback_url}"}}' in response.text
+    assert 'eventcenter_registrations{channel="metrics_channel"} 1' in response.text
+    assert 'eventcenter_registrants 1' in response.text
+
+
+def test_post_event__for_event_pattern():
+    # Objective:
+    # Client registered for an event name pattern gets events matching it, and no others.
+
+    # Setup
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['worker.*'],
+                                                        'channel': ''})
+
+    # Test
+    for i, name in enumerate(['worker.started', 'router.started', 'worker.task.started', 'worker.stopped']):
+        requests.post(f'{event_center_url}/post_event', json={
+            'channel': '',
+            'event': {'id': i, 'name': name, 'time': time.time(), 'payload': {'index': i}}
+        })
+
+    # Verify
+    wait_until(lambda: len(Receiver.received) >= 2)
+    time.sleep(0.1)
+    names = [remote_event['event']['name'] for remote_event in Receiver.received]
+    assert names == ['worker.started', 'worker.stopped']
+
+
+def test_replay():
+    # Objective:
+    # Client can get events posted to a channel again, from an offset on (e.g. ones missed while disconnected).
+
+    # Setup
+    log_dir = tempfile.mkdtemp()
+    set_replay_log(ReplayLog(log_dir))
+    for i in range(5):
+        requests.post(f'{event_center_url}/post_event', json={
+            'channel': 'some_channel',
+            'event': {'id': i, 'name': 'test_event', 'time': time.time(), 'payload': {'index': i}}
+        })
+
+    # Test
+    try:
+        response = requests.post(f'{event_center_url}/replay', json={'channel': 'some_channel', 'offset': 3})
+    finally:
+        set_replay_log()
+        shutil.rmtree(log_dir)
+
+    # Verify
+    body = response.json()
+    assert body['success'] == 'true'
+    assert [remote_event['event']['payload']['index'] for remote_event in body['remote_events']] == [3, 4]
+    assert (body['first_offset'], body['next_offset'], body['end_offset']) == (0, 5, 5)
+
+
+@pytest.mark.parametrize('body', [
+    {'channel': 'some_channel', 'offset': 'abc'},
+    {'channel': 'some_channel', 'offset': -1},
+    {'channel': 'some_channel', 'offset': 0, 'max_count': -5},
+])
+def test_replay__when_invalid_offset(body: dict):
+    # Objective:
+    # Replay from an offset (or for a max count) that isn't a non-negative integer fails as a bad request, with an
+    # error.
+
+    # Test
+    response = requests.post(f'{event_center_url}/replay', json=body)
+
+    # Verify
+    assert response.status_code == 400
+    assert response.json()['success'] == 'false'
+    assert 'must be a non-negative integer' in response.json()['error']
+
+
+def test_unregister_all__missing_callback_url():
+    # Objective:
+    # Request without a callback url fails with an error.
+
+    # Test
+    response = requests.post(f'{event_center_url}/unregister_all', json={})
+
+    # Verify
+    assert response.json() == {'success': 'false', 'error': 'Missing callback url'}
+
+
+def wait_until(condition, timeout_sec: float = 5.0):
+    deadline = time.monotonic() + timeout_sec
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
@@ -0,0 +1,126 @@
+import time
+
+from eventcenter.server.breaker import CircuitBreaker, CircuitBreakers, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+
+DESTINATION = 'http://localhost:9999/on_event'
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    pass
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    pass
+
+
+def test_on_failure__opens_after_threshold():
+    # Objective:
+    # Circuit opens after a number of failed (or slow) calls in a row, and refuses calls while open.
+
+    # Setup
+    breaker = CircuitBreaker(DESTINATION, failure_threshold=3, slow_call_sec=1.0, open_sec=10.0)
+
+    # Test
+    breaker.on_failure()
+    breaker.on_success(latency_sec=2.0)
+    is_closed_before_threshold = breaker.state == STATE_CLOSED
+    breaker.on_failure()
+
+    # Verify
+    assert is_closed_before_threshold
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+    assert 9.0 < breaker.retry_after_sec <= 10.0
+    assert breaker.stats == {'state': STATE_OPEN, 'failures': 3, 'trips': 1, 'skipped': 1, 'latency_sec': 2.0}
+
+
+def test_on_success__resets_failures():
+    # Objective:
+    # A call that succeeds in time resets failures in a row (circuit only opens on failures in a row).
+
+    # Setup
+    breaker = CircuitBreaker(DESTINATION, failure_threshold=2, slow_call_sec=1.0, open_sec=10.0)
+
+    # Test
+    breaker.on_failure()
+    breaker.on_success(latency_sec=0.1)
+    breaker.on_failure()
+
+    # Verify
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_allow_request__when_half_open():
+    # Objective:
+    # Once open time is up, a single probe goes through.  Circuit closes if probe succeeds in time, or opens again
+    # if it doesn't.
+
+    # Setup
+    breaker = CircuitBreaker(DESTINATION, failure_threshold=1, slow_call_sec=1.0, open_sec=0.05)
+    breaker.on_failure()
+    time.sleep(0.06)
+
+    # Test
+    is_probe_allowed = breaker.allow_request()
+    is_second_probe_allowed = breaker.allow_request()
+    state_while_probing = breaker.state
+    breaker.on_success(latency_sec=1.5)
+    state_after_slow_probe = breaker.state
+    time.sleep(0.06)
+    breaker.allow_request()
+    breaker.on_success(latency_sec=0.1)
+
+    # Verify
+    assert is_probe_allowed
+    assert not is_second_probe_allowed
+    assert state_while_probing == STATE_HALF_OPEN
+    assert state_after_slow_probe == STATE_OPEN
+    assert breaker.state == STATE_CLOSED
+    assert breaker.stats['trips'] == 2
+
+
+def test_get__when_off():
+    # Objective:
+    # No circuit breakers are kept when they're off (threshold of 0), and each destination gets its own otherwise.
+
+    # Setup
+    breakers = CircuitBreakers(failure_threshold=2)
+
+    # Test
+    breaker = breakers.get(DESTINATION)
+    breakers.discard(DESTINATION)
+
+    # Verify
+    assert CircuitBreakers(failure_threshold=0).get(DESTINATION) is None
+    assert breaker is not breakers.get(DESTINATION)
+    assert list(breakers.stats.keys()) == [DESTINATION]
+
+
+def test_release_probe():
+    # Objective:
+    # A probe that was let through but never sent is released, so next call is let through as a probe instead.
+
+    # Setup
+    breaker = CircuitBreaker(DESTINATION, failure_threshold=1, slow_call_sec=1.0, open_sec=0.05)
+    breaker.on_failure()
+    time.sleep(0.06)
+    breaker.allow_request()
+
+    # Test
+    is_allowed_before_release = breaker.allow_request()
+    breaker.release_probe()
+    is_allowed_after_release = breaker.allow_request()
+
+    # Verify
+    assert not is_allowed_before_release
+    assert is_allowed_after_release
+    assert breaker.state == STATE_HALF_OPEN
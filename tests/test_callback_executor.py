@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+from eventcenter.client.callback_executor import CallbackExecutor, BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, \
+    BACKPRESSURE_REJECT
+
+executor: CallbackExecutor
+handled: list
+gate: threading.Event
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    global handled, gate
+
+    handled = []
+    gate = threading.Event()
+    gate.set()
+
+
+def teardown_function():
+    global gate
+    gate.set()
+
+
+def teardown_module():
+    pass
+
+
+def handle(item):
+    gate.wait(5.0)
+    handled.append(item)
+
+
+def test_submit__ordered_per_channel():
+    # Objective:
+    # Events on the same channel are handled in the order submitted (even with several workers).
+
+    # Setup
+    global executor
+    executor = CallbackExecutor(handle, worker_count=4, max_queue_size=1000, backpressure=BACKPRESSURE_BLOCK)
+
+    # Test
+    for i in range(50):
+        executor.submit('channel1', ('channel1', i))
+        executor.submit('channel2', ('channel2', i))
+
+    # Verify
+    assert executor.wait_until_idle(5.0)
+    assert [i for channel, i in handled if channel == 'channel1'] == list(range(50))
+    assert [i for channel, i in handled if channel == 'channel2'] == list(range(50))
+    assert executor.stats['handled'] == 100
+    assert executor.stats['pending'] == 0
+    executor.shutdown()
+
+
+def test_submit__when_full_and_reject():
+    # Objective:
+    # Events are rejected once queue is full.
+
+    # Setup
+    global executor, gate
+    gate.clear()
+    executor = CallbackExecutor(handle, worker_count=1, max_queue_size=2, backpressure=BACKPRESSURE_REJECT)
+    assert executor.submit('', 1)
+    time.sleep(0.1)
+
+    # Test
+    assert executor.submit('', 2)
+    assert executor.submit('', 3)
+    is_accepted = executor.submit_all([('', 4), ('', 5)])
+
+    # Verify
+    assert not is_accepted
+    stats = executor.stats
+    assert stats['rejected'] == 2
+    assert stats['pending'] == 2
+    assert stats['in_flight'] == 1
+    assert executor.queue_depth('') == 2
+    gate.set()
+    assert executor.wait_until_idle(5.0)
+    assert handled == [1, 2, 3]
+    executor.shutdown()
+
+
+def test_submit__when_full_and_drop_oldest():
+    # Objective:
+    # Oldest waiting event (across channels) is dropped, to make room for new one.
+
+    # Setup
+    global executor, gate
+    gate.clear()
+    executor = CallbackExecutor(handle, worker_count=1, max_queue_size=2, backpressure=BACKPRESSURE_DROP_OLDEST)
+    executor.submit('channel1', 1)
+    time.sleep(0.1)
+    executor.submit('channel2', 2)
+    executor.submit('channel1', 3)
+
+    # Test
+    assert executor.submit('channel2', 4)
+
+    # Verify
+    assert executor.stats['dropped'] == 1
+    assert executor.stats['pending'] == 2
+    gate.set()
+    assert executor.wait_until_idle(5.0)
+    assert sorted(handled) == [1, 3, 4]
+    executor.shutdown()
+
+
+def test_submit__when_full_and_block():
+    # Objective:
+    # Submitting waits for room in queue, nothing is dropped or rejected.
+
+    # Setup
+    global executor, gate
+    gate.clear()
+    executor = CallbackExecutor(handle, worker_count=1, max_queue_size=1, backpressure=BACKPRESSURE_BLOCK)
+    executor.submit('', 1)
+    time.sleep(0.1)
+    executor.submit('', 2)
+    submitter = threading.Thread(target=executor.submit, args=['', 3])
+
+    # Test
+    submitter.start()
+    time.sleep(0.1)
+    assert submitter.is_alive()
+    gate.set()
+    submitter.join(5.0)
+
+    # Verify
+    assert not submitter.is_alive()
+    assert executor.wait_until_idle(5.0)
+    assert handled == [1, 2, 3]
+    assert executor.stats['dropped'] == 0
+    assert executor.stats['rejected'] == 0
+    executor.shutdown()
+
+
+def test_init__when_unknown_backpressure():
+    # Objective:
+    # Unknown backpressure policy is not accepted.
+
+    # Setup
+    # (none)
+
+    # Test
+    with pytest.raises(ValueError):
+        CallbackExecutor(handle, backpressure='some_policy')
+
+    # Verify
+    # (exception raised)
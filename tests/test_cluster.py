@@ -0,0 +1,401 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+import requests
+from eventdispatch import Properties, EventDispatchManager
+
+from eventcenter.server.async_service import AsyncEventCenterService, start_async_event_center
+from eventcenter.server.cluster import HashRing, Cluster, FORWARDED_HEADER, set_cluster
+from eventcenter.server.event_center import get_subscription_index
+
+EVENT_CENTER_PORT = 6340
+OTHER_NODE_PORT = 6341
+RECEIVER_PORT = 6342
+CLUSTER_NODE_PORTS = [6343, 6344, 6345]
+STALLED_NODE_PORT = 6346
+
+service: AsyncEventCenterService
+other_node: ThreadingHTTPServer
+receiver: ThreadingHTTPServer
+cluster: Cluster
+event_center_url = f'http://localhost:{EVENT_CENTER_PORT}'
+other_node_url = f'http://localhost:{OTHER_NODE_PORT}'
+callback_url = f'http://localhost:{RECEIVER_PORT}/on_event'
+
+
+class OtherNode(BaseHTTPRequestHandler):
+    # Stands in for another node in cluster (answers heartbeats, records requests forwarded to it).
+    forwarded = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        if self.path == '/cluster/members':
+            response = {'members': [event_center_url, other_node_url], 'success': 'true'}
+        else:
+            OtherNode.forwarded.append((self.path, self.headers.get(FORWARDED_HEADER), body))
+            response = {'success': 'true'}
+        write_response(self, response)
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+class Receiver(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        Receiver.received.extend(body.get('remote_events', [body]))
+        write_response(self, {})
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+def setup_module():
+    global service, other_node, receiver, cluster
+
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+
+    other_node = ThreadingHTTPServer(('localhost', OTHER_NODE_PORT), OtherNode)
+    threading.Thread(target=other_node.serve_forever, daemon=True).start()
+    receiver = ThreadingHTTPServer(('localhost', RECEIVER_PORT), Receiver)
+    threading.Thread(target=receiver.serve_forever, daemon=True).start()
+
+    cluster = Cluster(event_center_url, [other_node_url], heartbeat_sec=0.1)
+    set_cluster(cluster)
+    service = start_async_event_center(EVENT_CENTER_PORT)
+    wait_until(lambda: len(cluster.members) == 2)
+
+
+def setup_function():
+    OtherNode.forwarded = []
+    Receiver.received = []
+    service.event_registration_manager.clear_registrants()
+    get_subscription_index().clear()
+    EventDispatchManager().default_dispatch.clear_registered_handlers()
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    service.shutdown()
+    time.sleep(0.2)
+    set_cluster()
+    for server in [other_node, receiver]:
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_node__spreads_keys():
+    # Objective:
+    # Keys are spread evenly across nodes (each node gets roughly its share).
+
+    # Setup
+    nodes = ['http://node-a:6000', 'http://node-b:6000', 'http://node-c:6000']
+    ring = HashRing(nodes)
+
+    # Test
+    owners = [ring.get_node(f'channel_{i}') for i in range(3000)]
+
+    # Verify
+    for node in nodes:
+        assert 700 < owners.count(node) < 1300
+    assert HashRing().get_node('channel') is None
+
+
+def test_get_node__when_node_added():
+    # Objective:
+    # Adding a node only moves keys to it (about its share of them), other keys stay where they were.
+
+    # Setup
+    nodes = ['http://node-a:6000', 'http://node-b:6000', 'http://node-c:6000']
+    ring = HashRing(nodes)
+    grown_ring = HashRing(nodes + ['http://node-d:6000'])
+    keys = [f'channel_{i}' for i in range(3000)]
+
+    # Test
+    moved = [key for key in keys if ring.get_node(key) != grown_ring.get_node(key)]
+
+    # Verify
+    assert all(grown_ring.get_node(key) == 'http://node-d:6000' for key in moved)
+    assert 500 < len(moved) < 1000
+
+
+def test_on_members_message():
+    # Objective:
+    # A node that sends a heartbeat becomes a member, nodes it knows of only do once they respond.
+
+    # Setup
+    local_cluster = Cluster('http://node-a:6000', heartbeat_sec=60.0)
+
+    # Test
+    response = local_cluster.on_members_message({'node_url': 'http://node-b:6000/',
+                                                 'members': ['http://node-b:6000', 'http://node-c:6000']})
+
+    # Verify
+    assert response['members'] == ['http://node-a:6000', 'http://node-b:6000']
+    assert local_cluster.members == ['http://node-a:6000', 'http://node-b:6000']
+    channel = find_channel(local_cluster, 'http://node-b:6000')
+    assert not local_cluster.is_local(channel)
+    assert local_cluster.route(channel) == 'http://node-b:6000'
+    assert local_cluster.route(channel, is_forwarded=True) is None
+    assert Cluster().route(channel) is None
+
+
+def test_heartbeat__drops_unreachable_member():
+    # Objective:
+    # A member that misses a number of heartbeats in a row is dropped (and owner is told membership changed).
+
+    # Setup
+    changes = []
+    local_cluster = Cluster('http://localhost:6346', heartbeat_sec=0.05, max_missed_heartbeats=2)
+    local_cluster.on_members_message({'node_url': 'http://localhost:6347'})
+
+    # Test
+    local_cluster.start(on_change=lambda: changes.append(local_cluster.members))
+    wait_until(lambda: local_cluster.members == ['http://localhost:6346'])
+    local_cluster.stop()
+
+    # Verify
+    assert changes and changes[-1] == ['http://localhost:6346']
+
+
+def test_post_event__forwarded_to_owner():
+    # Objective:
+    # Events for channels owned by another node are forwarded to it (marked as forwarded), others are dispatched
+    # here.
+
+    # Setup
+    remote_channel = find_channel(cluster, other_node_url)
+    local_channel = find_channel(cluster, event_center_url)
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                        'channel': local_channel})
+
+    # Test
+    remote_response = requests.post(f'{event_center_url}/post_event', json=make_remote_event(remote_channel, 0))
+    local_response = requests.post(f'{event_center_url}/post_event', json=make_remote_event(local_channel, 1))
+    wait_until(lambda: len(Receiver.received) == 1)
+
+    # Verify
+    assert remote_response.json() == {'success': 'true'}
+    assert local_response.json() == {'success': 'true'}
+    assert [(path, header) for path, header, _ in OtherNode.forwarded] == [('/post_event', '1')]
+    assert OtherNode.forwarded[0][2]['channel'] == remote_channel
+    assert Receiver.received[0]['event']['payload']['index'] == 1
+
+
+def test_post_events__split_by_owner():
+    # Objective:
+    # A batch is split by channel owner, each node gets only events for its channels.
+
+    # Setup
+    remote_channel = find_channel(cluster, other_node_url)
+    local_channel = find_channel(cluster, event_center_url)
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                        'channel': local_channel})
+    remote_events = [make_remote_event(remote_channel if i % 2 else local_channel, i) for i in range(6)]
+
+    # Test
+    response = requests.post(f'{event_center_url}/post_events', json={'remote_events': remote_events})
+    wait_until(lambda: len(Receiver.received) == 3)
+
+    # Verify
+    assert response.json() == {'success': 'true'}
+    assert len(OtherNode.forwarded) == 1
+    forwarded_events = OtherNode.forwarded[0][2]['remote_events']
+    assert [remote_event['event']['payload']['index'] for remote_event in forwarded_events] == [1, 3, 5]
+    assert sorted(event['event']['payload']['index'] for event in Receiver.received) == [0, 2, 4]
+
+
+def test_register__when_forwarded():
+    # Objective:
+    # Registrations for channels owned by another node go there, unless request was already forwarded (then it's
+    # handled here, so nodes that briefly disagree on membership don't forward it back and forth).
+
+    # Setup
+    remote_channel = find_channel(cluster, other_node_url)
+    registration = {'callback_url': callback_url, 'events': ['test_event'], 'channel': remote_channel}
+
+    # Test
+    requests.post(f'{event_center_url}/register', json=registration)
+    requests.post(f'{event_center_url}/register', json=registration, headers={FORWARDED_HEADER: '1'})
+
+    # Verify
+    assert [path for path, _, _ in OtherNode.forwarded] == ['/register']
+    registrant = service.event_registration_manager.get_registrant(callback_url)
+    assert list(registrant.registrations.keys()) == [remote_channel]
+
+
+def test_hand_over():
+    # Objective:
+    # Registrations for channels owned by another node (e.g. one that just joined) are handed over to it, and
+    # dropped here.
+
+    # Setup
+    remote_channel = find_channel(cluster, other_node_url)
+    local_channel = find_channel(cluster, event_center_url)
+    for channel, events in [(remote_channel, ['test_event', 'other_event']), (remote_channel, []),
+                            (local_channel, ['test_event'])]:
+        requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': events,
+                                                            'channel': channel}, headers={FORWARDED_HEADER: '1'})
+
+    # Test
+    service.event_registration_manager.hand_over(cluster)
+
+    # Verify
+    handed_over = [(body['channel'], sorted(body['events'])) for _, _, body in OtherNode.forwarded]
+    assert handed_over == [(remote_channel, ['other_event', 'test_event']), (remote_channel, [])]
+    registrant = service.event_registration_manager.get_registrant(callback_url)
+    assert list(registrant.registrations.keys()) == [local_channel]
+
+
+def test_forward__when_owner_stalls():
+    # Objective:
+    # Request forwarded to an owner node that doesn't answer fails once forward timeout is up (node is reported
+    # unreachable), instead of waiting on it for good.
+
+    # Setup
+    class StalledNode(BaseHTTPRequestHandler):
+        def do_POST(self):
+            time.sleep(2.0)
+
+        def log_message(self, format: str, *args: Any):
+            pass
+
+    stalled_node = ThreadingHTTPServer(('localhost', STALLED_NODE_PORT), StalledNode)
+    threading.Thread(target=stalled_node.serve_forever, daemon=True).start()
+    stalled_node_url = f'http://localhost:{STALLED_NODE_PORT}'
+    local_cluster = Cluster(event_center_url, [stalled_node_url], forward_timeout_sec=0.2)
+
+    # Test
+    start = time.monotonic()
+    response = local_cluster.forward(stalled_node_url, '/post_event', make_remote_event('some_channel', 0))
+    elapsed_sec = time.monotonic() - start
+
+    # Verify
+    try:
+        assert response == Cluster.get_unreachable_response(stalled_node_url)
+        assert elapsed_sec < 1.0
+    finally:
+        stalled_node.shutdown()
+        stalled_node.server_close()
+
+
+def test_cluster_members():
+    # Objective:
+    # Node reports itself, and members it knows of.
+
+    # Test
+    response = requests.get(f'{event_center_url}/cluster/members')
+
+    # Verify
+    assert response.json() == {
+        'node_url': event_center_url, 'members': [event_center_url, other_node_url], 'success': 'true'
+    }
+
+
+def test_nodes_on_localhost():
+    # Objective:
+    # Several event center nodes (processes) form a cluster, channels are spread across them, and events posted to
+    # any node reach registrants (including after a node joins, and registrations for channels it now owns moved).
+
+    # Setup
+    temp_dir = tempfile.mkdtemp()
+    node_urls = [f'http://localhost:{port}' for port in CLUSTER_NODE_PORTS]
+    channels = [f'channel_{i}' for i in range(12)]
+    nodes = [start_node(port, node_urls[0], temp_dir) for port in CLUSTER_NODE_PORTS[:2]]
+
+    try:
+        wait_until(lambda: all(len(get_members(url)) == 2 for url in node_urls[:2]), timeout_sec=20.0)
+        for channel in channels:
+            requests.post(f'{node_urls[1]}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                            'channel': channel})
+
+        # Test
+        nodes.append(start_node(CLUSTER_NODE_PORTS[2], node_urls[0], temp_dir))
+        ring = HashRing(node_urls)
+        wait_until(lambda: all(get_channels(url) == {channel for channel in channels
+                                                     if ring.get_node(channel) == url} for url in node_urls),
+                   timeout_sec=20.0)
+        for i, channel in enumerate(channels):
+            requests.post(f'{node_urls[i % 3]}/post_event', json=make_remote_event(channel, i))
+        wait_until(lambda: len(Receiver.received) == len(channels))
+
+        # Verify
+        assert all(get_channels(url) for url in node_urls)
+        assert sorted(event['event']['payload']['index'] for event in Receiver.received) == list(range(12))
+
+    finally:
+        for node in nodes:
+            node.terminate()
+            node.wait()
+        shutil.rmtree(temp_dir)
+
+
+def start_node(port: int, seed_node_url: str, temp_dir: str) -> subprocess.Popen:
+    env = dict(os.environ, EC_PORT=str(port), EC_LOG_DEBUG='0', EC_CLUSTER_NODE_URL=f'http://localhost:{port}',
+               EC_CLUSTER_SEED_NODES=seed_node_url,
+               EC_REGISTRANTS_FILE_PATH=os.path.join(temp_dir, f'registrants_{port}.json'))
+    env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                         env.get('PYTHONPATH', '')])
+    return subprocess.Popen([sys.executable, '-m', 'eventcenter.app_async_event_center'], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def get_members(node_url: str) -> list:
+    try:
+        return requests.get(f'{node_url}/cluster/members').json()['members']
+    except requests.exceptions.ConnectionError:
+        return []
+
+
+def get_channels(node_url: str) -> set:
+    registrants = requests.get(f'{node_url}/registrants').json()['registrants']
+    return {channel for registrations in registrants.values() for channel in registrations}
+
+
+def find_channel(local_cluster: Cluster, node_url: str) -> str:
+    # First channel (in a predictable sequence) owned by node.
+    return next(channel for channel in (f'channel_{i}' for i in range(1000))
+                if local_cluster.get_owner(channel) == node_url)
+
+
+def make_remote_event(channel: str, index: int) -> dict:
+    return {'channel': channel, 'event': {'id': index, 'name': 'test_event', 'payload': {'index': index}}}
+
+
+def write_response(handler: BaseHTTPRequestHandler, response: dict):
+    body = json.dumps(response).encode()
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def wait_until(condition, timeout_sec: float = 5.0):
+    deadline = time.monotonic() + timeout_sec
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.05)
+    assert condition()
@@ -0,0 +1,237 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+from flask import Flask
+
+from eventcenter.client import compression
+from eventcenter.client.compression import Compressor, ENCODING_GZIP, ENCODING_ZSTD, COMPRESSION_OFF
+from eventcenter.client.network import FlaskAppRunner
+
+pytest.importorskip('aiohttp')
+
+import requests
+from eventdispatch import Properties, EventDispatchManager
+
+from eventcenter.server.async_service import AsyncEventCenterService, start_async_event_center
+from eventcenter.server.event_center import get_subscription_index
+
+EVENT_CENTER_PORT = 6330
+RECEIVER_PORT = 6331
+
+service: AsyncEventCenterService
+receiver: ThreadingHTTPServer
+event_center_url = f'http://localhost:{EVENT_CENTER_PORT}'
+callback_url = f'http://localhost:{RECEIVER_PORT}/on_event'
+
+DATA = b'{"values":[' + b','.join(str(i).encode() for i in range(2000)) + b']}'
+
+
+class Receiver(BaseHTTPRequestHandler):
+    # Client that reads gzip requests (and says so in its responses).
+    received = []
+
+    def do_POST(self):
+        content_encoding = self.headers.get('Content-Encoding')
+        body = compression.decompress(self.rfile.read(int(self.headers.get('Content-Length', 0))), content_encoding)
+        Receiver.received.append((content_encoding, json.loads(body)))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Accept-Encoding', ENCODING_GZIP)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+def setup_module():
+    global service, receiver
+
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+
+    receiver = ThreadingHTTPServer(('localhost', RECEIVER_PORT), Receiver)
+    threading.Thread(target=receiver.serve_forever, daemon=True).start()
+
+    service = start_async_event_center(EVENT_CENTER_PORT)
+
+
+def setup_function():
+    Receiver.received = []
+    compression.set_compressor()
+    service.event_registration_manager.clear_registrants()
+    get_subscription_index().clear()
+    EventDispatchManager().default_dispatch.clear_registered_handlers()
+
+
+def teardown_function():
+    compression.set_compressor()
+
+
+def teardown_module():
+    service.shutdown()
+    receiver.shutdown()
+    receiver.server_close()
+
+
+@pytest.mark.parametrize('encoding', [ENCODING_GZIP, ENCODING_ZSTD])
+def test_compress_decompress(encoding: str):
+    # Objective:
+    # Data is smaller once compressed, and the same after a round trip.
+
+    # Setup
+    if encoding not in compression.get_encodings():
+        pytest.skip(f'{encoding} not installed')
+
+    # Test
+    compressed = compression.compress(DATA, encoding)
+
+    # Verify
+    assert len(compressed) < len(DATA)
+    assert compression.decompress(compressed, encoding) == DATA
+
+
+def test_decompress__when_no_encoding():
+    # Objective:
+    # Bodies without an encoding are read as is, and unknown encodings are refused.
+
+    # Test/Verify
+    assert compression.decompress(DATA, None) == DATA
+    assert compression.decompress(DATA, 'identity') == DATA
+    with pytest.raises(ValueError):
+        compression.decompress(DATA, 'not_an_encoding')
+
+
+def test_choose_encoding():
+    # Objective:
+    # Encoding is own preferred one that other end accepts (not refused with q=0), only for bodies above threshold.
+
+    # Setup
+    compressor = Compressor(ENCODING_GZIP, min_size=100)
+
+    # Test/Verify
+    assert compressor.choose_encoding('zstd, gzip', size=100) == ENCODING_GZIP
+    assert compressor.choose_encoding('gzip;q=0, deflate', size=100) is None
+    assert compressor.choose_encoding('gzip', size=99) is None
+    assert compressor.choose_encoding(None, size=100) is None
+    assert compressor.accept_encoding.startswith(ENCODING_GZIP)
+
+
+def test_choose_encoding__when_off():
+    # Objective:
+    # Nothing is compressed (or offered) when compression is off.
+
+    # Setup
+    compressor = Compressor(COMPRESSION_OFF)
+
+    # Test/Verify
+    assert not compressor.is_enabled
+    assert compressor.accept_encoding == ''
+    assert compressor.choose_encoding('zstd, gzip', size=10000) is None
+    assert compressor.compress_response(DATA, 'gzip') == (DATA, {})
+
+
+def test_compress_request():
+    # Objective:
+    # Requests to a host are compressed only once it said it reads an encoding, and only when large enough.
+
+    # Setup
+    compressor = Compressor(min_size=100)
+    headers = {'Content-Type': 'application/json'}
+    body1, headers1 = compressor.compress_request(callback_url, DATA, headers)
+
+    # Test
+    compressor.learn('http://localhost:6331/ping', ENCODING_GZIP)
+    body2, headers2 = compressor.compress_request(callback_url, DATA, headers)
+    body3, headers3 = compressor.compress_request(callback_url, DATA[:99], headers)
+
+    # Verify
+    assert (body1, headers1) == (DATA, headers)
+    assert gzip.decompress(body2) == DATA
+    assert headers2 == {'Content-Type': 'application/json', 'Content-Encoding': ENCODING_GZIP}
+    assert (body3, headers3) == (DATA[:99], headers)
+
+
+def test_flask_app__compressed_request_and_response():
+    # Objective:
+    # Flask apps read compressed requests, compress large responses (when accepted), and offer their encodings.
+
+    # Setup
+    app = Flask('test_compression')
+    runner = FlaskAppRunner('localhost', 0, app)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return runner.make_response(runner.read_body())
+
+    client = app.test_client()
+    data = json.loads(DATA)
+
+    # Test
+    response = client.post('/echo', data=gzip.compress(DATA),
+                           headers={'Content-Type': 'application/json', 'Content-Encoding': ENCODING_GZIP,
+                                    'Accept-Encoding': ENCODING_GZIP})
+
+    # Verify
+    assert response.headers['Content-Encoding'] == ENCODING_GZIP
+    assert ENCODING_GZIP in response.headers['Accept-Encoding']
+    assert json.loads(gzip.decompress(response.data)) == data
+
+
+@pytest.mark.parametrize('encoding', compression.get_encodings())
+def test_async_service__compressed_request(encoding: str):
+    # Objective:
+    # Async event center reads requests in every encoding it offers (it decompresses them, not aiohttp).
+
+    # Setup
+    data = json.dumps({'callback_url': callback_url, 'events': ['test_event'], 'channel': ''}).encode()
+
+    # Test
+    response = requests.post(f'{event_center_url}/register', data=compression.compress(data, encoding),
+                             headers={'Content-Type': 'application/json', 'Content-Encoding': encoding})
+    requests.post(f'{event_center_url}/post_event', json={
+        'channel': '',
+        'event': {'id': 0, 'name': 'test_event', 'time': time.time(), 'payload': {'index': 0}}
+    })
+    wait_until(lambda: Receiver.received)
+
+    # Verify
+    assert response.status_code == 200
+    assert encoding in response.headers['Accept-Encoding']
+    assert Receiver.received[0][1]['event']['payload'] == {'index': 0}
+
+
+def test_delivery__when_client_reads_gzip():
+    # Objective:
+    # Event center delivers large events compressed once client said it reads gzip (and small ones as is).
+
+    # Setup
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                        'channel': ''})
+    values = list(range(2000))
+
+    # Test
+    for i, payload in enumerate([{'values': values}, {'values': values}, {'index': 2}]):
+        response = requests.post(f'{event_center_url}/post_event', json={
+            'channel': '',
+            'event': {'id': i, 'name': 'test_event', 'time': time.time(), 'payload': payload}
+        })
+        assert ENCODING_GZIP in response.headers['Accept-Encoding']
+        wait_until(lambda: len(Receiver.received) > i)
+
+    # Verify
+    assert [content_encoding for content_encoding, _ in Receiver.received] == [None, ENCODING_GZIP, None]
+    assert Receiver.received[1][1]['event']['payload'] == {'values': values}
+
+
+def wait_until(condition, timeout_sec: float = 5.0):
+    deadline = time.monotonic() + timeout_sec
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
@@ -0,0 +1,235 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+from flask import Flask
+
+from eventcenter.client import serialization
+from eventcenter.client.network import FlaskAppRunner
+from eventcenter.client.serialization import ContentNegotiator, CONTENT_TYPE_JSON, CONTENT_TYPE_MSGPACK, \
+    CONTENT_TYPE_CBOR, FORMAT_MSGPACK, FORMAT_CBOR
+
+msgpack = pytest.importorskip('msgpack')
+pytest.importorskip('aiohttp')
+
+import requests
+from eventdispatch import Properties, EventDispatchManager
+
+from eventcenter.server.async_service import AsyncEventCenterService, start_async_event_center
+from eventcenter.server.event_center import get_subscription_index
+
+EVENT_CENTER_PORT = 6320
+RECEIVER_PORT = 6321
+
+service: AsyncEventCenterService
+receiver: ThreadingHTTPServer
+event_center_url = f'http://localhost:{EVENT_CENTER_PORT}'
+callback_url = f'http://localhost:{RECEIVER_PORT}/on_event'
+
+DATA = {'channel': 'some_channel', 'event': {'id': 1, 'name': 'test_event', 'time': 1.5,
+                                             'payload': {'values': [1, 2.5, -3], 'name': 'Alice', 'ok': True}}}
+
+
+class Receiver(BaseHTTPRequestHandler):
+    # Client that prefers msgpack (answers in it, when event center accepts it).
+    negotiator = ContentNegotiator(FORMAT_MSGPACK)
+    received = []
+
+    def do_POST(self):
+        content_type = self.headers.get('Content-Type')
+        body = serialization.decode(self.rfile.read(int(self.headers.get('Content-Length', 0))), content_type)
+        Receiver.received.append((content_type, body))
+
+        response_content_type = Receiver.negotiator.choose_content_type(self.headers.get('Accept'))
+        response = serialization.encode({}, response_content_type)
+        self.send_response(200)
+        self.send_header('Content-Type', response_content_type)
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+def setup_module():
+    global service, receiver
+
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+
+    receiver = ThreadingHTTPServer(('localhost', RECEIVER_PORT), Receiver)
+    threading.Thread(target=receiver.serve_forever, daemon=True).start()
+
+    service = start_async_event_center(EVENT_CENTER_PORT)
+
+
+def setup_function():
+    Receiver.received = []
+    serialization.set_content_negotiator()
+    service.event_registration_manager.clear_registrants()
+    get_subscription_index().clear()
+    EventDispatchManager().default_dispatch.clear_registered_handlers()
+
+
+def teardown_function():
+    serialization.set_content_negotiator()
+
+
+def teardown_module():
+    service.shutdown()
+    receiver.shutdown()
+    receiver.server_close()
+
+
+@pytest.mark.parametrize('content_type', [CONTENT_TYPE_JSON, CONTENT_TYPE_MSGPACK, CONTENT_TYPE_CBOR])
+def test_encode_decode(content_type: str):
+    # Objective:
+    # Data is the same after a round trip through each wire format (or json, if format is not installed).
+
+    # Test
+    encoded = serialization.encode(DATA, content_type)
+
+    # Verify
+    assert isinstance(encoded, bytes)
+    assert serialization.decode(encoded, content_type) == DATA
+
+
+def test_decode__when_content_type_has_params():
+    # Objective:
+    # Content type params (e.g. charset) are ignored, and unknown content types are read as json.
+
+    # Test
+    data1 = serialization.decode(serialization.encode(DATA), 'application/json; charset=utf-8')
+    data2 = serialization.decode(serialization.encode(DATA), 'text/plain')
+
+    # Verify
+    assert data1 == DATA
+    assert data2 == DATA
+
+
+def test_choose_content_type():
+    # Objective:
+    # Response format is own preferred one (if accepted), or else first accepted one that is supported, or else json.
+
+    # Setup
+    negotiator = ContentNegotiator(FORMAT_MSGPACK)
+    default_negotiator = ContentNegotiator()
+
+    # Test/Verify
+    assert negotiator.choose_content_type(f'{CONTENT_TYPE_JSON}, {CONTENT_TYPE_MSGPACK}') == CONTENT_TYPE_MSGPACK
+    assert negotiator.choose_content_type(CONTENT_TYPE_JSON) == CONTENT_TYPE_JSON
+    assert negotiator.choose_content_type(None) == CONTENT_TYPE_JSON
+    assert negotiator.choose_content_type('*/*') == CONTENT_TYPE_JSON
+    assert default_negotiator.choose_content_type(f'{CONTENT_TYPE_MSGPACK}, {CONTENT_TYPE_JSON}') == \
+        CONTENT_TYPE_MSGPACK
+    assert default_negotiator.choose_content_type('application/x-unknown, application/json') == CONTENT_TYPE_JSON
+
+
+def test_accept__offers_preferred_format_first():
+    # Objective:
+    # Requests offer preferred format first, then all others this end can read.
+
+    # Setup
+    negotiator = ContentNegotiator(FORMAT_CBOR)
+
+    # Test
+    accept = [content_type.strip() for content_type in negotiator.accept.split(',')]
+
+    # Verify
+    expected = CONTENT_TYPE_CBOR if serialization.cbor2 else CONTENT_TYPE_JSON
+    assert accept[0] == expected
+    assert set(accept) == set(serialization.get_content_types())
+
+
+def test_learn():
+    # Objective:
+    # Format of a host's responses is used for requests to that host (any path), others get json.
+
+    # Setup
+    negotiator = ContentNegotiator()
+
+    # Test
+    negotiator.learn('http://localhost:8000/on_event', f'{CONTENT_TYPE_MSGPACK}; charset=utf-8')
+    negotiator.learn('http://localhost:9000/on_event', 'text/html')
+
+    # Verify
+    assert negotiator.get_content_type('http://localhost:8000/ping') == CONTENT_TYPE_MSGPACK
+    assert negotiator.get_content_type('http://localhost:9000/on_event') == CONTENT_TYPE_JSON
+    assert negotiator.get_content_type('http://otherhost:8000/on_event') == CONTENT_TYPE_JSON
+
+
+def test_request__when_msgpack_body():
+    # Objective:
+    # Event center reads msgpack requests, and answers in msgpack (when accepted), or in json for older clients.
+
+    # Setup
+    headers = {'Content-Type': CONTENT_TYPE_MSGPACK, 'Accept': f'{CONTENT_TYPE_MSGPACK}, {CONTENT_TYPE_JSON}'}
+    data = {'callback_url': callback_url, 'events': ['test_event'], 'channel': ''}
+
+    # Test
+    response1 = requests.post(f'{event_center_url}/register', data=msgpack.packb(data), headers=headers)
+    response2 = requests.get(f'{event_center_url}/ping')
+
+    # Verify
+    assert response1.headers['Content-Type'].startswith(CONTENT_TYPE_MSGPACK)
+    assert msgpack.unpackb(response1.content) == {'success': 'true'}
+    assert response2.headers['Content-Type'].startswith(CONTENT_TYPE_JSON)
+    assert response2.json() == {'success': 'true'}
+
+
+def test_request__when_empty_or_malformed_body():
+    # Objective:
+    # Requests without a body, or with one that can't be decoded, are rejected as bad requests (not server errors),
+    # by both event center and flask apps (e.g. adapters).
+
+    # Setup
+    app = Flask('test_content_negotiation')
+    runner = FlaskAppRunner('localhost', 0, app)
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return runner.make_response(runner.read_body())
+
+    client = app.test_client()
+
+    # Test
+    responses = [
+        requests.post(f'{event_center_url}/register'),
+        requests.post(f'{event_center_url}/post_event', data=b'{not json', headers={'Content-Type': CONTENT_TYPE_JSON}),
+        client.post('/echo'),
+        client.post('/echo', data=b'{not json', headers={'Content-Type': CONTENT_TYPE_JSON}),
+    ]
+
+    # Verify
+    assert [response.status_code for response in responses] == [400, 400, 400, 400]
+
+
+def test_delivery__when_client_prefers_msgpack():
+    # Objective:
+    # Event center delivers events in json until client answers in msgpack, then in msgpack from then on.
+
+    # Setup
+    requests.post(f'{event_center_url}/register', json={'callback_url': callback_url, 'events': ['test_event'],
+                                                        'channel': ''})
+
+    # Test
+    for i in range(3):
+        requests.post(f'{event_center_url}/post_event', json={
+            'channel': '',
+            'event': {'id': i, 'name': 'test_event', 'time': time.time(), 'payload': {'index': i}}
+        })
+        wait_until(lambda: len(Receiver.received) > i)
+
+    # Verify
+    content_types = [content_type for content_type, _ in Receiver.received]
+    assert content_types == [CONTENT_TYPE_JSON, CONTENT_TYPE_MSGPACK, CONTENT_TYPE_MSGPACK]
+    assert [body['event']['payload']['index'] for _, body in Receiver.received] == [0, 1, 2]
+
+
+def wait_until(condition, timeout_sec: float = 5.0):
+    deadline = time.monotonic() + timeout_sec
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from eventcenter.server.delivery import DeliveryEngine
+
+engine: DeliveryEngine
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    global engine
+    engine = DeliveryEngine(worker_count=4, max_drain=2)
+
+
+def teardown_function():
+    global engine
+    engine.shutdown()
+
+
+def teardown_module():
+    pass
+
+
+def test_submit__preserves_order_per_destination():
+    # Objective:
+    # Deliveries to the same destination are made in the order they were submitted.
+
+    # Setup
+    global engine
+    delivered = []
+
+    # Test
+    for i in range(10):
+        engine.submit('url1', lambda i=i: delivered.append(i))
+
+    # Verify
+    assert engine.wait_until_idle(1.0)
+    assert delivered == list(range(10))
+
+
+def test_submit__slow_destination_does_not_block_others():
+    # Objective:
+    # A destination that is slow to respond does not hold up delivery to other destinations.
+
+    # Setup
+    global engine
+    release = threading.Event()
+    delivered = []
+
+    # Test
+    engine.submit('slow_url', lambda: release.wait(2.0))
+    engine.submit('url1', lambda: delivered.append('url1'))
+    engine.submit('url2', lambda: delivered.append('url2'))
+
+    # Verify
+    time.sleep(0.1)
+    assert sorted(delivered) == ['url1', 'url2']
+    assert engine.queue_depth('slow_url') == 1
+
+    release.set()
+    assert engine.wait_until_idle(1.0)
+    assert engine.queue_depths() == {}
+
+
+def test_submit__when_delivery_raises():
+    # Objective:
+    # Failure of one delivery does not stop later deliveries to the same destination.
+
+    # Setup
+    global engine
+    delivered = []
+
+    def fail():
+        raise RuntimeError('failed')
+
+    # Test
+    engine.submit('url1', fail)
+    engine.submit('url1', lambda: delivered.append(1))
+
+    # Verify
+    assert engine.wait_until_idle(1.0)
+    assert delivered == [1]
+
+
+def test_submit_batched__accumulates_while_destination_busy():
+    # Objective:
+    # Items submitted while destination is busy are sent together, in one batch, in the order submitted.
+
+    # Setup
+    global engine
+    release = threading.Event()
+    sent_batches = []
+    engine.submit('url1', lambda: release.wait(2.0))
+
+    # Test
+    for i in range(5):
+        engine.submit_batched('url1', i, sent_batches.append)
+    release.set()
+
+    # Verify
+    assert engine.wait_until_idle(1.0)
+    assert sent_batches == [[0, 1, 2, 3, 4]]
+
+
+def test_submit_batched__when_max_batch_size_reached():
+    # Objective:
+    # Items beyond max batch size go into the next batch.
+
+    # Setup
+    batching_engine = DeliveryEngine(worker_count=2, max_batch_size=2)
+    release = threading.Event()
+    sent_batches = []
+    batching_engine.submit('url1', lambda: release.wait(2.0))
+
+    # Test
+    for i in range(5):
+        batching_engine.submit_batched('url1', i, sent_batches.append)
+    release.set()
+
+    # Verify
+    assert batching_engine.wait_until_idle(1.0)
+    assert sent_batches == [[0, 1], [2, 3], [4]]
+    batching_engine.shutdown()
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from eventcenter.client.event_batcher import EventBatcher
+
+batcher: EventBatcher
+sent_batches: list
+sent_event: threading.Event
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    global sent_batches, sent_event
+    sent_batches = []
+    sent_event = threading.Event()
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    pass
+
+
+def send_batch(batch: list):
+    sent_batches.append(batch)
+    sent_event.set()
+
+
+def test_add__sent_after_linger_time():
+    # Objective:
+    # Items added within linger time are sent together, in one batch, in the order they were added.
+
+    # Setup
+    global batcher
+    batcher = EventBatcher(send_batch, linger_sec=0.1, max_batch_size=100)
+
+    # Test
+    for i in range(5):
+        batcher.add(i)
+
+    # Verify
+    assert sent_batches == []
+    assert sent_event.wait(1.0)
+    assert sent_batches == [[0, 1, 2, 3, 4]]
+    batcher.stop()
+
+
+def test_add__sent_when_max_batch_size_reached():
+    # Objective:
+    # Batch is sent without waiting for linger time, once max batch size is reached.
+
+    # Setup
+    global batcher
+    batcher = EventBatcher(send_batch, linger_sec=10.0, max_batch_size=3)
+
+    # Test
+    for i in range(3):
+        batcher.add(i)
+
+    # Verify
+    assert sent_event.wait(1.0)
+    assert sent_batches == [[0, 1, 2]]
+    batcher.stop()
+
+
+def test_stop__sends_pending_items():
+    # Objective:
+    # Items still waiting (within linger time) are sent when batcher is stopped, preserving order.
+
+    # Setup
+    global batcher
+    batcher = EventBatcher(send_batch, linger_sec=10.0, max_batch_size=2)
+    for i in range(5):
+        batcher.add(i)
+
+    # Test
+    time.sleep(0.1)
+    batcher.stop()
+
+    # Verify
+    assert [item for batch in sent_batches for item in batch] == [0, 1, 2, 3, 4]
+    assert batcher.pending_count == 0
@@ -56,6 +56,21 @@ def test_init():
     assert port in adapter.callback_url
 
 
+def test_on_event__when_empty_body():
+    # Objective:
+    # Callback without a body is rejected as a bad request, and nothing is handed to the event handler.
+
+    # Setup
+    global adapter
+
+    # Test
+    response = adapter.app.test_client().post('/on_event')
+
+    # Verify
+    assert response.status_code == 400
+    assert handler1.received_events == {}
+
+
 test_params__register = [
     # Specified events, no channel.
     (
@@ -1,12 +1,14 @@
 import json
 import os
+import threading
 import time
 
 import pytest
 from eventdispatch import Properties, Event, EventDispatch, EventDispatchManager
 
 from eventcenter.server.event_center import EventRegistrationManager, RegistrationEvent, RegistrationData, \
-    RemoteEventData
+    RemoteEventData, RemoteEventBatchData, get_subscription_index
+from eventcenter.server.metrics import DELIVERIES, DELIVERY_SUCCESS, get_metrics
 from eventcenter.server.service import RESPONSE_OK
 from helper import validate_file_exists, validate_file_not_exists, validate_file_content, validate_event_log_count
 
@@ -30,6 +32,7 @@ def setup_module():
 def setup_function():
     global event_registration_manager, event_dispatch
 
+    get_subscription_index().clear()
     event_dispatch.clear_event_log()
     event_dispatch.clear_registered_handlers()
 
@@ -499,6 +502,28 @@ def create_registrant_with_data(data: RegistrationData, url: str, expected_regis
     validate_have_registrant(url)
 
 
+@pytest.mark.parametrize('is_unregister_all', [True, False])
+def test_unregister_all__drops_metrics(is_unregister_all: bool):
+    # Objective:
+    # Metrics of a client are dropped once it's no longer registered (whether it unregistered from everything, or
+    # from its last registration).
+
+    # Setup
+    global event_registration_manager
+    event_registration_manager.register(RegistrationData(callback_url, ['test_event'], SOME_CHANNEL))
+    get_metrics().inc(DELIVERIES, (callback_url, DELIVERY_SUCCESS))
+
+    # Test
+    if is_unregister_all:
+        event_registration_manager.unregister_all(callback_url)
+    else:
+        event_registration_manager.unregister(RegistrationData(callback_url, ['test_event'], SOME_CHANNEL))
+
+    # Verify
+    validate_expected_registrant_count(0)
+    assert get_metrics().get(DELIVERIES, (callback_url, DELIVERY_SUCCESS)) is None
+
+
 @pytest.mark.parametrize('channel', ['', SOME_CHANNEL])
 def test_post(channel: str):
     # Objective:
@@ -549,6 +574,34 @@ def test_post__when_channel_not_exist():
     assert EventDispatchManager().event_dispatchers.get(channel)
 
 
+@pytest.mark.parametrize('channel', ['', SOME_CHANNEL])
+def test_post_batch(channel: str):
+    # Objective:
+    # All events in batch are posted on the channel's event dispatch, in the order they are in the batch.
+
+    # Setup
+    global event_registration_manager
+    events = [Event('test_event1'), Event('test_event2'), Event('test_event3')]
+    batch_data = RemoteEventBatchData([RemoteEventData(channel, event) for event in events])
+    if channel:
+        EventDispatchManager().add_event_dispatch(channel)
+    channel_event_dispatch = EventDispatchManager().event_dispatchers.get(channel)
+    channel_event_dispatch.clear_event_log()
+    channel_event_dispatch.toggle_event_logging(True)
+    channel_event_dispatch.log_event_if_no_handlers = True
+
+    # Test
+    event_registration_manager.post_batch(batch_data)
+
+    # Verify
+    validate_event_log_count(3, channel_event_dispatch)
+    assert [event.name for event in channel_event_dispatch.event_log] == [event.name for event in events]
+
+    # Teardown
+    channel_event_dispatch.toggle_event_logging(False)
+    channel_event_dispatch.log_event_if_no_handlers = False
+
+
 def test_on_event__when_callback_failed():
     # Objective:
     # Unreachable client is unregistered from given event.
@@ -574,6 +627,70 @@ def test_on_event__when_callback_failed():
     validate_expected_registrant_count(0)
 
 
+def test_register__from_concurrent_clients():
+    # Objective:
+    # Registration changes made by many clients at once (each locking only its own registrant) all land, and the
+    # registrants file ends up with all of them.
+
+    # Setup
+    global event_registration_manager
+    urls = [f'http://localhost:{8000 + i}/on_event' for i in range(16)]
+
+    def churn(url: str):
+        for i in range(20):
+            event_registration_manager.register(RegistrationData(url, [f'test_event{i}'], SOME_CHANNEL))
+        for i in range(0, 20, 2):
+            event_registration_manager.unregister(RegistrationData(url, [f'test_event{i}'], SOME_CHANNEL))
+
+    # Test
+    threads = [threading.Thread(target=churn, args=[url]) for url in urls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Verify
+    expected_events = [f'test_event{i}' for i in range(1, 20, 2)]
+    registrants = event_registration_manager.pack_registrants()['registrants']
+    assert registrants == {url: {SOME_CHANNEL: expected_events} for url in urls}
+    with open(Properties().get('REGISTRANTS_FILE_PATH'), 'r') as file:
+        assert json.load(file)['registrants'] == registrants
+
+
+def test_register__for_event_patterns():
+    # Objective:
+    # Clients registered for event name patterns get events whose names match them (each client only once), and
+    # stop getting them once unregistered.
+
+    # Setup
+    global event_registration_manager
+    worker_url = 'http://localhost:8001/on_event'
+    router_url = 'http://localhost:8002/on_event'
+    event_registration_manager.register(RegistrationData(worker_url, ['worker.*', 'worker.started'], SOME_CHANNEL))
+    event_registration_manager.register(RegistrationData(router_url, ['router.#'], SOME_CHANNEL))
+
+    # Test
+    def get_callback_urls(event_name: str) -> [str]:
+        registrations = get_subscription_index().get_registrations(SOME_CHANNEL, event_name)
+        return sorted(registration.callback_url for registration in registrations)
+
+    worker_started_urls = get_callback_urls('worker.started')
+    worker_stopped_urls = get_callback_urls('worker.stopped')
+    router_failed_urls = get_callback_urls('router.diagnostics.failed')
+    other_urls = get_callback_urls('worker.task.started')
+    event_registration_manager.unregister(RegistrationData(router_url, ['router.#'], SOME_CHANNEL))
+
+    # Verify
+    assert worker_started_urls == [worker_url]
+    assert worker_stopped_urls == [worker_url]
+    assert router_failed_urls == [router_url]
+    assert other_urls == []
+    assert get_callback_urls('router.started') == []
+    assert event_registration_manager.pack_registrants()['registrants'] == {
+        worker_url: {SOME_CHANNEL: ['worker.*', 'worker.started']}
+    }
+
+
 def validate_expected_registrant_count(expected_count: int, manager: EventRegistrationManager = None):
     global event_registration_manager
 
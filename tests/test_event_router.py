@@ -1,3 +1,4 @@
+import threading
 import time
 
 from eventdispatch import Event
@@ -71,6 +72,7 @@ def test_on_internal_event__when_registration_event(mocker):
 
     # Test
     event_router.on_internal_event(event)
+    assert event_router.wait_until_sent(5.0)
 
     # Verify registration event got propagated out.
     mock_call.assert_called_with(event.payload.get('events'), test_channel)
@@ -92,6 +94,7 @@ def test_on_internal_event__when_unregistration_event(mocker):
 
     # Test
     event_router.on_internal_event(event)
+    assert event_router.wait_until_sent(5.0)
 
     # Verify unregistration event got propagated out.
     mock_call.assert_called_with(event.payload.get('events'), test_channel)
@@ -111,11 +114,45 @@ def test_on_internal_event__when_non_registration_event(mocker):
 
     # Test
     event_router.on_internal_event(event)
+    assert event_router.wait_until_sent(5.0)
 
     # Verify
     mock_call.assert_called_with(event, test_channel, is_suppress_connection_error=False)
 
 
+def test_on_internal_event__when_several_non_registration_events(mocker):
+    # Objective:
+    # Events queued up while sender is busy are posted to Event Center together, in order.
+
+    # Setup
+    global event_router
+    test_channel = ''
+    events = [Event('test_event', {'count': i}) for i in range(5)]
+    sending = threading.Event()
+    proceed = threading.Event()
+
+    def post_event(*args, **kwargs):
+        sending.set()
+        proceed.wait(5.0)
+
+    mock_post_event = mocker.patch('eventcenter.client.event_center_adapter.EventCenterAdapter.post_event',
+                                   side_effect=post_event)
+    mock_post_events = mocker.patch('eventcenter.client.event_center_adapter.EventCenterAdapter.post_events',
+                                    return_value=None)
+    event_router.on_internal_event(events[0])
+    assert sending.wait(5.0)
+
+    # Test
+    for event in events[1:]:
+        event_router.on_internal_event(event)
+    proceed.set()
+    assert event_router.wait_until_sent(5.0)
+
+    # Verify
+    mock_post_event.assert_called_once_with(events[0], test_channel, is_suppress_connection_error=False)
+    mock_post_events.assert_called_once_with(events[1:], test_channel, is_suppress_connection_error=False)
+
+
 def test_on_external_event():
     # Objective:
     # Event is posted to local_clients Event Dispatch, and locally registered handler receives it.
@@ -136,3 +173,30 @@ def test_on_external_event():
     # Verify
     time.sleep(0.1)
     validate_received_events(handler1, [event.name])
+
+
+def test_on_external_event__when_handler_registered_for_pattern(mocker):
+    # Objective:
+    # Event matching a pattern a local handler registered for is posted to it (under the pattern), along with its own
+    # name.  Handlers registered for patterns it doesn't match don't get it.
+
+    # Setup
+    global handler1, event_router
+    handler2 = EventHandler()
+    mocker.patch('eventcenter.client.event_center_adapter.EventCenterAdapter.register', return_value=None)
+    register_handler_for_event(handler1, 'worker.*')
+    register_handler_for_event(handler2, 'router.#')
+    assert event_router.wait_until_sent(5.0)
+
+    remote_event = RemoteEventData('', Event('worker.started', {
+        'name': 'Alice'
+    }))
+
+    # Test
+    event_router.on_external_event(remote_event)
+
+    # Verify
+    time.sleep(0.1)
+    assert handler1.received_events['worker.*'].payload['metadata']['external_event_name'] == 'worker.started'
+    validate_received_events(handler1, ['worker.*'])
+    validate_received_events(handler2, [])
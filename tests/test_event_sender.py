@@ -0,0 +1,95 @@
+import threading
+
+from eventcenter.client.event_sender import EventSender
+
+sent_batches: list
+sending: threading.Event
+proceed: threading.Event
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    global sent_batches, sending, proceed
+
+    sent_batches = []
+    sending = threading.Event()
+    proceed = threading.Event()
+    proceed.set()
+
+
+def teardown_function():
+    global proceed
+    proceed.set()
+
+
+def teardown_module():
+    pass
+
+
+def send_batch(batch):
+    sending.set()
+    proceed.wait(5.0)
+    sent_batches.append(batch)
+
+
+def test_add__items_queued_while_sending_are_sent_together():
+    # Objective:
+    # Items added while sender is busy are sent in one batch, in the order added.
+
+    # Setup
+    global proceed
+    proceed.clear()
+    sender = EventSender(send_batch, max_batch_size=100)
+    sender.add(0)
+    assert sending.wait(5.0)
+
+    # Test
+    for i in range(1, 6):
+        sender.add(i)
+    proceed.set()
+
+    # Verify
+    assert sender.wait_until_sent(5.0)
+    assert [item for batch in sent_batches for item in batch] == list(range(6))
+    assert sent_batches[-1] == [1, 2, 3, 4, 5]
+    sender.stop()
+
+
+def test_add__when_max_batch_size_reached():
+    # Objective:
+    # Batches are no bigger than max batch size.
+
+    # Setup
+    global proceed
+    proceed.clear()
+    sender = EventSender(send_batch, max_batch_size=2)
+
+    # Test
+    for i in range(5):
+        sender.add(i)
+    proceed.set()
+
+    # Verify
+    assert sender.wait_until_sent(5.0)
+    assert [item for batch in sent_batches for item in batch] == list(range(5))
+    assert max(len(batch) for batch in sent_batches) <= 2
+    sender.stop()
+
+
+def test_stop__sends_remaining_items():
+    # Objective:
+    # Items added before stopping are still sent.
+
+    # Setup
+    sender = EventSender(send_batch)
+    for i in range(3):
+        sender.add(i)
+
+    # Test
+    sender.stop(5.0)
+
+    # Verify
+    assert [item for batch in sent_batches for item in batch] == [0, 1, 2]
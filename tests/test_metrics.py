@@ -0,0 +1,137 @@
+import threading
+
+from eventcenter.server.metrics import Metrics, EVENTS_RECEIVED, DELIVERIES, DELIVERY_LATENCY, REGISTRANTS, \
+    DELIVERY_QUEUE_DEPTH, DELIVERY_SUCCESS
+
+CALLBACK_URL = 'http://localhost:9999/on_event'
+OTHER_CALLBACK_URL = 'http://localhost:9998/on_event'
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    pass
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    pass
+
+
+def test_inc__from_concurrent_threads():
+    # Objective:
+    # Counts recorded by many threads at once (each into its own shard) add up, including ones recorded by threads
+    # that ended.
+
+    # Setup
+    metrics = Metrics(is_enabled=True)
+
+    def record():
+        for _ in range(1000):
+            metrics.inc(EVENTS_RECEIVED, ('channel_1',))
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+
+    # Test
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    del threads, thread
+    metrics.inc(EVENTS_RECEIVED, ('channel_1',))
+    metrics.inc(EVENTS_RECEIVED, ('channel_2',), amount=5)
+
+    # Verify
+    assert metrics.get(EVENTS_RECEIVED, ('channel_1',)) == 8001
+    assert metrics.get(EVENTS_RECEIVED, ('channel_2',)) == 5
+    assert metrics.get(EVENTS_RECEIVED, ('channel_3',)) is None
+
+
+def test_observe__histogram():
+    # Objective:
+    # Values are counted in first bucket they fit in (+Inf if none), and rendered as cumulative buckets, sum and count.
+
+    # Setup
+    metrics = Metrics(is_enabled=True, latency_buckets=[0.01, 0.1, 1.0])
+
+    # Test
+    for latency_sec in [0.005, 0.01, 0.05, 0.5, 2.0]:
+        metrics.observe(DELIVERY_LATENCY, (CALLBACK_URL,), latency_sec)
+    text = metrics.render()
+
+    # Verify
+    assert metrics.get(DELIVERY_LATENCY, (CALLBACK_URL,))[:-1] == [2, 1, 1, 1]
+    assert f'# TYPE {DELIVERY_LATENCY} histogram' in text
+    assert f'{DELIVERY_LATENCY}_bucket{{callback_url="{CALLBACK_URL}",le="0.01"}} 2' in text
+    assert f'{DELIVERY_LATENCY}_bucket{{callback_url="{CALLBACK_URL}",le="1.0"}} 4' in text
+    assert f'{DELIVERY_LATENCY}_bucket{{callback_url="{CALLBACK_URL}",le="+Inf"}} 5' in text
+    assert f'{DELIVERY_LATENCY}_sum{{callback_url="{CALLBACK_URL}"}} 2.565' in text
+    assert f'{DELIVERY_LATENCY}_count{{callback_url="{CALLBACK_URL}"}} 5' in text
+
+
+def test_render__counters_and_gauges():
+    # Objective:
+    # Recorded counters and given gauges are rendered in Prometheus text format (label values escaped).
+
+    # Setup
+    metrics = Metrics(is_enabled=True)
+    metrics.inc(DELIVERIES, (CALLBACK_URL, DELIVERY_SUCCESS), amount=3)
+    metrics.inc(EVENTS_RECEIVED, ('say "hi"\\',))
+
+    # Test
+    text = metrics.render({REGISTRANTS: {(): 2}, DELIVERY_QUEUE_DEPTH: {(CALLBACK_URL,): 7}})
+
+    # Verify
+    assert f'# TYPE {DELIVERIES} counter' in text
+    assert f'{DELIVERIES}{{callback_url="{CALLBACK_URL}",result="success"}} 3' in text
+    assert f'{EVENTS_RECEIVED}{{channel="say \\"hi\\"\\\\"}} 1' in text
+    assert f'# TYPE {REGISTRANTS} gauge\n{REGISTRANTS} 2\n' in text
+    assert f'{DELIVERY_QUEUE_DEPTH}{{callback_url="{CALLBACK_URL}"}} 7' in text
+    assert text.endswith('\n')
+
+
+def test_discard():
+    # Objective:
+    # Series of a callback url are dropped (including ones recorded by threads that ended), others are kept.
+
+    # Setup
+    metrics = Metrics(is_enabled=True)
+    thread = threading.Thread(target=metrics.inc, args=[DELIVERIES, (CALLBACK_URL, DELIVERY_SUCCESS)])
+    thread.start()
+    thread.join()
+    del thread
+    metrics.inc(DELIVERIES, (CALLBACK_URL, DELIVERY_SUCCESS))
+    metrics.observe(DELIVERY_LATENCY, (CALLBACK_URL,), 0.1)
+    metrics.inc(DELIVERIES, (OTHER_CALLBACK_URL, DELIVERY_SUCCESS))
+    metrics.inc(EVENTS_RECEIVED, (CALLBACK_URL,))
+
+    # Test
+    metrics.discard(CALLBACK_URL)
+
+    # Verify
+    assert metrics.collect() == {
+        (DELIVERIES, (OTHER_CALLBACK_URL, DELIVERY_SUCCESS)): 1,
+        (EVENTS_RECEIVED, (CALLBACK_URL,)): 1
+    }
+
+
+def test_inc__when_disabled():
+    # Objective:
+    # Nothing is recorded when metrics are off (gauges are still rendered).
+
+    # Setup
+    metrics = Metrics(is_enabled=False)
+
+    # Test
+    metrics.inc(EVENTS_RECEIVED, ('channel_1',))
+    metrics.observe(DELIVERY_LATENCY, (CALLBACK_URL,), 0.1)
+
+    # Verify
+    assert metrics.collect() == {}
+    assert metrics.render({REGISTRANTS: {(): 0}}) == f'# HELP {REGISTRANTS} Registrants (callback urls)\n' \
+                                                     f'# TYPE {REGISTRANTS} gauge\n{REGISTRANTS} 0\n'
@@ -0,0 +1,93 @@
+import pytest
+
+from eventcenter.client.network import SessionPool, APICaller, ApiConnectionError
+
+session_pool: SessionPool
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    global session_pool
+    session_pool = SessionPool(pool_size=2, max_retries=1, retry_backoff_sec=0.0, is_keep_alive=True)
+
+
+def teardown_function():
+    global session_pool
+    session_pool.close()
+
+
+def teardown_module():
+    pass
+
+
+def test_get_session__when_same_host():
+    # Objective:
+    # Same session is used for all calls to the same host (regardless of path).
+
+    # Setup
+    global session_pool
+
+    # Test
+    session1 = session_pool.get_session('http://localhost:8000/on_event')
+    session2 = session_pool.get_session('http://localhost:8000/ping')
+
+    # Verify
+    assert session1 is session2
+    stats = session_pool.stats
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+    assert stats['sessions'] == 1
+
+
+def test_get_session__when_different_hosts():
+    # Objective:
+    # A separate session is used per host.
+
+    # Setup
+    global session_pool
+
+    # Test
+    session1 = session_pool.get_session('http://localhost:8000/on_event')
+    session2 = session_pool.get_session('http://localhost:9000/on_event')
+
+    # Verify
+    assert session1 is not session2
+    stats = session_pool.stats
+    assert stats['misses'] == 2
+    assert stats['hits'] == 0
+    assert stats['sessions'] == 2
+
+
+def test_get_session__when_keep_alive_disabled():
+    # Objective:
+    # Sessions ask for connections to be closed after each call.
+
+    # Setup
+    pool = SessionPool(is_keep_alive=False)
+
+    # Test
+    session = pool.get_session('http://localhost:8000/on_event')
+
+    # Verify
+    assert session.headers['Connection'] == 'close'
+    pool.close()
+
+
+def test_make_post_call__when_unreachable():
+    # Objective:
+    # Connection error carries body as caller gave it (not as encoded, and possibly compressed, for the call).
+
+    # Setup
+    global session_pool
+    url = 'http://localhost:1/on_event'
+    json = {'values': list(range(2000))}
+
+    # Test
+    with pytest.raises(ApiConnectionError) as e:
+        APICaller.make_post_call(url, json=json, session=session_pool.get_session(url), timeout_sec=1.0)
+
+    # Verify
+    assert e.value.payload == {'url': url, 'data': None, 'json': json}
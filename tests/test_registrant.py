@@ -1,6 +1,6 @@
 from eventdispatch import Properties, EventDispatchManager, EventDispatch
 
-from eventcenter.server.event_center import Registrant
+from eventcenter.server.event_center import Registrant, get_subscription_index
 from eventcenter.server.service import RESPONSE_OK
 
 event_dispatch: EventDispatch
@@ -19,6 +19,7 @@ def setup_module():
 def setup_function():
     global event_dispatch, registrant
 
+    get_subscription_index().clear()
     event_dispatch.clear_event_log()
     event_dispatch.clear_registered_handlers()
 
@@ -0,0 +1,273 @@
+import json
+import os
+import threading
+import time
+
+from eventdispatch import Properties
+
+from eventcenter.server.event_center import EventRegistrationManager, RegistrationData, get_subscription_index
+from eventcenter.server.journal import RegistrantsJournal, REGISTRANTS_JOURNAL, FSYNC_ALWAYS, REGISTRANTS_SHARED, \
+    REGISTRANTS_SYNC_INTERVAL_SEC, REGISTRANTS_JOURNAL_COMPACT_EVERY
+from helper import validate_file_exists, validate_file_content
+
+SNAPSHOT_FILE_PATH = 'journal_test_registrants.json'
+
+journal: RegistrantsJournal
+
+
+def setup_module():
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+
+
+def setup_function():
+    global journal
+
+    remove_files()
+    journal = RegistrantsJournal(SNAPSHOT_FILE_PATH, fsync_policy=FSYNC_ALWAYS, compact_every=3)
+
+
+def teardown_function():
+    global journal
+
+    journal.close()
+    remove_files()
+    Properties().set(REGISTRANTS_JOURNAL, False)
+    Properties().set(REGISTRANTS_SHARED, False)
+
+
+def teardown_module():
+    pass
+
+
+def remove_files():
+    for path in [SNAPSHOT_FILE_PATH, SNAPSHOT_FILE_PATH + '.journal', SNAPSHOT_FILE_PATH + '.tmp',
+                 SNAPSHOT_FILE_PATH + '.journal.lock', SNAPSHOT_FILE_PATH + '.journal.tmp',
+                 'registrants.json.journal', 'registrants.json.journal.lock']:
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def test_append__entries_are_loaded_in_order():
+    # Objective:
+    # Appended entries are loaded back, in the order they were appended.
+
+    # Setup
+    global journal
+    data1 = RegistrationData('http://localhost:8000/on_event', ['test_event1'], '').dict
+    data2 = RegistrationData('http://localhost:8000/on_event', ['test_event1'], '').dict
+
+    # Test
+    journal.append('register', data1)
+    journal.append('unregister', data2)
+
+    # Verify
+    snapshot, entries = journal.load()
+    assert snapshot == {}
+    assert entries == [{'op': 'register', 'data': data1}, {'op': 'unregister', 'data': data2}]
+    assert journal.entry_count == 2
+    assert not journal.is_compaction_due
+
+
+def test_load__when_last_entry_incomplete():
+    # Objective:
+    # Partially written entry (at end of journal) is ignored.
+
+    # Setup
+    global journal
+    journal.append('unregister_all', {'callback_url': 'http://localhost:8000/on_event'})
+    with open(journal.journal_file_path, 'a') as file:
+        file.write('{"op": "regis')
+
+    # Test
+    _, entries = journal.load()
+
+    # Verify
+    assert entries == [{'op': 'unregister_all', 'data': {'callback_url': 'http://localhost:8000/on_event'}}]
+
+
+def test_compact():
+    # Objective:
+    # Snapshot is written, and journal is emptied.
+
+    # Setup
+    global journal
+    for _ in range(3):
+        journal.append('unregister_all', {'callback_url': 'http://localhost:8000/on_event'})
+    assert journal.is_compaction_due
+    snapshot = {'registrants': {}}
+
+    # Test
+    journal.compact(snapshot)
+
+    # Verify
+    validate_file_content(SNAPSHOT_FILE_PATH, json.dumps(snapshot))
+    loaded_snapshot, entries = journal.load()
+    assert loaded_snapshot == snapshot
+    assert entries == []
+    assert journal.entry_count == 0
+
+
+def test_event_registration_manager__restores_journaled_registrations(mocker):
+    # Objective:
+    # Registration changes are journaled (not written to registrants file), and restored on restart.
+
+    # Setup
+    mocker.patch('eventcenter.server.event_center.APICaller.make_post_call')
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set(REGISTRANTS_JOURNAL, True)
+    filepath = Properties().get('REGISTRANTS_FILE_PATH')
+
+    manager = EventRegistrationManager()
+    manager.clear_registrants()
+    manager.register(RegistrationData('http://localhost:8000/on_event', ['test_event1', 'test_event2'], ''))
+    manager.register(RegistrationData('http://localhost:9000/on_event', [], 'some_channel'))
+    manager.unregister(RegistrationData('http://localhost:8000/on_event', ['test_event2'], ''))
+    validate_file_content(filepath, json.dumps({'registrants': {}}))
+
+    # Test (drop in-memory registrations, as if restarted)
+    get_subscription_index().clear()
+    restarted_manager = EventRegistrationManager()
+
+    # Verify
+    assert restarted_manager.pack_registrants() == {
+        'registrants': {
+            'http://localhost:8000/on_event': {'': ['test_event1']},
+            'http://localhost:9000/on_event': {'some_channel': ['']}
+        }
+    }
+    validate_file_exists(filepath)
+    validate_file_content(filepath, json.dumps(restarted_manager.pack_registrants()))
+
+    # Teardown
+    restarted_manager.clear_registrants()
+
+
+def test_read_new_entries__when_shared():
+    # Objective:
+    # Writer sharing a journal reads entries appended by other writer (and not its own).
+
+    # Setup
+    writer1 = RegistrantsJournal(SNAPSHOT_FILE_PATH, fsync_policy=FSYNC_ALWAYS, is_shared=True)
+    writer2 = RegistrantsJournal(SNAPSHOT_FILE_PATH, fsync_policy=FSYNC_ALWAYS, is_shared=True)
+    writer1.reset_reader()
+    writer2.reset_reader()
+    data = RegistrationData('http://localhost:8000/on_event', ['test_event1'], '').dict
+
+    # Test
+    writer1.append('register', data)
+    writer2.append('unregister_all', {'callback_url': 'http://localhost:9000/on_event'})
+
+    # Verify
+    entries = writer2.read_new_entries()
+    assert [(entry['op'], entry['data']) for entry in entries] == [('register', data)]
+    entries = writer1.read_new_entries()
+    assert [entry['op'] for entry in entries] == ['unregister_all']
+    assert writer1.read_new_entries() == []
+
+    writer1.close()
+    writer2.close()
+
+
+def test_read_new_entries__when_shared_and_compacted():
+    # Objective:
+    # Entries written before and after another writer compacted the journal are all read, in order.
+
+    # Setup
+    writer1 = RegistrantsJournal(SNAPSHOT_FILE_PATH, fsync_policy=FSYNC_ALWAYS, is_shared=True)
+    writer2 = RegistrantsJournal(SNAPSHOT_FILE_PATH, fsync_policy=FSYNC_ALWAYS, is_shared=True)
+    writer1.reset_reader()
+    writer2.reset_reader()
+    writer1.append('unregister_all', {'callback_url': 'http://localhost:8000/on_event'})
+
+    # Test
+    writer1.compact({'registrants': {}})
+    writer1.append('unregister_all', {'callback_url': 'http://localhost:9000/on_event'})
+
+    # Verify
+    entries = writer2.read_new_entries()
+    assert [entry['data']['callback_url'] for entry in entries] == ['http://localhost:8000/on_event',
+                                                                    'http://localhost:9000/on_event']
+
+    # Compacted twice since last read, changes missed.
+    writer1.compact({'registrants': {}})
+    writer1.compact({'registrants': {}})
+    assert writer2.read_new_entries() is None
+
+    writer1.close()
+    writer2.close()
+
+
+def test_event_registration_manager__concurrent_changes_survive_compaction(mocker):
+    # Objective:
+    # Changes journaled by many clients at once, while journal is compacted, are all restored on restart (none are
+    # lost to a snapshot taken while they were being journaled).
+
+    # Setup
+    mocker.patch('eventcenter.server.event_center.APICaller.make_post_call')
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set(REGISTRANTS_JOURNAL, True)
+    Properties().set(REGISTRANTS_JOURNAL_COMPACT_EVERY, 7)
+    urls = [f'http://localhost:{8000 + i}/on_event' for i in range(8)]
+
+    manager = EventRegistrationManager()
+    manager.clear_registrants()
+
+    def churn(url: str):
+        for i in range(25):
+            manager.register(RegistrationData(url, [f'test_event{i}'], ''))
+
+    # Test
+    threads = [threading.Thread(target=churn, args=[url]) for url in urls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.close()
+    get_subscription_index().clear()
+    restarted_manager = EventRegistrationManager()
+
+    # Verify
+    registrants = restarted_manager.pack_registrants()['registrants']
+    assert {url: sorted(channels['']) for url, channels in registrants.items()} == \
+           {url: sorted(f'test_event{i}' for i in range(25)) for url in urls}
+
+    # Teardown
+    restarted_manager.clear_registrants()
+    restarted_manager.close()
+    Properties().set(REGISTRANTS_JOURNAL_COMPACT_EVERY, 1000)
+
+
+def test_event_registration_manager__syncs_shared_registrations(mocker):
+    # Objective:
+    # Registration changes made by another process sharing the journal are picked up.
+
+    # Setup
+    mocker.patch('eventcenter.server.event_center.APICaller.make_post_call')
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set(REGISTRANTS_JOURNAL, True)
+    Properties().set(REGISTRANTS_SHARED, True)
+    Properties().set(REGISTRANTS_SYNC_INTERVAL_SEC, 0.05)
+    filepath = Properties().get('REGISTRANTS_FILE_PATH')
+
+    get_subscription_index().clear()
+    manager = EventRegistrationManager()
+    manager.clear_registrants()
+    other_worker = RegistrantsJournal(filepath, fsync_policy=FSYNC_ALWAYS, is_shared=True)
+
+    # Test
+    other_worker.append('register', RegistrationData('http://localhost:8000/on_event', ['test_event1'], '').dict)
+    other_worker.append('register', RegistrationData('http://localhost:9000/on_event', [], 'some_channel').dict)
+    other_worker.append('unregister_all', {'callback_url': 'http://localhost:9000/on_event'})
+    time.sleep(0.3)
+
+    # Verify
+    assert manager.pack_registrants() == {
+        'registrants': {
+            'http://localhost:8000/on_event': {'': ['test_event1']}
+        }
+    }
+
+    # Teardown
+    manager.clear_registrants()
+    manager.close()
+    other_worker.close()
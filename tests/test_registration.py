@@ -3,10 +3,15 @@ import time
 import pytest
 from eventdispatch import EventDispatch, Properties, EventDispatchManager, Event
 
-from eventcenter.server.event_center import Registration, RemoteEventData, RegistrationEvent
+from eventcenter.client import serialization
+from eventcenter.client.network import ApiConnectionError
+from eventcenter.client.serialization import get_content_negotiator, CONTENT_TYPE_JSON
+from eventcenter.server.event_center import Registration, RemoteEventData, RegistrationEvent, RemoteEventBatchData, \
+    get_subscription_index
+from eventcenter.server.breaker import CircuitBreakers, set_circuit_breakers, STATE_OPEN, STATE_CLOSED
+from eventcenter.server.retry import RetryQueues, set_retry_queues, get_retry_queues
 from eventcenter.server.service import RESPONSE_OK
-from helper import validate_handler_registered_for_event, validate_expected_handler_count, \
-    EventHandler, validate_received_events
+from helper import validate_expected_handler_count, EventHandler, validate_received_events
 
 SOME_CHANNEL = 'some_channel'
 
@@ -26,8 +31,11 @@ def setup_module():
 def setup_function():
     global handler, event_dispatch
 
+    get_subscription_index().clear()
     event_dispatch.clear_event_log()
     event_dispatch.clear_registered_handlers()
+    set_retry_queues(RetryQueues(backoff_sec=0.01, max_backoff_sec=0.01))
+    set_circuit_breakers(CircuitBreakers())
 
     handler = EventHandler()
 
@@ -41,6 +49,8 @@ def teardown_function():
         pass
 
     EventDispatchManager().remove_event_dispatch(SOME_CHANNEL)
+    set_retry_queues()
+    set_circuit_breakers()
 
 
 def teardown_module():
@@ -50,7 +60,7 @@ def teardown_module():
 @pytest.mark.parametrize('channel', [None, '', SOME_CHANNEL])
 def test_constructor__when_registering_for_event(channel: str):
     # Objective:
-    # Registration's handler is registered with event dispatch.
+    # Registration is indexed, and channel's handler is registered with event dispatch.
     # When valid channel, registered with channel event dispatch, otherwise with default event dispatch.
 
     # Setup
@@ -70,14 +80,14 @@ def test_constructor__when_registering_for_event(channel: str):
         channel_event_dispatch = event_dispatch
 
     validate_expected_handler_count(1, channel_event_dispatch)
-    validate_handler_registered_for_event(reg.on_event, test_event, channel_event_dispatch)
+    validate_registration_indexed(reg, test_event)
     assert reg.event == test_event
 
 
 @pytest.mark.parametrize('channel', [None, '', SOME_CHANNEL])
 def test_constructor__when_registering_for_all_events(mocker, channel: str):
     # Objective:
-    # Registration's handler is registered with event dispatch.
+    # Registration is indexed, and channel's handler is registered with event dispatch.
 
     # Setup
     global event_dispatch
@@ -94,14 +104,14 @@ def test_constructor__when_registering_for_all_events(mocker, channel: str):
     else:
         channel_event_dispatch = event_dispatch
     validate_expected_handler_count(1, channel_event_dispatch)
-    validate_handler_registered_for_event(reg.on_event, event_dispatch=channel_event_dispatch)
+    validate_registration_indexed(reg, 'any_event')
     mock_call.assert_called()
 
 
 @pytest.mark.parametrize('channel', [None, '', SOME_CHANNEL])
 def test_cancel__when_registered_for_event(channel: str):
     # Objective:
-    # Registration's handler is unregistered with event dispatch.
+    # Registration is removed from index, and channel's handler is unregistered with event dispatch.
 
     # Setup
     global event_dispatch
@@ -121,12 +131,13 @@ def test_cancel__when_registered_for_event(channel: str):
 
     # Verify
     validate_expected_handler_count(0, channel_event_dispatch)
+    assert reg not in get_subscription_index().get_registrations(reg.channel, reg.event)
 
 
 @pytest.mark.parametrize('channel', [None, '', SOME_CHANNEL])
 def test_cancel__when_registered_for_all_events(mocker, channel: str):
     # Objective:
-    # Registration's handler is unregistered with event dispatch.
+    # Registration is removed from index, and channel's handler is unregistered with event dispatch.
 
     # Setup
     global event_dispatch
@@ -148,6 +159,7 @@ def test_cancel__when_registered_for_all_events(mocker, channel: str):
 
     # Verify
     validate_expected_handler_count(0, channel_event_dispatch)
+    assert reg not in get_subscription_index().get_registrations(reg.channel, reg.event)
     mock_call.assert_called()
 
 
@@ -175,21 +187,47 @@ def test_on_event__when_reachable_client(mocker, channel: str):
     # Test
     reg.on_event(event)
 
-    # Verify
-    mock_call.assert_called_with(callback_url, json=remote_event.dict, timeout_sec=10.0)
+    # Verify (delivery happens asynchronously).
+    time.sleep(0.1)
+    mock_call.assert_called_with(callback_url, data=remote_event.encoded,
+                                 headers=get_content_negotiator().get_headers(CONTENT_TYPE_JSON), timeout_sec=10.0)
+
+
+@pytest.mark.parametrize('channel', [None, '', SOME_CHANNEL])
+def test_on_event__when_batch_delivery(mocker, channel: str):
+    # Objective:
+    # Remote handler's API is called, with a batch holding the event.
+
+    # Setup
+    global event_dispatch
+    callback_url = 'url'
+    test_event = 'test_event'
+    mock_call = mocker.patch('eventcenter.server.event_center.APICaller.make_post_call', return_value=RESPONSE_OK)
+    reg = Registration(callback_url, test_event, channel=channel, is_batch_delivery=True)
+
+    event = Event(test_event, {'name': 'Alice'})
+    batch = RemoteEventBatchData([RemoteEventData(channel, event)])
+
+    # Test
+    reg.on_event(event)
+
+    # Verify (delivery happens asynchronously).
+    time.sleep(0.1)
+    mock_call.assert_called_once_with(callback_url, json=batch.dict, timeout_sec=10.0)
 
 
 @pytest.mark.parametrize('channel', [None, '', SOME_CHANNEL])
 def test_on_event__when_unreachable_client(channel: str):
     # Objective:
-    # Unreachable client is unregistered with event dispatch.
+    # Unreachable client is unregistered with event dispatch (after failed retries).
     # Event sent about unreachable client.
 
     # Setup
     global event_dispatch, handler
     callback_url = 'http://localhost:9999/some/nonexisting/endpoint'
     test_event = 'test_event'
-    reg = Registration(callback_url, test_event, channel=channel)
+    reg = Registration(callback_url, test_event, channel=channel,
+                       retry_queues=RetryQueues(max_failures=2, backoff_sec=0.01))
 
     if channel:
         channel_event_dispatch = EventDispatchManager().event_dispatchers.get(channel)
@@ -209,6 +247,154 @@ def test_on_event__when_unreachable_client(channel: str):
     reg.on_event(event)
 
     # Verify
-    time.sleep(0.1)
+    time.sleep(0.3)
     validate_expected_handler_count(1, channel_event_dispatch)
     validate_received_events(handler, [RegistrationEvent.CALLBACK_FAILED_EVENT])
+
+
+def test_on_event__when_unreachable_client_and_retry_off():
+    # Objective:
+    # Unreachable client is unregistered right away, when retries are off.
+
+    # Setup
+    global event_dispatch, handler
+    callback_url = 'http://localhost:9999/some/nonexisting/endpoint'
+    reg = Registration(callback_url, 'test_event', retry_queues=RetryQueues(max_failures=0))
+    event_dispatch.register(handler.on_event, [RegistrationEvent.CALLBACK_FAILED_EVENT.namespaced_value])
+
+    # Test
+    reg.on_event(Event('test_event'))
+
+    # Verify
+    time.sleep(0.1)
+    validate_expected_handler_count(1, event_dispatch)
+    validate_received_events(handler, [RegistrationEvent.CALLBACK_FAILED_EVENT])
+
+
+def test_on_event__when_client_unreachable_for_a_while(mocker):
+    # Objective:
+    # Events are held while client is unreachable, and delivered (in order) once it is reachable again.
+    # Client stays registered.
+
+    # Setup
+    callback_url = 'http://localhost:9999/on_event'
+    posted = []
+
+    def post(url, **kwargs):
+        # First post and 2 retries fail.
+        if mock_call.call_count <= 3:
+            raise ApiConnectionError(url, None, None)
+        posted.append(RemoteEventData.from_dict(serialization.loads(kwargs['data'])).event.payload['index'])
+        return RESPONSE_OK
+
+    mock_call = mocker.patch('eventcenter.server.event_center.APICaller.make_post_call', side_effect=post)
+    reg = Registration(callback_url, 'test_event')
+
+    # Test
+    for i in range(5):
+        reg.on_event(Event('test_event', {'index': i}))
+
+    # Verify
+    time.sleep(0.3)
+    assert posted == [0, 1, 2, 3, 4]
+    assert reg in get_subscription_index().get_registrations('', 'test_event')
+    assert get_retry_queues().find(callback_url) is None
+
+
+def test_on_event__when_client_slow(mocker):
+    # Objective:
+    # Circuit opens once client is slow a number of times in a row, events are held (not sent) while it's open, and
+    # are delivered (in order) once a probe finds client healthy again.
+
+    # Setup
+    callback_url = 'http://localhost:9999/on_event'
+    breakers = CircuitBreakers(failure_threshold=2, slow_call_sec=0.05, open_sec=0.2)
+    posted = []
+
+    def post(url, **kwargs):
+        # First 2 posts are slow.
+        if mock_call.call_count <= 2:
+            time.sleep(0.06)
+        posted.append(RemoteEventData.from_dict(serialization.loads(kwargs['data'])).event.payload['index'])
+        return RESPONSE_OK
+
+    mock_call = mocker.patch('eventcenter.server.event_center.APICaller.make_post_call', side_effect=post)
+    reg = Registration(callback_url, 'test_event', circuit_breakers=breakers)
+
+    # Test
+    for i in range(5):
+        reg.on_event(Event('test_event', {'index': i}))
+    time.sleep(0.2)
+    posted_while_open = list(posted)
+    state_while_open = breakers.find(callback_url).state
+
+    # Verify
+    time.sleep(0.3)
+    assert posted_while_open == [0, 1]
+    assert state_while_open == STATE_OPEN
+    assert posted == [0, 1, 2, 3, 4]
+    assert breakers.find(callback_url).stats['state'] == STATE_CLOSED
+    assert breakers.find(callback_url).stats['trips'] == 1
+
+
+def test_on_event__when_circuit_open_and_retry_off(mocker):
+    # Objective:
+    # Events for a client whose circuit is open are skipped (not sent) when retries are off, and client stays
+    # registered.
+
+    # Setup
+    callback_url = 'http://localhost:9999/on_event'
+    breakers = CircuitBreakers(failure_threshold=1, slow_call_sec=0.01, open_sec=10.0)
+
+    def post(url, **kwargs):
+        time.sleep(0.02)
+        return RESPONSE_OK
+
+    mock_call = mocker.patch('eventcenter.server.event_center.APICaller.make_post_call', side_effect=post)
+    reg = Registration(callback_url, 'test_event', retry_queues=RetryQueues(max_failures=0),
+                       circuit_breakers=breakers)
+
+    # Test
+    for i in range(3):
+        reg.on_event(Event('test_event', {'index': i}))
+
+    # Verify
+    time.sleep(0.2)
+    assert mock_call.call_count == 1
+    assert breakers.find(callback_url).stats['skipped'] == 2
+    assert reg in get_subscription_index().get_registrations('', 'test_event')
+
+
+def test_on_event__when_probe_fails_to_encode(mocker):
+    # Objective:
+    # A probe the circuit let through, but that failed before being posted (event couldn't be encoded), doesn't keep
+    # circuit half open for good: next event is let through as a probe, and closes circuit once delivered.
+
+    # Setup
+    callback_url = 'http://localhost:9999/on_event'
+    breakers = CircuitBreakers(failure_threshold=1, slow_call_sec=1.0, open_sec=0.05)
+    statuses = [500, 200]
+    mock_call = mocker.patch('eventcenter.server.event_center.APICaller.make_post_call',
+                             side_effect=lambda url, **kwargs: mocker.Mock(status_code=statuses.pop(0)))
+    reg = Registration(callback_url, 'test_event', retry_queues=RetryQueues(max_failures=0),
+                       circuit_breakers=breakers)
+    reg.on_event(Event('test_event', {'index': 0}))
+    time.sleep(0.1)
+    state_after_failure = breakers.find(callback_url).state
+
+    # Test
+    encode = mocker.patch.object(RemoteEventData, 'encode', side_effect=ValueError('Cannot encode'))
+    reg.on_event(Event('test_event', {'index': 1}))
+    time.sleep(0.05)
+    mocker.stop(encode)
+    reg.on_event(Event('test_event', {'index': 2}))
+
+    # Verify
+    time.sleep(0.1)
+    assert state_after_failure == STATE_OPEN
+    assert mock_call.call_count == 2
+    assert breakers.find(callback_url).state == STATE_CLOSED
+
+
+def validate_registration_indexed(registration: Registration, event: str):
+    assert registration in get_subscription_index().get_registrations(registration.channel, event)
@@ -0,0 +1,186 @@
+import os
+import shutil
+import tempfile
+import time
+
+from eventdispatch import Event, EventDispatchManager
+
+from eventcenter.server.event_center import EventRegistrationManager, RemoteEventData, ReplayRequestData, \
+    get_subscription_index
+from eventcenter.server.replay import ReplayLog, ChannelLog, OFFSET_KEY, set_replay_log
+
+CHANNEL = 'some_channel'
+
+log_dir: str
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    global log_dir
+    log_dir = tempfile.mkdtemp()
+
+
+def teardown_function():
+    set_replay_log()
+    shutil.rmtree(log_dir)
+
+
+def teardown_module():
+    pass
+
+
+def test_append_read():
+    # Objective:
+    # Events get offsets in order (per channel), and are read back from any offset on.
+
+    # Setup
+    replay_log = ReplayLog(log_dir)
+
+    # Test
+    offsets = [replay_log.append(CHANNEL, make_data(i)) for i in range(200)]
+    other_offset = replay_log.append('other_channel', make_data(0))
+    records, first_offset, end_offset = replay_log.read(CHANNEL, 130, max_count=5)
+
+    # Verify
+    assert offsets == list(range(200))
+    assert other_offset == 0
+    assert [offset for offset, _ in records] == [130, 131, 132, 133, 134]
+    assert [data['event']['payload']['index'] for _, data in records] == [130, 131, 132, 133, 134]
+    assert (first_offset, end_offset) == (0, 200)
+
+
+def test_append__rolls_segments():
+    # Objective:
+    # Log is split in segments once they're full, and reads span segments.
+
+    # Setup
+    replay_log = ReplayLog(log_dir, segment_size=1024)
+
+    # Test
+    for i in range(50):
+        replay_log.append(CHANNEL, make_data(i))
+    records, _, _ = replay_log.read(CHANNEL, 0)
+
+    # Verify
+    assert replay_log.stats[CHANNEL]['segments'] > 1
+    assert [offset for offset, _ in records] == list(range(50))
+
+
+def test_append__retention_by_size():
+    # Objective:
+    # Oldest segments are deleted once log is over max size, and reads start from the first event kept.
+
+    # Setup
+    replay_log = ReplayLog(log_dir, segment_size=1024, retention_bytes=2048)
+
+    # Test
+    for i in range(100):
+        replay_log.append(CHANNEL, make_data(i))
+    records, first_offset, end_offset = replay_log.read(CHANNEL, 0)
+
+    # Verify
+    assert 0 < first_offset < 100
+    assert records[0][0] == first_offset
+    assert end_offset == 100
+    assert replay_log.stats[CHANNEL]['bytes'] <= 2048 + 1024
+
+
+def test_append__retention_by_time():
+    # Objective:
+    # Segments holding events older than max age are deleted (active segment is kept).
+
+    # Setup
+    log = ChannelLog(os.path.join(log_dir, 'channel'), CHANNEL, segment_size=256, retention_bytes=1024 * 1024,
+                     retention_sec=0.05)
+    for i in range(10):
+        log.append(b'{"index":%d}' % i)
+    time.sleep(0.1)
+
+    # Test
+    log.append(b'{"index":10}')
+    records = log.read(0, 100)
+
+    # Verify
+    assert log.first_offset > 0
+    assert records[-1] == (10, b'{"index":10}')
+
+
+def test_restart():
+    # Objective:
+    # Events logged before a restart are read back, and offsets carry on from where they were.
+
+    # Setup
+    replay_log = ReplayLog(log_dir, segment_size=1024)
+    for i in range(30):
+        replay_log.append(CHANNEL, make_data(i))
+    replay_log.close()
+
+    # Test
+    replay_log = ReplayLog(log_dir, segment_size=1024)
+    offset = replay_log.append(CHANNEL, make_data(30))
+    records, _, end_offset = replay_log.read(CHANNEL, 25)
+
+    # Verify
+    assert offset == 30
+    assert [data['event']['payload']['index'] for _, data in records] == [25, 26, 27, 28, 29, 30]
+    assert end_offset == 31
+
+
+def test_restart__when_crashed_mid_write():
+    # Objective:
+    # A partially written event (e.g. event center crashed mid-write) is dropped, events before it are kept.
+
+    # Setup
+    replay_log = ReplayLog(log_dir)
+    for i in range(3):
+        replay_log.append(CHANNEL, make_data(i))
+    replay_log.close()
+    channel_dir = os.path.join(log_dir, os.listdir(log_dir)[0])
+    segment_path = os.path.join(channel_dir, os.listdir(channel_dir)[0])
+    with open(segment_path, 'r+b') as file:
+        file.truncate(os.path.getsize(segment_path) - 5)
+
+    # Test
+    replay_log = ReplayLog(log_dir)
+    records, _, end_offset = replay_log.read(CHANNEL, 0)
+
+    # Verify
+    assert [offset for offset, _ in records] == [0, 1]
+    assert end_offset == 2
+    assert replay_log.append(CHANNEL, make_data(2)) == 2
+
+
+def test_replay():
+    # Objective:
+    # Posted events carry their offset, and can be replayed from an offset on (only ones asked for, if given names or
+    # patterns).
+
+    # Setup
+    set_replay_log(ReplayLog(log_dir))
+    get_subscription_index().clear()
+    received = []
+    EventDispatchManager().add_event_dispatch(CHANNEL)
+    EventDispatchManager().event_dispatchers[CHANNEL].register(received.append, ['test_event'])
+
+    # Test
+    for i in range(5):
+        name = 'test_event' if i % 2 == 0 else 'other_event'
+        EventRegistrationManager.post(RemoteEventData(CHANNEL, Event(name, {'index': i})))
+    response = EventRegistrationManager.replay(ReplayRequestData(CHANNEL, 1, events=['test_event']))
+    pattern_response = EventRegistrationManager.replay(ReplayRequestData(CHANNEL, 1, events=['*', 'none.#']))
+
+    # Verify
+    assert [event.payload['metadata'][OFFSET_KEY] for event in received] == [0, 2, 4]
+    assert [remote_event['event']['payload']['index'] for remote_event in response['remote_events']] == [2, 4]
+    assert response['remote_events'][0]['event']['payload']['metadata'] == {OFFSET_KEY: 2}
+    assert (response['next_offset'], response['end_offset']) == (5, 5)
+    assert [remote_event['event']['payload']['index'] for remote_event in pattern_response['remote_events']] == \
+        [1, 2, 3, 4]
+    EventDispatchManager().remove_event_dispatch(CHANNEL)
+
+
+def make_data(index: int):
+    return RemoteEventData(CHANNEL, Event('test_event', {'index': index})).dict
@@ -0,0 +1,133 @@
+import os
+import tempfile
+
+from eventdispatch import Event
+
+from eventcenter.server.event_center import RemoteEventData
+from eventcenter.server.retry import RetryQueue, RetryQueues
+
+DESTINATION = 'http://localhost:9999/on_event'
+
+spill_dir: str
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    global spill_dir
+    spill_dir = tempfile.mkdtemp()
+
+
+def teardown_function():
+    for name in os.listdir(spill_dir):
+        os.remove(os.path.join(spill_dir, name))
+    os.rmdir(spill_dir)
+
+
+def teardown_module():
+    pass
+
+
+def test_add_all__when_full():
+    # Objective:
+    # Oldest events are dropped once queue is full (no spill file).
+
+    # Setup
+    queue = RetryQueue(DESTINATION, RemoteEventData.from_dict, max_size=3)
+
+    # Test
+    queue.add_all(make_remote_events(5))
+
+    # Verify
+    assert get_indexes(queue.peek(10)) == [2, 3, 4]
+    assert queue.stats == {'pending': 3, 'spilled': 0, 'failures': 0, 'dropped': 2}
+
+
+def test_add_all__when_spilling():
+    # Objective:
+    # Events beyond what's held in memory are spilled to disk, and read back in order as room frees up.
+
+    # Setup
+    queues = RetryQueues(max_size=2, spill_dir=spill_dir, max_spill_size=10)
+    queue = queues.get(DESTINATION, RemoteEventData.from_dict)
+
+    # Test
+    queue.add_all(make_remote_events(5))
+    stats = queue.stats
+    delivered = []
+    while queue.size:
+        remote_events = queue.peek(2)
+        delivered += get_indexes(remote_events)
+        queue.remove(len(remote_events))
+
+    # Verify
+    assert stats['pending'] == 2
+    assert stats['spilled'] == 3
+    assert delivered == [0, 1, 2, 3, 4]
+
+
+def test_resume__after_restart():
+    # Objective:
+    # Spilled events are picked up by a new queue for the same destination (e.g. after a restart).
+
+    # Setup
+    queues = RetryQueues(max_size=1, spill_dir=spill_dir)
+    queues.get(DESTINATION, RemoteEventData.from_dict).add_all(make_remote_events(3))
+    queues.close()
+
+    # Test
+    queue = RetryQueues(max_size=10, spill_dir=spill_dir).resume(DESTINATION, RemoteEventData.from_dict)
+
+    # Verify (event held in memory before restart is lost, spilled ones are not).
+    assert get_indexes(queue.peek(10)) == [1, 2]
+    assert RetryQueues(spill_dir=spill_dir).resume('http://localhost:8888/on_event',
+                                                   RemoteEventData.from_dict) is None
+
+
+def test_on_failure():
+    # Objective:
+    # Backoff doubles with each failure in a row (up to a max), until too many failures (then gives up).
+    # A delivery resets failure count.
+
+    # Setup
+    queues = RetryQueues(max_failures=3, backoff_sec=1.0, max_backoff_sec=3.0)
+    queue = queues.get(DESTINATION, RemoteEventData.from_dict)
+    queue.add_all(make_remote_events(2))
+
+    # Test
+    delays = [queues.on_failure(queue) for _ in range(4)]
+    queue.remove()
+    delay_after_delivery = queues.on_failure(queue)
+
+    # Verify (delays have jitter, up to half off).
+    assert 0.5 <= delays[0] <= 1.0
+    assert 1.0 <= delays[1] <= 2.0
+    assert 1.5 <= delays[2] <= 3.0
+    assert delays[3] is None
+    assert 0.5 <= delay_after_delivery <= 1.0
+
+
+def test_discard():
+    # Objective:
+    # Discarded queue drops held events (including spilled ones).
+
+    # Setup
+    queues = RetryQueues(max_size=1, spill_dir=spill_dir)
+    queues.get(DESTINATION, RemoteEventData.from_dict).add_all(make_remote_events(3))
+
+    # Test
+    queues.discard(DESTINATION)
+
+    # Verify
+    assert queues.find(DESTINATION) is None
+    assert os.listdir(spill_dir) == []
+
+
+def make_remote_events(count: int) -> [RemoteEventData]:
+    return [RemoteEventData('', Event('test_event', {'index': i})) for i in range(count)]
+
+
+def get_indexes(remote_events: [RemoteEventData]) -> [int]:
+    return [remote_event.event.payload['index'] for remote_event in remote_events]
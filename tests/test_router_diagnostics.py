@@ -0,0 +1,85 @@
+import pytest
+
+from eventcenter.client.router_diagnostics import RouterDiagnostics, DIAGNOSTICS_OFF, DIAGNOSTICS_SAMPLED, \
+    DIAGNOSTICS_FULL
+from eventcenter.client.router_events import RouterEvent
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    pass
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    pass
+
+
+test_params__should_post = [
+    # All per-event diagnostics posted.
+    (
+        DIAGNOSTICS_FULL, [True, True, True, True, True, True]
+    ),
+
+    # First, then every 3rd per-event diagnostic posted.
+    (
+        DIAGNOSTICS_SAMPLED, [True, False, False, True, False, False]
+    ),
+
+    # No per-event diagnostics posted.
+    (
+        DIAGNOSTICS_OFF, [False, False, False, False, False, False]
+    ),
+]
+
+
+@pytest.mark.parametrize('level, expected', test_params__should_post)
+def test_should_post(level: str, expected: [bool]):
+    # Objective:
+    # Per-event diagnostics are posted per level, and all are counted.
+
+    # Setup
+    diagnostics = RouterDiagnostics(level, sample_every=3)
+
+    # Test
+    results = [diagnostics.should_post(RouterEvent.GOT_INTERNAL_EVENT) for _ in range(6)]
+
+    # Verify
+    assert results == expected
+    assert diagnostics.counts == {RouterEvent.GOT_INTERNAL_EVENT.value: 6}
+
+
+def test_should_post__when_not_per_event_diagnostic():
+    # Objective:
+    # Diagnostics not tied to routed events (e.g. router started) are always posted.
+
+    # Setup
+    diagnostics = RouterDiagnostics(DIAGNOSTICS_OFF)
+
+    # Test
+    is_posted = diagnostics.should_post(RouterEvent.STARTED)
+
+    # Verify
+    assert is_posted
+    assert diagnostics.counts == {RouterEvent.STARTED.value: 1}
+
+
+def test_init__when_unknown_level():
+    # Objective:
+    # Unknown diagnostics level is not accepted.
+
+    # Setup
+    # (none)
+
+    # Test
+    with pytest.raises(ValueError):
+        RouterDiagnostics('some_level')
+
+    # Verify
+    # (exception raised)
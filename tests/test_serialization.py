@@ -0,0 +1,66 @@
+import json
+
+from eventcenter.client import serialization
+from eventcenter.client.serialization import STDLIB_JSON
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    serialization.set_json_backend()
+
+
+def teardown_function():
+    serialization.set_json_backend()
+
+
+def teardown_module():
+    pass
+
+
+def test_dumps__when_default_backend():
+    # Objective:
+    # Data is encoded to json bytes (with fastest available backend).
+
+    # Setup
+    data = {'channel': 'some_channel', 'event': {'name': 'test_event1', 'payload': {'count': 1}}}
+
+    # Test
+    encoded = serialization.dumps(data)
+
+    # Verify
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == data
+    assert serialization.loads(encoded) == data
+
+
+def test_set_json_backend__when_backend_not_available():
+    # Objective:
+    # Unknown backend is not used, and fastest available is used instead.
+
+    # Setup
+    serialization.set_json_backend(STDLIB_JSON)
+    assert serialization.get_json_backend().name == STDLIB_JSON
+
+    # Test
+    serialization.set_json_backend('not_a_json_library')
+
+    # Verify
+    assert serialization.get_json_backend().name in [serialization.ORJSON, serialization.UJSON, STDLIB_JSON]
+    assert serialization.loads(serialization.dumps({'a': [1, 2]})) == {'a': [1, 2]}
+
+
+def test_dumps__when_stdlib_backend():
+    # Objective:
+    # Stdlib backend encodes compactly (no whitespace).
+
+    # Setup
+    serialization.set_json_backend(STDLIB_JSON)
+
+    # Test
+    encoded = serialization.dumps({'a': 1, 'b': [1, 2]})
+
+    # Verify
+    assert encoded == b'{"a":1,"b":[1,2]}'
@@ -0,0 +1,170 @@
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from eventdispatch import Event, Properties, EventDispatchManager
+
+from eventcenter.client.network import ApiConnectionError
+from eventcenter.client.stream_adapter import StreamingEventCenterAdapter, EVENT_CENTER_STREAM_ID, \
+    EVENT_CENTER_STREAM_CONNECT_TIMEOUT_SEC
+from eventcenter.server.async_service import AsyncEventCenterService, start_async_event_center
+from eventcenter.server.event_center import RemoteEventData, get_subscription_index
+from constants import EVENT_CENTER_PORT
+from helper import set_properties_for_event_center_interfacing
+
+SOME_CHANNEL = 'some_channel'
+
+service: AsyncEventCenterService
+receiver: StreamingEventCenterAdapter
+sender: StreamingEventCenterAdapter
+received: [RemoteEventData]
+
+
+def setup_module():
+    global service
+
+    set_properties_for_event_center_interfacing()
+    Properties().set('REGISTRANTS_FILE_PATH', 'registrants.json', is_skip_if_exists=True)
+    Properties().set('CLIENT_CALLBACK_TIMEOUT_SEC', 10.0, is_skip_if_exists=True)
+    service = start_async_event_center(EVENT_CENTER_PORT)
+
+
+def setup_function():
+    global receiver, sender, received
+
+    service.event_registration_manager.clear_registrants()
+    get_subscription_index().clear()
+    EventDispatchManager().default_dispatch.clear_registered_handlers()
+
+    received = []
+    receiver = create_adapter('receiver', received.append)
+    sender = create_adapter('sender', lambda _: None)
+
+
+def teardown_function():
+    receiver.shutdown()
+    sender.shutdown()
+
+
+def teardown_module():
+    service.shutdown()
+    time.sleep(0.2)
+
+
+def test_init__connected():
+    # Objective:
+    # Adapter connects its stream to event center, and is known by its stream url (no callback server).
+
+    # Verify
+    assert receiver.is_connected
+    assert receiver.callback_url == 'stream://receiver'
+    assert receiver.app is None
+
+
+@pytest.mark.parametrize('channel', ['', SOME_CHANNEL])
+def test_post_event__delivered_over_stream(channel: str):
+    # Objective:
+    # Events posted over one stream are delivered over another (registered) stream, in order.
+
+    # Setup
+    receiver.register(['test_event'], channel)
+
+    # Test
+    for i in range(20):
+        sender.post_event(Event('test_event', {'index': i}), channel, is_suppress_connection_error=False)
+
+    # Verify
+    wait_until(lambda: len(received) >= 20)
+    assert [remote_event.event.payload['index'] for remote_event in received] == list(range(20))
+    assert all(remote_event.channel == channel for remote_event in received)
+
+
+def test_post_events__delivered_over_stream():
+    # Objective:
+    # A batch of events posted over a stream is delivered, in order.
+
+    # Setup
+    receiver.register(['test_event'])
+
+    # Test
+    sender.post_events([Event('test_event', {'index': i}) for i in range(5)])
+
+    # Verify
+    wait_until(lambda: len(received) >= 5)
+    assert [remote_event.event.payload['index'] for remote_event in received] == list(range(5))
+
+
+def test_unregister__not_delivered():
+    # Objective:
+    # Events are no longer delivered over a stream after unregistering.
+
+    # Setup
+    receiver.register(['test_event'])
+    receiver.unregister(['test_event'])
+
+    # Test
+    sender.post_event(Event('test_event', {}))
+
+    # Verify
+    time.sleep(0.2)
+    assert received == []
+
+
+def test_map_events__response_over_stream():
+    # Objective:
+    # Mapping events gets event center's response (map key) over the stream.
+
+    # Test
+    key = sender.map_events([Event('event_a', {}), Event('event_b', {})], Event('event_c', {}))
+
+    # Verify
+    assert key
+
+
+def test_disconnect__registrations_dropped():
+    # Objective:
+    # Event center drops a stream's registrations once it disconnects.
+
+    # Setup
+    receiver.register(['test_event'])
+    wait_until(lambda: service.event_registration_manager.get_registrant('stream://receiver') is not None)
+
+    # Test
+    receiver.shutdown()
+
+    # Verify
+    wait_until(lambda: service.event_registration_manager.get_registrant('stream://receiver') is None)
+    assert service.event_registration_manager.get_registrant('stream://receiver') is None
+
+
+def test_post_event__not_connected():
+    # Objective:
+    # Posting without a connection raises a connection error (unless suppressed).
+
+    # Setup
+    Properties().set('EVENT_CENTER_URL', 'http://localhost:1')
+    Properties().set(EVENT_CENTER_STREAM_CONNECT_TIMEOUT_SEC, 0.1)
+    try:
+        adapter = create_adapter('unconnected', lambda _: None)
+    finally:
+        Properties().set('EVENT_CENTER_URL', f'http://localhost:{EVENT_CENTER_PORT}')
+        Properties().set(EVENT_CENTER_STREAM_CONNECT_TIMEOUT_SEC, 2.0)
+
+    # Test / Verify
+    with pytest.raises(ApiConnectionError):
+        adapter.post_event(Event('test_event', {}), is_suppress_connection_error=False)
+    adapter.post_event(Event('test_event', {}))
+    adapter.shutdown()
+
+
+def create_adapter(stream_id: str, handler) -> StreamingEventCenterAdapter:
+    Properties().set(EVENT_CENTER_STREAM_ID, stream_id)
+    return StreamingEventCenterAdapter(handler)
+
+
+def wait_until(condition, timeout_sec: float = 5.0):
+    deadline = time.monotonic() + timeout_sec
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
@@ -0,0 +1,113 @@
+import pytest
+
+from eventcenter.server.topics import TopicTrie, is_pattern
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    pass
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    pass
+
+
+@pytest.mark.parametrize('event, expected', [
+    ('worker.*', True),
+    ('router.#', True),
+    ('#', True),
+    ('worker.*.done', True),
+    ('worker.started', False),
+    ('worker*', False),
+    ('', False),
+])
+def test_is_pattern(event: str, expected: bool):
+    # Objective:
+    # Only names with a whole segment that is a wildcard are patterns.
+
+    # Verify
+    assert is_pattern(event) == expected
+
+
+@pytest.mark.parametrize('pattern, event, is_match', [
+    ('worker.*', 'worker.started', True),
+    ('worker.*', 'worker', False),
+    ('worker.*', 'worker.task.started', False),
+    ('worker.*', 'router.started', False),
+    ('router.#', 'router', True),
+    ('router.#', 'router.started', True),
+    ('router.#', 'router.diagnostics.failed', True),
+    ('router.#', 'routers.started', False),
+    ('*.started', 'worker.started', True),
+    ('*.started', 'worker.stopped', False),
+    ('#.failed', 'router.diagnostics.failed', True),
+    ('#.failed', 'failed', True),
+    ('worker.#.done', 'worker.done', True),
+    ('worker.#.done', 'worker.task.step.done', True),
+    ('worker.#.done', 'worker.task.step', False),
+    ('#', 'anything.at.all', True),
+])
+def test_match(pattern: str, event: str, is_match: bool):
+    # Objective:
+    # '*' matches exactly one segment, '#' matches any number of segments (none included).
+
+    # Setup
+    trie = TopicTrie()
+    trie.add(pattern, 'http://localhost:8000/on_event', pattern)
+
+    # Test
+    found = trie.match(event)
+
+    # Verify
+    assert found == ({'http://localhost:8000/on_event': pattern} if is_match else {})
+
+
+def test_match__values_of_all_matching_patterns():
+    # Objective:
+    # Event gets values of every pattern it matches (by key), and only those.
+
+    # Setup
+    trie = TopicTrie()
+    trie.add('worker.*', 'url_1', 1)
+    trie.add('worker.#', 'url_2', 2)
+    trie.add('*.started', 'url_3', 3)
+    trie.add('router.*', 'url_4', 4)
+
+    # Test
+    found = trie.match('worker.started')
+
+    # Verify
+    assert found == {'url_1': 1, 'url_2': 2, 'url_3': 3}
+    assert trie.size == 4
+
+
+def test_remove():
+    # Objective:
+    # Removed values are no longer matched, branches left empty are pruned, and a value is only removed if it's the
+    # one given.
+
+    # Setup
+    trie = TopicTrie()
+    first, second = object(), object()
+    trie.add('worker.*', 'url_1', first)
+    trie.add('worker.*.done', 'url_2', second)
+
+    # Test
+    is_other_value_removed = trie.remove('worker.*', 'url_1', second)
+    is_removed = trie.remove('worker.*', 'url_1', first)
+    is_missing_removed = trie.remove('router.*', 'url_1')
+    trie.remove('worker.*.done', 'url_2')
+
+    # Verify
+    assert not is_other_value_removed
+    assert is_removed
+    assert not is_missing_removed
+    assert trie.match('worker.started') == {}
+    assert trie.is_empty
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from eventcenter.client.worker_pool import WorkerPool
+
+
+def setup_module():
+    pass
+
+
+def setup_function():
+    pass
+
+
+def teardown_function():
+    pass
+
+
+def teardown_module():
+    pass
+
+
+def test_submit__bounded_number_of_threads():
+    # Objective:
+    # All submitted work is done, using no more than max number of threads.
+
+    # Setup
+    pool = WorkerPool(2, name='test_worker')
+    done = []
+    lock = threading.Lock()
+
+    def work(index: int):
+        time.sleep(0.01)
+        with lock:
+            done.append(index)
+
+    # Test
+    for i in range(10):
+        pool.submit(work, i)
+    active_workers = len([thread for thread in threading.enumerate() if thread.name.startswith('test_worker')])
+    pool.shutdown(wait=True)
+
+    # Verify
+    assert sorted(done) == list(range(10))
+    assert active_workers <= 2
+
+
+def test_submit__when_work_fails():
+    # Objective:
+    # Failing work doesn't stop worker from doing other work.
+
+    # Setup
+    pool = WorkerPool(1)
+    done = []
+
+    def fail():
+        raise ValueError('failed')
+
+    # Test
+    pool.submit(fail)
+    pool.submit(done.append, 'done')
+    pool.shutdown(wait=True)
+
+    # Verify
+    assert done == ['done']